@@ -12,11 +12,12 @@ from django.utils import timezone
 from datetime import datetime, timedelta
 
 from .models import (
-    LoteAves, BitacoraDiaria, TipoConcentrado,
+    LoteAves, BitacoraDiaria, ResumenProduccionDiaria, SincronizacionBitacora, TipoConcentrado,
     ControlConcentrado, TipoVacuna, PlanVacunacion,
-    MovimientoHuevos, DetalleMovimientoHuevos, InventarioHuevos, AlertaSistema,
-    RegistroModificacion
+    MovimientoHuevos, DetalleMovimientoHuevos, InventarioHuevos, KardexHuevos, SaldoDiarioHuevos,
+    AlertaSistema, RegistroModificacion, RegistroModificacionArchivado
 )
+from .utils import ajustar_stock
 
 
 class FiltroFechaPersonalizado(SimpleListFilter):
@@ -86,6 +87,20 @@ class BitacoraDiariaAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at', 'updated_at', 'produccion_total', 'porcentaje_postura']
     date_hierarchy = 'fecha'
 
+@admin.register(ResumenProduccionDiaria)
+class ResumenProduccionDiariaAdmin(admin.ModelAdmin):
+    list_display = ['fecha', 'lote', 'galpon', 'produccion_total', 'mortalidad', 'aves_inicio_dia', 'porcentaje_postura']
+    list_filter = ['fecha', 'galpon']
+    search_fields = ['lote__codigo', 'galpon']
+    ordering = ['-fecha']
+    date_hierarchy = 'fecha'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
 @admin.register(TipoConcentrado)
 class TipoConcentradoAdmin(admin.ModelAdmin):
     list_display = ['nombre', 'proteina_porcentaje', 'precio_por_kg']
@@ -190,9 +205,67 @@ class InventarioHuevosAdmin(admin.ModelAdmin):
     list_filter = ['categoria']
     ordering = ['categoria']
 
+    def save_model(self, request, obj, form, change):
+        """Los cambios de cantidad se registran como ajuste manual en el kardex."""
+        if not change:
+            cantidad = obj.cantidad_actual
+            obj.cantidad_actual = 0
+            super().save_model(request, obj, form, change)
+        else:
+            cantidad = form.cleaned_data['cantidad_actual']
+            campos = [campo for campo in form.changed_data if campo != 'cantidad_actual']
+            if campos:
+                obj.save(update_fields=campos + ['cantidad_minima', 'fecha_ultima_actualizacion', 'updated_at'])
+        if not change or 'cantidad_actual' in form.changed_data:
+            ajustar_stock(obj.categoria, cantidad, usuario_id=request.user.id)
+            obj.refresh_from_db(fields=['cantidad_actual'])
+
+@admin.register(KardexHuevos)
+class KardexHuevosAdmin(admin.ModelAdmin):
+    list_display = ['fecha_registro', 'categoria', 'cantidad', 'origen', 'referencia_id', 'usuario']
+    list_filter = ['categoria', 'origen', 'fecha']
+    ordering = ['-fecha_registro']
+    date_hierarchy = 'fecha'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(SincronizacionBitacora)
+class SincronizacionBitacoraAdmin(admin.ModelAdmin):
+    list_display = ['fecha_registro', 'clave', 'estado', 'bitacora', 'usuario']
+    list_filter = ['estado']
+    search_fields = ['clave']
+    ordering = ['-fecha_registro']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(SaldoDiarioHuevos)
+class SaldoDiarioHuevosAdmin(admin.ModelAdmin):
+    list_display = ['fecha', 'categoria', 'entradas', 'salidas', 'saldo']
+    list_filter = ['categoria']
+    ordering = ['-fecha', 'categoria']
+    date_hierarchy = 'fecha'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
 @admin.register(AlertaSistema)
 class AlertaSistemaAdmin(admin.ModelAdmin):
-    list_display = ['tipo_alerta', 'titulo', 'nivel', 'fecha_generacion', 'leida']
+    list_display = ['tipo_alerta', 'titulo', 'nivel', 'lote', 'fecha_alerta', 'ocurrencias', 'fecha_generacion', 'leida']
     list_filter = ['tipo_alerta', 'nivel', 'leida', 'fecha_generacion']
     search_fields = ['titulo', 'mensaje']
     ordering = ['-fecha_generacion']
@@ -214,6 +287,22 @@ class RegistroModificacionAdmin(admin.ModelAdmin):
     def has_delete_permission(self, request, obj=None):
         return False
 
+@admin.register(RegistroModificacionArchivado)
+class RegistroModificacionArchivadoAdmin(admin.ModelAdmin):
+    list_display = ['fecha_modificacion', 'usuario', 'modelo', 'accion', 'objeto_id']
+    list_filter = ['accion', 'modelo']
+    search_fields = ['usuario__username', 'justificacion']
+    ordering = ['-fecha_modificacion']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 admin.site.site_header = "AgroSmart - Administración Avícola"
 admin.site.site_title = "AgroSmart Admin"
 admin.site.index_title = "Panel de Administración del Módulo Avícola"
\ No newline at end of file
@@ -0,0 +1,393 @@
+"""
+Motor de reglas de alertas del módulo avícola.
+
+Las reglas se declaran como umbrales sobre las series diarias (producción,
+mortalidad y consumo del resumen diario; stock del inventario de huevos;
+días para aplicar las vacunas programadas) y se evalúan por familia con una sola consulta para todos los lotes activos.
+Cada alerta queda identificada por (tipo_alerta, clave_lote, día), con
+clave_lote = 0 para las alertas generales (stock): antes de insertar se
+descartan las que ya existen y la restricción única cubre las carreras, de
+modo que reevaluar un día no duplica alertas ni revive las que el usuario ya leyó.
+
+Se ejecuta al confirmar una bitácora (solo su lote y fecha, ver efectos.py)
+y como barrido programado (comando evaluar_alertas).
+
+Los contadores de alertas (encabezado de la lista, insignia del dashboard)
+salen de una sola consulta con agregación condicional, cacheada por
+usuario hasta que cambie cualquier alerta (dominio DOMINIO_ALERTAS).
+
+Mantenimiento (comando depurar_alertas): las alertas leídas o resueltas
+iguales de días consecutivos se compactan en una sola con el número de
+ocurrencias (que sigue deduplicando todos esos días), y las leídas más antiguas que la retención se eliminan por
+lotes.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from apps.core.cache import invalidar_dominio, obtener_o_calcular, DOMINIO_ALERTAS
+from .models import AlertaSistema, InventarioHuevos, PlanVacunacion, ResumenProduccionDiaria
+
+
+class Regla:
+    """Umbral sobre una serie diaria: `serie` mayor o menor que `umbral`."""
+
+    def __init__(self, tipo_alerta, nivel, serie, condicion, umbral, unidad, solo_postura=False):
+        self.tipo_alerta = tipo_alerta
+        self.nivel = nivel
+        self.serie = serie
+        self.condicion = condicion
+        self.umbral = umbral
+        self.unidad = unidad
+        self.solo_postura = solo_postura
+
+    def se_cumple(self, valor):
+        if valor is None:
+            return False
+        if self.condicion == 'mayor':
+            return valor > self.umbral
+        return valor < self.umbral
+
+    def describir(self, valor):
+        comparacion = 'más de' if self.condicion == 'mayor' else 'menos de'
+        return f'{valor:g} {self.unidad} ({comparacion} {self.umbral:g})'
+
+
+# Por tipo de alerta gana la primera regla que se cumple: las críticas van primero
+REGLAS_PRODUCCION = [
+    Regla('mortalidad_alta', 'critica', 'mortalidad', 'mayor', 5, 'aves muertas'),
+    Regla('produccion_baja', 'critica', 'porcentaje_postura', 'menor', 50, '% de postura', solo_postura=True),
+    Regla('produccion_baja', 'normal', 'produccion_total', 'menor', 100, 'huevos', solo_postura=True),
+    Regla('consumo_anormal', 'normal', 'consumo_por_ave', 'mayor', 150, 'g de concentrado por ave'),
+    Regla('consumo_anormal', 'normal', 'consumo_por_ave', 'menor', 80, 'g de concentrado por ave'),
+]
+
+REGLAS_STOCK = [
+    Regla('stock_bajo', 'critica', 'porcentaje_stock', 'menor', 50, '% del stock mínimo'),
+    Regla('stock_bajo', 'normal', 'porcentaje_stock', 'menor', 100, '% del stock mínimo'),
+]
+
+REGLAS_VACUNAS = [
+    Regla('vacuna_pendiente', 'critica', 'dias_para_aplicacion', 'menor', 0, 'días para aplicar'),
+    Regla('vacuna_pendiente', 'normal', 'dias_para_aplicacion', 'menor', 4, 'días para aplicar'),
+]
+
+TITULOS = {
+    'mortalidad_alta': 'Alta mortalidad',
+    'produccion_baja': 'Baja producción',
+    'consumo_anormal': 'Consumo anormal',
+    'stock_bajo': 'Stock bajo de huevos',
+    'vacuna_pendiente': 'Vacunas pendientes',
+}
+
+
+def _series_produccion(fila):
+    aves = fila['aves_inicio_dia']
+    consumo = fila['consumo_concentrado'] or 0
+    return {
+        'mortalidad': fila['mortalidad'],
+        'produccion_total': fila['produccion_total'],
+        'porcentaje_postura': round(fila['produccion_total'] / aves * 100, 1) if aves > 0 else None,
+        # Sin consumo registrado no se evalúa el consumo
+        'consumo_por_ave': round(float(consumo) * 1000 / aves) if aves > 0 and consumo else None,
+    }
+
+
+def evaluar_produccion(lote_ids=None, fechas=None, desde=None, hasta=None):
+    """
+    Evalúa REGLAS_PRODUCCION sobre el resumen diario de los lotes activos
+    (una consulta) y retorna las alertas candidatas sin guardarlas.
+    """
+    filas = ResumenProduccionDiaria.objects.filter(lote__is_active=True)
+    if lote_ids is not None:
+        filas = filas.filter(lote_id__in=lote_ids)
+    if fechas is not None:
+        filas = filas.filter(fecha__in=fechas)
+    if desde:
+        filas = filas.filter(fecha__gte=desde)
+    if hasta:
+        filas = filas.filter(fecha__lte=hasta)
+
+    alertas = {}
+    for fila in filas.values(
+        'lote_id', 'fecha', 'produccion_total', 'mortalidad', 'consumo_concentrado',
+        'aves_inicio_dia', 'lote__codigo', 'lote__galpon', 'lote__estado'
+    ):
+        series = _series_produccion(fila)
+        for regla in REGLAS_PRODUCCION:
+            clave = (regla.tipo_alerta, fila['lote_id'], fila['fecha'])
+            if clave in alertas or (regla.solo_postura and fila['lote__estado'] != 'postura'):
+                continue
+            valor = series[regla.serie]
+            if regla.se_cumple(valor):
+                alertas[clave] = AlertaSistema(
+                    tipo_alerta=regla.tipo_alerta,
+                    nivel=regla.nivel,
+                    titulo=f"{TITULOS[regla.tipo_alerta]} en lote {fila['lote__codigo']}",
+                    mensaje=f"Lote {fila['lote__codigo']} el {fila['fecha']:%d/%m/%Y}: {regla.describir(valor)}",
+                    lote_id=fila['lote_id'],
+                    galpon_nombre=fila['lote__galpon'],
+                    fecha_alerta=fila['fecha'],
+                )
+    return list(alertas.values())
+
+
+def evaluar_stock(dia=None):
+    """
+    Evalúa REGLAS_STOCK sobre el inventario de huevos (una consulta). Retorna
+    como máximo una alerta general del día con las categorías bajo el mínimo.
+    """
+    dia = dia or timezone.localdate()
+    nivel = None
+    detalles = []
+    for categoria, actual, minima in InventarioHuevos.objects.filter(
+        is_active=True, cantidad_minima__gt=0
+    ).order_by('categoria').values_list('categoria', 'cantidad_actual', 'cantidad_minima'):
+        valor = round(actual / minima * 100, 1)
+        regla = next((regla for regla in REGLAS_STOCK if regla.se_cumple(valor)), None)
+        if regla:
+            detalles.append(f'{categoria}: {actual} de {minima} ({regla.describir(valor)})')
+            if nivel != 'critica':
+                nivel = regla.nivel
+
+    if not detalles:
+        return []
+    return [AlertaSistema(
+        tipo_alerta='stock_bajo',
+        nivel=nivel,
+        titulo=TITULOS['stock_bajo'],
+        mensaje='; '.join(detalles),
+        fecha_alerta=dia,
+    )]
+
+
+def evaluar_vacunas(hoy=None):
+    """
+    Evalúa REGLAS_VACUNAS sobre los planes no aplicados que vencen pronto o
+    ya vencieron (una consulta por el índice (aplicada, fecha_programada)).
+    Retorna una alerta por lote con todas sus vacunas pendientes.
+    """
+    hoy = hoy or timezone.localdate()
+    limite = hoy + timedelta(days=max(regla.umbral for regla in REGLAS_VACUNAS) - 1)
+    por_lote = {}
+    for plan in PlanVacunacion.objects.filter(
+        aplicada=False, fecha_programada__lte=limite, is_active=True, lote__is_active=True
+    ).select_related('lote', 'tipo_vacuna').order_by('lote_id', 'fecha_programada'):
+        valor = (plan.fecha_programada - hoy).days
+        regla = next((regla for regla in REGLAS_VACUNAS if regla.se_cumple(valor)), None)
+        if regla is None:
+            continue
+        alerta = por_lote.get(plan.lote_id)
+        if alerta is None:
+            alerta = por_lote[plan.lote_id] = AlertaSistema(
+                tipo_alerta='vacuna_pendiente',
+                nivel=regla.nivel,
+                titulo=f"{TITULOS['vacuna_pendiente']} en lote {plan.lote.codigo}",
+                mensaje='',
+                lote=plan.lote,
+                galpon_nombre=plan.lote.galpon,
+                fecha_alerta=hoy,
+            )
+        estado = f'vencida hace {-valor} días' if valor < 0 else f'en {valor} días'
+        detalle = f'{plan.tipo_vacuna.nombre} ({plan.fecha_programada:%d/%m/%Y}, {estado})'
+        alerta.mensaje = f'{alerta.mensaje}; {detalle}' if alerta.mensaje else detalle
+        if regla.nivel == 'critica':
+            alerta.nivel = 'critica'
+    return list(por_lote.values())
+
+
+def _clave(alerta):
+    return (alerta.tipo_alerta, alerta.clave_lote, alerta.fecha_alerta)
+
+
+def _claves_existentes(alertas):
+    """
+    Claves (tipo, clave_lote, día) ya registradas entre las candidatas, en
+    una consulta. Una alerta compactada cubre los `ocurrencias` días
+    consecutivos desde su fecha_alerta, aunque las filas de esos días ya no existan.
+    """
+    fechas = [alerta.fecha_alerta for alerta in alertas]
+    existentes = set()
+    for tipo, clave_lote, fecha, ocurrencias in AlertaSistema.objects.filter(
+        Q(fecha_alerta__gte=min(fechas)) | Q(ocurrencias__gt=1),
+        tipo_alerta__in={alerta.tipo_alerta for alerta in alertas},
+        clave_lote__in={alerta.clave_lote for alerta in alertas},
+        fecha_alerta__lte=max(fechas),
+    ).values_list('tipo_alerta', 'clave_lote', 'fecha_alerta', 'ocurrencias'):
+        existentes.update((tipo, clave_lote, fecha + timedelta(days=dia)) for dia in range(ocurrencias))
+    return existentes
+
+
+def guardar_alertas(alertas):
+    """
+    Inserta las alertas omitiendo las que ya existen para su tipo, lote y
+    día, y las repetidas entre las candidatas (queda la primera). Retorna
+    el número de alertas nuevas; si otra evaluación inserta la misma alerta
+    al mismo tiempo, ambas la cuentan (el resultado es una cota superior).
+    """
+    for alerta in alertas:
+        # bulk_create no pasa por save()
+        alerta.clave_lote = alerta.lote_id or 0
+    if not alertas:
+        return 0
+    existentes = _claves_existentes(alertas)
+    nuevas = {}
+    for alerta in alertas:
+        if _clave(alerta) not in existentes:
+            nuevas.setdefault(_clave(alerta), alerta)
+    if not nuevas:
+        return 0
+    # ignore_conflicts cubre la carrera con otra evaluación concurrente del mismo día
+    AlertaSistema.objects.bulk_create(list(nuevas.values()), batch_size=500, ignore_conflicts=True)
+    invalidar_dominio(DOMINIO_ALERTAS)
+    return len(nuevas)
+
+
+def evaluar_lote(lote_id, fechas):
+    """Evalúa las reglas de producción de un lote en las fechas dadas (al confirmar bitácoras)."""
+    return guardar_alertas(evaluar_produccion(lote_ids=[lote_id], fechas=fechas))
+
+
+def barrido_alertas(dias=1, hoy=None):
+    """
+    Barrido programado (nocturno): evalúa todos los lotes activos en los
+    últimos `dias` días más hoy, el stock y las vacunas pendientes del día.
+    Retorna el número de alertas nuevas.
+    """
+    hoy = hoy or timezone.localdate()
+    alertas = evaluar_produccion(desde=hoy - timedelta(days=dias), hasta=hoy)
+    alertas += evaluar_stock(hoy)
+    alertas += evaluar_vacunas(hoy)
+    return guardar_alertas(alertas)
+
+
+def alertas_visibles(usuario):
+    """Alertas generales y las dirigidas al usuario; los superusuarios ven todas."""
+    alertas = AlertaSistema.objects.all()
+    if not usuario.is_superuser:
+        alertas = alertas.filter(Q(usuario_destinatario__isnull=True) | Q(usuario_destinatario=usuario))
+    return alertas
+
+
+def _contar(alertas):
+    # Una sola pasada por el índice (is_active, leida, nivel)
+    pendientes = Q(is_active=True, leida=False)
+    return alertas.aggregate(
+        criticas=Count('id', filter=pendientes & Q(nivel='critica')),
+        normales=Count('id', filter=pendientes & Q(nivel='normal')),
+        total_no_leidas=Count('id', filter=pendientes),
+        total=Count('id', filter=Q(is_active=True)),
+    )
+
+
+def contar_alertas(usuario=None):
+    """
+    Contadores de alertas visibles para el usuario (sin usuario, de todas,
+    como la lista de alertas): criticas, normales, total_no_leidas y total.
+    Se invalidan al crear, leer o resolver alertas.
+    """
+    if usuario is None:
+        return obtener_o_calcular(
+            'contadores_alertas', [DOMINIO_ALERTAS], [],
+            lambda: _contar(AlertaSistema.objects.all())
+        )
+    return obtener_o_calcular(
+        'contadores_alertas', [DOMINIO_ALERTAS], [usuario.pk],
+        lambda: _contar(alertas_visibles(usuario))
+    )
+
+
+def _leidas_o_resueltas():
+    return Q(leida=True) | Q(is_active=False)
+
+
+def _eliminar(ids, tamano_lote):
+    for inicio in range(0, len(ids), tamano_lote):
+        AlertaSistema.objects.filter(id__in=ids[inicio:inicio + tamano_lote]).delete()
+
+
+def compactar_alertas(antes_de, tamano_lote=1000):
+    """
+    Colapsa las alertas automáticas leídas o resueltas anteriores al día
+    `antes_de` que se repiten en días consecutivos con el mismo lote, tipo y
+    nivel: la primera de la racha acumula las ocurrencias y la primera y
+    última vez, y las demás se eliminan. La primera sigue marcando los días
+    de la racha como ya alertados (ver _claves_existentes), así que
+    reevaluarlos no recrea las alertas. Un lote por transacción. Retorna
+    el número de alertas eliminadas.
+    """
+    candidatas = AlertaSistema.objects.filter(
+        _leidas_o_resueltas(), lote__isnull=False, fecha_alerta__lt=antes_de
+    )
+    lote_ids = list(candidatas.order_by().values_list('lote_id', flat=True).distinct())
+
+    eliminadas = 0
+    for lote_id in lote_ids:
+        with transaction.atomic():
+            cabezas, sobrantes = {}, []
+            cabeza = None
+            for alerta in candidatas.filter(lote_id=lote_id).select_for_update().order_by(
+                'tipo_alerta', 'nivel', 'fecha_alerta'
+            ):
+                consecutiva = (
+                    cabeza is not None
+                    and (alerta.tipo_alerta, alerta.nivel) == (cabeza.tipo_alerta, cabeza.nivel)
+                    and alerta.fecha_alerta == cabeza.fecha_alerta + timedelta(days=cabeza.ocurrencias)
+                )
+                if not consecutiva:
+                    cabeza = alerta
+                    continue
+                cabeza.primera_vez = cabeza.primera_vez or cabeza.fecha_generacion
+                cabeza.ultima_vez = alerta.ultima_vez or alerta.fecha_generacion
+                cabeza.ocurrencias += alerta.ocurrencias
+                cabezas[cabeza.pk] = cabeza
+                sobrantes.append(alerta.pk)
+
+            if sobrantes:
+                AlertaSistema.objects.bulk_update(
+                    list(cabezas.values()), ['ocurrencias', 'primera_vez', 'ultima_vez'], batch_size=tamano_lote
+                )
+                _eliminar(sobrantes, tamano_lote)
+                eliminadas += len(sobrantes)
+
+    if eliminadas:
+        invalidar_dominio(DOMINIO_ALERTAS)
+    return eliminadas
+
+
+def depurar_alertas(antes_de, tamano_lote=1000):
+    """
+    Elimina por lotes de `tamano_lote` las alertas leídas o resueltas vistas
+    por última vez antes de `antes_de`. Retorna el número de alertas eliminadas.
+    """
+    antiguas = AlertaSistema.objects.filter(_leidas_o_resueltas()).filter(
+        Q(ultima_vez__lt=antes_de) | Q(ultima_vez__isnull=True, fecha_generacion__lt=antes_de)
+    ).order_by('id')
+
+    eliminadas = 0
+    while True:
+        ids = list(antiguas.values_list('id', flat=True)[:tamano_lote])
+        if not ids:
+            break
+        _eliminar(ids, tamano_lote)
+        eliminadas += len(ids)
+
+    if eliminadas:
+        invalidar_dominio(DOMINIO_ALERTAS)
+    return eliminadas
+
+
+def mantenimiento_alertas(dias_compactar=None, dias_retencion=None, tamano_lote=1000):
+    """Compacta y depura las alertas. Retorna (compactadas, eliminadas)."""
+    if dias_compactar is None:
+        dias_compactar = getattr(settings, 'AVES_ALERTAS_COMPACTAR_DIAS', 7)
+    if dias_retencion is None:
+        dias_retencion = getattr(settings, 'AVES_ALERTAS_RETENCION_DIAS', 90)
+
+    compactadas = compactar_alertas(timezone.localdate() - timedelta(days=dias_compactar), tamano_lote)
+    eliminadas = depurar_alertas(timezone.now() - timedelta(days=dias_retencion), tamano_lote)
+    return compactadas, eliminadas
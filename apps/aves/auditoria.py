@@ -0,0 +1,201 @@
+"""
+Auditoría de modificaciones del módulo avícola.
+
+Los cambios se calculan contra la instantánea tomada al leer la fila
+(SnapshotModel), sin volver a consultarla, y el usuario es el de la
+petición en curso (UsuarioActualMiddleware). Los registros se acumulan
+durante la transacción y se escriben con un solo bulk_create al
+confirmarla; si la transacción (o el savepoint) se revierte, se descartan.
+Cada registro lleva su callback de on_commit y una ficha en el estado del
+hilo; el callback que deja sin fichas pendientes hace el único INSERT.
+
+Los registros antiguos se archivan en RegistroModificacionArchivado (solo
+las diferencias, comprimidas); historial_modificaciones consulta ambas
+tablas por su índice (modelo, objeto_id, fecha_modificacion).
+"""
+
+import itertools
+import json
+import logging
+import threading
+import zlib
+from datetime import date, datetime
+
+from django.contrib.auth.models import User
+from django.core.signals import request_finished
+from django.db import transaction
+from django.dispatch import receiver
+
+from apps.core.middleware import obtener_usuario_actual
+from .models import RegistroModificacion, RegistroModificacionArchivado
+
+logger = logging.getLogger(__name__)
+
+_buffer = threading.local()
+_fichas = itertools.count()
+
+
+def _como_texto(valor):
+    # Convertir valores a string de forma segura
+    if valor is None:
+        return None
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    return str(valor)
+
+
+def _estado():
+    if not hasattr(_buffer, 'registros'):
+        # registros: confirmados y aún sin escribir; esperados: fichas de los
+        # callbacks registrados que todavía no se han ejecutado
+        _buffer.registros = []
+        _buffer.esperados = set()
+    return _buffer
+
+
+def registrar_modificacion(modelo, objeto_id, cambios, accion='UPDATE'):
+    """
+    Acumula un registro de auditoría para la transacción actual. `cambios`
+    es {campo: (valor_anterior, valor_nuevo)}.
+    """
+    registro = RegistroModificacion(
+        modelo=modelo,
+        objeto_id=objeto_id,
+        accion=accion,
+        campos_modificados={campo: True for campo in cambios},
+        valores_anteriores={campo: _como_texto(anterior) for campo, (anterior, _) in cambios.items()},
+        valores_nuevos={campo: _como_texto(nuevo) for campo, (_, nuevo) in cambios.items()},
+    )
+    usuario = obtener_usuario_actual()
+    ficha = next(_fichas)
+    _estado().esperados.add(ficha)
+
+    def acumular():
+        estado = _estado()
+        # Django ejecuta los callbacks en el orden en que se registraron: las
+        # fichas anteriores que siguen esperando eran de un savepoint o una
+        # transacción revertidos y ya no se ejecutarán
+        estado.esperados.difference_update([esperada for esperada in estado.esperados if esperada <= ficha])
+        estado.registros.append((registro, usuario))
+        # El último registro pendiente de la transacción escribe todos los acumulados
+        if not estado.esperados:
+            vaciar()
+
+    transaction.on_commit(acumular)
+
+
+def vaciar():
+    """Escribe los registros acumulados con un solo bulk_create."""
+    pendientes = _estado().registros
+    if not pendientes:
+        return
+    _buffer.registros = []
+
+    sin_usuario = [registro for registro, usuario in pendientes if usuario is None]
+    if sin_usuario:
+        # Cambios hechos fuera de una petición (comandos, tareas): se atribuyen
+        # al primer superusuario, como antes de existir el usuario actual
+        sistema = User.objects.filter(is_superuser=True).order_by('id').first()
+        if sistema is None:
+            logger.warning('Se omiten %d registros de auditoría sin usuario', len(sin_usuario))
+            pendientes = [(registro, usuario) for registro, usuario in pendientes if usuario is not None]
+        else:
+            pendientes = [(registro, usuario or sistema) for registro, usuario in pendientes]
+
+    registros = []
+    for registro, usuario in pendientes:
+        registro.usuario_id = usuario.pk
+        registros.append(registro)
+    RegistroModificacion.objects.bulk_create(registros)
+
+
+@receiver(request_finished)
+def vaciar_al_terminar_peticion(**kwargs):
+    """
+    Si el último cambio auditado de una transacción se revirtió en un
+    savepoint, los registros confirmados quedan esperando su callback: al
+    terminar la petición ya no queda ninguna transacción abierta.
+    """
+    estado = _estado()
+    if estado.registros:
+        estado.esperados.clear()
+        try:
+            vaciar()
+        except Exception:
+            logger.exception('No se pudieron escribir los registros de auditoría pendientes')
+
+
+def _como_dict(valores):
+    # Registros antiguos pueden guardar los valores como texto JSON
+    if isinstance(valores, str):
+        try:
+            valores = json.loads(valores)
+        except ValueError:
+            return {}
+    return valores if isinstance(valores, dict) else {}
+
+
+def comprimir_cambios(registro):
+    """JSON comprimido con {campo: [anterior, nuevo]} de los campos modificados."""
+    anteriores = _como_dict(registro.valores_anteriores)
+    nuevos = _como_dict(registro.valores_nuevos)
+    # campos_modificados es un dict ({campo: True}) o la lista changed_data de un formulario
+    diferencias = {
+        campo: [anteriores.get(campo), nuevos.get(campo)]
+        for campo in registro.campos_modificados or []
+    }
+    return zlib.compress(json.dumps(diferencias, separators=(',', ':'), default=str).encode('utf-8'))
+
+
+def archivar_registros(antes_de, tamano_lote=1000):
+    """
+    Mueve al archivo los registros de auditoría anteriores a `antes_de`, por
+    lotes de `tamano_lote` filas, cada lote en su propia transacción.
+    Retorna el número de registros archivados.
+    """
+    total = 0
+    while True:
+        with transaction.atomic():
+            registros = list(
+                RegistroModificacion.objects.filter(fecha_modificacion__lt=antes_de)
+                .order_by('fecha_modificacion', 'id')[:tamano_lote]
+            )
+            if not registros:
+                return total
+            RegistroModificacionArchivado.objects.bulk_create([
+                RegistroModificacionArchivado(
+                    registro_id=registro.id,
+                    usuario_id=registro.usuario_id,
+                    modelo=registro.modelo,
+                    objeto_id=registro.objeto_id,
+                    accion=registro.accion,
+                    cambios=comprimir_cambios(registro),
+                    justificacion=registro.justificacion,
+                    fecha_modificacion=registro.fecha_modificacion,
+                )
+                for registro in registros
+            ], ignore_conflicts=True)
+            RegistroModificacion.objects.filter(id__in=[registro.id for registro in registros]).delete()
+        total += len(registros)
+
+
+def historial_modificaciones(modelo, objeto_id, limite=None):
+    """
+    Historial de un objeto, del más reciente al más antiguo, combinando los
+    registros recientes y los archivados (una consulta indexada por tabla).
+    """
+    recientes = RegistroModificacion.objects.filter(
+        modelo=modelo, objeto_id=objeto_id
+    ).select_related('usuario').order_by('-fecha_modificacion')
+    archivados = RegistroModificacionArchivado.objects.filter(
+        modelo=modelo, objeto_id=objeto_id
+    ).select_related('usuario').order_by('-fecha_modificacion')
+    if limite:
+        recientes = recientes[:limite]
+        archivados = archivados[:limite]
+
+    historial = list(recientes)
+    if limite is None or len(historial) < limite:
+        historial += list(archivados)
+    historial.sort(key=lambda registro: registro.fecha_modificacion, reverse=True)
+    return historial[:limite] if limite else historial
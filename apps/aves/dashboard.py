@@ -0,0 +1,276 @@
+"""
+Capa de datos del dashboard avícola.
+
+Calcula todas las series del dashboard con un número fijo de consultas
+agrupadas (por fecha y por lote, con agregación condicional) sobre el
+resumen diario de producción, de modo que el costo de la página no crece
+con los días, galpones o lotes.
+"""
+
+from datetime import timedelta
+import json
+
+from django.db.models import Sum, Q
+from django.utils import timezone
+
+from apps.core.cache import (
+    DOMINIO_PRODUCCION, DOMINIO_INVENTARIO, DOMINIO_ALERTAS, DOMINIO_LOTES
+)
+from .models import (
+    LoteAves, ResumenProduccionDiaria, AlertaSistema, PlanVacunacion,
+    InventarioHuevos, MovimientoHuevos
+)
+
+
+CATEGORIAS_HUEVO = [categoria for categoria, _ in MovimientoHuevos.CATEGORIAS_HUEVO]
+
+
+class DashboardAvicola:
+    """
+    Construye el contexto del dashboard avícola.
+
+    Consultas por página: lotes, serie diaria agrupada por fecha, totales
+    agrupados por lote, alertas del día (motor de reglas), vacunas
+    pendientes e inventario. Las alertas pendientes dependen del usuario y
+    las agrega la vista (alertas.contar_alertas).
+    """
+
+    DIAS_TENDENCIA = 30
+    DOMINIOS_CACHE = [DOMINIO_PRODUCCION, DOMINIO_INVENTARIO, DOMINIO_ALERTAS, DOMINIO_LOTES]
+
+    def __init__(self, galpon_filtro=None, lote_filtro=None, hoy=None):
+        self.galpon_filtro = galpon_filtro
+        self.lote_filtro = lote_filtro
+        self.hoy = hoy or timezone.now().date()
+
+    def obtener_lotes_query(self):
+        """Query base para lotes activos con los filtros aplicados."""
+        lotes_query = LoteAves.objects.filter(is_active=True)
+        if self.galpon_filtro:
+            lotes_query = lotes_query.filter(galpon__icontains=self.galpon_filtro)
+        if self.lote_filtro:
+            lotes_query = lotes_query.filter(id=self.lote_filtro)
+        return lotes_query
+
+    def obtener_serie_diaria(self, lotes_query, desde, hasta):
+        """
+        Totales por fecha: producción de ponedoras, mortalidad de todos los
+        lotes y consumo de engorde, en una sola consulta GROUP BY fecha.
+        """
+        filas = ResumenProduccionDiaria.objects.filter(
+            lote__in=lotes_query, fecha__gte=desde, fecha__lte=hasta
+        ).values('fecha').annotate(
+            produccion=Sum('produccion_total', filter=Q(lote__estado='postura')),
+            mortalidad=Sum('mortalidad'),
+            consumo=Sum('consumo_concentrado', filter=Q(lote__estado='levante')),
+        ).order_by('fecha')
+        return {fila['fecha']: fila for fila in filas}
+
+    def obtener_totales_por_lote(self, lotes_query, desde, hasta):
+        """Totales del período por lote en una sola consulta GROUP BY lote."""
+        filas = ResumenProduccionDiaria.objects.filter(
+            lote__in=lotes_query, fecha__gte=desde
+        ).values('lote_id').annotate(
+            produccion_periodo=Sum('produccion_total', filter=Q(fecha__lte=hasta)),
+            mortalidad_periodo=Sum('mortalidad', filter=Q(fecha__lte=hasta)),
+            produccion_abierta=Sum('produccion_total'),
+        ).order_by()
+        return {fila['lote_id']: fila for fila in filas}
+
+    def obtener_inventario_huevos(self):
+        """Inventario por categoría; solo crea las categorías que falten."""
+        inventarios = {
+            inventario.categoria: inventario
+            for inventario in InventarioHuevos.objects.filter(categoria__in=CATEGORIAS_HUEVO)
+        }
+        for categoria in CATEGORIAS_HUEVO:
+            if categoria not in inventarios:
+                inventarios[categoria], _ = InventarioHuevos.objects.get_or_create(
+                    categoria=categoria,
+                    defaults={'cantidad_actual': 0, 'cantidad_minima': 100}
+                )
+        return [inventarios[categoria] for categoria in CATEGORIAS_HUEVO]
+
+    def obtener_contexto(self):
+        """Devuelve el diccionario de contexto completo del dashboard."""
+        hoy = self.hoy
+        hace_7_dias = hoy - timedelta(days=7)
+        hace_30_dias = hoy - timedelta(days=30)
+
+        lotes_query = self.obtener_lotes_query()
+        lotes = list(lotes_query)
+
+        # Estadísticas generales
+        total_lotes = len(lotes)
+        total_aves = sum(lote.numero_aves_actual for lote in lotes)
+        aves_ponedoras = sum(lote.numero_aves_actual for lote in lotes if lote.estado == 'postura')
+        aves_engorde = sum(lote.numero_aves_actual for lote in lotes if lote.estado == 'levante')
+
+        serie_diaria = self.obtener_serie_diaria(lotes_query, hace_30_dias, hoy)
+
+        def total_serie(campo, desde):
+            return sum(
+                fila[campo] or 0 for fecha, fila in serie_diaria.items() if fecha >= desde
+            )
+
+        def valor_dia(campo, fecha):
+            fila = serie_diaria.get(fecha)
+            return (fila[campo] or 0) if fila else 0
+
+        # INDICADORES PONEDORAS
+        produccion_hoy = valor_dia('produccion', hoy)
+        produccion_7d = total_serie('produccion', hace_7_dias)
+        produccion_30d = total_serie('produccion', hace_30_dias)
+
+        porcentaje_postura_hoy = (produccion_hoy / aves_ponedoras * 100) if aves_ponedoras > 0 else 0
+        porcentaje_postura_7d = (produccion_7d / (aves_ponedoras * 7) * 100) if aves_ponedoras > 0 else 0
+        porcentaje_postura_30d = (produccion_30d / (aves_ponedoras * 30) * 100) if aves_ponedoras > 0 else 0
+
+        # Producción ideal vs real (asumiendo 85% como ideal)
+        produccion_ideal_hoy = aves_ponedoras * 0.85
+        produccion_ideal_7d = aves_ponedoras * 0.85 * 7
+        produccion_ideal_30d = aves_ponedoras * 0.85 * 30
+        diferencia_ideal_hoy = produccion_hoy - produccion_ideal_hoy
+        diferencia_ideal_7d = produccion_7d - produccion_ideal_7d
+        diferencia_ideal_30d = produccion_30d - produccion_ideal_30d
+
+        # INDICADORES ENGORDE
+        consumo_total_hoy = valor_dia('consumo', hoy)
+        consumo_total_7d = total_serie('consumo', hace_7_dias)
+        consumo_total_30d = total_serie('consumo', hace_30_dias)
+        consumo_por_ave_hoy = (consumo_total_hoy / aves_engorde) if aves_engorde > 0 else 0
+        consumo_promedio_7d = (consumo_total_7d / (aves_engorde * 7)) if aves_engorde > 0 else 0
+        consumo_promedio_30d = (consumo_total_30d / (aves_engorde * 30)) if aves_engorde > 0 else 0
+
+        # MORTALIDAD
+        mortalidad_hoy = valor_dia('mortalidad', hoy)
+        mortalidad_30d = total_serie('mortalidad', hace_30_dias)
+        porcentaje_mortalidad_hoy = (mortalidad_hoy / total_aves * 100) if total_aves > 0 else 0
+        porcentaje_mortalidad_30d = (mortalidad_30d / total_aves * 100) if total_aves > 0 else 0
+
+        # GRÁFICOS DE TENDENCIA (últimos 30 días)
+        evolucion_produccion = []
+        evolucion_mortalidad = []
+        for i in range(self.DIAS_TENDENCIA):
+            fecha = hoy - timedelta(days=self.DIAS_TENDENCIA - 1 - i)
+            prod_dia = valor_dia('produccion', fecha)
+            evolucion_produccion.append({
+                'fecha': fecha.strftime('%d/%m'),
+                'produccion': prod_dia,
+                'porcentaje': (prod_dia / aves_ponedoras * 100) if aves_ponedoras > 0 else 0
+            })
+            evolucion_mortalidad.append({
+                'fecha': fecha.strftime('%d/%m'),
+                'mortalidad': valor_dia('mortalidad', fecha)
+            })
+
+        # COMPARACIÓN ENTRE GALPONES Y TOP LOTES (últimos 30 días)
+        totales_lote = self.obtener_totales_por_lote(lotes_query, hace_30_dias, hoy)
+        galpones = {}
+        for lote in lotes:
+            totales = totales_lote.get(lote.id, {})
+            galpon = galpones.setdefault(lote.galpon, {'aves': 0, 'produccion': 0, 'mortalidad': 0})
+            galpon['aves'] += lote.numero_aves_actual
+            galpon['produccion'] += totales.get('produccion_periodo') or 0
+            galpon['mortalidad'] += totales.get('mortalidad_periodo') or 0
+
+        comparacion_galpones = []
+        for nombre, datos in galpones.items():
+            aves_galpon = datos['aves']
+            comparacion_galpones.append({
+                'galpon': nombre,
+                'aves': aves_galpon,
+                'produccion_30d': datos['produccion'],
+                'mortalidad_30d': datos['mortalidad'],
+                'porcentaje_postura': (datos['produccion'] / (aves_galpon * 30) * 100) if aves_galpon > 0 else 0,
+                'porcentaje_mortalidad': (datos['mortalidad'] / aves_galpon * 100) if aves_galpon > 0 else 0
+            })
+
+        top_lotes = []
+        for lote in lotes[:5]:
+            produccion_lote = totales_lote.get(lote.id, {}).get('produccion_abierta') or 0
+            top_lotes.append({
+                'lote': lote,
+                'edad_dias': lote.edad_dias,
+                'porcentaje_postura': (produccion_lote / (lote.numero_aves_actual * 30) * 100) if lote.numero_aves_actual > 0 else 0,
+                'produccion_30d': produccion_lote
+            })
+        top_lotes.sort(key=lambda x: x['porcentaje_postura'], reverse=True)
+
+        # ALERTAS Y NOTIFICACIONES
+        alertas_criticas = self.obtener_alertas_del_dia(lotes_query)
+
+        vacunas_pendientes = PlanVacunacion.objects.filter(
+            aplicada=False,
+            fecha_programada__lte=hoy + timedelta(days=3)
+        ).count()
+
+        return {
+            # Estadísticas generales
+            'total_lotes': total_lotes,
+            'total_aves': total_aves,
+            'aves_ponedoras': aves_ponedoras,
+            'aves_engorde': aves_engorde,
+
+            # Indicadores ponedoras
+            'produccion_hoy': produccion_hoy,
+            'produccion_7d': produccion_7d,
+            'produccion_30d': produccion_30d,
+            'porcentaje_postura_hoy': round(porcentaje_postura_hoy, 1),
+            'porcentaje_postura_7d': round(porcentaje_postura_7d, 1),
+            'porcentaje_postura_30d': round(porcentaje_postura_30d, 1),
+            'produccion_ideal_hoy': round(produccion_ideal_hoy),
+            'diferencia_ideal_hoy': round(diferencia_ideal_hoy),
+            'diferencia_ideal_7d': round(diferencia_ideal_7d),
+            'diferencia_ideal_30d': round(diferencia_ideal_30d),
+
+            # Indicadores engorde
+            'consumo_total_hoy': round(consumo_total_hoy, 1),
+            'consumo_por_ave_hoy': round(consumo_por_ave_hoy * 1000),  # En gramos
+            'consumo_promedio_7d': round(consumo_promedio_7d * 1000),  # En gramos
+            'consumo_promedio_30d': round(consumo_promedio_30d * 1000),  # En gramos
+
+            # Mortalidad
+            'mortalidad_hoy': mortalidad_hoy,
+            'mortalidad_30d': mortalidad_30d,
+            'porcentaje_mortalidad_hoy': round(porcentaje_mortalidad_hoy, 2),
+            'porcentaje_mortalidad_30d': round(porcentaje_mortalidad_30d, 2),
+
+            # Gráficos
+            'evolucion_produccion': evolucion_produccion,
+            'evolucion_mortalidad': evolucion_mortalidad,
+            'comparacion_galpones': comparacion_galpones,
+
+            # Alertas
+            'alertas_criticas': alertas_criticas,
+            'vacunas_pendientes': vacunas_pendientes,
+
+            # Otros datos
+            'inventario_huevos': self.obtener_inventario_huevos(),
+            'top_lotes': top_lotes[:5],
+
+            # Para filtros
+            'galpones_disponibles': list(galpones),
+            'lotes_disponibles': [{'id': lote.id, 'codigo': lote.codigo} for lote in lotes],
+            'galpon_filtro': self.galpon_filtro,
+            'lote_filtro': self.lote_filtro,
+
+            # JSON para gráficos
+            'evolucion_produccion_json': json.dumps(evolucion_produccion),
+            'evolucion_mortalidad_json': json.dumps(evolucion_mortalidad),
+            'comparacion_galpones_json': json.dumps(comparacion_galpones),
+        }
+
+    def obtener_alertas_del_dia(self, lotes_query):
+        """
+        Alertas del encabezado: las generadas hoy por el motor de reglas
+        (alertas.py) para los lotes filtrados y las generales, sin leer.
+        """
+        alertas = AlertaSistema.objects.filter(
+            Q(lote__in=lotes_query) | Q(lote__isnull=True),
+            is_active=True, leida=False, fecha_alerta=self.hoy,
+        ).order_by('nivel', 'tipo_alerta')
+        return [
+            {'tipo': alerta.color_clase, 'mensaje': f'{alerta.titulo}: {alerta.mensaje}', 'icono': alerta.icono}
+            for alerta in alertas.only('tipo_alerta', 'nivel', 'titulo', 'mensaje')
+        ]
@@ -0,0 +1,136 @@
+"""
+Efectos secundarios diferidos de las señales del módulo avícola.
+
+Las señales solo encolan el efecto con transaction.on_commit, de modo que
+la petición que guarda una bitácora o un movimiento cubre únicamente la
+inserción de la fila. Al confirmarse la transacción el evento se combina
+en una cola del proceso con los demás eventos pendientes de la misma
+clave (mortalidad por lote, entradas de inventario, alertas por lote) y
+un pool pequeño de hilos aplica cada grupo de una vez. Con
+AVES_EFECTOS_BACKEND = 'celery' el grupo combinado se envía a un worker
+de Celery; con 'sincrono' se aplica en el mismo hilo al confirmar.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .alertas import evaluar_lote
+from .importacion import ajustar_aves_lotes
+from .utils import sumar_stock_entradas
+
+logger = logging.getLogger(__name__)
+
+try:
+    import celery  # noqa: F401
+    CELERY_AVAILABLE = True
+except ImportError:
+    CELERY_AVAILABLE = False
+
+
+# Tipos de efecto: la clave agrupa los eventos que se combinan entre sí
+INVENTARIO = 'inventario'  # clave: None; datos: lista de entradas de kardex
+AVES_LOTE = 'aves_lote'    # clave: id del lote; datos: mortalidad neta
+ALERTAS = 'alertas'        # clave: id del lote; datos: fechas ISO de bitácoras
+
+_pendientes = {}
+_candado = threading.Lock()
+_pool = None
+
+
+def _combinar(tipo, actuales, nuevos):
+    if tipo == ALERTAS:
+        return actuales + [fecha for fecha in nuevos if fecha not in actuales]
+    return actuales + nuevos
+
+
+def _backend():
+    backend = getattr(settings, 'AVES_EFECTOS_BACKEND', 'hilos')
+    if backend == 'celery' and not CELERY_AVAILABLE:
+        logger.warning('Celery no está instalado; los efectos diferidos se aplican en hilos')
+        return 'hilos'
+    return backend
+
+
+def _obtener_pool():
+    global _pool
+    with _candado:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'AVES_EFECTOS_HILOS', 2),
+                thread_name_prefix='aves-efectos',
+            )
+        return _pool
+
+
+def encolar_efecto(tipo, clave, datos):
+    """
+    Encola un efecto para cuando se confirme la transacción actual. Si la
+    transacción se revierte el efecto se descarta. `datos` debe poder
+    serializarse como JSON (para Celery).
+    """
+    transaction.on_commit(lambda: _al_confirmar(tipo, clave, datos))
+
+
+def _al_confirmar(tipo, clave, datos):
+    if _backend() == 'sincrono':
+        ejecutar_efecto(tipo, clave, datos)
+        return
+
+    with _candado:
+        nuevo = (tipo, clave) not in _pendientes
+        if nuevo:
+            _pendientes[(tipo, clave)] = datos
+        else:
+            _pendientes[(tipo, clave)] = _combinar(tipo, _pendientes[(tipo, clave)], datos)
+    # Si ya había un grupo pendiente para la clave, el evento viaja con él
+    if nuevo:
+        _obtener_pool().submit(_despachar, tipo, clave)
+
+
+def _despachar(tipo, clave):
+    with _candado:
+        datos = _pendientes.pop((tipo, clave))
+
+    if _backend() == 'celery':
+        from .tasks import ejecutar_efecto_task
+        try:
+            ejecutar_efecto_task.delay(tipo, clave, datos)
+            return
+        except Exception:
+            logger.exception('No se pudo enviar el efecto %s a Celery; se aplica localmente', tipo)
+
+    close_old_connections()
+    try:
+        ejecutar_efecto(tipo, clave, datos)
+    finally:
+        close_old_connections()
+
+
+def ejecutar_efecto(tipo, clave, datos):
+    """Aplica un grupo de eventos ya combinado. Los errores se registran en el log."""
+    try:
+        if tipo == INVENTARIO:
+            sumar_stock_entradas(datos)
+        elif tipo == AVES_LOTE:
+            if datos:
+                ajustar_aves_lotes({clave: datos})
+        elif tipo == ALERTAS:
+            evaluar_lote(clave, [date.fromisoformat(fecha) for fecha in datos])
+        else:
+            raise ValueError(f'Tipo de efecto desconocido: {tipo}')
+    except Exception:
+        logger.exception('Error aplicando el efecto diferido %s (clave=%s, datos=%r)', tipo, clave, datos)
+
+
+def esperar_efectos():
+    """Espera a que el pool termine los efectos encolados (pruebas y comandos)."""
+    global _pool
+    with _candado:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True)
@@ -0,0 +1,142 @@
+"""
+Escritura de Excel en modo write_only de openpyxl.
+
+Un Workbook normal guarda cada celda en memoria y los reportes recorrían
+después todas las celdas para ajustar el ancho de las columnas. Aquí las
+filas se escriben directo al archivo a medida que llegan, los estilos se
+declaran una vez como NamedStyle y los anchos automáticos se calculan en
+una pasada previa sobre un archivo temporal, así que la memoria y el
+tiempo crecen linealmente con el número de filas.
+
+Limitaciones del modo write_only: las filas se escriben en orden y no se
+pueden volver a leer, y los anchos de columna y los altos de fila deben
+fijarse antes de escribir la fila correspondiente.
+"""
+
+import pickle
+import tempfile
+from copy import copy
+
+from django.http import FileResponse
+
+try:
+    import openpyxl
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.cell.cell import Cell
+    from openpyxl.styles import NamedStyle, Alignment, PatternFill, Border, Side
+    from openpyxl.styles.fonts import DEFAULT_FONT
+    from openpyxl.utils import get_column_letter
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+
+ANCHO_MAXIMO = 50
+TIPO_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def estilo(nombre, font=None, fill=None, border=None, alignment=None):
+    """NamedStyle con los atributos dados; los omitidos quedan como en una celda sin formato."""
+    return NamedStyle(
+        name=nombre,
+        font=font or copy(DEFAULT_FONT),
+        fill=fill or PatternFill(),
+        border=border or Border(),
+        alignment=alignment or Alignment(),
+    )
+
+
+def relleno(color):
+    return PatternFill(start_color=color, end_color=color, fill_type='solid')
+
+
+def borde(grosor):
+    lado = Side(style=grosor)
+    return Border(left=lado, right=lado, top=lado, bottom=lado)
+
+
+class LibroStreaming:
+    """Workbook write_only con los estilos con nombre registrados de antemano."""
+
+    def __init__(self, estilos=()):
+        if not OPENPYXL_AVAILABLE:
+            raise ImportError("openpyxl no está disponible")
+        self.libro = openpyxl.Workbook(write_only=True)
+        # Copias: un NamedStyle queda ligado al libro que lo registra
+        for nuevo in estilos:
+            self.libro.add_named_style(copy(nuevo))
+
+    def hoja(self, titulo):
+        return HojaStreaming(self.libro.create_sheet(titulo))
+
+    def respuesta(self, nombre_archivo):
+        """Guarda el libro en un archivo temporal y lo envía por bloques con FileResponse."""
+        archivo = tempfile.TemporaryFile()
+        self.libro.save(archivo)
+        archivo.seek(0)
+        return FileResponse(archivo, as_attachment=True, filename=nombre_archivo, content_type=TIPO_XLSX)
+
+
+class HojaStreaming:
+    """Hoja write_only que lleva la cuenta de la fila actual."""
+
+    def __init__(self, hoja):
+        self.hoja = hoja
+        self.filas = 0
+
+    def celda(self, valor=None, estilo=None):
+        celda = WriteOnlyCell(self.hoja, value=valor)
+        if estilo:
+            celda.style = estilo
+        return celda
+
+    def fila(self, valores=(), estilo=None, alto=None):
+        """
+        Escribe la siguiente fila. Con `estilo`, los valores que no sean ya
+        celdas lo reciben. Retorna el número de la fila escrita.
+        """
+        self.filas += 1
+        if alto:
+            self.hoja.row_dimensions[self.filas].height = alto
+        if estilo:
+            valores = [valor if isinstance(valor, Cell) else self.celda(valor, estilo) for valor in valores]
+        self.hoja.append(list(valores))
+        return self.filas
+
+    def combinar(self, rango):
+        self.hoja.merged_cells.add(rango)
+
+    def anchos(self, anchos):
+        """Fija el ancho de las columnas ({'A': 12, ...}); debe llamarse antes de la primera fila."""
+        if self.filas:
+            raise ValueError('Los anchos de columna se fijan antes de escribir filas')
+        for letra, ancho in anchos.items():
+            self.hoja.column_dimensions[letra].width = ancho
+
+    def tabla(self, encabezados, filas, estilo_encabezado=None):
+        """
+        Escribe una tabla con el ancho de cada columna ajustado al valor más
+        largo (máximo ANCHO_MAXIMO). Las filas se vuelcan primero a un
+        archivo temporal mientras se miden, y luego se escriben desde ahí.
+        """
+        largos = [len(str(encabezado)) for encabezado in encabezados]
+        with tempfile.TemporaryFile() as temporal:
+            for fila in filas:
+                for indice, valor in enumerate(fila):
+                    largo = len(str(valor)) if valor is not None else 0
+                    if indice >= len(largos):
+                        largos.append(largo)
+                    elif largo > largos[indice]:
+                        largos[indice] = largo
+                pickle.dump(fila, temporal, pickle.HIGHEST_PROTOCOL)
+
+            self.anchos({
+                get_column_letter(indice): min(largo + 2, ANCHO_MAXIMO)
+                for indice, largo in enumerate(largos, start=1)
+            })
+            self.fila(encabezados, estilo=estilo_encabezado)
+            temporal.seek(0)
+            while True:
+                try:
+                    self.fila(pickle.load(temporal))
+                except EOFError:
+                    break
@@ -0,0 +1,137 @@
+"""
+Exportaciones CSV en streaming.
+
+Los reportes con años de bitácoras no caben cómodos en memoria si se
+arman completos con HttpResponse. respuesta_csv recibe secciones cuyas
+filas son iteradores (normalmente filas_por_bloques), las convierte a
+CSV fila por fila y las envía en bloques de ~64 KB con
+StreamingHttpResponse. Con comprimir=True los bloques salen en gzip.
+
+Con mysqlclient, iterator() no abre un cursor de servidor: el driver
+descarga el resultado completo antes de entregar la primera fila.
+filas_por_bloques pagina por clave (las filas que siguen a la última
+leída, con LIMIT), así que cada consulta trae como mucho
+FILAS_POR_CONSULTA filas y la memoria del proceso no depende del
+número de filas.
+"""
+
+import csv
+import zlib
+
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+
+TAMANO_BLOQUE = 64 * 1024
+FILAS_POR_CONSULTA = 2000
+
+
+def filas_por_bloques(queryset, *campos, tamano=FILAS_POR_CONSULTA):
+    """
+    Filas values_list(*campos) del queryset, leídas en páginas de `tamano`
+    filas por paginación por clave. Se respeta el orden del queryset (o el
+    del modelo), completado con 'pk' para desempatar; los campos de orden
+    no pueden ser nulos.
+    """
+    orden = [
+        campo for campo in (queryset.query.order_by or queryset.model._meta.ordering)
+        if campo.lstrip('-') not in ('pk', 'id')
+    ] + ['pk']
+    claves = [campo.lstrip('-') for campo in orden]
+    # Las claves que no están entre los campos se piden al final de cada fila
+    extra = [clave for clave in claves if clave not in campos]
+    columnas = list(campos) + extra
+    posiciones = [columnas.index(clave) for clave in claves]
+    paginas = queryset.order_by(*orden).values_list(*columnas)
+
+    siguientes = Q()
+    while True:
+        pagina = list(paginas.filter(siguientes)[:tamano])
+        for fila in pagina:
+            yield fila[:len(campos)] if extra else fila
+        if len(pagina) < tamano:
+            return
+        ultima = pagina[-1]
+        siguientes = _despues_de(orden, [ultima[posicion] for posicion in posiciones])
+
+
+def _despues_de(orden, valores):
+    """Condición de las filas que van después de `valores` en el orden `orden`."""
+    condicion, iguales = Q(), Q()
+    for campo, valor in zip(orden, valores):
+        nombre = campo.lstrip('-')
+        operador = 'lt' if campo.startswith('-') else 'gt'
+        condicion |= iguales & Q(**{f'{nombre}__{operador}': valor})
+        iguales &= Q(**{nombre: valor})
+    return condicion
+
+
+class Eco:
+    """Pseudo-archivo para csv.writer: write() devuelve la línea en vez de guardarla."""
+
+    def write(self, valor):
+        return valor
+
+
+class Seccion:
+    """Bloque del CSV: un título opcional ('=== LOTES ==='), los encabezados y un iterable de filas."""
+
+    def __init__(self, encabezados, filas, titulo=None):
+        self.encabezados = encabezados
+        self.filas = filas
+        self.titulo = titulo
+
+
+def lineas_csv(secciones):
+    """Genera las líneas CSV de todas las secciones, una fila a la vez."""
+    escritor = csv.writer(Eco())
+    for indice, seccion in enumerate(secciones):
+        if indice:
+            yield escritor.writerow([])
+        if seccion.titulo:
+            yield escritor.writerow([seccion.titulo])
+        yield escritor.writerow(seccion.encabezados)
+        for fila in seccion.filas:
+            yield escritor.writerow(fila)
+
+
+def bloques(lineas, tamano=TAMANO_BLOQUE):
+    """Agrupa las líneas en bloques UTF-8 de ~`tamano` bytes para no enviar una escritura por fila."""
+    pendiente, acumulado = [], 0
+    for linea in lineas:
+        pendiente.append(linea)
+        acumulado += len(linea)
+        if acumulado >= tamano:
+            yield ''.join(pendiente).encode('utf-8')
+            pendiente, acumulado = [], 0
+    if pendiente:
+        yield ''.join(pendiente).encode('utf-8')
+
+
+def comprimir_gzip(datos):
+    """Comprime un flujo de bloques en formato gzip sin acumularlo."""
+    compresor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for bloque in datos:
+        comprimido = compresor.compress(bloque)
+        if comprimido:
+            yield comprimido
+    yield compresor.flush()
+
+
+def respuesta_csv(nombre_archivo, secciones, comprimir=False):
+    """
+    StreamingHttpResponse con el CSV de `secciones`. Con `comprimir` se
+    descarga como <nombre_archivo>.gz.
+    """
+    contenido = bloques(lineas_csv(secciones))
+    if comprimir:
+        response = StreamingHttpResponse(comprimir_gzip(contenido), content_type='application/gzip')
+        nombre_archivo = f'{nombre_archivo}.gz'
+    else:
+        response = StreamingHttpResponse(contenido, content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{nombre_archivo}"'
+    return response
+
+
+def pedir_gzip(request):
+    """True si la petición pide la exportación comprimida (?gzip=1)."""
+    return request.GET.get('gzip') in ('1', 'true')
@@ -0,0 +1,313 @@
+"""
+Importación masiva de bitácoras diarias desde CSV o Excel.
+
+El archivo completo se valida en memoria (lotes y bitácoras existentes se
+consultan una sola vez). Si no hay errores, las bitácoras se insertan con
+bulk_create en una transacción y los efectos secundarios que normalmente
+ejecuta BitacoraDiaria.save() y sus señales se aplican una sola vez por
+lote de importación: aves vivas por lote, resumen diario, inventario y
+kardex, alertas e invalidación de caché.
+"""
+
+import csv
+import io
+import unicodedata
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+try:
+    import openpyxl
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+
+from apps.core.cache import invalidar_dominio, DOMINIO_PRODUCCION, DOMINIO_LOTES, DOMINIO_AVES_POSTURA
+from .models import LoteAves, BitacoraDiaria
+from .resumenes import reconstruir_resumenes_lote
+from .utils import sumar_stock, descontar_stock, generar_alertas_bitacoras
+
+
+CAMPOS_ENTEROS = [
+    'recoleccion_1', 'recoleccion_2', 'recoleccion_3', 'huevos_rotos',
+    'produccion_aaa', 'produccion_aa', 'produccion_a', 'produccion_b', 'produccion_c',
+    'mortalidad', 'semana_vida',
+]
+CAMPOS_TEXTO = ['causa_mortalidad', 'observaciones']
+
+# Encabezados aceptados (normalizados) y el campo al que corresponden
+ALIAS_COLUMNAS = {
+    'lote': 'lote',
+    'codigo_lote': 'lote',
+    'codigo': 'lote',
+    'fecha': 'fecha',
+    'consumo_concentrado': 'consumo_concentrado',
+    'consumo': 'consumo_concentrado',
+    'aaa': 'produccion_aaa',
+    'aa': 'produccion_aa',
+    'a': 'produccion_a',
+    'b': 'produccion_b',
+    'c': 'produccion_c',
+    **{campo: campo for campo in CAMPOS_ENTEROS + CAMPOS_TEXTO},
+}
+
+FORMATOS_FECHA = ['%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y']
+
+TAMANO_LOTE_INSERCION = 1000
+
+
+def _normalizar_encabezado(encabezado):
+    """'Producción AAA ' -> 'produccion_aaa'."""
+    texto = unicodedata.normalize('NFKD', str(encabezado or '')).encode('ascii', 'ignore').decode()
+    return '_'.join(texto.strip().lower().split())
+
+
+def _mapear_encabezados(encabezados):
+    return [ALIAS_COLUMNAS.get(_normalizar_encabezado(encabezado)) for encabezado in encabezados]
+
+
+def leer_archivo(archivo, nombre=None):
+    """
+    Lee un CSV o XLSX y retorna una lista de (número de fila, {campo: valor}).
+    El Excel se abre en modo read_only para recorrerlo sin cargarlo entero.
+    """
+    nombre = (nombre or getattr(archivo, 'name', '') or '').lower()
+
+    if nombre.endswith(('.xlsx', '.xlsm')):
+        if not OPENPYXL_AVAILABLE:
+            raise ValidationError('openpyxl no está disponible para leer archivos Excel')
+        libro = openpyxl.load_workbook(archivo, read_only=True, data_only=True)
+        try:
+            filas = libro.active.iter_rows(values_only=True)
+            campos = _mapear_encabezados(next(filas, []))
+            resultado = [
+                (numero, {campo: valor for campo, valor in zip(campos, fila) if campo})
+                for numero, fila in enumerate(filas, start=2)
+                if any(valor not in (None, '') for valor in fila)
+            ]
+        finally:
+            libro.close()
+        return resultado
+
+    if nombre.endswith('.csv') or not nombre:
+        contenido = archivo.read()
+        if isinstance(contenido, bytes):
+            contenido = contenido.decode('utf-8-sig')
+        muestra = contenido[:2048]
+        try:
+            dialecto = csv.Sniffer().sniff(muestra, delimiters=',;\t')
+        except csv.Error:
+            dialecto = csv.excel
+        lector = csv.reader(io.StringIO(contenido), dialecto)
+        campos = _mapear_encabezados(next(lector, []))
+        return [
+            (numero, {campo: valor for campo, valor in zip(campos, fila) if campo})
+            for numero, fila in enumerate(lector, start=2)
+            if any(valor.strip() for valor in fila)
+        ]
+
+    raise ValidationError('Formato no soportado. Use un archivo .csv o .xlsx')
+
+
+def _convertir_fecha(valor):
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    texto = str(valor or '').strip()
+    for formato in FORMATOS_FECHA:
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            continue
+    raise ValueError(f'fecha inválida "{texto}" (use AAAA-MM-DD o DD/MM/AAAA)')
+
+
+def _convertir_entero(campo, valor):
+    if valor in (None, ''):
+        return None if campo == 'semana_vida' else 0
+    try:
+        numero = Decimal(str(valor).strip())
+    except InvalidOperation:
+        raise ValueError(f'{campo} debe ser un número entero')
+    if numero != numero.to_integral_value() or numero < 0:
+        raise ValueError(f'{campo} debe ser un entero mayor o igual a cero')
+    return int(numero)
+
+
+def _convertir_decimal(campo, valor):
+    if valor in (None, ''):
+        return Decimal('0')
+    try:
+        numero = Decimal(str(valor).strip().replace(',', '.')).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise ValueError(f'{campo} debe ser un número')
+    if numero < 0:
+        raise ValueError(f'{campo} no puede ser negativo')
+    return numero
+
+
+def construir_bitacora(datos, lotes, usuario, bitacora=None):
+    """
+    Convierte un registro ({campo: valor}) en una bitácora validada sin
+    guardarla. Si se pasa `bitacora` se sobrescriben sus valores (upsert).
+    Lanza ValueError o ValidationError con el motivo del rechazo.
+    """
+    codigo = str(datos.get('lote') or '').strip()
+    if not codigo:
+        raise ValueError('falta el código del lote')
+    lote = lotes.get(codigo)
+    if lote is None:
+        raise ValueError(f'el lote "{codigo}" no existe')
+
+    if bitacora is None:
+        bitacora = BitacoraDiaria(lote=lote, usuario_registro=usuario)
+    bitacora.fecha = _convertir_fecha(datos.get('fecha'))
+    bitacora.consumo_concentrado = _convertir_decimal('consumo_concentrado', datos.get('consumo_concentrado'))
+    for campo in CAMPOS_ENTEROS:
+        setattr(bitacora, campo, _convertir_entero(campo, datos.get(campo)))
+    for campo in CAMPOS_TEXTO:
+        setattr(bitacora, campo, str(datos.get(campo) or '').strip())
+
+    if not bitacora.semana_vida:
+        dias_vida = (bitacora.fecha - lote.fecha_llegada).days
+        bitacora.semana_vida = max(1, round(dias_vida / 7))
+
+    bitacora.clean()
+    return bitacora
+
+
+def cargar_lotes(registros):
+    """Lotes referenciados por código en los registros, con una sola consulta."""
+    codigos = {str(datos.get('lote') or '').strip() for datos in registros}
+    return {lote.codigo: lote for lote in LoteAves.objects.filter(codigo__in=codigos)}
+
+
+def validar_filas(filas, usuario):
+    """
+    Valida todas las filas en memoria y construye las bitácoras sin guardarlas.
+    Retorna (bitacoras, errores), donde errores es una lista de textos por fila.
+    """
+    errores = []
+    lotes = cargar_lotes(datos for _, datos in filas)
+
+    bitacoras = []
+    vistos = {}
+    for numero, datos in filas:
+        try:
+            bitacora = construir_bitacora(datos, lotes, usuario)
+
+            clave = (bitacora.lote_id, bitacora.fecha)
+            if clave in vistos:
+                raise ValueError(f'repite lote y fecha de la fila {vistos[clave]}')
+            vistos[clave] = numero
+            bitacoras.append(bitacora)
+        except ValidationError as e:
+            errores.append(f'Fila {numero}: {" ".join(e.messages)}')
+        except ValueError as e:
+            errores.append(f'Fila {numero}: {e}')
+
+    if bitacoras:
+        # Bitácoras ya registradas: una sola consulta para todo el archivo
+        fechas = [bitacora.fecha for bitacora in bitacoras]
+        existentes = set(
+            BitacoraDiaria.objects.filter(
+                lote_id__in={bitacora.lote_id for bitacora in bitacoras},
+                fecha__range=(min(fechas), max(fechas)),
+            ).values_list('lote_id', 'fecha')
+        )
+        for (lote_id, fecha), numero in vistos.items():
+            if (lote_id, fecha) in existentes:
+                errores.append(f'Fila {numero}: ya existe una bitácora para ese lote el {fecha:%d/%m/%Y}')
+
+    return bitacoras, errores
+
+
+def ajustar_aves_lotes(mortalidad_por_lote):
+    """
+    Aplica la mortalidad de cada lote en una sola sentencia, sin bajar de
+    cero. Una mortalidad negativa (corrección a la baja) devuelve aves.
+    """
+    casos = []
+    for lote_id, mortalidad in mortalidad_por_lote.items():
+        if mortalidad > 0:
+            casos.append(When(id=lote_id, numero_aves_actual__gt=mortalidad, then=F('numero_aves_actual') - mortalidad))
+            casos.append(When(id=lote_id, then=Value(0)))
+        else:
+            casos.append(When(id=lote_id, then=F('numero_aves_actual') - mortalidad))
+    LoteAves.objects.filter(id__in=mortalidad_por_lote).update(
+        numero_aves_actual=Case(*casos, default=F('numero_aves_actual'), output_field=IntegerField()),
+        updated_at=timezone.now(),
+    )
+    invalidar_dominio(DOMINIO_AVES_POSTURA)
+    invalidar_dominio(DOMINIO_LOTES)
+
+
+def produccion_por_categoria(bitacora):
+    """Producción de la bitácora por categoría de huevo."""
+    return {
+        'AAA': bitacora.produccion_aaa,
+        'AA': bitacora.produccion_aa,
+        'A': bitacora.produccion_a,
+        'B': bitacora.produccion_b,
+        'C': bitacora.produccion_c,
+    }
+
+
+def aplicar_efectos(bitacoras, usuario, mortalidad_por_lote, produccion, observaciones):
+    """
+    Efectos secundarios de un grupo de bitácoras, una vez por grupo:
+    `mortalidad_por_lote` y `produccion` son los cambios netos a aplicar.
+    Si una categoría no tiene stock para una corrección a la baja se lanza
+    ValidationError y la transacción se revierte.
+    """
+    mortalidad_por_lote = {lote_id: total for lote_id, total in mortalidad_por_lote.items() if total}
+    if mortalidad_por_lote:
+        ajustar_aves_lotes(mortalidad_por_lote)
+
+    for lote_id in {bitacora.lote_id for bitacora in bitacoras}:
+        reconstruir_resumenes_lote(lote_id)
+
+    kardex = {'origen': 'bitacora', 'usuario_id': usuario.id, 'observaciones': observaciones}
+    sumar_stock({categoria: n for categoria, n in produccion.items() if n > 0}, **kardex)
+    for categoria, cantidad in produccion.items():
+        if cantidad < 0 and not descontar_stock(categoria, -cantidad, **kardex):
+            raise ValidationError(f'Stock insuficiente de {categoria} para corregir la producción')
+
+    generar_alertas_bitacoras(bitacoras)
+    invalidar_dominio(DOMINIO_PRODUCCION)
+
+
+def importar_bitacoras(archivo, usuario, nombre=None, dry_run=False):
+    """
+    Importa un archivo de bitácoras. Todo o nada: si alguna fila tiene
+    errores no se guarda ninguna. Retorna {'creadas', 'errores', 'filas'}.
+    """
+    filas = leer_archivo(archivo, nombre)
+    bitacoras, errores = validar_filas(filas, usuario)
+    resultado = {'filas': len(filas), 'creadas': 0, 'errores': errores}
+
+    if errores or dry_run or not bitacoras:
+        return resultado
+
+    mortalidad_por_lote = defaultdict(int)
+    produccion = defaultdict(int)
+    for bitacora in bitacoras:
+        mortalidad_por_lote[bitacora.lote_id] += bitacora.mortalidad
+        for categoria, cantidad in produccion_por_categoria(bitacora).items():
+            produccion[categoria] += cantidad
+
+    with transaction.atomic():
+        BitacoraDiaria.objects.bulk_create(bitacoras, batch_size=TAMANO_LOTE_INSERCION)
+        aplicar_efectos(
+            bitacoras, usuario, mortalidad_por_lote, produccion,
+            observaciones=f'Importación de {len(bitacoras)} bitácoras'
+        )
+
+    resultado['creadas'] = len(bitacoras)
+    return resultado
@@ -0,0 +1,152 @@
+"""
+Kardex de huevos: registro de solo inserción de los cambios de stock.
+
+Cada UPDATE sobre InventarioHuevos.cantidad_actual se acompaña, en la
+misma transacción, de una fila en KardexHuevos con el delta y su origen.
+Los saldos de cierre diarios (SaldoDiarioHuevos) permiten obtener el
+saldo a cualquier fecha con un saldo de cierre más un rango acotado del
+kardex, y verificar que el stock actual coincide con el registro.
+"""
+
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from .models import InventarioHuevos, KardexHuevos, MovimientoHuevos, SaldoDiarioHuevos
+
+
+CATEGORIAS = [codigo for codigo, _ in MovimientoHuevos.CATEGORIAS_HUEVO]
+
+
+def registrar_kardex(cantidades, origen, referencia_id=None, fecha_origen=None,
+                     usuario_id=None, observaciones=''):
+    """Inserta una fila por categoría con su delta ({'AAA': 10, 'B': -5})."""
+    KardexHuevos.objects.bulk_create([
+        KardexHuevos(
+            categoria=categoria,
+            cantidad=cantidad,
+            origen=origen,
+            referencia_id=referencia_id,
+            fecha_origen=fecha_origen,
+            usuario_id=usuario_id,
+            observaciones=observaciones[:255],
+        )
+        for categoria, cantidad in cantidades.items() if cantidad
+    ])
+
+
+def registrar_entradas(entradas):
+    """
+    Inserta una fila por entrada ya combinada. Cada entrada es un
+    diccionario con categoria, cantidad, origen y, opcionalmente,
+    referencia_id, fecha_origen, usuario_id y observaciones.
+    """
+    KardexHuevos.objects.bulk_create([
+        KardexHuevos(
+            categoria=entrada['categoria'],
+            cantidad=entrada['cantidad'],
+            origen=entrada['origen'],
+            referencia_id=entrada.get('referencia_id'),
+            fecha_origen=entrada.get('fecha_origen'),
+            usuario_id=entrada.get('usuario_id'),
+            observaciones=(entrada.get('observaciones') or '')[:255],
+        )
+        for entrada in entradas if entrada['cantidad']
+    ])
+
+
+def _ultimo_cierre(fecha):
+    """Último día cerrado hasta `fecha` y sus saldos por categoría."""
+    fecha_cierre = SaldoDiarioHuevos.objects.filter(fecha__lte=fecha).order_by('-fecha').values_list(
+        'fecha', flat=True
+    ).first()
+    if not fecha_cierre:
+        return None, {}
+    return fecha_cierre, dict(
+        SaldoDiarioHuevos.objects.filter(fecha=fecha_cierre).values_list('categoria', 'saldo')
+    )
+
+
+def saldos_a_fecha(fecha=None):
+    """
+    Saldo por categoría al cierre de `fecha` (hoy por defecto): el último
+    saldo de cierre más la suma del kardex posterior hasta la fecha.
+    """
+    fecha = fecha or timezone.localdate()
+    fecha_cierre, saldos = _ultimo_cierre(fecha)
+
+    kardex = KardexHuevos.objects.filter(fecha__lte=fecha)
+    if fecha_cierre:
+        kardex = kardex.filter(fecha__gt=fecha_cierre)
+    deltas = dict(
+        kardex.order_by().values('categoria').annotate(total=Sum('cantidad'))
+        .values_list('categoria', 'total')
+    )
+    return {
+        categoria: saldos.get(categoria, 0) + (deltas.get(categoria) or 0)
+        for categoria in CATEGORIAS
+    }
+
+
+def saldo_a_fecha(categoria, fecha=None):
+    """Saldo de una categoría al cierre de `fecha`."""
+    return saldos_a_fecha(fecha)[categoria]
+
+
+def verificar_inventario():
+    """
+    Compara el stock de InventarioHuevos con el saldo del kardex.
+    Retorna {categoria: (cantidad_actual, saldo_kardex)} solo para las diferencias.
+    """
+    saldos = saldos_a_fecha()
+    actuales = dict(InventarioHuevos.objects.values_list('categoria', 'cantidad_actual'))
+    return {
+        categoria: (actuales.get(categoria, 0), saldo)
+        for categoria, saldo in saldos.items()
+        if actuales.get(categoria, 0) != saldo
+    }
+
+
+def generar_saldos_diarios(hasta=None):
+    """
+    Genera los saldos de cierre faltantes hasta `hasta` (ayer por defecto),
+    continuando desde el último saldo guardado. Retorna las filas creadas.
+    """
+    hasta = hasta or timezone.localdate() - timedelta(days=1)
+    ultimo = SaldoDiarioHuevos.objects.order_by('-fecha').values_list('fecha', flat=True).first()
+    if ultimo:
+        desde = ultimo + timedelta(days=1)
+    else:
+        desde = KardexHuevos.objects.order_by('fecha').values_list('fecha', flat=True).first()
+    if not desde or desde > hasta:
+        return 0
+
+    saldos = {categoria: 0 for categoria in CATEGORIAS}
+    saldos.update(_ultimo_cierre(ultimo)[1] if ultimo else {})
+
+    movimientos = {}
+    for categoria, fecha, entradas, salidas in (
+        KardexHuevos.objects.filter(fecha__gte=desde, fecha__lte=hasta).order_by()
+        .values('categoria', 'fecha')
+        .annotate(entradas=Sum('cantidad', filter=Q(cantidad__gt=0)), salidas=Sum('cantidad', filter=Q(cantidad__lt=0)))
+        .values_list('categoria', 'fecha', 'entradas', 'salidas')
+    ):
+        movimientos[(categoria, fecha)] = (entradas or 0, -(salidas or 0))
+
+    filas = []
+    fecha = desde
+    while fecha <= hasta:
+        for categoria in CATEGORIAS:
+            entradas, salidas = movimientos.get((categoria, fecha), (0, 0))
+            saldos[categoria] += entradas - salidas
+            filas.append(SaldoDiarioHuevos(
+                categoria=categoria, fecha=fecha, entradas=entradas, salidas=salidas,
+                saldo=saldos[categoria]
+            ))
+        fecha += timedelta(days=1)
+
+    with transaction.atomic():
+        SaldoDiarioHuevos.objects.bulk_create(filas, batch_size=1000, ignore_conflicts=True)
+    return len(filas)
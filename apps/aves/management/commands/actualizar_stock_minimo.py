@@ -5,7 +5,9 @@ basándose en la cantidad total de gallinas.
 
 from django.core.management.base import BaseCommand
 from django.db.models import Sum
+from django.utils import timezone
 from apps.aves.models import InventarioHuevos, LoteAves
+from apps.core.cache import invalidar_dominio, DOMINIO_INVENTARIO
 
 
 class Command(BaseCommand):
@@ -51,11 +53,11 @@ class Command(BaseCommand):
         if not options['force']:
             inventarios = inventarios.filter(stock_automatico=True)
         
-        actualizados = 0
+        cambiados = []
         
         for inventario in inventarios:
             stock_anterior = inventario.cantidad_minima
-            nuevo_stock = inventario.calcular_stock_minimo_automatico()
+            nuevo_stock = inventario.calcular_stock_minimo_automatico(total_gallinas)
             
             if stock_anterior != nuevo_stock:
                 self.stdout.write(
@@ -63,13 +65,20 @@ class Command(BaseCommand):
                     f'({"+" if nuevo_stock > stock_anterior else ""}{nuevo_stock - stock_anterior})'
                 )
                 
-                if not options['dry_run']:
-                    inventario.cantidad_minima = nuevo_stock
-                    inventario.save(update_fields=['cantidad_minima', 'fecha_ultima_actualizacion'])
-                    actualizados += 1
+                inventario.cantidad_minima = nuevo_stock
+                inventario.fecha_ultima_actualizacion = timezone.now()
+                cambiados.append(inventario)
             else:
                 self.stdout.write(f'✅ {inventario.categoria}: Sin cambios ({stock_anterior})')
         
+        actualizados = 0
+        if cambiados and not options['dry_run']:
+            # Todas las categorías en una sola sentencia
+            actualizados = InventarioHuevos.objects.bulk_update(
+                cambiados, ['cantidad_minima', 'fecha_ultima_actualizacion']
+            )
+            invalidar_dominio(DOMINIO_INVENTARIO)
+        
         if options['dry_run']:
             self.stdout.write(self.style.WARNING('🔍 Modo dry-run: No se aplicaron cambios'))
         else:
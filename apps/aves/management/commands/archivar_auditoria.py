@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from apps.aves.auditoria import archivar_registros
+from apps.aves.models import RegistroModificacion
+
+
+def restar_meses(fecha, meses):
+    """Misma hora y día `meses` atrás (el día se ajusta al último del mes si hace falta)."""
+    mes = fecha.month - 1 - meses
+    anio = fecha.year + mes // 12
+    mes = mes % 12 + 1
+    for dia in (fecha.day, 30, 29, 28):
+        try:
+            return fecha.replace(year=anio, month=mes, day=dia)
+        except ValueError:
+            continue
+
+
+class Command(BaseCommand):
+    help = 'Archiva los registros de auditoría antiguos en la tabla comprimida'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--meses',
+            type=int,
+            default=12,
+            help='Archivar los registros con más de N meses de antigüedad (por defecto 12)',
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=1000,
+            help='Registros movidos por transacción (por defecto 1000)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Muestra cuántos registros se archivarían sin moverlos',
+        )
+
+    def handle(self, *args, **options):
+        if options['meses'] < 1 or options['lote'] < 1:
+            raise CommandError('--meses y --lote deben ser mayores que cero.')
+
+        antes_de = restar_meses(timezone.now(), options['meses'])
+        self.stdout.write(f'🗄️ Archivando auditoría anterior al {antes_de:%d/%m/%Y}...\n')
+
+        if options['dry_run']:
+            pendientes = RegistroModificacion.objects.filter(fecha_modificacion__lt=antes_de).count()
+            self.stdout.write(
+                self.style.WARNING(f'🔍 MODO DRY-RUN: se archivarían {pendientes} registros')
+            )
+            return
+
+        archivados = archivar_registros(antes_de, tamano_lote=options['lote'])
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ Registros archivados: {archivados}')
+        )
@@ -0,0 +1,105 @@
+import resource
+import sys
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from apps.aves.models import LoteAves, BitacoraDiaria
+from apps.aves.reports import ReporteAvicola
+from apps.aves.resumenes import anotar_aves_inicio_dia
+from apps.aves.views_reports import generar_csv_mortalidad
+
+DIAS_POR_LOTE = 1000
+BITACORAS_POR_INSERT = 5000
+
+
+def pico_rss_mb():
+    """Pico de memoria residente del proceso (ru_maxrss: KB en Linux, bytes en macOS)."""
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / 1024 / 1024 if sys.platform == 'darwin' else pico / 1024
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide el pico de memoria (RSS) de las exportaciones CSV de producción y mortalidad '
+        'sobre N bitácoras de prueba; los datos se revierten al terminar'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, default=200_000, help='Bitácoras a generar (por defecto 200.000)')
+        parser.add_argument('--gzip', action='store_true', help='Exportar comprimido con gzip')
+        parser.add_argument(
+            '--comparar', action='store_true',
+            help='Medir además las bitácoras cargadas completas en memoria, como la exportación anterior',
+        )
+
+    def handle(self, *args, **options):
+        if options['filas'] <= 0:
+            raise CommandError('--filas debe ser mayor que cero.')
+        usuario = User.objects.filter(is_superuser=True).order_by('id').first()
+        if usuario is None:
+            raise CommandError('Se necesita un superusuario para registrar las bitácoras de prueba.')
+
+        filas = options['filas']
+        with transaction.atomic():
+            self.stdout.write(f'🔄 Generando {filas:,} bitácoras de prueba...')
+            lotes = self._sembrar(filas, usuario)
+            self.stdout.write(f'📊 Pico RSS tras generar los datos: {pico_rss_mb():,.1f} MB\n')
+
+            # El pico RSS solo crece: las mediciones van de la que menos memoria usa a la que más
+            bitacoras = BitacoraDiaria.objects.filter(lote__in=lotes)
+            self._medir('CSV producción', lambda: self._consumir(
+                ReporteAvicola().generar_csv_produccion(comprimir=options['gzip'])
+            ))
+            self._medir('CSV mortalidad', lambda: self._consumir(
+                generar_csv_mortalidad(anotar_aves_inicio_dia(bitacoras), comprimir=options['gzip'])
+            ))
+            if options['comparar']:
+                self._medir('Bitácoras en memoria', lambda: len(list(bitacoras.select_related('lote'))))
+
+            transaction.set_rollback(True)
+
+    def _sembrar(self, filas, usuario):
+        """Lotes de DIAS_POR_LOTE días con sus bitácoras, insertadas por bloques sin señales."""
+        inicio = date(2000, 1, 1)
+        lotes = []
+        pendientes = []
+        for i in range(filas):
+            dia = i % DIAS_POR_LOTE
+            if dia == 0:
+                lotes.append(LoteAves.objects.create(
+                    codigo=f'BENCH-{len(lotes):05d}', galpon=f'Galpón {len(lotes) % 8}',
+                    linea_genetica='lohmann_brown', procedencia='Benchmark',
+                    numero_aves_inicial=10000, numero_aves_actual=10000, fecha_llegada=inicio,
+                    peso_total_llegada=Decimal('400.00'), peso_promedio_llegada=Decimal('40.00'),
+                    estado='postura',
+                ))
+            pendientes.append(BitacoraDiaria(
+                lote=lotes[-1], fecha=inicio + timedelta(days=dia), recoleccion_1=750,
+                produccion_aaa=300, produccion_aa=250, produccion_a=150, produccion_b=40, produccion_c=10,
+                mortalidad=i % 5, causa_mortalidad='Calor', consumo_concentrado=Decimal('112.50'),
+                observaciones='Sin novedad', usuario_registro=usuario,
+            ))
+            if len(pendientes) == BITACORAS_POR_INSERT:
+                BitacoraDiaria.objects.bulk_create(pendientes)
+                pendientes = []
+        BitacoraDiaria.objects.bulk_create(pendientes)
+        return lotes
+
+    def _consumir(self, respuesta):
+        """Recorre la respuesta en streaming como lo haría el servidor y cuenta los bytes."""
+        return sum(len(bloque) for bloque in respuesta.streaming_content)
+
+    def _medir(self, nombre, funcion):
+        antes = pico_rss_mb()
+        inicio = time.perf_counter()
+        resultado = funcion()
+        segundos = time.perf_counter() - inicio
+        despues = pico_rss_mb()
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {nombre}: {resultado:,} en {segundos:.1f} s, '
+            f'pico RSS {despues:,.1f} MB (+{despues - antes:,.1f} MB)'
+        ))
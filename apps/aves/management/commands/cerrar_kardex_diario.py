@@ -0,0 +1,40 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from apps.aves.kardex import generar_saldos_diarios, verificar_inventario
+
+
+class Command(BaseCommand):
+    help = 'Genera los saldos de cierre diarios del kardex de huevos y verifica el inventario'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hasta',
+            type=str,
+            help='Último día a cerrar en formato YYYY-MM-DD (por defecto ayer)',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('🔄 Cerrando saldos diarios del kardex...\n')
+
+        hasta = None
+        if options['hasta']:
+            try:
+                hasta = datetime.strptime(options['hasta'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('Formato de fecha inválido. Use YYYY-MM-DD.')
+
+        filas = generar_saldos_diarios(hasta)
+        self.stdout.write(f'📊 Saldos de cierre generados: {filas}')
+
+        diferencias = verificar_inventario()
+        if diferencias:
+            for categoria, (actual, saldo) in diferencias.items():
+                self.stdout.write(
+                    self.style.WARNING(
+                        f'⚠️ Categoría {categoria}: inventario {actual} ≠ kardex {saldo}'
+                    )
+                )
+            self.stdout.write('Ejecute sincronizar_inventario para corregir las diferencias.')
+        else:
+            self.stdout.write(self.style.SUCCESS('✅ El inventario coincide con el kardex'))
@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from apps.aves.alertas import mantenimiento_alertas
+
+
+class Command(BaseCommand):
+    help = 'Compacta las alertas leídas repetidas y elimina las leídas o resueltas antiguas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--compactar',
+            type=int,
+            default=getattr(settings, 'AVES_ALERTAS_COMPACTAR_DIAS', 7),
+            help='Compactar alertas con más de N días (por defecto AVES_ALERTAS_COMPACTAR_DIAS)',
+        )
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=getattr(settings, 'AVES_ALERTAS_RETENCION_DIAS', 90),
+            help='Eliminar alertas leídas o resueltas con más de N días (por defecto AVES_ALERTAS_RETENCION_DIAS)',
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=1000,
+            help='Alertas eliminadas por sentencia (por defecto 1000)',
+        )
+
+    def handle(self, *args, **options):
+        if options['compactar'] < 0 or options['dias'] < 1 or options['lote'] < 1:
+            raise CommandError('--compactar no puede ser negativo y --dias y --lote deben ser mayores que cero.')
+
+        self.stdout.write('🧹 Depurando alertas del sistema...\n')
+        compactadas, eliminadas = mantenimiento_alertas(
+            options['compactar'], options['dias'], tamano_lote=options['lote']
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ Alertas compactadas: {compactadas} | Alertas eliminadas: {eliminadas}')
+        )
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from apps.aves.alertas import barrido_alertas
+
+
+class Command(BaseCommand):
+    help = 'Evalúa las reglas de alertas para todos los lotes activos, el inventario de huevos y las vacunas pendientes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=1,
+            help='Días anteriores a hoy que se reevalúan (por defecto 1)',
+        )
+
+    def handle(self, *args, **options):
+        if options['dias'] < 0:
+            raise CommandError('--dias no puede ser negativo.')
+
+        self.stdout.write(f'🚨 Evaluando reglas de alertas de los últimos {options["dias"]} días...\n')
+        nuevas = barrido_alertas(dias=options['dias'])
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ Alertas nuevas: {nuevas} (las ya existentes del mismo día se omiten)')
+        )
@@ -0,0 +1,67 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from apps.aves.models import LoteAves
+from apps.aves.reports import generar_reportes_sena
+from apps.aves.sena import leer_periodo
+
+
+class Command(BaseCommand):
+    help = 'Genera los registros mensuales SENA de todos los lotes activos en un ZIP o en un Excel de varias hojas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--periodo',
+            action='append',
+            help='Mes a generar en formato YYYY-MM; se puede repetir (por defecto el mes anterior)',
+        )
+        parser.add_argument('--galpon', type=str, help='Solo los lotes de este galpón')
+        parser.add_argument('--lote', action='append', help='Código de lote; se puede repetir')
+        parser.add_argument(
+            '--formato', choices=['zip', 'libro'], default='zip',
+            help='zip: un Excel por lote-mes; libro: un Excel con una hoja por lote-mes',
+        )
+        parser.add_argument('--procesos', type=int, help='Procesos para escribir los libros (por defecto AVES_SENA_PROCESOS)')
+        parser.add_argument('--salida', type=str, help='Archivo de salida (por defecto el nombre sugerido en la carpeta actual)')
+        parser.add_argument('--granja', type=str, default='Granja Avícola La Salada', help='Nombre de la granja')
+        parser.add_argument('--registro-ica', type=str, default='051290274', help='Registro ICA de la granja')
+
+    def handle(self, *args, **options):
+        try:
+            if options['periodo']:
+                periodos = [leer_periodo(periodo) for periodo in options['periodo']]
+            else:
+                anterior = date.today().replace(day=1) - timedelta(days=1)
+                periodos = [(anterior.month, anterior.year)]
+        except ValueError:
+            raise CommandError('Formato de periodo inválido. Use YYYY-MM.')
+        if options['procesos'] is not None and options['procesos'] < 1:
+            raise CommandError('--procesos debe ser mayor que cero.')
+
+        lotes = LoteAves.objects.filter(is_active=True).order_by('galpon', 'codigo')
+        if options['galpon']:
+            lotes = lotes.filter(galpon=options['galpon'])
+        if options['lote']:
+            lotes = lotes.filter(codigo__in=options['lote'])
+
+        self.stdout.write(
+            f'📊 Generando registros SENA de {lotes.count()} lotes para '
+            f'{", ".join(f"{mes:02d}/{año}" for mes, año in periodos)}...\n'
+        )
+        inicio = time.perf_counter()
+        try:
+            respuesta = generar_reportes_sena(
+                lotes, periodos, options['granja'], options['registro_ica'],
+                formato=options['formato'], procesos=options['procesos'],
+            )
+        except (ImportError, ValueError) as e:
+            raise CommandError(str(e))
+
+        salida = options['salida'] or respuesta.filename
+        with open(salida, 'wb') as archivo:
+            for bloque in respuesta.streaming_content:
+                archivo.write(bloque)
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {salida} generado en {time.perf_counter() - inicio:.1f} s'
+        ))
@@ -0,0 +1,59 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from apps.aves.importacion import importar_bitacoras
+
+
+class Command(BaseCommand):
+    help = 'Importa bitácoras diarias desde un archivo CSV o Excel (.xlsx) en una sola transacción'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', type=str, help='Ruta del archivo .csv o .xlsx')
+        parser.add_argument(
+            '--usuario',
+            type=str,
+            required=True,
+            help='Nombre de usuario que queda como responsable del registro',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo valida el archivo, sin guardar cambios',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            usuario = User.objects.get(username=options['usuario'])
+        except User.DoesNotExist:
+            raise CommandError(f'No existe el usuario "{options["usuario"]}"')
+
+        self.stdout.write(f'📂 Importando {options["archivo"]}...')
+        inicio = time.monotonic()
+        try:
+            with open(options['archivo'], 'rb') as archivo:
+                resultado = importar_bitacoras(
+                    archivo, usuario, nombre=options['archivo'], dry_run=options['dry_run']
+                )
+        except OSError as e:
+            raise CommandError(f'No se pudo abrir el archivo: {e}')
+        except ValidationError as e:
+            raise CommandError(' '.join(e.messages))
+
+        self.stdout.write(f'📊 Filas leídas: {resultado["filas"]}')
+
+        if resultado['errores']:
+            for error in resultado['errores']:
+                self.stdout.write(self.style.ERROR(f'❌ {error}'))
+            raise CommandError(f'{len(resultado["errores"])} errores: no se importó ninguna bitácora')
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('🔍 MODO DRY-RUN: el archivo es válido, no se guardaron cambios'))
+            return
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'✅ {resultado["creadas"]} bitácoras importadas en {time.monotonic() - inicio:.1f} s'
+            )
+        )
@@ -0,0 +1,68 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from apps.aves.models import LoteAves
+from apps.aves.resumenes import reconstruir_resumenes_lote
+
+
+def procesar_bloque(lotes_ids):
+    """Reconstruye el resumen de un bloque de lotes con su propia conexión."""
+    try:
+        return sum(reconstruir_resumenes_lote(lote_id) for lote_id in lotes_ids)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el resumen diario de producción a partir de las bitácoras, en bloques paralelos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            help='ID del lote a reconstruir (por defecto todos)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Número de hilos en paralelo (1 = sin paralelismo)',
+        )
+        parser.add_argument(
+            '--bloque',
+            type=int,
+            default=10,
+            help='Cantidad de lotes por bloque',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('🔄 Reconstruyendo resumen diario de producción...\n')
+
+        lotes = LoteAves.objects.order_by('id')
+        if options['lote']:
+            lotes = lotes.filter(id=options['lote'])
+        lotes_ids = list(lotes.values_list('id', flat=True))
+
+        if not lotes_ids:
+            self.stdout.write(self.style.WARNING('❌ No hay lotes para procesar.'))
+            return
+
+        tamano = max(1, options['bloque'])
+        bloques = [lotes_ids[i:i + tamano] for i in range(0, len(lotes_ids), tamano)]
+        self.stdout.write(f'📊 Lotes: {len(lotes_ids)} en {len(bloques)} bloques')
+
+        total_filas = 0
+        if options['workers'] <= 1:
+            for bloque in bloques:
+                total_filas += sum(reconstruir_resumenes_lote(lote_id) for lote_id in bloque)
+        else:
+            with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+                futuros = [executor.submit(procesar_bloque, bloque) for bloque in bloques]
+                for futuro in as_completed(futuros):
+                    total_filas += futuro.result()
+                    self.stdout.write(f'✅ Bloque completado ({total_filas} filas acumuladas)')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ Resumen reconstruido: {total_filas} días registrados')
+        )
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.30 on 2026-10-16 23:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aves', '0008_alter_loteaves_linea_genetica_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenProduccionDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('galpon', models.CharField(max_length=100, verbose_name='Galpón')),
+                ('produccion_total', models.PositiveIntegerField(default=0, verbose_name='Producción total')),
+                ('produccion_aaa', models.PositiveIntegerField(default=0, verbose_name='Producción AAA')),
+                ('produccion_aa', models.PositiveIntegerField(default=0, verbose_name='Producción AA')),
+                ('produccion_a', models.PositiveIntegerField(default=0, verbose_name='Producción A')),
+                ('produccion_b', models.PositiveIntegerField(default=0, verbose_name='Producción B')),
+                ('produccion_c', models.PositiveIntegerField(default=0, verbose_name='Producción C')),
+                ('mortalidad', models.PositiveIntegerField(default=0, verbose_name='Mortalidad')),
+                ('consumo_concentrado', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Consumo concentrado (kg)')),
+                ('aves_inicio_dia', models.IntegerField(default=0, verbose_name='Aves vivas al inicio del día')),
+                ('bitacora', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='resumen', to='aves.bitacoradiaria', verbose_name='Bitácora')),
+                ('lote', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_diarios', to='aves.loteaves', verbose_name='Lote')),
+            ],
+            options={
+                'verbose_name': 'Resumen de Producción Diaria',
+                'verbose_name_plural': 'Resúmenes de Producción Diaria',
+                'ordering': ['-fecha'],
+                'indexes': [models.Index(fields=['fecha', 'galpon'], name='aves_resumen_fecha_galpon_idx')],
+                'unique_together': {('lote', 'fecha')},
+            },
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def registrar_saldo_inicial(apps, schema_editor):
+    """Abre el kardex con el stock actual de cada categoría."""
+    InventarioHuevos = apps.get_model('aves', 'InventarioHuevos')
+    KardexHuevos = apps.get_model('aves', 'KardexHuevos')
+    KardexHuevos.objects.bulk_create([
+        KardexHuevos(
+            categoria=inventario.categoria,
+            cantidad=inventario.cantidad_actual,
+            origen='ajuste',
+            observaciones='Saldo inicial',
+        )
+        for inventario in InventarioHuevos.objects.exclude(cantidad_actual=0)
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('aves', '0009_resumenproducciondiaria'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoDiarioHuevos',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('categoria', models.CharField(choices=[('AAA', 'AAA'), ('AA', 'AA'), ('A', 'A'), ('B', 'B'), ('C', 'C')], max_length=3, verbose_name='Categoría')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('entradas', models.PositiveIntegerField(default=0, verbose_name='Entradas')),
+                ('salidas', models.PositiveIntegerField(default=0, verbose_name='Salidas')),
+                ('saldo', models.IntegerField(verbose_name='Saldo al cierre')),
+            ],
+            options={
+                'verbose_name': 'Saldo Diario de Huevos',
+                'verbose_name_plural': 'Saldos Diarios de Huevos',
+                'ordering': ['-fecha', 'categoria'],
+                'unique_together': {('categoria', 'fecha')},
+            },
+        ),
+        migrations.CreateModel(
+            name='KardexHuevos',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('categoria', models.CharField(choices=[('AAA', 'AAA'), ('AA', 'AA'), ('A', 'A'), ('B', 'B'), ('C', 'C')], max_length=3, verbose_name='Categoría')),
+                ('cantidad', models.IntegerField(help_text='Positiva para entradas, negativa para salidas', verbose_name='Cantidad')),
+                ('fecha', models.DateField(default=django.utils.timezone.localdate, verbose_name='Fecha')),
+                ('fecha_registro', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de registro')),
+                ('origen', models.CharField(choices=[('bitacora', 'Bitácora diaria'), ('movimiento', 'Movimiento de huevos'), ('pedido', 'Pedido punto blanco'), ('ajuste', 'Ajuste manual')], max_length=15, verbose_name='Origen')),
+                ('referencia_id', models.PositiveIntegerField(blank=True, null=True, verbose_name='ID de referencia')),
+                ('fecha_origen', models.DateField(blank=True, null=True, verbose_name='Fecha del documento de origen')),
+                ('observaciones', models.CharField(blank=True, max_length=255, verbose_name='Observaciones')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Kardex de Huevos',
+                'verbose_name_plural': 'Kardex de Huevos',
+                'ordering': ['-fecha_registro'],
+                'indexes': [models.Index(fields=['categoria', 'fecha'], name='aves_kardex_cat_fecha_idx'), models.Index(fields=['origen', 'referencia_id'], name='aves_kardex_origen_ref_idx')],
+            },
+        ),
+        migrations.RunPython(registrar_saldo_inicial, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:09
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('aves', '0010_kardexhuevos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SincronizacionBitacora',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=64, unique=True, verbose_name='Clave de idempotencia')),
+                ('huella', models.CharField(max_length=40, verbose_name='Huella del contenido')),
+                ('estado', models.CharField(choices=[('creada', 'Creada'), ('actualizada', 'Actualizada'), ('sin_cambios', 'Sin cambios')], max_length=15, verbose_name='Estado')),
+                ('fecha_registro', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de registro')),
+                ('bitacora', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sincronizaciones', to='aves.bitacoradiaria', verbose_name='Bitácora')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Sincronización de Bitácora',
+                'verbose_name_plural': 'Sincronizaciones de Bitácoras',
+                'ordering': ['-fecha_registro'],
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:18
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('aves', '0011_sincronizacionbitacora'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistroModificacionArchivado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('registro_id', models.PositiveBigIntegerField(unique=True, verbose_name='ID original')),
+                ('modelo', models.CharField(max_length=100, verbose_name='Modelo')),
+                ('objeto_id', models.PositiveIntegerField(verbose_name='ID del objeto')),
+                ('accion', models.CharField(max_length=20, verbose_name='Acción')),
+                ('cambios', models.BinaryField(verbose_name='Cambios (JSON comprimido)')),
+                ('justificacion', models.TextField(blank=True, verbose_name='Justificación')),
+                ('fecha_modificacion', models.DateTimeField(verbose_name='Fecha de modificación')),
+            ],
+            options={
+                'verbose_name': 'Registro de Modificación Archivado',
+                'verbose_name_plural': 'Registros de Modificaciones Archivados',
+                'ordering': ['-fecha_modificacion'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='registromodificacion',
+            index=models.Index(fields=['modelo', 'objeto_id', 'fecha_modificacion'], name='aves_regmod_objeto_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registromodificacion',
+            index=models.Index(fields=['fecha_modificacion'], name='aves_regmod_fecha_idx'),
+        ),
+        migrations.AddField(
+            model_name='registromodificacionarchivado',
+            name='usuario',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='registromodificacionarchivado',
+            index=models.Index(fields=['modelo', 'objeto_id', 'fecha_modificacion'], name='aves_regarch_objeto_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registromodificacionarchivado',
+            index=models.Index(fields=['fecha_modificacion'], name='aves_regarch_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aves', '0012_registromodificacion_archivo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alertasistema',
+            name='fecha_alerta',
+            field=models.DateField(blank=True, help_text='Día de los datos que dispararon la alerta (alertas automáticas)', null=True, verbose_name='Día de la alerta'),
+        ),
+        migrations.AlterField(
+            model_name='alertasistema',
+            name='tipo_alerta',
+            field=models.CharField(choices=[('stock_bajo', 'Stock Bajo'), ('mortalidad_alta', 'Mortalidad Alta'), ('vacuna_pendiente', 'Vacuna Pendiente'), ('produccion_baja', 'Producción Baja'), ('consumo_anormal', 'Consumo Anormal')], max_length=30, verbose_name='Tipo de alerta'),
+        ),
+        migrations.AddConstraint(
+            model_name='alertasistema',
+            constraint=models.UniqueConstraint(fields=('tipo_alerta', 'lote', 'fecha_alerta'), name='aves_alerta_unica_lote_dia'),
+        ),
+        migrations.AddConstraint(
+            model_name='alertasistema',
+            constraint=models.UniqueConstraint(condition=models.Q(('lote__isnull', True)), fields=('tipo_alerta', 'fecha_alerta'), name='aves_alerta_unica_general_dia'),
+        ),
+    ]
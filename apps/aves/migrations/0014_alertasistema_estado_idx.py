@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aves', '0013_alertasistema_fecha_alerta'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='alertasistema',
+            index=models.Index(fields=['is_active', 'leida', 'nivel'], name='aves_alerta_estado_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aves', '0014_alertasistema_estado_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alertasistema',
+            name='ocurrencias',
+            field=models.PositiveIntegerField(default=1, verbose_name='Ocurrencias'),
+        ),
+        migrations.AddField(
+            model_name='alertasistema',
+            name='primera_vez',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Primera vez'),
+        ),
+        migrations.AddField(
+            model_name='alertasistema',
+            name='ultima_vez',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Última vez'),
+        ),
+    ]
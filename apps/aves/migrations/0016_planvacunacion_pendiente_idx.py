@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aves', '0015_alertasistema_ocurrencias'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='planvacunacion',
+            index=models.Index(fields=['aplicada', 'fecha_programada'], name='aves_plan_pendiente_idx'),
+        ),
+    ]
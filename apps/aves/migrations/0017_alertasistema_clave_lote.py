@@ -0,0 +1,40 @@
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def rellenar_clave_lote(apps, schema_editor):
+    AlertaSistema = apps.get_model('aves', 'AlertaSistema')
+    AlertaSistema.objects.filter(lote__isnull=False).update(clave_lote=models.F('lote_id'))
+
+    # En MySQL la restricción condicional no existía: deja una alerta general por tipo y día
+    generales = AlertaSistema.objects.filter(lote__isnull=True, fecha_alerta__isnull=False)
+    conservar = generales.order_by().values('tipo_alerta', 'fecha_alerta').annotate(primera=Min('id')).values_list('primera', flat=True)
+    generales.exclude(id__in=list(conservar)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aves', '0016_planvacunacion_pendiente_idx'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='alertasistema',
+            name='aves_alerta_unica_general_dia',
+        ),
+        migrations.RemoveConstraint(
+            model_name='alertasistema',
+            name='aves_alerta_unica_lote_dia',
+        ),
+        migrations.AddField(
+            model_name='alertasistema',
+            name='clave_lote',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Clave de lote'),
+        ),
+        migrations.RunPython(rellenar_clave_lote, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='alertasistema',
+            constraint=models.UniqueConstraint(fields=('tipo_alerta', 'clave_lote', 'fecha_alerta'), name='aves_alerta_unica_dia'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+from django.db import migrations
+
+CAMPOS_PRODUCCION = ['produccion_aaa', 'produccion_aa', 'produccion_a', 'produccion_b', 'produccion_c']
+
+
+def rellenar_resumen(apps, schema_editor):
+    """
+    Genera el resumen diario de los lotes con bitácoras sin resumen (las
+    registradas antes de 0009). Misma lógica que reconstruir_resumenes_lote,
+    con los modelos históricos.
+    """
+    LoteAves = apps.get_model('aves', 'LoteAves')
+    BitacoraDiaria = apps.get_model('aves', 'BitacoraDiaria')
+    ResumenProduccionDiaria = apps.get_model('aves', 'ResumenProduccionDiaria')
+
+    lotes_ids = set(
+        BitacoraDiaria.objects.exclude(
+            id__in=ResumenProduccionDiaria.objects.values('bitacora_id')
+        ).values_list('lote_id', flat=True)
+    )
+    for lote in LoteAves.objects.filter(id__in=lotes_ids).only('id', 'galpon', 'numero_aves_inicial'):
+        bitacoras = BitacoraDiaria.objects.filter(lote_id=lote.id).only(
+            'id', 'fecha', 'mortalidad', 'consumo_concentrado', *CAMPOS_PRODUCCION
+        ).order_by('fecha')
+
+        resumenes = []
+        aves_vivas = lote.numero_aves_inicial
+        for bitacora in bitacoras:
+            produccion = {campo: getattr(bitacora, campo) for campo in CAMPOS_PRODUCCION}
+            resumenes.append(ResumenProduccionDiaria(
+                bitacora_id=bitacora.id,
+                lote_id=lote.id,
+                fecha=bitacora.fecha,
+                galpon=lote.galpon,
+                produccion_total=sum(produccion.values()),
+                mortalidad=bitacora.mortalidad,
+                consumo_concentrado=bitacora.consumo_concentrado or 0,
+                aves_inicio_dia=aves_vivas,
+                **produccion
+            ))
+            aves_vivas -= bitacora.mortalidad
+
+        ResumenProduccionDiaria.objects.filter(lote_id=lote.id).delete()
+        ResumenProduccionDiaria.objects.bulk_create(resumenes, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aves', '0017_alertasistema_clave_lote'),
+    ]
+
+    operations = [
+        migrations.RunPython(rellenar_resumen, migrations.RunPython.noop),
+    ]
@@ -3,12 +3,15 @@ Modelos para el módulo avícola de AgroSmart.
 Sistema integral de gestión de gallinas ponedoras.
 """
 
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 from decimal import Decimal
+import json
+import zlib
 from apps.core.models import BaseModel
+from apps.core.cache import obtener_o_calcular, invalidar_dominio, DOMINIO_AVES_POSTURA, DOMINIO_INVENTARIO
 
 
 class LoteAves(BaseModel):
@@ -53,6 +56,9 @@ class LoteAves(BaseModel):
         ('engorde', 'Engorde'),
     ], default='ponedoras')
     
+    # Campos que determinan el total de gallinas en postura (stock mínimo automático)
+    CAMPOS_TOTAL_POSTURA = ('numero_aves_actual', 'estado', 'is_active')
+    
     class Meta:
         verbose_name = 'Lote de Aves'
         verbose_name_plural = 'Lotes de Aves'
@@ -61,6 +67,29 @@ class LoteAves(BaseModel):
     def __str__(self):
         return f"{self.codigo} - {self.galpon}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        cargados = dict(zip(field_names, values))
+        instance._valores_postura = {
+            campo: cargados[campo] for campo in cls.CAMPOS_TOTAL_POSTURA if campo in cargados
+        }
+        return instance
+    
+    def cambio_total_postura(self):
+        """Indica si desde que se cargó cambió algún campo que afecta al total de gallinas en postura."""
+        originales = getattr(self, '_valores_postura', None)
+        if originales is None:
+            return True
+        return any(
+            originales[campo] != getattr(self, campo)
+            for campo in self.CAMPOS_TOTAL_POSTURA if campo in originales
+        )
+    
+    def marcar_total_postura_guardado(self):
+        """Toma los valores actuales como referencia para el próximo guardado."""
+        self._valores_postura = {campo: getattr(self, campo) for campo in self.CAMPOS_TOTAL_POSTURA}
+    
     @property
     def edad_dias(self):
         """Calcula la edad del lote en días."""
@@ -131,6 +160,20 @@ class BitacoraDiaria(BaseModel):
     def __str__(self):
         return f"{self.lote.codigo} - {self.fecha}"
     
+    # Mortalidad ya descontada y lote del que se descontó; una bitácora nueva
+    # aún no descontó nada
+    mortalidad_aplicada = 0
+    lote_aplicado_id = None
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'mortalidad' in field_names:
+            instance.mortalidad_aplicada = values[field_names.index('mortalidad')]
+        if 'lote_id' in field_names:
+            instance.lote_aplicado_id = values[field_names.index('lote_id')]
+        return instance
+    
     @property
     def total_recolecciones(self):
         """Calcula el total de huevos recolectados en todas las recolecciones."""
@@ -143,9 +186,16 @@ class BitacoraDiaria(BaseModel):
     
     @property
     def porcentaje_postura(self):
-        """Calcula el porcentaje de postura del lote."""
-        if self.lote.numero_aves_actual > 0:
-            return round((self.produccion_total / self.lote.numero_aves_actual) * 100, 2)
+        """
+        Calcula el porcentaje de postura sobre las aves vivas al inicio del
+        día si la bitácora viene anotada con resumenes.anotar_aves_inicio_dia;
+        si no, sobre las aves actuales del lote (sin consultas adicionales).
+        """
+        aves = getattr(self, 'aves_inicio_dia', None)
+        if aves is None:
+            aves = self.lote.numero_aves_actual
+        if aves > 0:
+            return round((self.produccion_total / aves) * 100, 2)
         return 0
     
     @property
@@ -189,12 +239,82 @@ class BitacoraDiaria(BaseModel):
         # Ejecutar validaciones personalizadas
         self.clean()
         
-        super().save(*args, **kwargs)
-        
-        # Actualizar número de aves actual del lote si hay mortalidad
-        if self.mortalidad > 0:
-            self.lote.numero_aves_actual = max(0, self.lote.numero_aves_actual - self.mortalidad)
-            self.lote.save()
+        # El resumen diario se actualiza en post_save dentro de esta misma transacción;
+        # la mortalidad se descuenta del lote al confirmar (ver signals.py)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+class ResumenProduccionDiaria(models.Model):
+    """
+    Resumen diario de producción por lote, mantenido incrementalmente
+    desde la bitácora diaria para que reportes y dashboards no recorran
+    las columnas de la bitácora.
+    """
+    bitacora = models.OneToOneField(BitacoraDiaria, on_delete=models.CASCADE, related_name='resumen', verbose_name='Bitácora')
+    lote = models.ForeignKey(LoteAves, on_delete=models.CASCADE, related_name='resumenes_diarios', verbose_name='Lote')
+    fecha = models.DateField('Fecha')
+    galpon = models.CharField('Galpón', max_length=100)
+    
+    produccion_total = models.PositiveIntegerField('Producción total', default=0)
+    produccion_aaa = models.PositiveIntegerField('Producción AAA', default=0)
+    produccion_aa = models.PositiveIntegerField('Producción AA', default=0)
+    produccion_a = models.PositiveIntegerField('Producción A', default=0)
+    produccion_b = models.PositiveIntegerField('Producción B', default=0)
+    produccion_c = models.PositiveIntegerField('Producción C', default=0)
+    mortalidad = models.PositiveIntegerField('Mortalidad', default=0)
+    consumo_concentrado = models.DecimalField('Consumo concentrado (kg)', max_digits=10, decimal_places=2, default=0)
+    aves_inicio_dia = models.IntegerField('Aves vivas al inicio del día', default=0)
+    
+    class Meta:
+        verbose_name = 'Resumen de Producción Diaria'
+        verbose_name_plural = 'Resúmenes de Producción Diaria'
+        unique_together = ['lote', 'fecha']
+        ordering = ['-fecha']
+        indexes = [
+            models.Index(fields=['fecha', 'galpon'], name='aves_resumen_fecha_galpon_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Resumen {self.lote_id} - {self.fecha}"
+    
+    @property
+    def porcentaje_postura(self):
+        """Porcentaje de postura sobre las aves vivas al inicio del día."""
+        if self.aves_inicio_dia > 0:
+            return round((self.produccion_total / self.aves_inicio_dia) * 100, 2)
+        return 0
+
+
+class SincronizacionBitacora(models.Model):
+    """
+    Clave de idempotencia de una bitácora enviada desde una tableta sin
+    conexión. Un reintento con la misma clave devuelve el resultado guardado
+    sin volver a aplicar mortalidad ni producción.
+    """
+    ESTADOS = [
+        ('creada', 'Creada'),
+        ('actualizada', 'Actualizada'),
+        ('sin_cambios', 'Sin cambios'),
+    ]
+    
+    clave = models.CharField('Clave de idempotencia', max_length=64, unique=True)
+    huella = models.CharField('Huella del contenido', max_length=40)
+    bitacora = models.ForeignKey(
+        BitacoraDiaria, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='sincronizaciones', verbose_name='Bitácora'
+    )
+    estado = models.CharField('Estado', max_length=15, choices=ESTADOS)
+    usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    fecha_registro = models.DateTimeField('Fecha de registro', auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Sincronización de Bitácora'
+        verbose_name_plural = 'Sincronizaciones de Bitácoras'
+        ordering = ['-fecha_registro']
+    
+    def __str__(self):
+        return f"{self.clave} ({self.get_estado_display()})"
 
 
 class TipoConcentrado(BaseModel):
@@ -272,6 +392,10 @@ class PlanVacunacion(BaseModel):
         verbose_name = 'Plan de Vacunación'
         verbose_name_plural = 'Planes de Vacunación'
         ordering = ['fecha_programada']
+        indexes = [
+            # Vacunas pendientes por fecha (dashboard y barrido de alertas)
+            models.Index(fields=['aplicada', 'fecha_programada'], name='aves_plan_pendiente_idx'),
+        ]
     
     def __str__(self):
         return f"{self.lote.codigo} - {self.tipo_vacuna.nombre} - {self.fecha_programada}"
@@ -454,6 +578,21 @@ class DetalleMovimientoHuevos(BaseModel):
                 })
 
 
+def total_gallinas_postura():
+    """
+    Total de gallinas en postura de los lotes activos. Se cachea y solo se
+    invalida cuando cambia numero_aves_actual, estado o is_active de un lote.
+    """
+    def calcular():
+        from django.db.models import Sum
+        return LoteAves.objects.filter(
+            is_active=True,
+            estado='postura'
+        ).aggregate(total=Sum('numero_aves_actual'))['total'] or 0
+    
+    return obtener_o_calcular('total_gallinas_postura', [DOMINIO_AVES_POSTURA], [], calcular)
+
+
 class InventarioHuevos(BaseModel):
     """Inventario actual de huevos por categoría."""
     categoria = models.CharField('Categoría', max_length=3, choices=MovimientoHuevos.CATEGORIAS_HUEVO, unique=True)
@@ -484,15 +623,11 @@ class InventarioHuevos(BaseModel):
             return self.calcular_stock_minimo_automatico()
         return self.cantidad_minima
     
-    def calcular_stock_minimo_automatico(self):
+    def calcular_stock_minimo_automatico(self, total_gallinas=None):
         """Calcula el stock mínimo automáticamente basado en la cantidad de gallinas."""
-        from django.db.models import Sum
-        
-        # Obtener total de gallinas en postura (activas)
-        total_gallinas = LoteAves.objects.filter(
-            is_active=True,
-            estado='postura'
-        ).aggregate(total=Sum('numero_aves_actual'))['total'] or 0
+        # Total de gallinas en postura (activas), cacheado hasta que cambie un lote
+        if total_gallinas is None:
+            total_gallinas = total_gallinas_postura()
         
         if total_gallinas == 0:
             return self.cantidad_minima  # Fallback al valor manual
@@ -526,6 +661,32 @@ class InventarioHuevos(BaseModel):
                 return True
         return False
     
+    @classmethod
+    def recalcular_minimos(cls, inventarios=None, total_gallinas=None):
+        """
+        Recalcula el stock mínimo de todas las categorías automáticas en una
+        sola pasada y guarda las que cambiaron con un único bulk_update.
+        Retorna la cantidad de inventarios actualizados.
+        """
+        if inventarios is None:
+            inventarios = cls.objects.filter(stock_automatico=True)
+        if total_gallinas is None:
+            total_gallinas = total_gallinas_postura()
+        
+        ahora = timezone.now()
+        cambiados = []
+        for inventario in inventarios:
+            nuevo_minimo = inventario.calcular_stock_minimo_automatico(total_gallinas)
+            if nuevo_minimo != inventario.cantidad_minima:
+                inventario.cantidad_minima = nuevo_minimo
+                inventario.fecha_ultima_actualizacion = ahora
+                cambiados.append(inventario)
+        
+        if cambiados:
+            cls.objects.bulk_update(cambiados, ['cantidad_minima', 'fecha_ultima_actualizacion'])
+            invalidar_dominio(DOMINIO_INVENTARIO)
+        return len(cambiados)
+    
     def save(self, *args, **kwargs):
         """Override save para actualizar stock automático."""
         if self.stock_automatico:
@@ -533,6 +694,67 @@ class InventarioHuevos(BaseModel):
         super().save(*args, **kwargs)
 
 
+class KardexHuevos(models.Model):
+    """
+    Registro de solo inserción con cada cambio de stock por categoría.
+    La suma de sus cantidades es el stock de InventarioHuevos.
+    """
+    ORIGENES = [
+        ('bitacora', 'Bitácora diaria'),
+        ('movimiento', 'Movimiento de huevos'),
+        ('pedido', 'Pedido punto blanco'),
+        ('ajuste', 'Ajuste manual'),
+    ]
+    
+    categoria = models.CharField('Categoría', max_length=3, choices=MovimientoHuevos.CATEGORIAS_HUEVO)
+    cantidad = models.IntegerField('Cantidad', help_text='Positiva para entradas, negativa para salidas')
+    fecha = models.DateField('Fecha', default=timezone.localdate)
+    fecha_registro = models.DateTimeField('Fecha de registro', auto_now_add=True)
+    origen = models.CharField('Origen', max_length=15, choices=ORIGENES)
+    referencia_id = models.PositiveIntegerField('ID de referencia', null=True, blank=True)
+    fecha_origen = models.DateField('Fecha del documento de origen', null=True, blank=True)
+    usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    observaciones = models.CharField('Observaciones', max_length=255, blank=True)
+    
+    class Meta:
+        verbose_name = 'Kardex de Huevos'
+        verbose_name_plural = 'Kardex de Huevos'
+        ordering = ['-fecha_registro']
+        indexes = [
+            models.Index(fields=['categoria', 'fecha'], name='aves_kardex_cat_fecha_idx'),
+            models.Index(fields=['origen', 'referencia_id'], name='aves_kardex_origen_ref_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.categoria} {self.cantidad:+d} ({self.get_origen_display()}) - {self.fecha}"
+    
+    def save(self, *args, **kwargs):
+        if self.pk:
+            raise ValueError('El kardex es de solo inserción: registre un ajuste en lugar de modificar.')
+        super().save(*args, **kwargs)
+    
+    def delete(self, *args, **kwargs):
+        raise ValueError('El kardex es de solo inserción: registre un ajuste en lugar de eliminar.')
+
+
+class SaldoDiarioHuevos(models.Model):
+    """Saldo de cierre por categoría y día, calculado desde el kardex."""
+    categoria = models.CharField('Categoría', max_length=3, choices=MovimientoHuevos.CATEGORIAS_HUEVO)
+    fecha = models.DateField('Fecha')
+    entradas = models.PositiveIntegerField('Entradas', default=0)
+    salidas = models.PositiveIntegerField('Salidas', default=0)
+    saldo = models.IntegerField('Saldo al cierre')
+    
+    class Meta:
+        verbose_name = 'Saldo Diario de Huevos'
+        verbose_name_plural = 'Saldos Diarios de Huevos'
+        unique_together = ['categoria', 'fecha']
+        ordering = ['-fecha', 'categoria']
+    
+    def __str__(self):
+        return f"{self.categoria} - {self.fecha}: {self.saldo}"
+
+
 class AlertaSistema(BaseModel):
     """Sistema de alertas para el módulo avícola."""
     TIPOS_ALERTA = [
@@ -540,6 +762,7 @@ class AlertaSistema(BaseModel):
         ('mortalidad_alta', 'Mortalidad Alta'),
         ('vacuna_pendiente', 'Vacuna Pendiente'),
         ('produccion_baja', 'Producción Baja'),
+        ('consumo_anormal', 'Consumo Anormal'),
     ]
     
     NIVELES = [
@@ -554,6 +777,13 @@ class AlertaSistema(BaseModel):
     lote = models.ForeignKey(LoteAves, on_delete=models.CASCADE, null=True, blank=True)
     galpon_nombre = models.CharField('Galpón', max_length=100, blank=True)
     fecha_generacion = models.DateTimeField('Fecha de generación', auto_now_add=True)
+    fecha_alerta = models.DateField(
+        'Día de la alerta', null=True, blank=True,
+        help_text='Día de los datos que dispararon la alerta (alertas automáticas)'
+    )
+    # lote_id o 0 para las alertas generales: MySQL no admite restricciones
+    # condicionales y no considera iguales dos NULL en un índice único
+    clave_lote = models.PositiveIntegerField('Clave de lote', default=0, editable=False)
     leida = models.BooleanField('Leída', default=False)
     usuario_destinatario = models.ForeignKey(
         User, 
@@ -562,15 +792,32 @@ class AlertaSistema(BaseModel):
         blank=True,
         related_name='alertas_aves'
     )
+    # Alertas iguales de días consecutivos compactadas en esta (ver alertas.compactar_alertas)
+    ocurrencias = models.PositiveIntegerField('Ocurrencias', default=1)
+    primera_vez = models.DateTimeField('Primera vez', null=True, blank=True)
+    ultima_vez = models.DateTimeField('Última vez', null=True, blank=True)
     
     class Meta:
         verbose_name = 'Alerta del Sistema'
         verbose_name_plural = 'Alertas del Sistema'
         ordering = ['-fecha_generacion']
+        indexes = [
+            models.Index(fields=['is_active', 'leida', 'nivel'], name='aves_alerta_estado_idx'),
+        ]
+        constraints = [
+            # Una alerta automática por tipo, lote (o general) y día (ver alertas.py)
+            models.UniqueConstraint(
+                fields=['tipo_alerta', 'clave_lote', 'fecha_alerta'], name='aves_alerta_unica_dia'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.titulo} - {self.fecha_generacion.strftime('%d/%m/%Y %H:%M')}"
     
+    def save(self, *args, **kwargs):
+        self.clave_lote = self.lote_id or 0
+        super().save(*args, **kwargs)
+    
     @property
     def es_critica(self):
         """Determina si la alerta es crítica basándose en el tipo y contenido."""
@@ -584,6 +831,7 @@ class AlertaSistema(BaseModel):
             'produccion_baja': 'fas fa-egg',
             'vacuna_pendiente': 'fas fa-syringe',
             'stock_bajo': 'fas fa-boxes',
+            'consumo_anormal': 'fas fa-utensils',
         }
         return iconos.get(self.tipo_alerta, 'fas fa-bell')
     
@@ -609,6 +857,56 @@ class RegistroModificacion(BaseModel):
         verbose_name = 'Registro de Modificación'
         verbose_name_plural = 'Registros de Modificaciones'
         ordering = ['-fecha_modificacion']
+        indexes = [
+            models.Index(fields=['modelo', 'objeto_id', 'fecha_modificacion'], name='aves_regmod_objeto_idx'),
+            models.Index(fields=['fecha_modificacion'], name='aves_regmod_fecha_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.usuario.username} - {self.accion} - {self.modelo} - {self.fecha_modificacion}"
\ No newline at end of file
+        return f"{self.usuario.username} - {self.accion} - {self.modelo} - {self.fecha_modificacion}"
+
+
+class RegistroModificacionArchivado(models.Model):
+    """
+    Registro de auditoría archivado: solo los campos que cambiaron, como
+    JSON comprimido ({campo: [anterior, nuevo]}). Expone la misma interfaz
+    de lectura que RegistroModificacion para mostrarse en el mismo historial.
+    """
+    registro_id = models.PositiveBigIntegerField('ID original', unique=True)
+    usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    modelo = models.CharField('Modelo', max_length=100)
+    objeto_id = models.PositiveIntegerField('ID del objeto')
+    accion = models.CharField('Acción', max_length=20)
+    cambios = models.BinaryField('Cambios (JSON comprimido)')
+    justificacion = models.TextField('Justificación', blank=True)
+    fecha_modificacion = models.DateTimeField('Fecha de modificación')
+    
+    class Meta:
+        verbose_name = 'Registro de Modificación Archivado'
+        verbose_name_plural = 'Registros de Modificaciones Archivados'
+        ordering = ['-fecha_modificacion']
+        indexes = [
+            models.Index(fields=['modelo', 'objeto_id', 'fecha_modificacion'], name='aves_regarch_objeto_idx'),
+            models.Index(fields=['fecha_modificacion'], name='aves_regarch_fecha_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.accion} - {self.modelo} #{self.objeto_id} - {self.fecha_modificacion} (archivado)"
+    
+    @property
+    def diferencias(self):
+        if not hasattr(self, '_diferencias'):
+            self._diferencias = json.loads(zlib.decompress(bytes(self.cambios)).decode('utf-8'))
+        return self._diferencias
+    
+    @property
+    def campos_modificados(self):
+        return {campo: True for campo in self.diferencias}
+    
+    @property
+    def valores_anteriores(self):
+        return {campo: valores[0] for campo, valores in self.diferencias.items()}
+    
+    @property
+    def valores_nuevos(self):
+        return {campo: valores[1] for campo, valores in self.diferencias.items()}
\ No newline at end of file
@@ -4,15 +4,19 @@ Sistema de reportes específicos para el módulo avícola
 
 import os
 import io
-import csv
+import multiprocessing
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta, date
 from django.conf import settings
 from django.template.loader import render_to_string
-from django.http import HttpResponse, JsonResponse
-from django.db.models import Sum, Avg, Count, Q, F, Max, Min
+from django.http import FileResponse, HttpResponse, JsonResponse
+from django.db.models import Sum, Avg, Count, Q, F, Max, Min, FloatField, FilteredRelation
+from django.db.models.functions import Cast, NullIf
 from django.utils import timezone
 from django.contrib.auth.decorators import login_required
-from django.shortcuts import get_object_or_404
 
 # Importaciones para Excel
 try:
@@ -32,16 +36,33 @@ try:
     import openpyxl
     from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
     from openpyxl.chart import BarChart, LineChart, Reference, PieChart
-    from openpyxl.utils.dataframe import dataframe_to_rows
     OPENPYXL_AVAILABLE = True
 except ImportError:
     OPENPYXL_AVAILABLE = False
 
+from apps.core.cache import DOMINIO_PRODUCCION, DOMINIO_ALERTAS, DOMINIO_LOTES
+from .exportacion import respuesta_csv, filas_por_bloques, Seccion, FILAS_POR_CONSULTA
+from .excel import LibroStreaming, estilo, relleno, TIPO_XLSX
+from .sena import escribir_hoja_sena, libro_sena, nombre_archivo_sena, titulo_hoja_sena
+from .resumenes import anotar_aves_inicio_dia
 from .models import (
-    LoteAves, BitacoraDiaria, MovimientoHuevos, ControlConcentrado,
+    LoteAves, BitacoraDiaria, ResumenProduccionDiaria, MovimientoHuevos, ControlConcentrado,
     PlanVacunacion, AlertaSistema, TipoVacuna, TipoConcentrado
 )
 
+ENCABEZADOS_PRODUCCION = [
+    'Fecha', 'Lote', 'Galpón', 'Producción AAA', 'Producción AA', 'Producción A',
+    'Producción B', 'Producción C', 'Total Huevos', 'Mortalidad', 'Consumo Concentrado', 'Observaciones'
+]
+
+# Estilos con nombre de los reportes Excel (ver excel.py)
+ESTILOS_REPORTE = [
+    estilo('reporte_titulo', font=Font(size=16, bold=True)),
+    estilo('reporte_subtitulo', font=Font(size=14, bold=True)),
+    estilo('reporte_encabezado', font=Font(bold=True), fill=relleno("CCCCCC")),
+] if OPENPYXL_AVAILABLE else []
+
+
 class ReporteAvicola:
     """
     Clase principal para generar reportes avícolas
@@ -53,12 +74,31 @@ class ReporteAvicola:
         self.fecha_fin = self.parametros.get('fecha_fin')
         self.lote_id = self.parametros.get('lote_id')
         
-    def obtener_datos_produccion_diaria(self):
+    def obtener_datos_produccion_diaria(self, con_aves_inicio_dia=False):
         """
-        Obtiene datos de producción diaria con filtros aplicados
+        Obtiene datos de producción diaria con filtros aplicados. Con
+        con_aves_inicio_dia cada bitácora trae anotadas las aves vivas al
+        inicio del día (usadas por porcentaje_postura)
         """
         queryset = BitacoraDiaria.objects.all()
         
+        if self.lote_id:
+            queryset = queryset.filter(lote_id=self.lote_id)
+        if self.fecha_fin:
+            queryset = queryset.filter(fecha__lte=self.fecha_fin)
+        if con_aves_inicio_dia:
+            queryset = anotar_aves_inicio_dia(queryset, desde=self.fecha_inicio)
+        elif self.fecha_inicio:
+            queryset = queryset.filter(fecha__gte=self.fecha_inicio)
+            
+        return queryset.select_related('lote').order_by('-fecha')
+    
+    def obtener_resumen_diario(self):
+        """
+        Obtiene el resumen diario de producción con los mismos filtros
+        """
+        queryset = ResumenProduccionDiaria.objects.all()
+        
         if self.lote_id:
             queryset = queryset.filter(lote_id=self.lote_id)
         if self.fecha_inicio:
@@ -66,15 +106,30 @@ class ReporteAvicola:
         if self.fecha_fin:
             queryset = queryset.filter(fecha__lte=self.fecha_fin)
             
-        return queryset.select_related('lote').order_by('-fecha')
+        return queryset
     
     def obtener_resumen_produccion(self):
         """
-        Obtiene resumen estadístico de producción
+        Obtiene resumen estadístico de producción. El porcentaje de postura
+        es el de ave-día: huevos del rango sobre la suma de las aves vivas al
+        inicio de cada día, calculado en la misma agregación.
         """
-        datos = self.obtener_datos_produccion_diaria()
+        resumen = self.obtener_resumen_diario().aggregate(
+            total_huevos=Sum('produccion_total'),
+            produccion_aaa=Sum('produccion_aaa'),
+            produccion_aa=Sum('produccion_aa'),
+            produccion_a=Sum('produccion_a'),
+            produccion_b=Sum('produccion_b'),
+            produccion_c=Sum('produccion_c'),
+            total_mortalidad=Sum('mortalidad'),
+            promedio_diario=Avg('produccion_total'),
+            mejor_dia=Max('produccion_total'),
+            total_consumo=Sum('consumo_concentrado'),
+            dias_registrados=Count('id'),
+            porcentaje_postura=Cast(Sum('produccion_total'), FloatField()) * 100 / NullIf(Sum('aves_inicio_dia'), 0),
+        )
         
-        if not datos.exists():
+        if not resumen['dias_registrados']:
             return {
                 'total_huevos': 0,
                 'produccion_aaa': 0,
@@ -89,33 +144,6 @@ class ReporteAvicola:
                 'porcentaje_postura': 0,
                 'dias_registrados': 0
             }
-            
-        resumen = datos.aggregate(
-            total_huevos=Sum(F('produccion_aaa') + F('produccion_aa') + F('produccion_a') + F('produccion_b') + F('produccion_c')),
-            produccion_aaa=Sum('produccion_aaa'),
-            produccion_aa=Sum('produccion_aa'),
-            produccion_a=Sum('produccion_a'),
-            produccion_b=Sum('produccion_b'),
-            produccion_c=Sum('produccion_c'),
-            total_mortalidad=Sum('mortalidad'),
-            promedio_diario=Avg(F('produccion_aaa') + F('produccion_aa') + F('produccion_a') + F('produccion_b') + F('produccion_c')),
-            mejor_dia=Max(F('produccion_aaa') + F('produccion_aa') + F('produccion_a') + F('produccion_b') + F('produccion_c')),
-            total_consumo=Sum('consumo_concentrado'),
-            dias_registrados=Count('id')
-        )
-        
-        # Calcular porcentaje de postura promedio
-        total_aves = 0
-        total_produccion = 0
-        
-        for registro in datos:
-            aves_dia = registro.lote.numero_aves_actual
-            produccion_dia = (registro.produccion_aaa + registro.produccion_aa + 
-                            registro.produccion_a + registro.produccion_b + registro.produccion_c)
-            total_aves += aves_dia
-            total_produccion += produccion_dia
-            
-        porcentaje_postura = (total_produccion / total_aves * 100) if total_aves > 0 else 0
         
         # Calcular porcentajes por categoría
         total_huevos = resumen['total_huevos'] or 0
@@ -141,7 +169,7 @@ class ReporteAvicola:
             'promedio_diario': round(resumen['promedio_diario'] or 0, 1),
             'mejor_dia': resumen['mejor_dia'] or 0,
             'total_consumo': resumen['total_consumo'] or 0,
-            'porcentaje_postura': round(porcentaje_postura, 2),
+            'porcentaje_postura': round(resumen['porcentaje_postura'] or 0, 2),
             'dias_registrados': resumen['dias_registrados']
         }
     
@@ -188,37 +216,49 @@ class ReporteAvicola:
             
         return queryset.select_related('lote', 'tipo_vacuna', 'veterinario').order_by('-fecha_programada')
     
+    def filas_produccion_diaria(self):
+        """
+        Filas de producción diaria (ENCABEZADOS_PRODUCCION) leídas por bloques
+        con filas_por_bloques, sin instanciar modelos.
+        """
+        filas = filas_por_bloques(
+            self.obtener_datos_produccion_diaria(),
+            'fecha', 'lote__codigo', 'lote__galpon', 'produccion_aaa', 'produccion_aa', 'produccion_a',
+            'produccion_b', 'produccion_c', 'mortalidad', 'consumo_concentrado', 'observaciones'
+        )
+        for fecha, codigo, galpon, aaa, aa, a, b, c, mortalidad, consumo, observaciones in filas:
+            yield [fecha, codigo, galpon, aaa, aa, a, b, c, aaa + aa + a + b + c, mortalidad, float(consumo), observaciones]
+
     def generar_excel_produccion(self, nombre_archivo="reporte_produccion.xlsx"):
         """
-        Genera reporte Excel de producción con múltiples hojas y gráficos
+        Genera reporte Excel de producción con múltiples hojas y gráficos,
+        escrito en modo write_only
         """
         if not OPENPYXL_AVAILABLE:
             raise ImportError("openpyxl no está disponible")
             
-        wb = openpyxl.Workbook()
+        libro = LibroStreaming(ESTILOS_REPORTE)
         
         # Hoja 1: Resumen
-        ws_resumen = wb.active
-        ws_resumen.title = "Resumen"
+        ws_resumen = libro.hoja("Resumen")
         
         # Título
-        ws_resumen['A1'] = "Reporte de Producción Avícola"
-        ws_resumen['A1'].font = Font(size=16, bold=True)
-        ws_resumen.merge_cells('A1:D1')
+        ws_resumen.fila([ws_resumen.celda("Reporte de Producción Avícola", 'reporte_titulo')])
+        ws_resumen.combinar('A1:D1')
+        ws_resumen.fila()
         
         # Información del reporte
-        ws_resumen['A3'] = "Fecha de generación:"
-        ws_resumen['B3'] = datetime.now().strftime('%d/%m/%Y %H:%M')
-        ws_resumen['A4'] = "Período:"
-        ws_resumen['B4'] = f"{self.fecha_inicio or 'N/A'} - {self.fecha_fin or 'N/A'}"
+        ws_resumen.fila(["Fecha de generación:", datetime.now().strftime('%d/%m/%Y %H:%M')])
+        ws_resumen.fila(["Período:", f"{self.fecha_inicio or 'N/A'} - {self.fecha_fin or 'N/A'}"])
+        ws_resumen.fila()
         
         # Resumen estadístico
         resumen = self.obtener_resumen_produccion()
-        ws_resumen['A6'] = "Resumen Estadístico"
-        ws_resumen['A6'].font = Font(size=14, bold=True)
+        ws_resumen.fila([ws_resumen.celda("Resumen Estadístico", 'reporte_subtitulo')])
+        ws_resumen.fila()
         
-        datos_resumen = [
-            ['Concepto', 'Valor'],
+        ws_resumen.fila(['Concepto', 'Valor'], estilo='reporte_encabezado')
+        for fila in [
             ['Total de huevos producidos', resumen['total_huevos']],
             ['Producción AAA', f"{resumen['produccion_aaa']} ({resumen['porcentaje_aaa']}%)"],
             ['Producción AA', f"{resumen['produccion_aa']} ({resumen['porcentaje_aa']}%)"],
@@ -229,137 +269,74 @@ class ReporteAvicola:
             ['Días registrados', resumen['dias_registrados']],
             ['Promedio diario', resumen['promedio_diario']],
             ['% Postura promedio', f"{resumen['porcentaje_postura']}%"],
-        ]
-        
-        for i, fila in enumerate(datos_resumen, start=8):
-            for j, valor in enumerate(fila, start=1):
-                celda = ws_resumen.cell(row=i, column=j, value=valor)
-                if i == 8:  # Encabezado
-                    celda.font = Font(bold=True)
-                    celda.fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
-        
-        # Hoja 2: Producción Diaria
-        ws_produccion = wb.create_sheet("Producción Diaria")
-        datos_produccion = self.obtener_datos_produccion_diaria()
-        
-        # Encabezados
-        encabezados = ['Fecha', 'Lote', 'Galpón', 'Producción AAA', 'Producción AA', 'Producción A', 
-                      'Producción B', 'Producción C', 'Total Huevos', 'Mortalidad', 'Consumo Concentrado', 'Observaciones']
+        ]:
+            ws_resumen.fila(fila)
         
-        for i, encabezado in enumerate(encabezados, start=1):
-            celda = ws_produccion.cell(row=1, column=i, value=encabezado)
-            celda.font = Font(bold=True)
-            celda.fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
+        # Hoja 2: Producción Diaria, con el ancho de columnas ajustado en la misma pasada
+        ws_produccion = libro.hoja("Producción Diaria")
+        ws_produccion.tabla(ENCABEZADOS_PRODUCCION, self.filas_produccion_diaria(), estilo_encabezado='reporte_encabezado')
         
-        # Datos
-        for i, dato in enumerate(datos_produccion, start=2):
-            total_huevos = dato.produccion_aaa + dato.produccion_aa + dato.produccion_a + dato.produccion_b + dato.produccion_c
-            ws_produccion.cell(row=i, column=1, value=dato.fecha)
-            ws_produccion.cell(row=i, column=2, value=dato.lote.codigo)
-            ws_produccion.cell(row=i, column=3, value=dato.lote.galpon)
-            ws_produccion.cell(row=i, column=4, value=dato.produccion_aaa)
-            ws_produccion.cell(row=i, column=5, value=dato.produccion_aa)
-            ws_produccion.cell(row=i, column=6, value=dato.produccion_a)
-            ws_produccion.cell(row=i, column=7, value=dato.produccion_b)
-            ws_produccion.cell(row=i, column=8, value=dato.produccion_c)
-            ws_produccion.cell(row=i, column=9, value=total_huevos)
-            ws_produccion.cell(row=i, column=10, value=dato.mortalidad)
-            ws_produccion.cell(row=i, column=11, value=float(dato.consumo_concentrado))
-            ws_produccion.cell(row=i, column=12, value=dato.observaciones)
-        
-        # Ajustar ancho de columnas
-        for column in ws_produccion.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws_produccion.column_dimensions[column_letter].width = adjusted_width
+        # Datos para el gráfico: los últimos 30 días, en orden cronológico
+        datos_grafico = list(self.obtener_datos_produccion_diaria().values_list(
+            'fecha', 'produccion_aaa', 'produccion_aa', 'produccion_a', 'produccion_b', 'produccion_c', 'mortalidad'
+        )[:30])[::-1]
         
         # Crear gráfico de producción
-        if datos_produccion:
+        if datos_grafico:
             chart = LineChart()
             chart.title = "Evolución de la Producción de Huevos"
             chart.style = 13
             chart.x_axis.title = 'Fecha'
             chart.y_axis.title = 'Cantidad de Huevos'
             
-            # Datos para el gráfico (últimos 30 días)
-            datos_grafico = list(datos_produccion)[-30:] if len(list(datos_produccion)) > 30 else list(datos_produccion)
-            
             # Agregar datos del gráfico en una nueva hoja
-            ws_grafico = wb.create_sheet("Datos Gráfico")
-            ws_grafico['A1'] = "Fecha"
-            ws_grafico['B1'] = "Total Huevos"
-            ws_grafico['C1'] = "Mortalidad"
-            
-            for i, dato in enumerate(datos_grafico, start=2):
-                total_huevos = dato.produccion_aaa + dato.produccion_aa + dato.produccion_a + dato.produccion_b + dato.produccion_c
-                ws_grafico.cell(row=i, column=1, value=dato.fecha.strftime('%d/%m'))
-                ws_grafico.cell(row=i, column=2, value=total_huevos)
-                ws_grafico.cell(row=i, column=3, value=dato.mortalidad)
+            ws_grafico = libro.hoja("Datos Gráfico")
+            ws_grafico.fila(["Fecha", "Total Huevos", "Mortalidad"])
+            for fecha, aaa, aa, a, b, c, mortalidad in datos_grafico:
+                ws_grafico.fila([fecha.strftime('%d/%m'), aaa + aa + a + b + c, mortalidad])
             
             # Configurar referencias del gráfico
-            data = Reference(ws_grafico, min_col=2, min_row=1, max_col=3, max_row=len(datos_grafico)+1)
-            cats = Reference(ws_grafico, min_col=1, min_row=2, max_row=len(datos_grafico)+1)
+            data = Reference(ws_grafico.hoja, min_col=2, min_row=1, max_col=3, max_row=len(datos_grafico)+1)
+            cats = Reference(ws_grafico.hoja, min_col=1, min_row=2, max_row=len(datos_grafico)+1)
             
             chart.add_data(data, titles_from_data=True)
             chart.set_categories(cats)
             
             # Agregar gráfico a la hoja de resumen
-            ws_resumen.add_chart(chart, "F6")
+            ws_resumen.hoja.add_chart(chart, "F6")
         
-        # Guardar en buffer
-        buffer = io.BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
-        
-        response = HttpResponse(
-            buffer.getvalue(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        response['Content-Disposition'] = f'attachment; filename="{nombre_archivo}"'
-        return response
+        return libro.respuesta(nombre_archivo)
     
-    def generar_csv_produccion(self, nombre_archivo="reporte_produccion.csv"):
+    def generar_csv_produccion(self, nombre_archivo="reporte_produccion.csv", comprimir=False):
         """
-        Genera reporte CSV de producción
+        Genera reporte CSV de producción en streaming
         """
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="{nombre_archivo}"'
-        
-        writer = csv.writer(response)
-        
-        # Encabezados
-        writer.writerow([
-            'Fecha', 'Lote', 'Galpón', 'Producción AAA', 'Producción AA', 'Producción A',
-            'Producción B', 'Producción C', 'Total Huevos', 'Mortalidad', 'Consumo Concentrado', 'Observaciones'
-        ])
-        
-        # Datos
-        datos_produccion = self.obtener_datos_produccion_diaria()
-        for dato in datos_produccion:
-            total_huevos = dato.produccion_aaa + dato.produccion_aa + dato.produccion_a + dato.produccion_b + dato.produccion_c
-            writer.writerow([
-                dato.fecha.strftime('%d/%m/%Y'),
-                dato.lote.codigo,
-                dato.lote.galpon,
-                dato.produccion_aaa,
-                dato.produccion_aa,
-                dato.produccion_a,
-                dato.produccion_b,
-                dato.produccion_c,
-                total_huevos,
-                dato.mortalidad,
-                float(dato.consumo_concentrado),
-                dato.observaciones
-            ])
-        
-        return response
+        filas = (
+            [fecha.strftime('%d/%m/%Y')] + resto
+            for fecha, *resto in self.filas_produccion_diaria()
+        )
+        return respuesta_csv(nombre_archivo, [Seccion(ENCABEZADOS_PRODUCCION, filas)], comprimir=comprimir)
+
+# Totales que comparan lotes y períodos, sumados sobre ResumenProduccionDiaria
+CAMPOS_COMPARACION = ['produccion_aaa', 'produccion_aa', 'produccion_a', 'produccion_b', 'produccion_c', 'mortalidad']
+
+
+def agregados_comparacion(ruta='', filtro=None, sufijo=''):
+    """
+    Agregados de comparación sobre el resumen diario. `ruta` es el camino
+    hasta el resumen ('' si se consulta directamente), `filtro` limita las
+    filas (agregación condicional) y `sufijo` distingue cada grupo cuando
+    se calculan varios en la misma consulta.
+    """
+    agregados = {
+        f'total_{campo}{sufijo}': Sum(f'{ruta}{campo}', filter=filtro) for campo in CAMPOS_COMPARACION
+    }
+    agregados[f'total_huevos{sufijo}'] = Sum(f'{ruta}produccion_total', filter=filtro)
+    agregados[f'promedio_postura{sufijo}'] = Avg(f'{ruta}produccion_total', filter=filtro)
+    agregados[f'aves_dia{sufijo}'] = Sum(f'{ruta}aves_inicio_dia', filter=filtro)
+    agregados[f'dias_registrados{sufijo}'] = Count(f'{ruta}id', filter=filtro)
+    return agregados
+
 
 class ReporteComparativo:
     """
@@ -369,112 +346,111 @@ class ReporteComparativo:
     def __init__(self, parametros=None):
         self.parametros = parametros or {}
         
-    def comparar_lotes(self, lotes_ids, fecha_inicio, fecha_fin):
+    def comparar_lotes(self, lotes_ids, fecha_inicio, fecha_fin, galpon=None, linea_genetica=None):
         """
-        Compara producción entre diferentes lotes
+        Compara producción entre diferentes lotes: los de lotes_ids más, si se
+        indican, todos los lotes activos del galpón y/o la línea genética.
+        Una sola consulta agrupada por lote; el rango de fechas va en la
+        condición del JOIN, así que los lotes sin registros salen en cero.
         """
-        datos_comparacion = []
+        if not (lotes_ids or galpon or linea_genetica):
+            return []
+        
+        seleccion = Q()
+        if lotes_ids:
+            seleccion |= Q(id__in=lotes_ids)
+        if galpon or linea_genetica:
+            grupo = Q(is_active=True)
+            if galpon:
+                grupo &= Q(galpon=galpon)
+            if linea_genetica:
+                grupo &= Q(linea_genetica=linea_genetica)
+            seleccion |= grupo
+        lotes = LoteAves.objects.filter(seleccion)
+        
+        rango = Q()
+        if fecha_inicio:
+            rango &= Q(resumenes_diarios__fecha__gte=fecha_inicio)
+        if fecha_fin:
+            rango &= Q(resumenes_diarios__fecha__lte=fecha_fin)
+        ruta = 'resumenes_diarios__'
+        if rango:
+            lotes = lotes.annotate(resumenes_rango=FilteredRelation('resumenes_diarios', condition=rango))
+            ruta = 'resumenes_rango__'
+        lotes = lotes.annotate(**agregados_comparacion(ruta)).order_by('galpon', 'codigo')
+        
+        if lotes_ids and not (galpon or linea_genetica):
+            # Se respeta el orden en que se eligieron los lotes
+            posicion = {str(lote_id): indice for indice, lote_id in enumerate(lotes_ids)}
+            lotes = sorted(lotes, key=lambda lote: posicion.get(str(lote.id), len(posicion)))
         
-        for lote_id in lotes_ids:
-            lote = get_object_or_404(LoteAves, id=lote_id)
-            
-            # Obtener datos del lote
-            bitacoras = BitacoraDiaria.objects.filter(
-                lote_id=lote_id,
-                fecha__gte=fecha_inicio,
-                fecha__lte=fecha_fin
-            )
-            
-            resumen = bitacoras.aggregate(
-                total_produccion_aaa=Sum('produccion_aaa'),
-                total_produccion_aa=Sum('produccion_aa'),
-                total_produccion_a=Sum('produccion_a'),
-                total_produccion_b=Sum('produccion_b'),
-                total_produccion_c=Sum('produccion_c'),
-                total_mortalidad=Sum('mortalidad'),
-                promedio_postura=Avg(F('produccion_aaa') + F('produccion_aa') + F('produccion_a') + F('produccion_b') + F('produccion_c')),
-                dias_registrados=Count('id')
-            )
-            
-            total_huevos = (
-                (resumen['total_produccion_aaa'] or 0) + 
-                (resumen['total_produccion_aa'] or 0) + 
-                (resumen['total_produccion_a'] or 0) + 
-                (resumen['total_produccion_b'] or 0) + 
-                (resumen['total_produccion_c'] or 0)
-            )
-            
+        datos_comparacion = []
+        for lote in lotes:
+            total_huevos = lote.total_huevos or 0
             datos_comparacion.append({
                 'lote_codigo': lote.codigo,
                 'galpon': lote.galpon,
                 'linea_genetica': lote.linea_genetica,
                 'numero_aves_actual': lote.numero_aves_actual,
                 'total_huevos': total_huevos,
-                'produccion_aaa': resumen['total_produccion_aaa'] or 0,
-                'produccion_aa': resumen['total_produccion_aa'] or 0,
-                'produccion_a': resumen['total_produccion_a'] or 0,
-                'produccion_b': resumen['total_produccion_b'] or 0,
-                'produccion_c': resumen['total_produccion_c'] or 0,
-                'total_mortalidad': resumen['total_mortalidad'] or 0,
-                'promedio_postura': round(resumen['promedio_postura'] or 0, 2),
-                'dias_registrados': resumen['dias_registrados'],
-                'huevos_por_ave_dia': round(total_huevos / (lote.numero_aves_actual * resumen['dias_registrados']), 3) if lote.numero_aves_actual > 0 and resumen['dias_registrados'] > 0 else 0
+                'produccion_aaa': lote.total_produccion_aaa or 0,
+                'produccion_aa': lote.total_produccion_aa or 0,
+                'produccion_a': lote.total_produccion_a or 0,
+                'produccion_b': lote.total_produccion_b or 0,
+                'produccion_c': lote.total_produccion_c or 0,
+                'total_mortalidad': lote.total_mortalidad or 0,
+                'promedio_postura': round(lote.promedio_postura or 0, 2),
+                'dias_registrados': lote.dias_registrados,
+                # Ave-día: sobre las aves vivas al inicio de cada día registrado
+                'huevos_por_ave_dia': round(total_huevos / lote.aves_dia, 3) if lote.aves_dia else 0
             })
         
         return datos_comparacion
     
     def comparar_periodos(self, lote_id, periodos):
         """
-        Compara producción del mismo lote en diferentes períodos
+        Compara producción del mismo lote en diferentes períodos, con una
+        agregación condicional por período en una sola consulta
         """
-        datos_comparacion = []
+        if not periodos:
+            return []
         
-        for periodo in periodos:
-            fecha_inicio = periodo['fecha_inicio']
-            fecha_fin = periodo['fecha_fin']
-            nombre_periodo = periodo['nombre']
-            
-            bitacoras = BitacoraDiaria.objects.filter(
-                lote_id=lote_id,
-                fecha__gte=fecha_inicio,
-                fecha__lte=fecha_fin
-            )
-            
-            resumen = bitacoras.aggregate(
-                total_produccion_aaa=Sum('produccion_aaa'),
-                total_produccion_aa=Sum('produccion_aa'),
-                total_produccion_a=Sum('produccion_a'),
-                total_produccion_b=Sum('produccion_b'),
-                total_produccion_c=Sum('produccion_c'),
-                total_mortalidad=Sum('mortalidad'),
-                dias_registrados=Count('id')
-            )
-            
-            total_huevos = (
-                (resumen['total_produccion_aaa'] or 0) + 
-                (resumen['total_produccion_aa'] or 0) + 
-                (resumen['total_produccion_a'] or 0) + 
-                (resumen['total_produccion_b'] or 0) + 
-                (resumen['total_produccion_c'] or 0)
-            )
-            
+        agregados = {}
+        for indice, periodo in enumerate(periodos):
+            en_periodo = Q(fecha__gte=periodo['fecha_inicio'], fecha__lte=periodo['fecha_fin'])
+            agregados.update(agregados_comparacion(filtro=en_periodo, sufijo=f'_{indice}'))
+        
+        resumen = ResumenProduccionDiaria.objects.filter(
+            lote_id=lote_id,
+            fecha__gte=min(periodo['fecha_inicio'] for periodo in periodos),
+            fecha__lte=max(periodo['fecha_fin'] for periodo in periodos)
+        ).aggregate(**agregados)
+        
+        datos_comparacion = []
+        for indice, periodo in enumerate(periodos):
+            total_huevos = resumen[f'total_huevos_{indice}'] or 0
+            dias_registrados = resumen[f'dias_registrados_{indice}']
             datos_comparacion.append({
-                'periodo': nombre_periodo,
-                'fecha_inicio': fecha_inicio,
-                'fecha_fin': fecha_fin,
+                'periodo': periodo['nombre'],
+                'fecha_inicio': periodo['fecha_inicio'],
+                'fecha_fin': periodo['fecha_fin'],
                 'total_huevos': total_huevos,
-                'produccion_aaa': resumen['total_produccion_aaa'] or 0,
-                'produccion_aa': resumen['total_produccion_aa'] or 0,
-                'produccion_a': resumen['total_produccion_a'] or 0,
-                'produccion_b': resumen['total_produccion_b'] or 0,
-                'produccion_c': resumen['total_produccion_c'] or 0,
-                'total_mortalidad': resumen['total_mortalidad'] or 0,
-                'dias_registrados': resumen['dias_registrados'],
-                'promedio_huevos_dia': round(total_huevos / resumen['dias_registrados'], 1) if resumen['dias_registrados'] > 0 else 0
+                'produccion_aaa': resumen[f'total_produccion_aaa_{indice}'] or 0,
+                'produccion_aa': resumen[f'total_produccion_aa_{indice}'] or 0,
+                'produccion_a': resumen[f'total_produccion_a_{indice}'] or 0,
+                'produccion_b': resumen[f'total_produccion_b_{indice}'] or 0,
+                'produccion_c': resumen[f'total_produccion_c_{indice}'] or 0,
+                'total_mortalidad': resumen[f'total_mortalidad_{indice}'] or 0,
+                'dias_registrados': dias_registrados,
+                'promedio_huevos_dia': round(total_huevos / dias_registrados, 1) if dias_registrados > 0 else 0
             })
         
         return datos_comparacion
 
+# Dominios de datos de los que depende obtener_datos_dashboard (caché versionada)
+DOMINIOS_DATOS_DASHBOARD = [DOMINIO_PRODUCCION, DOMINIO_ALERTAS, DOMINIO_LOTES]
+
+
 def obtener_datos_dashboard():
     """
     Obtiene datos para el dashboard principal del módulo avícola
@@ -487,18 +463,18 @@ def obtener_datos_dashboard():
     total_aves = LoteAves.objects.filter(estado__in=['levante', 'postura']).aggregate(total=Sum('numero_aves_actual'))['total'] or 0
     
     # Producción del día
-    produccion_hoy = BitacoraDiaria.objects.filter(fecha=hoy).aggregate(
-        huevos_hoy=Sum(F('produccion_aaa') + F('produccion_aa') + F('produccion_a') + F('produccion_b') + F('produccion_c')),
+    produccion_hoy = ResumenProduccionDiaria.objects.filter(fecha=hoy).aggregate(
+        huevos_hoy=Sum('produccion_total'),
         mortalidad_hoy=Sum('mortalidad')
     )
     
     # Producción últimos 30 días
-    produccion_30_dias = BitacoraDiaria.objects.filter(
+    produccion_30_dias = ResumenProduccionDiaria.objects.filter(
         fecha__gte=hace_30_dias,
         fecha__lte=hoy
     ).aggregate(
-        total_huevos=Sum(F('produccion_aaa') + F('produccion_aa') + F('produccion_a') + F('produccion_b') + F('produccion_c')),
-        promedio_diario=Avg(F('produccion_aaa') + F('produccion_aa') + F('produccion_a') + F('produccion_b') + F('produccion_c'))
+        total_huevos=Sum('produccion_total'),
+        promedio_diario=Avg('produccion_total')
     )
     
     # Alertas activas
@@ -506,27 +482,31 @@ def obtener_datos_dashboard():
         leida=False
     ).count()
     
-    # Evolución de producción (últimos 7 días)
+    # Evolución de producción (últimos 7 días) en una sola consulta agrupada
+    produccion_por_fecha = dict(
+        ResumenProduccionDiaria.objects.filter(
+            fecha__gte=hoy - timedelta(days=6),
+            fecha__lte=hoy
+        ).values('fecha').annotate(
+            total=Sum('produccion_total')
+        ).order_by().values_list('fecha', 'total')
+    )
     evolucion_produccion = []
     for i in range(7):
         fecha = hoy - timedelta(days=i)
-        produccion_dia = BitacoraDiaria.objects.filter(fecha=fecha).aggregate(
-            total=Sum(F('produccion_aaa') + F('produccion_aa') + F('produccion_a') + F('produccion_b') + F('produccion_c'))
-        )['total'] or 0
         evolucion_produccion.append({
             'fecha': fecha.strftime('%d/%m'),
-            'produccion': produccion_dia
+            'produccion': produccion_por_fecha.get(fecha) or 0
         })
-    
     evolucion_produccion.reverse()
     
     # Top 5 lotes por producción
-    top_lotes = BitacoraDiaria.objects.filter(
+    top_lotes = ResumenProduccionDiaria.objects.filter(
         fecha__gte=hace_30_dias
     ).values(
         'lote__codigo', 'lote__galpon'
     ).annotate(
-        total_produccion=Sum(F('produccion_aaa') + F('produccion_aa') + F('produccion_a') + F('produccion_b') + F('produccion_c'))
+        total_produccion=Sum('produccion_total')
     ).order_by('-total_produccion')[:5]
     
     return {
@@ -542,6 +522,64 @@ def obtener_datos_dashboard():
     }
 
 
+# Campos de la bitácora que usa el registro SENA de cada día
+CAMPOS_DIA_SENA = (
+    'produccion_aaa', 'produccion_aa', 'produccion_a', 'produccion_b', 'produccion_c',
+    'huevos_rotos', 'consumo_concentrado', 'mortalidad', 'observaciones',
+)
+
+
+def _datos_lote_sena(lote):
+    return {
+        'codigo': lote.codigo,
+        'galpon': lote.galpon,
+        'linea': lote.get_linea_genetica_display_name(),
+        'edad_semanas': lote.edad_actual_semanas,
+        'numero_aves_inicial': lote.numero_aves_inicial,
+        'numero_aves_actual': lote.numero_aves_actual,
+    }
+
+
+def datos_reporte_sena(lotes, periodos, nombre_granja="Granja Avícola La Salada", registro_ica="051290274",
+                       incluir_vacios=False):
+    """
+    Datos de los registros SENA (ver sena.py) de varios lotes y meses,
+    con una sola consulta de bitácoras para todo el rango. `periodos` son
+    pares (mes, año). Sin `incluir_vacios` se omiten los lote-mes sin
+    bitácoras (lotes que aún no llegaban o ya terminaron).
+    """
+    lotes = list(lotes)
+    periodos = sorted(set(periodos), key=lambda periodo: (periodo[1], periodo[0]))
+    if not lotes or not periodos:
+        return []
+
+    from calendar import monthrange
+    primer_mes, primer_año = periodos[0]
+    ultimo_mes, ultimo_año = periodos[-1]
+    bitacoras = BitacoraDiaria.objects.filter(
+        lote__in=lotes,
+        fecha__range=(date(primer_año, primer_mes, 1), date(ultimo_año, ultimo_mes, monthrange(ultimo_año, ultimo_mes)[1])),
+    ).order_by('lote_id', 'fecha').values('lote_id', 'fecha', *CAMPOS_DIA_SENA)
+
+    dias_por_mes = {}
+    for fila in bitacoras.iterator(chunk_size=FILAS_POR_CONSULTA):
+        lote_id, fecha = fila.pop('lote_id'), fila.pop('fecha')
+        dias_por_mes.setdefault((lote_id, fecha.month, fecha.year), {})[fecha.day] = fila
+
+    datos = []
+    for lote in lotes:
+        datos_lote = _datos_lote_sena(lote)
+        for mes, año in periodos:
+            dias = dias_por_mes.get((lote.pk, mes, año))
+            if dias is None and not incluir_vacios:
+                continue
+            datos.append({
+                'mes': mes, 'año': año, 'nombre_granja': nombre_granja, 'registro_ica': registro_ica,
+                'lote': datos_lote, 'dias': dias or {},
+            })
+    return datos
+
+
 def generar_reporte_sena_excel(lote_id, mes, año, nombre_granja="Granja Avícola La Salada", registro_ica="051290274"):
     """
     Genera reporte mensual en formato SENA para registro de postura
@@ -555,377 +593,95 @@ def generar_reporte_sena_excel(lote_id, mes, año, nombre_granja="Granja Avícol
     except LoteAves.DoesNotExist:
         raise ValueError(f"No se encontró el lote con ID {lote_id}")
     
-    # Crear workbook
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = f"Registro Postura {mes}-{año}"
-    
-    # Configurar página
-    ws.page_setup.orientation = ws.ORIENTATION_LANDSCAPE
-    ws.page_setup.paperSize = ws.PAPERSIZE_A4
-    
-    # Estilos
-    header_font = Font(name='Arial', size=10, bold=True)
-    normal_font = Font(name='Arial', size=9)
-    title_font = Font(name='Arial', size=12, bold=True)
-    border_thin = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-    
-    # Colores
-    green_fill = PatternFill(start_color='92D050', end_color='92D050', fill_type='solid')
-    light_green_fill = PatternFill(start_color='C6EFCE', end_color='C6EFCE', fill_type='solid')
-    
-    # ENCABEZADO SENA
-    # Fila 1: Logo SENA, Nombre de la granja, Centro
-    ws['A1'] = 'SENA'
-    ws['A1'].font = Font(name='Arial', size=14, bold=True)
-    ws['A1'].fill = green_fill
-    
-    ws.merge_cells('B1:M1')
-    ws['B1'] = nombre_granja.upper()
-    ws['B1'].font = title_font
-    ws['B1'].alignment = Alignment(horizontal='center')
-    ws['B1'].fill = green_fill
-    
-    ws.merge_cells('N1:P1')
-    ws['N1'] = 'CENTRO DE LOS RECURSOS NATURALES RENOVABLES'
-    ws['N1'].font = Font(name='Arial', size=8)
-    ws['N1'].alignment = Alignment(horizontal='center', wrap_text=True)
-    ws['N1'].fill = green_fill
-    
-    # Fila 2: Registro ICA
-    ws.merge_cells('A2:P2')
-    ws['A2'] = f'Registro ICA {registro_ica}'
-    ws['A2'].font = Font(name='Arial', size=11, bold=True)
-    ws['A2'].alignment = Alignment(horizontal='center')
-    ws['A2'].fill = light_green_fill
-    
-    # Fila 3: Vacía
-    
-    # Fila 4: Título del reporte
-    ws.merge_cells('A4:P4')
-    ws['A4'] = 'REGISTRO MENSUAL DE POSTURA'
-    ws['A4'].font = Font(name='Arial', size=14, bold=True)
-    ws['A4'].alignment = Alignment(horizontal='center')
-    ws['A4'].fill = green_fill
-    
-    # Fila 5: Versión
-    ws['P5'] = 'Versión: 2020-01'
-    ws['P5'].font = Font(name='Arial', size=8)
-    ws['P5'].alignment = Alignment(horizontal='right')
-    
-    # Fila 6: Información del lote
-    ws['A6'] = 'Mes:'
-    ws['A6'].font = header_font
-    ws['B6'] = f'{mes:02d}'
-    ws['B6'].font = normal_font
-    
-    ws['C6'] = 'Año:'
-    ws['C6'].font = header_font
-    ws['D6'] = str(año)
-    ws['D6'].font = normal_font
-    
-    ws['E6'] = 'Galpón:'
-    ws['E6'].font = header_font
-    ws['F6'] = str(lote.galpon)
-    ws['F6'].font = normal_font
-    
-    ws['G6'] = 'Lote:'
-    ws['G6'].font = header_font
-    ws['H6'] = str(lote.codigo)
-    ws['H6'].font = normal_font
-    
-    ws['I6'] = 'Sistema:'
-    ws['I6'].font = header_font
-    ws['J6'] = 'Jaula'  # Valor por defecto
-    ws['J6'].font = normal_font
-    
-    ws['K6'] = 'Línea:'
-    ws['K6'].font = header_font
-    ws['L6'] = lote.get_linea_genetica_display_name() if hasattr(lote, 'get_linea_genetica_display_name') else str(lote.linea_genetica)
-    ws['L6'].font = normal_font
-    
-    # Fila 7: Información de aves
-    ws['A7'] = 'Edad en semanas:'
-    ws['A7'].font = header_font
-    edad_semanas = lote.edad_actual_semanas if hasattr(lote, 'edad_actual_semanas') else 0
-    ws['B7'] = f'{edad_semanas:.1f}'
-    ws['B7'].font = normal_font
-    
-    ws['C7'] = 'Aves alojadas:'
-    ws['C7'].font = header_font
-    ws['D7'] = lote.numero_aves_inicial
-    ws['D7'].font = normal_font
-    
-    ws['E7'] = 'N° de aves al inicio del mes:'
-    ws['E7'].font = header_font
-    ws['F7'] = lote.numero_aves_actual
-    ws['F7'].font = normal_font
-    
-    # TABLA DE DATOS DIARIOS
-    # Fila 9: Encabezados principales
-    fila_encabezado = 9
-    
-    # Aplicar color de fondo a encabezados
-    for col in range(1, 17):  # A hasta P
-        ws.cell(row=fila_encabezado, column=col).fill = green_fill
-        ws.cell(row=fila_encabezado + 1, column=col).fill = light_green_fill
-    
-    # Encabezados principales
-    ws['A9'] = 'Día'
-    ws.merge_cells('B9:F9')
-    ws['B9'] = 'PRODUCCIÓN'
-    ws.merge_cells('G9:H9')
-    ws['G9'] = 'ALIMENTO'
-    ws.merge_cells('I9:K9')
-    ws['I9'] = 'BAJAS'
-    ws['L9'] = 'Existencia'
-    ws['M9'] = 'OBSERVACIONES'
-    
-    # Aplicar formato a encabezados principales
-    for col in ['A', 'B', 'G', 'I', 'L', 'M']:
-        ws[f'{col}9'].font = header_font
-        ws[f'{col}9'].alignment = Alignment(horizontal='center', vertical='center')
-        ws[f'{col}9'].border = border_thin
-    
-    # Fila 10: Subencabezados
-    subencabezados = [
-        ('A', ''),
-        ('B', '1a'),
-        ('C', '2a'),
-        ('D', '3a'),
-        ('E', 'Rotos'),
-        ('F', 'Total'),
-        ('G', 'Kg'),
-        ('H', 'Acumulado'),
-        ('I', 'Descar'),
-        ('J', 'Elimin'),
-        ('K', 'Total'),
-        ('L', ''),
-        ('M', '')
-    ]
-    
-    for col, texto in subencabezados:
-        ws[f'{col}10'] = texto
-        ws[f'{col}10'].font = header_font
-        ws[f'{col}10'].alignment = Alignment(horizontal='center', vertical='center')
-        ws[f'{col}10'].border = border_thin
-    
-    # Obtener datos del mes
-    from calendar import monthrange
-    dias_en_mes = monthrange(año, mes)[1]
-    
-    # Obtener bitácoras del mes
-    bitacoras = BitacoraDiaria.objects.filter(
-        lote=lote,
-        fecha__year=año,
-        fecha__month=mes
-    ).order_by('fecha')
-    
-    # Crear diccionario de bitácoras por día
-    bitacoras_por_dia = {bitacora.fecha.day: bitacora for bitacora in bitacoras}
-    
-    # LLENAR DATOS DIARIOS
-    fila_inicio_datos = 11
-    acumulado_alimento = 0
-    
-    # Variables para totales
-    total_1a = 0
-    total_2a = 0
-    total_3a = 0
-    total_rotos = 0
-    total_alimento = 0
-    total_mortalidad = 0
-    
-    for dia in range(1, dias_en_mes + 1):
-        fila = fila_inicio_datos + dia - 1
-        
-        # Día
-        ws[f'A{fila}'] = dia
-        ws[f'A{fila}'].alignment = Alignment(horizontal='center')
-        ws[f'A{fila}'].border = border_thin
-        
-        if dia in bitacoras_por_dia:
-            bitacora = bitacoras_por_dia[dia]
-            
-            # Producción (mapear categorías del sistema a formato SENA)
-            # 1a = AAA + AA
-            # 2a = A
-            # 3a = B + C
-            produccion_1a = (bitacora.produccion_aaa or 0) + (bitacora.produccion_aa or 0)
-            produccion_2a = bitacora.produccion_a or 0
-            produccion_3a = (bitacora.produccion_b or 0) + (bitacora.produccion_c or 0)
-            rotos = bitacora.huevos_rotos or 0
-            total_produccion_dia = produccion_1a + produccion_2a + produccion_3a + rotos
-            
-            # Acumular totales
-            total_1a += produccion_1a
-            total_2a += produccion_2a
-            total_3a += produccion_3a
-            total_rotos += rotos
-            
-            ws[f'B{fila}'] = produccion_1a if produccion_1a > 0 else ''
-            ws[f'C{fila}'] = produccion_2a if produccion_2a > 0 else ''
-            ws[f'D{fila}'] = produccion_3a if produccion_3a > 0 else ''
-            ws[f'E{fila}'] = rotos if rotos > 0 else ''
-            ws[f'F{fila}'] = total_produccion_dia if total_produccion_dia > 0 else ''
-            
-            # Alimento
-            consumo_kg = float(bitacora.consumo_concentrado) if bitacora.consumo_concentrado else 0
-            acumulado_alimento += consumo_kg
-            total_alimento += consumo_kg
-            
-            ws[f'G{fila}'] = consumo_kg if consumo_kg > 0 else ''
-            ws[f'H{fila}'] = round(acumulado_alimento, 2) if acumulado_alimento > 0 else ''
-            
-            # Bajas (mortalidad)
-            mortalidad = bitacora.mortalidad or 0
-            total_mortalidad += mortalidad
-            
-            ws[f'I{fila}'] = mortalidad if mortalidad > 0 else ''
-            ws[f'J{fila}'] = ''  # Eliminación (no tenemos este dato)
-            ws[f'K{fila}'] = mortalidad if mortalidad > 0 else ''
-            
-            # Existencia (aves restantes)
-            aves_restantes = lote.numero_aves_actual - total_mortalidad
-            ws[f'L{fila}'] = aves_restantes if aves_restantes >= 0 else ''
-            
-            # Observaciones
-            ws[f'M{fila}'] = bitacora.observaciones[:30] if bitacora.observaciones else ''
-        
-        # Aplicar bordes y formato a toda la fila
-        for col in ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J', 'K', 'L', 'M']:
-            ws[f'{col}{fila}'].border = border_thin
-            ws[f'{col}{fila}'].font = normal_font
-            if col in ['B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J', 'K', 'L']:
-                ws[f'{col}{fila}'].alignment = Alignment(horizontal='center')
-    
-    # FILA TOTAL
-    fila_total = fila_inicio_datos + dias_en_mes
-    ws[f'A{fila_total}'] = 'TOTAL'
-    ws[f'A{fila_total}'].font = header_font
-    ws[f'A{fila_total}'].fill = green_fill
-    
-    total_general = total_1a + total_2a + total_3a + total_rotos
-    
-    ws[f'B{fila_total}'] = total_1a if total_1a > 0 else ''
-    ws[f'C{fila_total}'] = total_2a if total_2a > 0 else ''
-    ws[f'D{fila_total}'] = total_3a if total_3a > 0 else ''
-    ws[f'E{fila_total}'] = total_rotos if total_rotos > 0 else ''
-    ws[f'F{fila_total}'] = total_general if total_general > 0 else ''
-    
-    # Total alimento
-    ws[f'G{fila_total}'] = round(total_alimento, 2) if total_alimento > 0 else ''
-    
-    # Total bajas
-    ws[f'I{fila_total}'] = total_mortalidad if total_mortalidad > 0 else ''
-    ws[f'K{fila_total}'] = total_mortalidad if total_mortalidad > 0 else ''
-    
-    # Aplicar formato a fila total
-    for col in ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J', 'K', 'L', 'M']:
-        ws[f'{col}{fila_total}'].border = border_thin
-        ws[f'{col}{fila_total}'].font = header_font
-        ws[f'{col}{fila_total}'].fill = green_fill
-        if col in ['B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J', 'K', 'L']:
-            ws[f'{col}{fila_total}'].alignment = Alignment(horizontal='center')
-    
-    # RESUMEN MENSUAL
-    fila_resumen = fila_total + 3
-    ws[f'A{fila_resumen}'] = 'RESUMEN MENSUAL'
-    ws[f'A{fila_resumen}'].font = Font(name='Arial', size=12, bold=True)
-    ws[f'A{fila_resumen}'].fill = green_fill
-    
-    fila_resumen += 1
-    ws[f'A{fila_resumen}'] = 'PRODUCCIÓN TOTAL:'
-    ws[f'A{fila_resumen}'].font = header_font
-    ws[f'C{fila_resumen}'] = f'{total_general} huevos'
-    ws[f'C{fila_resumen}'].font = normal_font
-    
-    ws[f'F{fila_resumen}'] = '% DE PRODUCCIÓN:'
-    ws[f'F{fila_resumen}'].font = header_font
-    
-    # Calcular porcentaje de producción
-    if lote.numero_aves_actual > 0:
-        porcentaje_produccion = (total_general / (lote.numero_aves_actual * dias_en_mes)) * 100
-        ws[f'H{fila_resumen}'] = f'{porcentaje_produccion:.1f}%'
-        ws[f'H{fila_resumen}'].font = normal_font
-    
-    fila_resumen += 1
-    ws[f'A{fila_resumen}'] = 'CONSUMO TOTAL:'
-    ws[f'A{fila_resumen}'].font = header_font
-    ws[f'C{fila_resumen}'] = f'{total_alimento:.2f} kg'
-    ws[f'C{fila_resumen}'].font = normal_font
-    
-    ws[f'F{fila_resumen}'] = '% DE MORTALIDAD:'
-    ws[f'F{fila_resumen}'].font = header_font
-    
-    # Calcular porcentaje de mortalidad
-    if lote.numero_aves_inicial > 0:
-        porcentaje_mortalidad = (total_mortalidad / lote.numero_aves_inicial) * 100
-        ws[f'H{fila_resumen}'] = f'{porcentaje_mortalidad:.2f}%'
-        ws[f'H{fila_resumen}'].font = normal_font
-    
-    fila_resumen += 1
-    ws[f'A{fila_resumen}'] = 'MORTALIDAD TOTAL:'
-    ws[f'A{fila_resumen}'].font = header_font
-    ws[f'C{fila_resumen}'] = f'{total_mortalidad} aves'
-    ws[f'C{fila_resumen}'].font = normal_font
-    
-    ws[f'F{fila_resumen}'] = 'CONSUMO PROMEDIO:'
-    ws[f'F{fila_resumen}'].font = header_font
-    if dias_en_mes > 0:
-        consumo_promedio = total_alimento / dias_en_mes
-        ws[f'H{fila_resumen}'] = f'{consumo_promedio:.2f} kg/día'
-        ws[f'H{fila_resumen}'].font = normal_font
-    
-    # CONVERSIÓN Y FIRMAS
-    fila_conversion = fila_resumen + 3
-    ws[f'A{fila_conversion}'] = 'CONVERSIÓN:'
-    ws[f'A{fila_conversion}'].font = header_font
-    
-    # Calcular conversión alimenticia
-    if total_general > 0:
-        # Conversión = kg alimento / docenas de huevos
-        docenas = total_general / 12
-        conversion = total_alimento / docenas if docenas > 0 else 0
-        ws[f'C{fila_conversion}'] = f'{conversion:.2f} kg/docena'
-        ws[f'C{fila_conversion}'].font = normal_font
-    
-    # Firmas
-    fila_firmas = fila_conversion + 3
-    ws[f'B{fila_firmas}'] = 'Elaboró: Sergio Buitrago'
-    ws[f'B{fila_firmas}'].font = normal_font
-    
-    ws[f'H{fila_firmas}'] = 'Administrador Unidades Agropecuarias'
-    ws[f'H{fila_firmas}'].font = normal_font
-    
-    # Ajustar ancho de columnas
-    anchos_columnas = {
-        'A': 6, 'B': 8, 'C': 8, 'D': 8, 'E': 8, 'F': 8,
-        'G': 10, 'H': 12, 'I': 8, 'J': 8, 'K': 8, 'L': 10, 'M': 25
-    }
-    
-    for col, ancho in anchos_columnas.items():
-        ws.column_dimensions[col].width = ancho
-    
-    # Ajustar altura de filas
-    ws.row_dimensions[1].height = 25
-    ws.row_dimensions[2].height = 20
-    ws.row_dimensions[4].height = 25
-    ws.row_dimensions[9].height = 20
-    ws.row_dimensions[10].height = 20
+    datos, = datos_reporte_sena([lote], [(mes, año)], nombre_granja, registro_ica, incluir_vacios=True)
     
     # Crear respuesta HTTP
     response = HttpResponse(
+        libro_sena(datos),
         content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
     )
-    
-    nombre_archivo = f'Registro_Postura_SENA_{lote.codigo}_{mes:02d}_{año}.xlsx'
-    response['Content-Disposition'] = f'attachment; filename="{nombre_archivo}"'
-    
-    wb.save(response)
-    return response
\ No newline at end of file
+    response['Content-Disposition'] = f'attachment; filename="{nombre_archivo_sena(datos)}"'
+    return response
+
+
+# Libros mínimos por proceso para que el pool compense su arranque
+LIBROS_POR_PROCESO = 10
+
+_candado_pool = threading.Lock()
+_pool_sena = None
+
+
+def _obtener_pool_sena(procesos):
+    """Pool de procesos compartido por todos los lotes de fin de mes del proceso (se crea una vez)."""
+    global _pool_sena
+    with _candado_pool:
+        if _pool_sena is None:
+            _pool_sena = ProcessPoolExecutor(
+                max_workers=max(procesos, getattr(settings, 'AVES_SENA_PROCESOS', 4)),
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _pool_sena
+
+
+def renderizar_libros_sena(datos, procesos=None):
+    """
+    Bytes .xlsx de cada lote-mes, en el mismo orden. Los libros se
+    reparten entre procesos (spawn: sena.py no necesita Django ni
+    conexiones). Por defecto se usan hasta AVES_SENA_PROCESOS, sin pasar
+    del número de CPU ni de un proceso por LIBROS_POR_PROCESO libros, porque
+    arrancar un proceso cuesta lo que escribir varios libros; con un
+    proceso los libros se escriben aquí. El pool se arranca la primera vez
+    y lo reutilizan los lotes siguientes del mismo proceso.
+    """
+    if procesos is None:
+        procesos = min(getattr(settings, 'AVES_SENA_PROCESOS', 4), os.cpu_count() or 1, len(datos) // LIBROS_POR_PROCESO)
+    procesos = min(procesos, len(datos))
+    if procesos <= 1:
+        return [libro_sena(lote_mes) for lote_mes in datos]
+
+    pool = _obtener_pool_sena(procesos)
+    return list(pool.map(libro_sena, datos, chunksize=max(1, len(datos) // (procesos * 4))))
+
+
+def generar_reportes_sena(lotes, periodos, nombre_granja="Granja Avícola La Salada", registro_ica="051290274",
+                          formato='zip', procesos=None):
+    """
+    Registros SENA de fin de mes de varios lotes y meses en una sola
+    descarga: un ZIP con un Excel por lote-mes (escritos en paralelo) o,
+    con formato='libro', un Excel con una hoja por lote-mes. Un libro no
+    se puede repartir entre procesos, así que sus hojas se escriben aquí.
+    """
+    if not OPENPYXL_AVAILABLE:
+        raise ImportError("openpyxl no está disponible para generar reportes Excel")
+
+    datos = datos_reporte_sena(lotes, periodos, nombre_granja, registro_ica)
+    if not datos:
+        raise ValueError("No hay bitácoras de los lotes seleccionados en los meses indicados")
+
+    meses = [f'{mes:02d}_{año}' for año, mes in sorted({(lote_mes['año'], lote_mes['mes']) for lote_mes in datos})]
+    periodo = meses[0] if len(meses) == 1 else f'{meses[0]}_a_{meses[-1]}'
+
+    archivo = tempfile.TemporaryFile()
+    if formato == 'libro':
+        wb = openpyxl.Workbook()
+        wb.remove(wb.active)
+        titulos = set()
+        for lote_mes in datos:
+            titulo = titulo_hoja_sena(lote_mes)
+            sufijo = 2
+            while titulo in titulos:
+                titulo = f'{titulo_hoja_sena(lote_mes)[:28]}~{sufijo}'
+                sufijo += 1
+            titulos.add(titulo)
+            escribir_hoja_sena(wb.create_sheet(titulo), lote_mes)
+        wb.save(archivo)
+        nombre, tipo = f'Registros_Postura_SENA_{periodo}.xlsx', TIPO_XLSX
+    else:
+        # Los .xlsx ya vienen comprimidos: se guardan sin volver a comprimir
+        with zipfile.ZipFile(archivo, 'w', zipfile.ZIP_STORED) as comprimido:
+            for lote_mes, contenido in zip(datos, renderizar_libros_sena(datos, procesos)):
+                comprimido.writestr(nombre_archivo_sena(lote_mes), contenido)
+        nombre, tipo = f'Registros_Postura_SENA_{periodo}.zip', 'application/zip'
+
+    archivo.seek(0)
+    return FileResponse(archivo, as_attachment=True, filename=nombre, content_type=tipo)
\ No newline at end of file
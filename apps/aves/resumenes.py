@@ -0,0 +1,136 @@
+"""
+Mantenimiento incremental del resumen diario de producción por lote.
+
+Cada bitácora tiene una fila en ResumenProduccionDiaria con los totales
+del día y las aves vivas al inicio del día. Las funciones de este módulo
+se ejecutan dentro de la transacción que guarda o elimina la bitácora.
+
+anotar_aves_inicio_dia calcula el mismo dato directamente sobre un
+queryset de bitácoras (funciones de ventana), para los reportes que
+recorren bitácoras y no el resumen.
+"""
+
+from django.db import transaction
+from django.db.models import F, OuterRef, RowRange, Subquery, Sum, Window
+from django.db.models.functions import Coalesce
+
+from .models import BitacoraDiaria, LoteAves, ResumenProduccionDiaria
+
+
+CAMPOS_PRODUCCION = ['produccion_aaa', 'produccion_aa', 'produccion_a', 'produccion_b', 'produccion_c']
+
+
+def anotar_aves_inicio_dia(bitacoras, desde=None):
+    """
+    Anota `aves_inicio_dia` en un queryset de bitácoras: numero_aves_inicial
+    del lote menos la mortalidad acumulada de los días anteriores, con un
+    SUM(mortalidad) en ventana por lote ordenado por fecha.
+
+    La ventana solo ve las filas del queryset, así que el límite inferior
+    de fechas se pasa en `desde` en lugar de filtrarlo antes: la función
+    filtra fecha >= desde y suma la mortalidad anterior de cada lote.
+    """
+    # Acumulado hasta el día inclusive (Django 4.2 no admite terminar el marco en 1 PRECEDING)
+    mortalidad_previa = Window(
+        Sum('mortalidad'), partition_by=[F('lote_id')], order_by=F('fecha').asc(),
+        frame=RowRange(start=None, end=0),
+    ) - F('mortalidad')
+    if desde:
+        anterior = BitacoraDiaria.objects.filter(
+            lote_id=OuterRef('lote_id'), fecha__lt=desde
+        ).order_by().values('lote_id').annotate(total=Sum('mortalidad')).values('total')
+        mortalidad_previa = mortalidad_previa + Coalesce(Subquery(anterior), 0)
+        bitacoras = bitacoras.filter(fecha__gte=desde)
+    return bitacoras.annotate(aves_inicio_dia=F('lote__numero_aves_inicial') - mortalidad_previa)
+
+
+def _desplazar_aves_posteriores(lote_id, fecha, mortalidad):
+    """Descuenta la mortalidad de un día de las aves iniciales de los días siguientes."""
+    if mortalidad:
+        ResumenProduccionDiaria.objects.filter(
+            lote_id=lote_id, fecha__gt=fecha
+        ).update(aves_inicio_dia=F('aves_inicio_dia') - mortalidad)
+
+
+def _copiar_valores(resumen, bitacora, galpon):
+    """Copia a la fila de resumen los totales de la bitácora."""
+    resumen.lote_id = bitacora.lote_id
+    resumen.fecha = bitacora.fecha
+    resumen.galpon = galpon
+    for campo in CAMPOS_PRODUCCION:
+        setattr(resumen, campo, getattr(bitacora, campo))
+    resumen.produccion_total = bitacora.produccion_total
+    resumen.mortalidad = bitacora.mortalidad
+    resumen.consumo_concentrado = bitacora.consumo_concentrado or 0
+
+
+def sincronizar_resumen_bitacora(bitacora):
+    """Crea o actualiza el resumen de una bitácora recién guardada."""
+    with transaction.atomic():
+        resumen = ResumenProduccionDiaria.objects.select_for_update().filter(bitacora=bitacora).first()
+
+        if resumen and (resumen.lote_id, resumen.fecha) == (bitacora.lote_id, bitacora.fecha):
+            # Mismo día: las aves iniciales no cambian, solo se corrigen los días siguientes
+            diferencia = bitacora.mortalidad - resumen.mortalidad
+        else:
+            if resumen:
+                # La bitácora cambió de lote o fecha: se retira su aporte anterior
+                _desplazar_aves_posteriores(resumen.lote_id, resumen.fecha, -resumen.mortalidad)
+            else:
+                resumen = ResumenProduccionDiaria(bitacora=bitacora)
+
+            mortalidad_previa = ResumenProduccionDiaria.objects.filter(
+                lote_id=bitacora.lote_id, fecha__lt=bitacora.fecha
+            ).exclude(bitacora=bitacora).aggregate(total=Sum('mortalidad'))['total'] or 0
+            resumen.aves_inicio_dia = bitacora.lote.numero_aves_inicial - mortalidad_previa
+            diferencia = bitacora.mortalidad
+
+        _copiar_valores(resumen, bitacora, bitacora.lote.galpon)
+        resumen.save()
+        _desplazar_aves_posteriores(bitacora.lote_id, bitacora.fecha, diferencia)
+
+    return resumen
+
+
+def revertir_resumen_bitacora(bitacora):
+    """
+    Retira el aporte de una bitácora eliminada. La fila de resumen se
+    borra en cascada; aquí solo se corrigen los días siguientes.
+    """
+    _desplazar_aves_posteriores(bitacora.lote_id, bitacora.fecha, -bitacora.mortalidad)
+
+
+def sincronizar_resumenes_lote(lote):
+    """Propaga al resumen los cambios de galpón o de aves iniciales del lote."""
+    resumenes = ResumenProduccionDiaria.objects.filter(lote=lote)
+    resumenes.exclude(galpon=lote.galpon).update(galpon=lote.galpon)
+
+    primero = resumenes.order_by('fecha').values('aves_inicio_dia').first()
+    if primero and primero['aves_inicio_dia'] != lote.numero_aves_inicial:
+        diferencia = lote.numero_aves_inicial - primero['aves_inicio_dia']
+        resumenes.update(aves_inicio_dia=F('aves_inicio_dia') + diferencia)
+
+
+def reconstruir_resumenes_lote(lote_id):
+    """
+    Recalcula desde cero el resumen de un lote a partir de sus bitácoras.
+    Retorna el número de filas generadas.
+    """
+    lote = LoteAves.objects.only('id', 'galpon', 'numero_aves_inicial').get(id=lote_id)
+    bitacoras = BitacoraDiaria.objects.filter(lote_id=lote_id).only(
+        'id', 'lote_id', 'fecha', 'mortalidad', 'consumo_concentrado', *CAMPOS_PRODUCCION
+    ).order_by('fecha')
+
+    resumenes = []
+    aves_vivas = lote.numero_aves_inicial
+    for bitacora in bitacoras:
+        resumen = ResumenProduccionDiaria(bitacora_id=bitacora.id, aves_inicio_dia=aves_vivas)
+        _copiar_valores(resumen, bitacora, lote.galpon)
+        resumenes.append(resumen)
+        aves_vivas -= bitacora.mortalidad
+
+    with transaction.atomic():
+        ResumenProduccionDiaria.objects.filter(lote_id=lote_id).delete()
+        ResumenProduccionDiaria.objects.bulk_create(resumenes, batch_size=500)
+
+    return len(resumenes)
@@ -4,118 +4,187 @@ Señales para el módulo avícola.
 
 from django.db.models.signals import post_save, pre_save, post_delete
 from django.dispatch import receiver
-from django.contrib.auth.models import User
-from .models import BitacoraDiaria, MovimientoHuevos, DetalleMovimientoHuevos, RegistroModificacion
-from .utils import generar_alertas, actualizar_inventario_huevos, actualizar_inventario_por_movimiento
+from apps.core.cache import (
+    invalidar_dominio, DOMINIO_PRODUCCION, DOMINIO_INVENTARIO, DOMINIO_ALERTAS, DOMINIO_LOTES,
+    DOMINIO_AVES_POSTURA
+)
+from .models import (
+    LoteAves, BitacoraDiaria, MovimientoHuevos, DetalleMovimientoHuevos,
+    InventarioHuevos, AlertaSistema, PlanVacunacion
+)
+from .utils import TIPOS_SALIDA, actualizar_inventario_por_movimiento, entradas_bitacora
+from .efectos import encolar_efecto, INVENTARIO, AVES_LOTE, ALERTAS
+from .auditoria import registrar_modificacion
+from .resumenes import sincronizar_resumen_bitacora, revertir_resumen_bitacora, sincronizar_resumenes_lote
 
 
 @receiver(post_save, sender=BitacoraDiaria)
 def procesar_bitacora_diaria(sender, instance, created, **kwargs):
-    """Procesa la bitácora diaria después de guardarla."""
+    """Encola los efectos de la bitácora para cuando se confirme la transacción."""
+    # Mortalidad: solo la diferencia con lo ya descontado, combinada por lote
+    anterior = instance.lote_aplicado_id
+    if anterior is not None and anterior != instance.lote_id:
+        # Cambio de lote: se devuelve al lote anterior lo que se le descontó y
+        # se descuenta la mortalidad completa del nuevo
+        if instance.mortalidad_aplicada:
+            encolar_efecto(AVES_LOTE, anterior, -instance.mortalidad_aplicada)
+        encolar_efecto(ALERTAS, anterior, [instance.fecha.isoformat()])
+        diferencia = instance.mortalidad
+    else:
+        diferencia = instance.mortalidad - instance.mortalidad_aplicada
+    if diferencia:
+        encolar_efecto(AVES_LOTE, instance.lote_id, diferencia)
+    instance.mortalidad_aplicada = instance.mortalidad
+    instance.lote_aplicado_id = instance.lote_id
+
+    # Reglas de alertas del día de la bitácora (también al corregirla)
+    encolar_efecto(ALERTAS, instance.lote_id, [instance.fecha.isoformat()])
+
     if created:
-        # Generar alertas automáticas
-        generar_alertas(instance)
-        
-        # Actualizar inventario de huevos
-        actualizar_inventario_huevos(instance)
+        encolar_efecto(INVENTARIO, None, entradas_bitacora(instance))
+
+
+@receiver(post_save, sender=BitacoraDiaria)
+def actualizar_resumen_produccion(sender, instance, **kwargs):
+    """Mantiene el resumen diario en la misma transacción que la bitácora."""
+    sincronizar_resumen_bitacora(instance)
+
+
+@receiver(post_delete, sender=BitacoraDiaria)
+def revertir_resumen_produccion(sender, instance, **kwargs):
+    """Corrige las aves iniciales de los días siguientes al eliminar una bitácora."""
+    revertir_resumen_bitacora(instance)
+
+
+@receiver(post_save, sender=LoteAves)
+def actualizar_resumenes_lote(sender, instance, created, **kwargs):
+    """Propaga al resumen diario los cambios de galpón o aves iniciales."""
+    if not created:
+        sincronizar_resumenes_lote(instance)
+
+
+@receiver(post_save, sender=BitacoraDiaria)
+@receiver(post_delete, sender=BitacoraDiaria)
+def invalidar_cache_produccion(sender, **kwargs):
+    """Invalida la caché de dashboards que dependen de la producción."""
+    invalidar_dominio(DOMINIO_PRODUCCION)
+
+
+@receiver(post_save, sender=DetalleMovimientoHuevos)
+@receiver(post_delete, sender=DetalleMovimientoHuevos)
+@receiver(post_save, sender=InventarioHuevos)
+@receiver(post_delete, sender=InventarioHuevos)
+def invalidar_cache_inventario(sender, **kwargs):
+    """Invalida la caché de dashboards que dependen del inventario de huevos."""
+    invalidar_dominio(DOMINIO_INVENTARIO)
+
+
+@receiver(post_save, sender=AlertaSistema)
+@receiver(post_delete, sender=AlertaSistema)
+def invalidar_cache_alertas(sender, **kwargs):
+    """Invalida la caché de dashboards que dependen de las alertas."""
+    invalidar_dominio(DOMINIO_ALERTAS)
+
+
+@receiver(post_save, sender=LoteAves)
+@receiver(post_delete, sender=LoteAves)
+@receiver(post_save, sender=PlanVacunacion)
+@receiver(post_delete, sender=PlanVacunacion)
+def invalidar_cache_lotes(sender, **kwargs):
+    """Invalida la caché de dashboards que dependen de lotes y vacunación."""
+    invalidar_dominio(DOMINIO_LOTES)
+
+
+@receiver(post_save, sender=LoteAves)
+def invalidar_total_gallinas_postura(sender, instance, **kwargs):
+    """Invalida el total de gallinas en postura solo si cambiaron aves, estado o actividad."""
+    if instance.cambio_total_postura():
+        invalidar_dominio(DOMINIO_AVES_POSTURA)
+    instance.marcar_total_postura_guardado()
+
+
+@receiver(post_delete, sender=LoteAves)
+def invalidar_total_gallinas_postura_eliminado(sender, instance, **kwargs):
+    """Un lote eliminado deja de contar en el total de gallinas en postura."""
+    invalidar_dominio(DOMINIO_AVES_POSTURA)
 
 
 @receiver(post_save, sender=DetalleMovimientoHuevos)
 def procesar_movimiento_huevos(sender, instance, created, **kwargs):
     """Actualiza el inventario cuando se registra un movimiento de huevos."""
-    if created:
-        # Actualizar inventario restando la cantidad movida
+    if not created:
+        return
+    if instance.movimiento.tipo_movimiento in TIPOS_SALIDA:
+        # Las salidas se descuentan dentro de la transacción: el UPDATE
+        # condicional es la validación de stock y debe poder revertirla
         actualizar_inventario_por_movimiento(instance)
+    else:
+        encolar_efecto(INVENTARIO, None, [entrada_movimiento(
+            instance, fecha_origen=instance.movimiento.fecha.isoformat(),
+            usuario_id=instance.movimiento.usuario_registro_id,
+        )])
 
 
 @receiver(post_delete, sender=DetalleMovimientoHuevos)
 def revertir_movimiento_huevos(sender, instance, **kwargs):
     """Revierte el inventario cuando se elimina un movimiento de huevos."""
-    try:
-        from .models import InventarioHuevos
-        
-        # Obtener el inventario para la categoría
-        inventario = InventarioHuevos.objects.get(categoria=instance.categoria_huevo)
-        
-        # Devolver la cantidad al inventario (sumar lo que se había restado)
-        cantidad_unidades = instance.cantidad_unidades
-        inventario.cantidad_actual += cantidad_unidades
-        inventario.save()
-        
-    except InventarioHuevos.DoesNotExist:
-        # Si no existe el inventario, no hacer nada
-        pass
-    except Exception as e:
-        print(f"Error revirtiendo movimiento: {e}")
-
-
-from django.db.models.signals import pre_save, post_save
-from django.dispatch import receiver
-from django.contrib.auth.models import User
-from .models import RegistroModificacion
-import json
-from datetime import date, datetime
-from decimal import Decimal
-
-class DateTimeEncoder(json.JSONEncoder):
-    """Encoder personalizado para manejar fechas y decimales."""
-    def default(self, obj):
-        if isinstance(obj, (date, datetime)):
-            return obj.isoformat()
-        elif isinstance(obj, Decimal):
-            return float(obj)
-        return super().default(obj)
+    # Devolver la cantidad al inventario (sumar lo que se había restado) al confirmar
+    encolar_efecto(INVENTARIO, None, [entrada_movimiento(
+        instance, observaciones='Reversión por eliminación del movimiento'
+    )])
+
+
+def entrada_movimiento(detalle, **kardex):
+    """Entrada de stock de un detalle de movimiento de huevos."""
+    return dict(
+        categoria=detalle.categoria_huevo,
+        cantidad=detalle.cantidad_unidades,
+        origen='movimiento',
+        referencia_id=detalle.pk,
+        **kardex
+    )
+
+
 
 @receiver(pre_save)
-def registrar_modificaciones(sender, instance, **kwargs):
+def registrar_modificaciones(sender, instance, raw=False, update_fields=None, **kwargs):
     """Registra modificaciones para auditoría."""
     # Solo para modelos del módulo avícola
-    if not sender._meta.app_label == 'aves':
+    if not sender._meta.app_label == 'aves' or raw:
         return
     
-    # Excluir BitacoraDiaria ya que se maneja manualmente en la vista con justificación
-    if sender.__name__ == 'BitacoraDiaria':
+    # Excluir BitacoraDiaria ya que se maneja manualmente en la vista con justificación,
+    # y el resumen diario, que es un dato derivado de la bitácora
+    if sender.__name__ in ('BitacoraDiaria', 'ResumenProduccionDiaria'):
         return
     
     # Solo si el objeto ya existe (es una modificación)
-    if instance.pk:
-        try:
-            objeto_anterior = sender.objects.get(pk=instance.pk)
-            campos_modificados = {}
-            valores_anteriores = {}
-            valores_nuevos = {}
-            
-            for field in instance._meta.fields:
-                field_name = field.name
-                valor_anterior = getattr(objeto_anterior, field_name)
-                valor_nuevo = getattr(instance, field_name)
-                
-                if valor_anterior != valor_nuevo:
-                    campos_modificados[field_name] = True
-                    # Convertir valores a string de forma segura
-                    if isinstance(valor_anterior, (date, datetime)):
-                        valores_anteriores[field_name] = valor_anterior.isoformat()
-                    else:
-                        valores_anteriores[field_name] = str(valor_anterior) if valor_anterior is not None else None
-                    
-                    if isinstance(valor_nuevo, (date, datetime)):
-                        valores_nuevos[field_name] = valor_nuevo.isoformat()
-                    else:
-                        valores_nuevos[field_name] = str(valor_nuevo) if valor_nuevo is not None else None
-            
-            if campos_modificados:
-                # Aquí podrías obtener el usuario actual del request
-                # Por simplicidad, usamos el primer superusuario
-                usuario = User.objects.filter(is_superuser=True).first()
-                
-                RegistroModificacion.objects.create(
-                    usuario=usuario,
-                    modelo=sender.__name__,
-                    objeto_id=instance.pk,
-                    accion='UPDATE',
-                    campos_modificados=campos_modificados,
-                    valores_anteriores=valores_anteriores,
-                    valores_nuevos=valores_nuevos
-                )
-        except sender.DoesNotExist:
-            pass
\ No newline at end of file
+    if not instance.pk or instance._state.adding:
+        return
+    
+    # Cambios contra la instantánea tomada al leer la fila, sin volver a consultarla
+    campos_modificados = getattr(instance, 'campos_modificados', None)
+    cambios = campos_modificados(update_fields) if campos_modificados else None
+    if cambios is None:
+        # Instancia sin instantánea (modelo sin SnapshotModel o construida a mano)
+        objeto_anterior = sender.objects.filter(pk=instance.pk).first()
+        if objeto_anterior is None:
+            return
+        cambios = {}
+        for field in sender._meta.concrete_fields:
+            if update_fields is not None and field.name not in update_fields:
+                continue
+            anterior = getattr(objeto_anterior, field.attname)
+            nuevo = getattr(instance, field.attname)
+            if anterior != nuevo:
+                cambios[field.name] = (anterior, nuevo)
+    
+    if cambios:
+        registrar_modificacion(sender.__name__, instance.pk, cambios)
+
+
+@receiver(post_save)
+def actualizar_instantanea(sender, instance, created, raw=False, **kwargs):
+    """El estado guardado pasa a ser la referencia de la próxima auditoría."""
+    if sender._meta.app_label == 'aves' and not raw and hasattr(instance, 'tomar_instantanea'):
+        instance.tomar_instantanea()
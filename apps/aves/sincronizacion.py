@@ -0,0 +1,202 @@
+"""
+Sincronización por lotes de bitácoras registradas sin conexión.
+
+Cada registro trae una clave de idempotencia generada por la tableta. Las
+claves ya procesadas devuelven su resultado guardado sin volver a aplicar
+nada, de modo que un reintento nunca descuenta dos veces la mortalidad ni
+suma dos veces los huevos. Los registros nuevos se insertan y los que ya
+existen para el mismo lote y fecha se actualizan aplicando solo la
+diferencia. Todo se resuelve con consultas por lote de registros, no por
+registro.
+"""
+
+import hashlib
+import json
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from .importacion import (
+    CAMPOS_ENTEROS, CAMPOS_TEXTO, TAMANO_LOTE_INSERCION, aplicar_efectos, cargar_lotes,
+    construir_bitacora, produccion_por_categoria
+)
+from .models import BitacoraDiaria, InventarioHuevos, SincronizacionBitacora
+
+
+MAX_REGISTROS = 500
+
+CAMPOS_SINCRONIZADOS = CAMPOS_ENTEROS + CAMPOS_TEXTO + ['consumo_concentrado']
+
+
+def _huella(datos):
+    """Huella del contenido de un registro para detectar claves reutilizadas."""
+    return hashlib.sha1(json.dumps(datos, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def _error(clave, mensaje):
+    return {'clave': clave, 'estado': 'error', 'bitacora_id': None, 'errores': [mensaje]}
+
+
+def sincronizar_bitacoras(registros, usuario):
+    """
+    Inserta o actualiza las bitácoras de `registros` (lista de diccionarios
+    con 'clave', 'lote', 'fecha' y los campos de la bitácora). Retorna un
+    resultado por registro, en el mismo orden, con estado creada,
+    actualizada, sin_cambios, duplicada o error.
+    """
+    resultados = [None] * len(registros)
+
+    # 1. Claves de idempotencia ya procesadas (una consulta)
+    claves = {}
+    for indice, datos in enumerate(registros):
+        clave = str(datos.get('clave') or '').strip() if isinstance(datos, dict) else ''
+        if not clave or len(clave) > 64:
+            resultados[indice] = _error(clave, 'clave de idempotencia requerida (máximo 64 caracteres)')
+        elif clave in claves:
+            resultados[indice] = _error(clave, 'la clave se repite en la misma solicitud')
+        else:
+            claves[clave] = indice
+
+    previas = {
+        sincronizacion.clave: sincronizacion
+        for sincronizacion in SincronizacionBitacora.objects.filter(clave__in=claves)
+    }
+    pendientes = []
+    for clave, indice in claves.items():
+        previa = previas.get(clave)
+        if previa is None:
+            pendientes.append(indice)
+        elif previa.huella != _huella(registros[indice]):
+            resultados[indice] = _error(clave, 'la clave ya se usó con un contenido distinto')
+        else:
+            resultados[indice] = {
+                'clave': clave, 'estado': 'duplicada', 'bitacora_id': previa.bitacora_id, 'errores': []
+            }
+
+    # 2. Validación en memoria (lotes en una consulta)
+    lotes = cargar_lotes(registros[indice] for indice in pendientes)
+    candidatas = {}
+    vistos = {}
+    for indice in pendientes:
+        clave = registros[indice]['clave'].strip()
+        try:
+            bitacora = construir_bitacora(registros[indice], lotes, usuario)
+            dia = (bitacora.lote_id, bitacora.fecha)
+            if dia in vistos:
+                raise ValueError(f'repite lote y fecha del registro {vistos[dia] + 1}')
+            vistos[dia] = indice
+            candidatas[indice] = bitacora
+        except ValidationError as e:
+            resultados[indice] = _error(clave, ' '.join(e.messages))
+        except ValueError as e:
+            resultados[indice] = _error(clave, str(e))
+
+    if not candidatas:
+        return resultados
+
+    # 3. Bitácoras existentes para los mismos lotes y fechas (una consulta)
+    existentes = {
+        (bitacora.lote_id, bitacora.fecha): bitacora
+        for bitacora in BitacoraDiaria.objects.select_related('lote').filter(
+            lote_id__in={bitacora.lote_id for bitacora in candidatas.values()},
+            fecha__in={bitacora.fecha for bitacora in candidatas.values()},
+        )
+    }
+
+    nuevas = {}
+    actualizadas = {}
+    sin_cambios = {}
+    deltas = {}
+    for indice, bitacora in candidatas.items():
+        anterior = existentes.get((bitacora.lote_id, bitacora.fecha))
+        if anterior is None:
+            nuevas[indice] = bitacora
+            deltas[indice] = (bitacora.mortalidad, produccion_por_categoria(bitacora))
+            continue
+
+        valores_previos = {campo: getattr(anterior, campo) for campo in CAMPOS_SINCRONIZADOS}
+        produccion_previa = produccion_por_categoria(anterior)
+        construir_bitacora(registros[indice], lotes, usuario, bitacora=anterior)
+        if all(getattr(anterior, campo) == valor for campo, valor in valores_previos.items()):
+            sin_cambios[indice] = anterior
+            continue
+        actualizadas[indice] = anterior
+        deltas[indice] = (
+            anterior.mortalidad - valores_previos['mortalidad'],
+            {
+                categoria: cantidad - produccion_previa[categoria]
+                for categoria, cantidad in produccion_por_categoria(anterior).items()
+            },
+        )
+
+    # 4. Correcciones a la baja que dejarían el inventario en negativo
+    produccion_neta = defaultdict(int)
+    for _, produccion in deltas.values():
+        for categoria, cantidad in produccion.items():
+            produccion_neta[categoria] += cantidad
+    stock = dict(InventarioHuevos.objects.values_list('categoria', 'cantidad_actual'))
+    sin_stock = {
+        categoria for categoria, cantidad in produccion_neta.items()
+        if cantidad < 0 and stock.get(categoria, 0) < -cantidad
+    }
+    if sin_stock:
+        for indice in list(actualizadas):
+            faltantes = sorted(c for c in sin_stock if deltas[indice][1][c] < 0)
+            if faltantes:
+                resultados[indice] = _error(
+                    registros[indice]['clave'].strip(),
+                    f'stock insuficiente para corregir la producción ({", ".join(faltantes)})'
+                )
+                del actualizadas[indice]
+                del deltas[indice]
+
+    mortalidad_por_lote = defaultdict(int)
+    produccion_neta = defaultdict(int)
+    for indice, (mortalidad, produccion) in deltas.items():
+        bitacora = nuevas.get(indice) or actualizadas[indice]
+        mortalidad_por_lote[bitacora.lote_id] += mortalidad
+        for categoria, cantidad in produccion.items():
+            produccion_neta[categoria] += cantidad
+
+    # 5. Escritura en una transacción: bitácoras, efectos y claves
+    with transaction.atomic():
+        if nuevas:
+            BitacoraDiaria.objects.bulk_create(list(nuevas.values()), batch_size=TAMANO_LOTE_INSERCION)
+        if actualizadas:
+            ahora = timezone.now()
+            for bitacora in actualizadas.values():
+                bitacora.updated_at = ahora
+            BitacoraDiaria.objects.bulk_update(
+                list(actualizadas.values()), CAMPOS_SINCRONIZADOS + ['semana_vida', 'updated_at'],
+                batch_size=TAMANO_LOTE_INSERCION
+            )
+        if nuevas or actualizadas:
+            aplicar_efectos(
+                [*nuevas.values(), *actualizadas.values()], usuario, mortalidad_por_lote, produccion_neta,
+                observaciones=f'Sincronización de {len(nuevas) + len(actualizadas)} bitácoras'
+            )
+
+        # bulk_create no devuelve ids en todos los motores: se leen en una consulta
+        ids = dict(
+            ((lote_id, fecha), bitacora_id)
+            for bitacora_id, lote_id, fecha in BitacoraDiaria.objects.filter(
+                lote_id__in={bitacora.lote_id for bitacora in candidatas.values()},
+                fecha__in={bitacora.fecha for bitacora in candidatas.values()},
+            ).values_list('id', 'lote_id', 'fecha')
+        )
+
+        sincronizaciones = []
+        for estado, grupo in (('creada', nuevas), ('actualizada', actualizadas), ('sin_cambios', sin_cambios)):
+            for indice, bitacora in grupo.items():
+                clave = registros[indice]['clave'].strip()
+                bitacora_id = ids.get((bitacora.lote_id, bitacora.fecha))
+                resultados[indice] = {'clave': clave, 'estado': estado, 'bitacora_id': bitacora_id, 'errores': []}
+                sincronizaciones.append(SincronizacionBitacora(
+                    clave=clave, huella=_huella(registros[indice]), bitacora_id=bitacora_id,
+                    estado=estado, usuario=usuario,
+                ))
+        SincronizacionBitacora.objects.bulk_create(sincronizaciones)
+
+    return resultados
@@ -0,0 +1,29 @@
+"""
+Tareas de Celery del módulo avícola.
+
+Solo se importa cuando hay un worker de Celery: AVES_EFECTOS_BACKEND =
+'celery' o las tareas de alertas programadas con Celery beat.
+"""
+
+from celery import shared_task
+
+from .alertas import barrido_alertas, mantenimiento_alertas
+from .efectos import ejecutar_efecto
+
+
+@shared_task(name='aves.ejecutar_efecto')
+def ejecutar_efecto_task(tipo, clave, datos):
+    """Aplica en el worker un grupo de efectos diferidos ya combinado."""
+    ejecutar_efecto(tipo, clave, datos)
+
+
+@shared_task(name='aves.barrido_alertas')
+def barrido_alertas_task(dias=1):
+    """Barrido programado de las reglas de alertas."""
+    return barrido_alertas(dias=dias)
+
+
+@shared_task(name='aves.mantenimiento_alertas')
+def mantenimiento_alertas_task():
+    """Compactación y retención programadas de las alertas."""
+    return mantenimiento_alertas()
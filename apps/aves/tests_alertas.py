@@ -0,0 +1,276 @@
+"""
+Pruebas del motor de reglas de alertas.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.usuarios.models import PerfilUsuario
+from .alertas import (
+    barrido_alertas, compactar_alertas, contar_alertas, depurar_alertas, evaluar_produccion, evaluar_stock,
+    guardar_alertas
+)
+from .models import LoteAves, BitacoraDiaria, InventarioHuevos, AlertaSistema
+
+User = get_user_model()
+
+
+def crear_lote(codigo, estado='postura'):
+    return LoteAves.objects.create(
+        codigo=codigo, galpon='Galpón 1', linea_genetica='lohmann_brown', procedencia='Incubadora',
+        numero_aves_inicial=1000, numero_aves_actual=1000, fecha_llegada=date(2024, 1, 1),
+        peso_total_llegada=Decimal('40.00'), peso_promedio_llegada=Decimal('40.00'), estado=estado,
+    )
+
+
+@override_settings(AVES_EFECTOS_BACKEND='sincrono')
+class MotorAlertasTest(TestCase):
+    """Pruebas de la evaluación por lotes y la deduplicación por tipo, lote y día"""
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(username='admin', password='testpass123')
+        self.hoy = date(2024, 6, 10)
+        self.postura = crear_lote('L001')
+        self.levante = crear_lote('L002', estado='levante')
+
+    def bitacora(self, lote, dias_atras=0, produccion=800, mortalidad=0, consumo='110.00'):
+        return BitacoraDiaria.objects.create(
+            lote=lote, fecha=self.hoy - timedelta(days=dias_atras), recoleccion_1=produccion,
+            produccion_aaa=produccion, mortalidad=mortalidad,
+            consumo_concentrado=Decimal(consumo), usuario_registro=self.user,
+        )
+
+    def test_reglas_por_serie(self):
+        self.bitacora(self.postura, produccion=400, mortalidad=8)
+        self.bitacora(self.postura, dias_atras=1, produccion=800, consumo='200.00')
+        self.bitacora(self.levante, produccion=0)
+
+        alertas = {(a.tipo_alerta, a.lote_id, a.fecha_alerta): a for a in evaluar_produccion()}
+
+        self.assertEqual(set(alertas), {
+            ('mortalidad_alta', self.postura.pk, self.hoy),
+            ('produccion_baja', self.postura.pk, self.hoy),
+            ('consumo_anormal', self.postura.pk, self.hoy - timedelta(days=1)),
+        })
+        # 400 huevos de 1000 aves: gana la regla crítica del porcentaje de postura
+        self.assertEqual(alertas[('produccion_baja', self.postura.pk, self.hoy)].nivel, 'critica')
+
+    def test_una_consulta_para_todos_los_lotes(self):
+        for dias in range(5):
+            self.bitacora(self.postura, dias_atras=dias, mortalidad=6)
+            self.bitacora(self.levante, dias_atras=dias, mortalidad=6)
+
+        with self.assertNumQueries(1):
+            alertas = evaluar_produccion(desde=self.hoy - timedelta(days=4), hasta=self.hoy)
+        self.assertEqual(len(alertas), 10)
+
+    def test_reevaluar_no_duplica_ni_revive(self):
+        """Las alertas ya leídas del mismo día no se vuelven a crear"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bitacora(self.postura, mortalidad=8)
+        AlertaSistema.objects.update(leida=True)
+
+        guardar_alertas(evaluar_produccion())
+        barrido_alertas(dias=3, hoy=self.hoy)
+
+        self.assertEqual(AlertaSistema.objects.filter(tipo_alerta='mortalidad_alta').count(), 1)
+        self.assertFalse(AlertaSistema.objects.filter(lote=self.postura, leida=False).exists())
+
+    def test_corregir_bitacora_evalua_su_dia(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            bitacora = self.bitacora(self.postura)
+        self.assertFalse(AlertaSistema.objects.exists())
+
+        bitacora = BitacoraDiaria.objects.get(pk=bitacora.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            bitacora.mortalidad = 9
+            bitacora.save()
+
+        alerta = AlertaSistema.objects.get()
+        self.assertEqual((alerta.tipo_alerta, alerta.lote, alerta.fecha_alerta), ('mortalidad_alta', self.postura, self.hoy))
+
+    def test_barrido_incluye_stock(self):
+        InventarioHuevos.objects.create(categoria='AAA', cantidad_actual=30, cantidad_minima=100, stock_automatico=False)
+        InventarioHuevos.objects.create(categoria='AA', cantidad_actual=80, cantidad_minima=100, stock_automatico=False)
+        InventarioHuevos.objects.create(categoria='A', cantidad_actual=500, cantidad_minima=100, stock_automatico=False)
+
+        salida = StringIO()
+        call_command('evaluar_alertas', '--dias', '0', stdout=salida)
+        call_command('evaluar_alertas', '--dias', '0', stdout=StringIO())
+
+        self.assertIn('Alertas nuevas: 1', salida.getvalue())
+        alerta = AlertaSistema.objects.get(tipo_alerta='stock_bajo')
+        self.assertIsNone(alerta.lote)
+        self.assertEqual(alerta.nivel, 'critica')
+        self.assertEqual(alerta.mensaje.count(' de 100 '), 2)
+        self.assertNotIn('500', alerta.mensaje)
+
+    def test_alerta_general_una_por_dia(self):
+        """Las alertas sin lote también se deduplican por tipo y día"""
+        InventarioHuevos.objects.create(categoria='AAA', cantidad_actual=30, cantidad_minima=100, stock_automatico=False)
+
+        self.assertEqual(guardar_alertas(evaluar_stock(self.hoy)), 1)
+        self.assertEqual(guardar_alertas(evaluar_stock(self.hoy)), 0)
+
+        alerta = AlertaSistema.objects.get(tipo_alerta='stock_bajo')
+        self.assertEqual((alerta.clave_lote, alerta.fecha_alerta), (0, self.hoy))
+
+    def test_repetidas_en_el_mismo_lote_cuentan_una_vez(self):
+        """Dos candidatas con el mismo tipo, lote y día insertan y cuentan una sola alerta"""
+        InventarioHuevos.objects.create(categoria='AAA', cantidad_actual=30, cantidad_minima=100, stock_automatico=False)
+
+        self.assertEqual(guardar_alertas(evaluar_stock(self.hoy) + evaluar_stock(self.hoy)), 1)
+        self.assertEqual(AlertaSistema.objects.filter(tipo_alerta='stock_bajo').count(), 1)
+
+
+class ContadoresAlertasTest(TestCase):
+    """Pruebas de los contadores cacheados y la lista de alertas"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='operario', password='testpass123')
+        PerfilUsuario.objects.filter(user=self.user).update(rol='admin_aves')
+        self.otro = User.objects.create_user(username='otro', password='testpass123')
+        self.lote = crear_lote('L001')
+        with self.captureOnCommitCallbacks(execute=True):
+            for nivel, leida, activa in [('critica', False, True), ('critica', False, True), ('normal', False, True),
+                                         ('normal', True, True), ('normal', False, False)]:
+                AlertaSistema.objects.create(
+                    tipo_alerta='mortalidad_alta', nivel=nivel, titulo='Alerta', mensaje='Mensaje',
+                    lote=self.lote, leida=leida, is_active=activa,
+                )
+            # Dirigida a otro usuario: no cuenta para self.user
+            AlertaSistema.objects.create(
+                tipo_alerta='stock_bajo', nivel='critica', titulo='Privada', mensaje='Mensaje',
+                usuario_destinatario=self.otro,
+            )
+        self.client.force_login(self.user)
+
+    def test_una_consulta_y_cache_por_usuario(self):
+        with self.assertNumQueries(1):
+            contadores = contar_alertas(self.user)
+        self.assertEqual(contadores, {'criticas': 2, 'normales': 1, 'total_no_leidas': 3, 'total': 4})
+
+        with self.assertNumQueries(0):
+            contar_alertas(self.user)
+        self.assertEqual(contar_alertas(self.otro)['criticas'], 3)
+
+    def test_leer_y_resolver_invalidan(self):
+        contar_alertas(self.user)
+        alerta = AlertaSistema.objects.filter(nivel='critica', lote=self.lote).first()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('aves:marcar_alerta_leida', args=[alerta.pk]))
+        self.assertEqual(contar_alertas(self.user)['criticas'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse('aves:marcar_alertas_masivo'),
+                data={'alertas_ids': 'todas', 'accion': 'resuelta'}, content_type='application/json'
+            )
+        self.assertEqual(contar_alertas(self.user)['total'], 0)
+
+    def test_lista_con_dos_consultas(self):
+        """Con la caché caliente la lista solo pagina: un COUNT y la página"""
+        self.client.get(reverse('aves:alertas_list'))
+
+        with CaptureQueriesContext(connection) as contexto:
+            respuesta = self.client.get(reverse('aves:alertas_list'))
+
+        consultas = [q['sql'] for q in contexto.captured_queries if '"aves_' in q['sql']]
+        self.assertEqual(len(consultas), 2)
+        self.assertEqual(respuesta.context['stats']['total_no_leidas'], 4)
+        self.assertEqual(len(respuesta.context['alertas']), 6)
+
+    def test_lista_incluye_alertas_de_otros_usuarios(self):
+        """La lista y sus estadísticas muestran todas las alertas, también las dirigidas a otros"""
+        respuesta = self.client.get(reverse('aves:alertas_list'))
+
+        self.assertIn('Privada', [alerta.titulo for alerta in respuesta.context['alertas']])
+        self.assertEqual(respuesta.context['stats']['criticas'], 3)
+        # La insignia del usuario solo cuenta las generales y las suyas
+        self.assertEqual(contar_alertas(self.user)['criticas'], 2)
+
+
+class MantenimientoAlertasTest(TestCase):
+    """Pruebas de la compactación y la retención de alertas"""
+
+    def setUp(self):
+        self.lote = crear_lote('L001')
+        self.inicio = timezone.localdate() - timedelta(days=30)
+
+    def alerta(self, dias, tipo='mortalidad_alta', nivel='critica', leida=True):
+        alerta = AlertaSistema.objects.create(
+            tipo_alerta=tipo, nivel=nivel, titulo='Alerta', mensaje='Mensaje', lote=self.lote,
+            leida=leida, fecha_alerta=self.inicio + timedelta(days=dias),
+        )
+        AlertaSistema.objects.filter(pk=alerta.pk).update(
+            fecha_generacion=timezone.now() - timedelta(days=30 - dias)
+        )
+        return alerta
+
+    def test_compacta_rachas_consecutivas(self):
+        primera = self.alerta(0)
+        for dias in (1, 2, 3):
+            self.alerta(dias)
+        separada = self.alerta(5)           # Hueco de un día: nueva racha
+        otro_nivel = self.alerta(6, nivel='normal')
+        pendiente = self.alerta(7, leida=False)
+
+        self.assertEqual(compactar_alertas(timezone.localdate()), 3)
+
+        primera.refresh_from_db()
+        self.assertEqual(primera.ocurrencias, 4)
+        self.assertEqual((primera.ultima_vez - primera.primera_vez).days, 3)
+        self.assertEqual(
+            set(AlertaSistema.objects.values_list('pk', flat=True)),
+            {primera.pk, separada.pk, otro_nivel.pk, pendiente.pk}
+        )
+
+        # Una racha ya compactada sigue creciendo en la siguiente ejecución
+        self.alerta(4)
+        compactar_alertas(timezone.localdate())
+        primera.refresh_from_db()
+        self.assertEqual(primera.ocurrencias, 6)
+
+    def test_reevaluar_dias_compactados_no_recrea(self):
+        """La alerta compactada sigue deduplicando los días de su racha"""
+        for dias in range(4):
+            self.alerta(dias)
+        compactar_alertas(timezone.localdate())
+        self.assertEqual(AlertaSistema.objects.count(), 1)
+
+        candidatas = [
+            AlertaSistema(
+                tipo_alerta='mortalidad_alta', nivel='critica', titulo='Alerta', mensaje='Mensaje',
+                lote=self.lote, fecha_alerta=self.inicio + timedelta(days=dias),
+            )
+            for dias in range(5)
+        ]
+        # Solo el día siguiente a la racha es nuevo
+        self.assertEqual(guardar_alertas(candidatas), 1)
+        self.assertEqual(
+            AlertaSistema.objects.order_by('fecha_alerta').last().fecha_alerta, self.inicio + timedelta(days=4)
+        )
+
+    def test_retencion_por_lotes(self):
+        for dias in range(4):
+            self.alerta(dias * 2)
+        self.alerta(1, leida=False)
+        reciente = self.alerta(29)
+
+        salida = StringIO()
+        call_command('depurar_alertas', '--compactar', '0', '--dias', '10', '--lote', '2', stdout=salida)
+
+        self.assertIn('Alertas eliminadas: 4', salida.getvalue())
+        self.assertEqual(AlertaSistema.objects.filter(leida=True).get(), reciente)
+        self.assertEqual(depurar_alertas(timezone.now(), tamano_lote=2), 1)
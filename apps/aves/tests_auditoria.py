@@ -0,0 +1,193 @@
+"""
+Pruebas de la auditoría por instantáneas del módulo avícola.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.core.middleware import UsuarioActualMiddleware, obtener_usuario_actual, usuario_actual
+from .auditoria import archivar_registros, historial_modificaciones, vaciar_al_terminar_peticion
+from .models import TipoConcentrado, RegistroModificacion, RegistroModificacionArchivado
+
+User = get_user_model()
+
+
+class AuditoriaInstantaneaTest(TestCase):
+    """Pruebas de registrar_modificaciones con instantáneas y usuario actual"""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin', password='testpass123')
+        self.operario = User.objects.create_user(username='operario', password='testpass123')
+        TipoConcentrado.objects.create(
+            nombre='Postura', proteina_porcentaje=Decimal('16.50'), precio_por_kg=Decimal('2500.00')
+        )
+        self.concentrado = TipoConcentrado.objects.get()
+
+    def test_guardar_no_consulta_fila_ni_usuario(self):
+        """La auditoría no agrega consultas al guardar; el registro se escribe al confirmar"""
+        self.concentrado.precio_por_kg = Decimal('2600.00')
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            with usuario_actual(self.operario):
+                with CaptureQueriesContext(connection) as contexto:
+                    self.concentrado.save()
+
+        self.assertEqual(len(contexto.captured_queries), 1)
+        self.assertTrue(contexto.captured_queries[0]['sql'].startswith('UPDATE'))
+        self.assertFalse(RegistroModificacion.objects.exists())
+
+        for callback in callbacks:
+            callback()
+
+        registro = RegistroModificacion.objects.get()
+        self.assertEqual(registro.usuario, self.operario)
+        self.assertEqual(registro.campos_modificados, {'precio_por_kg': True, 'updated_at': True})
+        self.assertEqual(registro.valores_anteriores['precio_por_kg'], '2500.00')
+        self.assertEqual(registro.valores_nuevos['precio_por_kg'], '2600.00')
+
+    def test_registros_de_la_transaccion_en_un_insert(self):
+        """Varios guardados en una transacción se escriben con un solo INSERT"""
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                for precio in ('2600.00', '2700.00', '2800.00'):
+                    self.concentrado.precio_por_kg = Decimal(precio)
+                    self.concentrado.save(update_fields=['precio_por_kg'])
+
+        self.assertEqual(
+            list(RegistroModificacion.objects.order_by('id').values_list('valores_nuevos', flat=True)),
+            [{'precio_por_kg': '2600.00'}, {'precio_por_kg': '2700.00'}, {'precio_por_kg': '2800.00'}]
+        )
+        # Sin usuario en el contexto se atribuye al primer superusuario
+        self.assertEqual(set(RegistroModificacion.objects.values_list('usuario', flat=True)), {self.admin.pk})
+
+    def test_un_solo_insert_al_confirmar(self):
+        """Los registros de varias modificaciones se escriben juntos al confirmar"""
+        with usuario_actual(self.operario):
+            with CaptureQueriesContext(connection) as contexto:
+                with self.captureOnCommitCallbacks(execute=True):
+                    with transaction.atomic():
+                        self.concentrado.nombre = 'Postura fase 2'
+                        self.concentrado.save()
+                        self.concentrado.descripcion = 'Nueva fórmula'
+                        self.concentrado.save()
+
+        inserciones = [q for q in contexto.captured_queries if 'INSERT INTO "aves_registromodificacion"' in q['sql']]
+        self.assertEqual(len(inserciones), 1)
+        self.assertEqual(RegistroModificacion.objects.filter(usuario=self.operario).count(), 2)
+
+    def test_savepoint_revertido_descarta_registro(self):
+        """Un cambio revertido no deja registro de auditoría"""
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.concentrado.nombre = 'Cambio revertido'
+                    self.concentrado.save()
+                    raise RuntimeError('fallo')
+            except RuntimeError:
+                pass
+
+        self.assertFalse(RegistroModificacion.objects.exists())
+
+    def test_savepoint_revertido_al_final_no_pierde_los_anteriores(self):
+        """Si el último cambio se revierte, los confirmados se escriben al terminar la petición"""
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.concentrado.nombre = 'Cambio confirmado'
+                self.concentrado.save()
+                try:
+                    with transaction.atomic():
+                        self.concentrado.descripcion = 'Cambio revertido'
+                        self.concentrado.save()
+                        raise RuntimeError('fallo')
+                except RuntimeError:
+                    pass
+        vaciar_al_terminar_peticion()
+
+        registro = RegistroModificacion.objects.get()
+        self.assertEqual(registro.valores_nuevos['nombre'], 'Cambio confirmado')
+        self.assertNotIn('descripcion', registro.valores_nuevos)
+
+    def test_sin_cambios_no_registra(self):
+        """Guardar sin cambios no genera registro"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.concentrado.save(update_fields=['nombre'])
+
+        self.assertFalse(RegistroModificacion.objects.exists())
+
+    def test_middleware_expone_usuario(self):
+        """El middleware fija el usuario de la petición solo durante la petición"""
+        request = RequestFactory().get('/')
+        request.user = self.operario
+        vistos = []
+
+        def vista(req):
+            vistos.append(obtener_usuario_actual())
+            return HttpResponse()
+
+        UsuarioActualMiddleware(vista)(request)
+
+        self.assertEqual(vistos, [self.operario])
+        self.assertIsNone(obtener_usuario_actual())
+
+
+class ArchivoAuditoriaTest(TestCase):
+    """Pruebas del archivo comprimido de auditoría y el historial combinado"""
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(username='admin', password='testpass123')
+        self.ahora = timezone.now()
+        for dias, nuevo in ((800, '10'), (500, '20'), (5, '30')):
+            registro = RegistroModificacion.objects.create(
+                usuario=self.user, modelo='BitacoraDiaria', objeto_id=7, accion='UPDATE',
+                campos_modificados=['mortalidad'], valores_anteriores={'mortalidad': '0'},
+                valores_nuevos={'mortalidad': nuevo}, justificacion=f'Corrección {nuevo}',
+            )
+            RegistroModificacion.objects.filter(pk=registro.pk).update(
+                fecha_modificacion=self.ahora - timedelta(days=dias)
+            )
+        RegistroModificacion.objects.create(
+            usuario=self.user, modelo='BitacoraDiaria', objeto_id=8, accion='UPDATE',
+            campos_modificados={'observaciones': True}, valores_anteriores={'observaciones': ''},
+            valores_nuevos={'observaciones': 'Otro objeto'},
+        )
+
+    def test_archivar_conserva_diferencias(self):
+        """Los registros antiguos pasan al archivo con sus diferencias comprimidas"""
+        archivados = archivar_registros(self.ahora - timedelta(days=365), tamano_lote=1)
+
+        self.assertEqual(archivados, 2)
+        self.assertEqual(RegistroModificacion.objects.count(), 2)
+        archivado = RegistroModificacionArchivado.objects.order_by('fecha_modificacion').first()
+        self.assertEqual(archivado.campos_modificados, {'mortalidad': True})
+        self.assertEqual(archivado.valores_anteriores, {'mortalidad': '0'})
+        self.assertEqual(archivado.valores_nuevos, {'mortalidad': '10'})
+        self.assertEqual(archivado.justificacion, 'Corrección 10')
+
+    def test_historial_combina_ambas_tablas(self):
+        """El historial devuelve recientes y archivados en orden, con una consulta por tabla"""
+        archivar_registros(self.ahora - timedelta(days=365))
+
+        with self.assertNumQueries(2):
+            historial = historial_modificaciones('BitacoraDiaria', 7)
+            nombres = [registro.usuario.username for registro in historial]
+
+        self.assertEqual([registro.valores_nuevos['mortalidad'] for registro in historial], ['30', '20', '10'])
+        self.assertEqual(nombres, ['admin'] * 3)
+        self.assertEqual(len(historial_modificaciones('BitacoraDiaria', 7, limite=2)), 2)
+
+    def test_comando_archivar(self):
+        salida = StringIO()
+        call_command('archivar_auditoria', '--meses', '12', '--dry-run', stdout=salida)
+        self.assertIn('se archivarían 2', salida.getvalue())
+        self.assertFalse(RegistroModificacionArchivado.objects.exists())
+
+        call_command('archivar_auditoria', '--meses', '12', stdout=StringIO())
+        self.assertEqual(RegistroModificacionArchivado.objects.count(), 2)
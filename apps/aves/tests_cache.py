@@ -0,0 +1,183 @@
+"""
+Pruebas de la caché versionada de dashboards.
+"""
+import os
+import unittest
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.core import cache as cache_versionada
+from .models import LoteAves, BitacoraDiaria, InventarioHuevos, AlertaSistema
+
+User = get_user_model()
+
+
+class CacheVersionadaTest(TestCase):
+    """Pruebas para obtener_o_calcular e incrementar_version"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_acierto_cuesta_una_lectura(self):
+        """Un acierto hace una sola lectura a la caché y no recalcula"""
+        calcular = mock.Mock(return_value={'total': 1})
+        cache_versionada.obtener_o_calcular('vista', ['produccion'], ['a'], calcular)
+
+        with mock.patch.object(cache_versionada, 'cache', wraps=cache) as cache_espia:
+            datos = cache_versionada.obtener_o_calcular('vista', ['produccion'], ['a'], calcular)
+
+        self.assertEqual(datos, {'total': 1})
+        self.assertEqual(calcular.call_count, 1)
+        self.assertEqual(cache_espia.method_calls, [mock.call.get_many(mock.ANY)])
+
+    def test_version_invalida_entrada(self):
+        """Incrementar la versión de un dominio fuerza el recálculo"""
+        calcular = mock.Mock(side_effect=[1, 2])
+        self.assertEqual(cache_versionada.obtener_o_calcular('vista', ['produccion'], [], calcular), 1)
+
+        cache_versionada.incrementar_version('produccion')
+
+        self.assertEqual(cache_versionada.obtener_o_calcular('vista', ['produccion'], [], calcular), 2)
+
+    def test_dominio_ajeno_no_invalida(self):
+        """Una escritura en otro dominio no invalida la entrada"""
+        calcular = mock.Mock(side_effect=[1, 2])
+        cache_versionada.obtener_o_calcular('vista', ['produccion'], [], calcular)
+
+        cache_versionada.incrementar_version('pedidos')
+
+        self.assertEqual(cache_versionada.obtener_o_calcular('vista', ['produccion'], [], calcular), 1)
+
+    def test_version_desalojada(self):
+        """Si el contador se pierde la entrada no se reutiliza"""
+        calcular = mock.Mock(side_effect=[1, 2])
+        cache_versionada.obtener_o_calcular('vista', ['produccion'], [], calcular)
+
+        cache.delete(cache_versionada.clave_version('produccion'))
+
+        self.assertEqual(cache_versionada.obtener_o_calcular('vista', ['produccion'], [], calcular), 2)
+
+    def test_escritura_durante_el_calculo(self):
+        """Un valor calculado mientras ocurre una escritura no se sirve después"""
+        def calcular_con_escritura():
+            cache_versionada.incrementar_version('produccion')
+            return 'viejo'
+
+        cache_versionada.obtener_o_calcular('vista', ['produccion'], [], calcular_con_escritura)
+
+        self.assertEqual(
+            cache_versionada.obtener_o_calcular('vista', ['produccion'], [], lambda: 'nuevo'), 'nuevo'
+        )
+
+    def test_claves_por_parametros(self):
+        """Filtros y rol distintos generan entradas distintas"""
+        self.assertNotEqual(
+            cache_versionada.clave_entrada('vista', ['G1', None, 'solo_vista']),
+            cache_versionada.clave_entrada('vista', ['G1', None, 'admin_aves'])
+        )
+
+
+@override_settings(AVES_EFECTOS_BACKEND='sincrono')
+class DashboardCacheTest(TestCase):
+    """Pruebas de invalidación de la caché desde las escrituras"""
+
+    def setUp(self):
+        cache.clear()
+        self.hoy = timezone.now().date()
+        self.user = User.objects.create_superuser(username='admin', password='testpass123')
+        self.client.login(username='admin', password='testpass123')
+        for categoria in ['AAA', 'AA', 'A', 'B', 'C']:
+            InventarioHuevos.objects.create(categoria=categoria, cantidad_actual=0, stock_automatico=False)
+        self.lote = LoteAves.objects.create(
+            codigo='L001',
+            galpon='Galpón 1',
+            linea_genetica='lohmann_brown',
+            procedencia='Incubadora',
+            numero_aves_inicial=1000,
+            numero_aves_actual=1000,
+            fecha_llegada=date(2024, 1, 1),
+            peso_total_llegada=Decimal('40.00'),
+            peso_promedio_llegada=Decimal('40.00'),
+            estado='postura',
+        )
+
+    def contexto_dashboard(self):
+        return self.client.get(reverse('aves:dashboard')).context
+
+    def test_bitacora_invalida_dashboard(self):
+        """Tras guardar una bitácora el dashboard no sirve la entrada anterior"""
+        self.assertEqual(self.contexto_dashboard()['produccion_hoy'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            BitacoraDiaria.objects.create(
+                lote=self.lote, fecha=self.hoy, recoleccion_1=700, produccion_aaa=700,
+                usuario_registro=self.user
+            )
+
+        self.assertEqual(self.contexto_dashboard()['produccion_hoy'], 700)
+
+    def test_eliminar_bitacora_invalida_dashboard(self):
+        """Eliminar una bitácora también invalida la entrada"""
+        with self.captureOnCommitCallbacks(execute=True):
+            bitacora = BitacoraDiaria.objects.create(
+                lote=self.lote, fecha=self.hoy, recoleccion_1=700, produccion_aaa=700,
+                usuario_registro=self.user
+            )
+        self.assertEqual(self.contexto_dashboard()['produccion_hoy'], 700)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            bitacora.delete()
+
+        self.assertEqual(self.contexto_dashboard()['produccion_hoy'], 0)
+
+    def test_alertas_masivas_invalidan_dashboard(self):
+        """Marcar alertas con update() invalida la caché explícitamente"""
+        with self.captureOnCommitCallbacks(execute=True):
+            AlertaSistema.objects.create(
+                tipo_alerta='stock_bajo', nivel='normal', titulo='Stock', mensaje='Stock bajo'
+            )
+        self.assertEqual(self.contexto_dashboard()['alertas_pendientes'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse('aves:marcar_alertas_masivo'),
+                data={'alertas_ids': 'todas', 'accion': 'leida'},
+                content_type='application/json'
+            )
+
+        self.assertEqual(self.contexto_dashboard()['alertas_pendientes'], 0)
+
+    def test_api_datos_dashboard(self):
+        """La API del dashboard de reportes también se invalida con la bitácora"""
+        url = reverse('aves:api_datos_dashboard')
+        self.assertEqual(self.client.get(url).json()['huevos_hoy'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            BitacoraDiaria.objects.create(
+                lote=self.lote, fecha=self.hoy, recoleccion_1=300, produccion_aa=300,
+                usuario_registro=self.user
+            )
+
+        self.assertEqual(self.client.get(url).json()['huevos_hoy'], 300)
+
+
+@unittest.skipUnless(os.environ.get('REDIS_URL'), 'Requiere REDIS_URL para probar con Redis')
+class CacheVersionadaRedisTest(CacheVersionadaTest):
+    """Las mismas pruebas de la caché versionada sobre el backend de Redis"""
+
+    def run(self, result=None):
+        caches = {
+            'default': {
+                'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                'LOCATION': os.environ.get('REDIS_URL'),
+            }
+        }
+        with override_settings(CACHES=caches):
+            return super().run(result)
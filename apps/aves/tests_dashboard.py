@@ -0,0 +1,124 @@
+"""
+Pruebas del dashboard avícola: resultados y número de consultas.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .dashboard import DashboardAvicola
+from .models import LoteAves, BitacoraDiaria, InventarioHuevos
+from .resumenes import reconstruir_resumenes_lote
+
+User = get_user_model()
+
+
+class DashboardAvicolaTest(TestCase):
+    """Pruebas para la capa de datos del dashboard avícola"""
+
+    def setUp(self):
+        self.hoy = timezone.now().date()
+        self.user = User.objects.create_user(username='dashboard', password='testpass123')
+        for categoria in ['AAA', 'AA', 'A', 'B', 'C']:
+            InventarioHuevos.objects.create(categoria=categoria, cantidad_actual=0, stock_automatico=False)
+
+    def crear_lotes(self, cantidad_galpones, lotes_por_galpon, dias, inicio=0):
+        """Crea lotes de postura y levante con bitácoras en los últimos días."""
+        bitacoras = []
+        lotes = []
+        for g in range(cantidad_galpones):
+            for n in range(lotes_por_galpon):
+                lote = LoteAves.objects.create(
+                    codigo=f'L-{inicio}-{g}-{n}',
+                    galpon=f'Galpón {inicio}-{g}',
+                    linea_genetica='lohmann_brown',
+                    procedencia='Incubadora',
+                    numero_aves_inicial=1000,
+                    numero_aves_actual=1000,
+                    fecha_llegada=date(2024, 1, 1),
+                    peso_total_llegada=Decimal('40.00'),
+                    peso_promedio_llegada=Decimal('40.00'),
+                    estado='postura' if n % 2 == 0 else 'levante',
+                )
+                lotes.append(lote)
+                for d in range(dias):
+                    bitacoras.append(BitacoraDiaria(
+                        lote=lote,
+                        fecha=self.hoy - timedelta(days=d),
+                        produccion_aaa=300, produccion_aa=200, produccion_a=100,
+                        produccion_b=50, produccion_c=50,
+                        mortalidad=1,
+                        consumo_concentrado=Decimal('110.00'),
+                        usuario_registro=self.user,
+                    ))
+        BitacoraDiaria.objects.bulk_create(bitacoras)
+        for lote in lotes:
+            reconstruir_resumenes_lote(lote.id)
+
+    def test_indicadores_agrupados(self):
+        """Los totales agrupados coinciden con los registros creados"""
+        self.crear_lotes(cantidad_galpones=2, lotes_por_galpon=2, dias=10)
+        contexto = DashboardAvicola(hoy=self.hoy).obtener_contexto()
+
+        self.assertEqual(contexto['total_lotes'], 4)
+        self.assertEqual(contexto['aves_ponedoras'], 2000)
+        self.assertEqual(contexto['produccion_hoy'], 1400)
+        self.assertEqual(contexto['produccion_7d'], 1400 * 8)
+        self.assertEqual(contexto['produccion_30d'], 1400 * 10)
+        self.assertEqual(contexto['mortalidad_hoy'], 4)
+        self.assertEqual(contexto['mortalidad_30d'], 40)
+        self.assertEqual(contexto['consumo_total_hoy'], Decimal('220.0'))
+        self.assertEqual(contexto['porcentaje_postura_hoy'], 70.0)
+        self.assertEqual(len(contexto['evolucion_produccion']), 30)
+        self.assertEqual(contexto['evolucion_produccion'][-1]['produccion'], 1400)
+        self.assertEqual(contexto['evolucion_mortalidad'][-1]['mortalidad'], 4)
+        self.assertEqual(len(contexto['comparacion_galpones']), 2)
+        self.assertEqual(contexto['comparacion_galpones'][0]['produccion_30d'], 14000)
+        self.assertEqual(contexto['comparacion_galpones'][0]['mortalidad_30d'], 20)
+        self.assertEqual(len(contexto['top_lotes']), 4)
+        self.assertEqual(contexto['top_lotes'][0]['produccion_30d'], 7000)
+
+    def test_filtro_por_galpon(self):
+        """El filtro de galpón limita todas las series"""
+        self.crear_lotes(cantidad_galpones=2, lotes_por_galpon=2, dias=3)
+        contexto = DashboardAvicola(galpon_filtro='Galpón 0-1', hoy=self.hoy).obtener_contexto()
+
+        self.assertEqual(contexto['total_lotes'], 2)
+        self.assertEqual(contexto['galpones_disponibles'], ['Galpón 0-1'])
+        self.assertEqual(contexto['produccion_hoy'], 700)
+        self.assertEqual(contexto['mortalidad_hoy'], 2)
+
+    def test_consultas_constantes_en_contexto(self):
+        """El contexto se calcula con un número fijo de consultas"""
+        self.crear_lotes(cantidad_galpones=1, lotes_por_galpon=1, dias=1)
+        with self.assertNumQueries(6):
+            DashboardAvicola(hoy=self.hoy).obtener_contexto()
+
+        self.crear_lotes(cantidad_galpones=5, lotes_por_galpon=4, dias=30, inicio=1)
+        with self.assertNumQueries(6):
+            DashboardAvicola(hoy=self.hoy).obtener_contexto()
+
+    def test_consultas_constantes_en_vista(self):
+        """La página completa no crece en consultas con días, galpones o lotes"""
+        self.client.login(username='dashboard', password='testpass123')
+        url = reverse('aves:dashboard')
+        cache.clear()
+
+        self.crear_lotes(cantidad_galpones=1, lotes_por_galpon=1, dias=1)
+        with CaptureQueriesContext(connection) as pocos_datos:
+            respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+
+        self.crear_lotes(cantidad_galpones=6, lotes_por_galpon=5, dias=30, inicio=1)
+        cache.clear()
+        with CaptureQueriesContext(connection) as muchos_datos:
+            respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+
+        self.assertEqual(len(pocos_datos), len(muchos_datos))
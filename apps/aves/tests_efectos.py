@@ -0,0 +1,158 @@
+"""
+Pruebas de los efectos diferidos de bitácoras y movimientos.
+"""
+import threading
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from . import efectos
+from .kardex import verificar_inventario
+from .models import LoteAves, BitacoraDiaria, InventarioHuevos, KardexHuevos, AlertaSistema
+
+User = get_user_model()
+
+
+def crear_lote():
+    return LoteAves.objects.create(
+        codigo='L001',
+        galpon='Galpón 1',
+        linea_genetica='lohmann_brown',
+        procedencia='Incubadora',
+        numero_aves_inicial=1000,
+        numero_aves_actual=1000,
+        fecha_llegada=date(2024, 1, 1),
+        peso_total_llegada=Decimal('40.00'),
+        peso_promedio_llegada=Decimal('40.00'),
+        estado='postura',
+    )
+
+
+@override_settings(AVES_EFECTOS_BACKEND='sincrono')
+class EfectosBitacoraTest(TestCase):
+    """Pruebas de los efectos encolados al guardar una bitácora"""
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(username='admin', password='testpass123')
+        self.lote = crear_lote()
+
+    def crear_bitacora(self, mortalidad=5, produccion_aaa=50):
+        return BitacoraDiaria.objects.create(
+            lote=self.lote, fecha=date(2024, 6, 1), recoleccion_1=600,
+            produccion_aaa=produccion_aaa, mortalidad=mortalidad, usuario_registro=self.user
+        )
+
+    def test_efectos_se_aplican_al_confirmar(self):
+        """Guardar la bitácora no toca lote ni inventario hasta confirmar"""
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.crear_bitacora(mortalidad=6)
+
+        self.assertEqual(LoteAves.objects.get(pk=self.lote.pk).numero_aves_actual, 1000)
+        self.assertFalse(KardexHuevos.objects.exists())
+
+        for callback in callbacks:
+            callback()
+
+        self.assertEqual(LoteAves.objects.get(pk=self.lote.pk).numero_aves_actual, 994)
+        self.assertEqual(InventarioHuevos.objects.get(categoria='AAA').cantidad_actual, 50)
+        self.assertEqual(
+            set(AlertaSistema.objects.values_list('tipo_alerta', flat=True)),
+            {'produccion_baja', 'mortalidad_alta'}
+        )
+        self.assertEqual(verificar_inventario(), {})
+
+    def test_editar_descuenta_solo_la_diferencia(self):
+        """Editar la mortalidad ajusta el lote por diferencia y no la descuenta dos veces"""
+        with self.captureOnCommitCallbacks(execute=True):
+            bitacora = self.crear_bitacora(mortalidad=5)
+        bitacora = BitacoraDiaria.objects.get(pk=bitacora.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            bitacora.mortalidad = 3
+            bitacora.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            bitacora.observaciones = 'Sin cambios en mortalidad'
+            bitacora.save()
+
+        self.assertEqual(LoteAves.objects.get(pk=self.lote.pk).numero_aves_actual, 997)
+
+    def test_cambiar_de_lote_devuelve_la_mortalidad_al_anterior(self):
+        """Mover la bitácora a otro lote devuelve sus aves al anterior y descuenta todo del nuevo"""
+        otro = LoteAves.objects.create(
+            codigo='L002', galpon='Galpón 2', linea_genetica='lohmann_brown',
+            procedencia='Incubadora', numero_aves_inicial=800, numero_aves_actual=800,
+            fecha_llegada=date(2024, 1, 1), peso_total_llegada=Decimal('32.00'),
+            peso_promedio_llegada=Decimal('40.00'), estado='postura',
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            bitacora = self.crear_bitacora(mortalidad=5)
+        bitacora = BitacoraDiaria.objects.get(pk=bitacora.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            bitacora.lote = otro
+            bitacora.mortalidad = 7
+            bitacora.save()
+
+        self.assertEqual(LoteAves.objects.get(pk=self.lote.pk).numero_aves_actual, 1000)
+        self.assertEqual(LoteAves.objects.get(pk=otro.pk).numero_aves_actual, 793)
+        self.assertEqual(InventarioHuevos.objects.get(categoria='AAA').cantidad_actual, 50)
+
+    def test_transaccion_revertida_descarta_efectos(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.crear_bitacora()
+                    raise RuntimeError('fallo de la vista')
+            except RuntimeError:
+                pass
+
+        self.assertEqual(LoteAves.objects.get(pk=self.lote.pk).numero_aves_actual, 1000)
+        self.assertFalse(KardexHuevos.objects.exists())
+
+    def test_errores_se_registran(self):
+        """Un efecto que falla se registra en el log sin propagar la excepción"""
+        with self.assertLogs('apps.aves.efectos', level='ERROR'):
+            efectos.ejecutar_efecto('desconocido', None, [])
+
+
+@override_settings(AVES_EFECTOS_BACKEND='hilos', AVES_EFECTOS_HILOS=1)
+class EfectosCombinadosTest(TransactionTestCase):
+    """Pruebas de la cola que combina eventos por lote y categoría"""
+
+    def setUp(self):
+        efectos.esperar_efectos()
+        self.user = User.objects.create_superuser(username='admin', password='testpass123')
+        self.lote = crear_lote()
+
+    def tearDown(self):
+        efectos.esperar_efectos()
+
+    def test_eventos_del_mismo_lote_se_combinan(self):
+        """Cinco bitácoras confirmadas mientras el pool está ocupado se aplican en un solo grupo"""
+        liberar = threading.Event()
+        efectos._obtener_pool().submit(liberar.wait, 10)
+
+        with transaction.atomic():
+            for dia in range(5):
+                BitacoraDiaria.objects.create(
+                    lote=self.lote, fecha=date(2024, 6, 1) + timedelta(days=dia), recoleccion_1=600,
+                    produccion_aaa=40, produccion_b=10, mortalidad=2, usuario_registro=self.user
+                )
+
+        self.assertEqual(efectos._pendientes[(efectos.AVES_LOTE, self.lote.pk)], 10)
+        self.assertEqual(len(efectos._pendientes[(efectos.INVENTARIO, None)]), 10)
+        self.assertEqual(len(efectos._pendientes[(efectos.ALERTAS, self.lote.pk)]), 5)
+
+        liberar.set()
+        efectos.esperar_efectos()
+
+        self.assertEqual(efectos._pendientes, {})
+        self.assertEqual(LoteAves.objects.get(pk=self.lote.pk).numero_aves_actual, 990)
+        self.assertEqual(InventarioHuevos.objects.get(categoria='AAA').cantidad_actual, 200)
+        self.assertEqual(KardexHuevos.objects.filter(origen='bitacora').count(), 10)
+        # Una alerta por día: cinco días con baja producción
+        self.assertEqual(AlertaSistema.objects.filter(tipo_alerta='produccion_baja').count(), 5)
+        self.assertEqual(verificar_inventario(), {})
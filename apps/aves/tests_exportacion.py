@@ -0,0 +1,276 @@
+"""
+Pruebas de las exportaciones CSV en streaming.
+"""
+import csv
+import gzip
+import io
+import shutil
+import tempfile
+import zipfile
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.http import StreamingHttpResponse
+from unittest import skipUnless
+
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.reportes.models import ReporteGenerado
+from apps.usuarios.models import PerfilUsuario
+from .excel import OPENPYXL_AVAILABLE
+from .exportacion import Seccion, bloques, filas_por_bloques, lineas_csv
+from .models import LoteAves, BitacoraDiaria
+from .reports import ReporteAvicola, datos_reporte_sena, generar_reporte_sena_excel, generar_reportes_sena
+from .resumenes import anotar_aves_inicio_dia
+from .views_reports import generar_csv_mortalidad
+
+if OPENPYXL_AVAILABLE:
+    import openpyxl
+
+User = get_user_model()
+
+
+def leer_libro(respuesta):
+    return openpyxl.load_workbook(io.BytesIO(b''.join(respuesta.streaming_content)))
+
+
+def leer_csv(respuesta):
+    contenido = b''.join(respuesta.streaming_content)
+    if respuesta['Content-Type'] == 'application/gzip':
+        contenido = gzip.decompress(contenido)
+    return list(csv.reader(io.StringIO(contenido.decode('utf-8'))))
+
+
+class ExportacionTestBase(TestCase):
+    """Lote en postura con tres bitácoras y un lote finalizado con una"""
+
+    def setUp(self):
+        # Las descargas quedan guardadas como ReporteGenerado (caché de resultados)
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        ajuste = override_settings(MEDIA_ROOT=self.media)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+
+        self.admin = User.objects.create_superuser(username='admin', password='testpass123')
+        self.user = User.objects.create_user(username='operario', password='testpass123')
+        PerfilUsuario.objects.filter(user=self.user).update(rol='admin_aves')
+        self.client.force_login(self.user)
+        self.hoy = date(2024, 6, 10)
+        self.lote = self.crear_lote('L001', 'postura')
+        self.finalizado = self.crear_lote('L002', 'finalizado')
+        for dias in range(3):
+            self.bitacora(self.lote, dias, mortalidad=dias)
+        self.bitacora(self.finalizado, 0, mortalidad=4)
+
+    def crear_lote(self, codigo, estado):
+        return LoteAves.objects.create(
+            codigo=codigo, galpon='Galpón 1', linea_genetica='lohmann_brown', procedencia='Incubadora',
+            numero_aves_inicial=1000, numero_aves_actual=1000, fecha_llegada=date(2024, 1, 1),
+            peso_total_llegada=Decimal('40.00'), peso_promedio_llegada=Decimal('40.00'), estado=estado,
+        )
+
+    def bitacora(self, lote, dias_atras, mortalidad=0):
+        return BitacoraDiaria.objects.create(
+            lote=lote, fecha=self.hoy - timedelta(days=dias_atras), recoleccion_1=800,
+            produccion_aaa=500, produccion_aa=300, mortalidad=mortalidad, causa_mortalidad='Calor',
+            consumo_concentrado=Decimal('110.50'), usuario_registro=self.admin,
+        )
+
+
+class ExportacionCSVTest(ExportacionTestBase):
+    """Pruebas del contenido, la compresión y las consultas de los CSV"""
+
+    def test_produccion_en_streaming(self):
+        respuesta = self.client.get(reverse('aves:exportar_reporte_produccion'), {
+            'formato': 'csv', 'lote': self.lote.pk,
+        })
+
+        self.assertIsInstance(respuesta, StreamingHttpResponse)
+        self.assertIn('reporte_produccion.csv', respuesta['Content-Disposition'])
+        filas = leer_csv(respuesta)
+        self.assertEqual(filas[0][:3], ['Fecha', 'Lote', 'Galpón'])
+        self.assertEqual(filas[1], ['10/06/2024', 'L001', 'Galpón 1', '500', '300', '0', '0', '0', '800', '0', '110.5', ''])
+        self.assertEqual(len(filas), 4)
+
+    def test_gzip(self):
+        respuesta = self.client.get(reverse('aves:exportar_reporte_produccion'), {'formato': 'csv', 'gzip': '1'})
+
+        self.assertEqual(respuesta['Content-Type'], 'application/gzip')
+        self.assertIn('reporte_produccion.csv.gz', respuesta['Content-Disposition'])
+        self.assertEqual(len(leer_csv(respuesta)), 5)
+
+    def test_mortalidad_una_consulta(self):
+        """El CSV no materializa las bitácoras: una consulta sin importar cuántas filas haya"""
+        for dias in range(3, 30):
+            self.bitacora(self.lote, dias)
+
+        with CaptureQueriesContext(connection) as contexto:
+            filas = leer_csv(generar_csv_mortalidad(
+                anotar_aves_inicio_dia(BitacoraDiaria.objects.filter(lote=self.lote))
+            ))
+
+        self.assertEqual(len(contexto.captured_queries), 1)
+        self.assertEqual(len(filas), 31)
+        # El 9 de junio empezó con 998 aves: el día anterior murieron 2
+        self.assertEqual(filas[0][5], 'Aves Inicio Día')
+        self.assertEqual(filas[2], ['09/06/2024', 'L001', 'Galpón 1', '1', 'Calor', '998', '0.1'])
+
+        # La vista entrega el mismo contenido
+        respuesta = self.client.get(reverse('aves:reporte_mortalidad'), {'formato': 'csv', 'lote_id': self.lote.pk})
+        self.assertEqual(leer_csv(respuesta), filas)
+
+    def test_filas_por_bloques(self):
+        """Las páginas por clave dan las mismas filas, con empates de fecha entre lotes y la ventana intacta"""
+        for dias in range(3, 30):
+            self.bitacora(self.lote, dias, mortalidad=dias % 3)
+            self.bitacora(self.finalizado, dias, mortalidad=1)
+        queryset = anotar_aves_inicio_dia(BitacoraDiaria.objects.all()).order_by('-fecha')
+        campos = ['fecha', 'lote__codigo', 'mortalidad', 'aves_inicio_dia']
+        esperadas = list(queryset.order_by('-fecha', 'pk').values_list(*campos))
+
+        # 58 filas en páginas de 7: 9 consultas, la última con 2 filas
+        with self.assertNumQueries(9):
+            filas = list(filas_por_bloques(queryset, *campos, tamano=7))
+
+        self.assertEqual(filas, esperadas)
+
+    def test_mortalidad_desde_fecha(self):
+        """Con fecha de inicio, las aves de cada día descuentan la mortalidad anterior al rango"""
+        respuesta = self.client.get(reverse('aves:reporte_mortalidad'), {
+            'formato': 'csv', 'lote_id': self.lote.pk, 'fecha_inicio': '2024-06-09',
+        })
+
+        filas = leer_csv(respuesta)
+        self.assertEqual([fila[5] for fila in filas[1:]], ['997', '998'])
+
+        respuesta = self.client.get(reverse('aves:reporte_mortalidad'), {
+            'lote_id': self.lote.pk, 'fecha_inicio': '2024-06-09',
+        })
+        self.assertEqual(
+            [dato['aves_inicio_dia'] for dato in respuesta.context['datos_mortalidad']], [997, 998]
+        )
+
+    def test_datos_completos_historicos(self):
+        url = reverse('aves:exportar_datos_completos')
+
+        filas = leer_csv(self.client.get(url, {'formato': 'csv'}))
+        self.assertEqual(filas[0], ['=== LOTES ==='])
+        self.assertEqual(filas[2][2:5], ['Lohmann Brown', '1000', 'En Postura'])
+        self.assertEqual(sum(1 for fila in filas if fila[1:2] == ['L002']), 0)
+
+        filas = leer_csv(self.client.get(url, {'formato': 'csv', 'incluir_historicos': 'true'}))
+        self.assertEqual(sum(1 for fila in filas if fila[1:2] == ['L002']), 1)
+
+    def test_bloques(self):
+        lineas = lineas_csv([Seccion(['a'], ([i] for i in range(1000)))])
+        partes = list(bloques(lineas, tamano=100))
+
+        self.assertGreater(len(partes), 10)
+        self.assertEqual(b''.join(partes).decode().splitlines()[-1], '999')
+
+
+@skipUnless(OPENPYXL_AVAILABLE, 'openpyxl no está instalado')
+class ExportacionExcelTest(ExportacionTestBase):
+    """Pruebas de los Excel escritos en modo write_only"""
+
+    def test_produccion_anchos_y_estilos(self):
+        hojas = leer_libro(ReporteAvicola({'lote_id': self.lote.pk}).generar_excel_produccion())
+
+        self.assertEqual(hojas.sheetnames, ['Resumen', 'Producción Diaria', 'Datos Gráfico'])
+        diaria = hojas['Producción Diaria']
+        self.assertEqual(diaria.max_row, 4)
+        self.assertEqual(diaria['A2'].value.date(), self.hoy)
+        self.assertTrue(diaria['A1'].font.b)
+        self.assertEqual(diaria['A1'].fill.fgColor.rgb, '00CCCCCC')
+        # El ancho sale del valor más largo de la columna, encabezado incluido
+        self.assertEqual(diaria.column_dimensions['B'].width, 6)
+        self.assertEqual(diaria.column_dimensions['K'].width, 21)
+        # Gráfico con los días en orden cronológico
+        self.assertEqual([fila[0] for fila in hojas['Datos Gráfico'].iter_rows(min_row=2, values_only=True)],
+                         ['08/06', '09/06', '10/06'])
+
+    def test_registro_sena(self):
+        respuesta = self.client.get(reverse('aves:exportar_reporte_produccion'), {
+            'formato': 'excel', 'lote': self.lote.pk,
+        })
+
+        self.assertIn('Registro_Postura_SENA_L001_06_2024.xlsx', respuesta['Content-Disposition'])
+        hoja = leer_libro(respuesta).active
+        self.assertIn('B1:M3', {str(rango) for rango in hoja.merged_cells.ranges})
+        self.assertEqual(hoja['A6'].fill.fgColor.rgb, '0030A900')
+        # Día 10 en la fila 22: 500 de 1a, 300 de 2a, existencia 1000 - (0 + 1 + 2)
+        self.assertEqual([hoja.cell(22, col).value for col in (1, 2, 3, 13)], [10, 500, 300, 997])
+        self.assertEqual(hoja['A43'].value, 'TOTAL')
+        self.assertEqual(hoja['B43'].value, 1500)
+        self.assertEqual(hoja.column_dimensions['E'].width, 25)
+
+    def test_registros_sena_en_lote(self):
+        otro = self.crear_lote('L003', 'postura')
+        self.bitacora(otro, 0)
+        lotes = LoteAves.objects.filter(estado='postura').order_by('codigo')
+
+        # Una consulta de bitácoras para todos los lotes y meses (más la de los lotes)
+        with self.assertNumQueries(2):
+            datos = datos_reporte_sena(lotes, [(6, 2024), (5, 2024)])
+        # Mayo no tiene bitácoras y se omite
+        self.assertEqual([(d['lote']['codigo'], d['mes']) for d in datos], [('L001', 6), ('L003', 6)])
+
+        # Los libros del ZIP se escriben en el pool de procesos
+        respuesta = generar_reportes_sena(lotes, [(6, 2024)], procesos=2)
+        comprimido = zipfile.ZipFile(io.BytesIO(b''.join(respuesta.streaming_content)))
+        self.assertEqual(comprimido.namelist(), [
+            'Registro_Postura_SENA_L001_06_2024.xlsx', 'Registro_Postura_SENA_L003_06_2024.xlsx',
+        ])
+        hoja = openpyxl.load_workbook(io.BytesIO(comprimido.read('Registro_Postura_SENA_L001_06_2024.xlsx'))).active
+        individual = openpyxl.load_workbook(io.BytesIO(generar_reporte_sena_excel(self.lote.pk, 6, 2024).content)).active
+        self.assertEqual(
+            [[celda.value for celda in fila] for fila in hoja.iter_rows()],
+            [[celda.value for celda in fila] for fila in individual.iter_rows()],
+        )
+
+        libro = leer_libro(generar_reportes_sena(lotes, [(6, 2024)], formato='libro'))
+        self.assertEqual(libro.sheetnames, ['L001 06-2024', 'L003 06-2024'])
+        self.assertEqual(libro['L003 06-2024']['H6'].value, 'L003')
+
+    @override_settings(REPORTES_BACKEND='sincrono')
+    def test_registros_sena_vista(self):
+        """La vista encola el lote de fin de mes y el formulario consulta su estado"""
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.client.post(reverse('aves:generar_reportes_sena_lote'), {'mes': 6, 'año': 2024})
+
+        reporte = ReporteGenerado.objects.get(parametros__trabajo='sena_lote')
+        self.assertRedirects(
+            respuesta, f"{reverse('aves:generar_reporte_sena')}?reporte={reporte.pk}", fetch_redirect_response=False
+        )
+        self.assertEqual(reporte.estado, 'completado', reporte.mensaje_error)
+        self.assertEqual(reporte.nombre_archivo, 'Registros_Postura_SENA_06_2024.zip')
+        # El lote finalizado sigue activo y tiene bitácora en junio
+        with reporte.archivo.open('rb') as archivo:
+            self.assertEqual(len(zipfile.ZipFile(archivo).namelist()), 2)
+        formulario = self.client.get(respuesta.url)
+        self.assertEqual(
+            formulario.context['url_estado_lote'], reverse('reportes:estado_reporte', args=[reporte.pk])
+        )
+
+        # Sin bitácoras en el mes el trabajo termina con error
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.client.post(reverse('aves:generar_reportes_sena_lote'), {'periodo': '2023-01'})
+        self.assertEqual(ReporteGenerado.objects.get(pk=respuesta.url.split('=')[1]).estado, 'error')
+        # Un periodo inválido no se encola
+        respuesta = self.client.post(reverse('aves:generar_reportes_sena_lote'), {'periodo': '2023-13'})
+        self.assertRedirects(respuesta, reverse('aves:generar_reporte_sena'), fetch_redirect_response=False)
+
+    def test_registros_sena_comando(self):
+        salida = f'{self.media}/sena.xlsx'
+        call_command('generar_reportes_sena', '--periodo', '2024-06', '--formato', 'libro', '--lote', 'L001',
+                     '--salida', salida, stdout=io.StringIO())
+
+        self.assertEqual(openpyxl.load_workbook(salida).sheetnames, ['L001 06-2024'])
+        with self.assertRaises(CommandError):
+            call_command('generar_reportes_sena', '--periodo', '2024-13', stdout=io.StringIO())
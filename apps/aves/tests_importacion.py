@@ -0,0 +1,171 @@
+"""
+Pruebas de la importación masiva de bitácoras.
+"""
+import io
+import os
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+
+import openpyxl
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.usuarios.models import PerfilUsuario
+from .importacion import importar_bitacoras
+from .models import (
+    LoteAves, BitacoraDiaria, ResumenProduccionDiaria, InventarioHuevos, KardexHuevos, AlertaSistema
+)
+
+User = get_user_model()
+
+ENCABEZADOS = 'lote,fecha,recoleccion_1,produccion_aaa,produccion_b,mortalidad,consumo_concentrado\n'
+
+
+class ImportacionBitacorasTest(TestCase):
+    """Pruebas para importar_bitacoras y sus efectos por lote"""
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(username='admin', password='testpass123')
+        self.lotes = []
+        for numero in range(1, 3):
+            self.lotes.append(LoteAves.objects.create(
+                codigo=f'L00{numero}',
+                galpon=f'Galpón {numero}',
+                linea_genetica='lohmann_brown',
+                procedencia='Incubadora',
+                numero_aves_inicial=1000,
+                numero_aves_actual=1000,
+                fecha_llegada=date(2024, 1, 1),
+                peso_total_llegada=Decimal('40.00'),
+                peso_promedio_llegada=Decimal('40.00'),
+                estado='postura',
+            ))
+        self.fecha = date(2024, 6, 1)
+
+    def csv(self, filas):
+        return io.BytesIO((ENCABEZADOS + ''.join(filas)).encode('utf-8'))
+
+    def filas_semana(self, codigo, mortalidad=2):
+        return [
+            f'{codigo},{self.fecha + timedelta(days=d):%Y-%m-%d},800,600,200,{mortalidad},110.5\n'
+            for d in range(7)
+        ]
+
+    def test_importar_csv_aplica_efectos(self):
+        """Las bitácoras importadas actualizan aves, resumen, inventario y kardex"""
+        filas = self.filas_semana('L001') + self.filas_semana('L002', mortalidad=0)
+
+        resultado = importar_bitacoras(self.csv(filas), self.user, nombre='semana.csv')
+
+        self.assertEqual(resultado['errores'], [])
+        self.assertEqual(resultado['creadas'], 14)
+        self.assertEqual(LoteAves.objects.get(codigo='L001').numero_aves_actual, 986)
+        self.assertEqual(LoteAves.objects.get(codigo='L002').numero_aves_actual, 1000)
+        self.assertEqual(
+            list(
+                ResumenProduccionDiaria.objects.filter(lote=self.lotes[0]).order_by('fecha')
+                .values_list('aves_inicio_dia', flat=True)
+            ),
+            [1000, 998, 996, 994, 992, 990, 988]
+        )
+        self.assertEqual(InventarioHuevos.objects.get(categoria='AAA').cantidad_actual, 14 * 600)
+        self.assertEqual(KardexHuevos.objects.filter(origen='bitacora').count(), 2)
+
+    def test_errores_no_guardan_nada(self):
+        """Con una sola fila inválida no se importa ninguna"""
+        filas = self.filas_semana('L001') + [
+            'L999,2024-06-01,10,10,0,0,1\n',
+            'L002,01/06/2024,100,200,0,0,1\n',
+            'L001,2024-06-01,800,600,200,0,1\n',
+        ]
+
+        resultado = importar_bitacoras(self.csv(filas), self.user, nombre='semana.csv')
+
+        self.assertEqual(len(resultado['errores']), 3)
+        self.assertIn('Fila 9', resultado['errores'][0])
+        self.assertFalse(BitacoraDiaria.objects.exists())
+        self.assertEqual(LoteAves.objects.get(codigo='L001').numero_aves_actual, 1000)
+
+    def test_bitacora_existente(self):
+        """Una fecha ya registrada para el lote se reporta como error"""
+        BitacoraDiaria.objects.create(
+            lote=self.lotes[0], fecha=self.fecha, recoleccion_1=100, produccion_aaa=100,
+            usuario_registro=self.user
+        )
+
+        resultado = importar_bitacoras(self.csv(self.filas_semana('L001')), self.user, nombre='semana.csv')
+
+        self.assertEqual(len(resultado['errores']), 1)
+        self.assertEqual(BitacoraDiaria.objects.count(), 1)
+
+    def test_importar_xlsx(self):
+        """El Excel se lee con los mismos encabezados"""
+        libro = openpyxl.Workbook()
+        hoja = libro.active
+        hoja.append(['Lote', 'Fecha', 'Recolección 1', 'AAA', 'Mortalidad'])
+        hoja.append(['L001', self.fecha, 500, 500, 8])
+        hoja.append(['L001', self.fecha + timedelta(days=1), 400, 400, 0])
+        archivo = io.BytesIO()
+        libro.save(archivo)
+        archivo.seek(0)
+
+        resultado = importar_bitacoras(archivo, self.user, nombre='mes.xlsx')
+
+        self.assertEqual(resultado['creadas'], 2)
+        self.assertEqual(LoteAves.objects.get(codigo='L001').numero_aves_actual, 992)
+        self.assertTrue(
+            AlertaSistema.objects.filter(tipo_alerta='mortalidad_alta', lote=self.lotes[0]).exists()
+        )
+
+    def test_consultas_no_crecen_con_las_filas(self):
+        """Importar más filas no agrega consultas por fila"""
+        filas = [
+            f'L00{1 + d % 2},{self.fecha + timedelta(days=d // 2):%Y-%m-%d},800,600,200,1,100\n'
+            for d in range(1200)
+        ]
+
+        with CaptureQueriesContext(connection) as consultas:
+            resultado = importar_bitacoras(self.csv(filas), self.user, nombre='anio.csv')
+
+        self.assertEqual(resultado['creadas'], 1200)
+        # Las inserciones van por lotes (su tamaño depende del motor); el resto es fijo
+        sentencias = [
+            c['sql'] for c in consultas.captured_queries if 'SAVEPOINT' not in c['sql']
+        ]
+        inserciones = [sql for sql in sentencias if sql.startswith('INSERT')]
+        self.assertLess(len(sentencias) - len(inserciones), 20)
+        self.assertLess(len(inserciones), 1200 // 20)
+
+    def test_comando(self):
+        """El comando importa el archivo indicado"""
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as archivo:
+            archivo.write(ENCABEZADOS + ''.join(self.filas_semana('L002')))
+        self.addCleanup(os.remove, archivo.name)
+
+        call_command('importar_bitacoras', archivo.name, usuario='admin', stdout=io.StringIO())
+
+        self.assertEqual(BitacoraDiaria.objects.filter(lote=self.lotes[1]).count(), 7)
+        with self.assertRaises(CommandError):
+            call_command('importar_bitacoras', archivo.name, usuario='admin', stdout=io.StringIO())
+
+    def test_vista(self):
+        """La vista valida sin guardar o importa el archivo subido"""
+        PerfilUsuario.objects.filter(user=self.user).update(rol='admin_aves')
+        self.client.login(username='admin', password='testpass123')
+        contenido = (ENCABEZADOS + ''.join(self.filas_semana('L001'))).encode('utf-8')
+        url = reverse('aves:bitacora_importar')
+
+        self.client.post(url, {
+            'archivo': SimpleUploadedFile('semana.csv', contenido), 'solo_validar': '1'
+        })
+        self.assertFalse(BitacoraDiaria.objects.exists())
+
+        respuesta = self.client.post(url, {'archivo': SimpleUploadedFile('semana.csv', contenido)})
+        self.assertRedirects(respuesta, reverse('aves:bitacora_list'), fetch_redirect_response=False)
+        self.assertEqual(BitacoraDiaria.objects.count(), 7)
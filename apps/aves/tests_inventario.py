@@ -0,0 +1,247 @@
+"""
+Pruebas de las actualizaciones atómicas del inventario de huevos.
+"""
+import threading
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from apps.punto_blanco.models import Pedido, DetallePedido
+from .models import (
+    LoteAves, InventarioHuevos, MovimientoHuevos, DetalleMovimientoHuevos, total_gallinas_postura
+)
+from .kardex import verificar_inventario
+from .utils import sumar_stock, descontar_stock
+
+User = get_user_model()
+
+CATEGORIAS = ['AAA', 'AA', 'A', 'B', 'C']
+
+
+def ejecutar_en_hilos(funcion, hilos, repeticiones):
+    """Ejecuta `funcion` en varios hilos a la vez y retorna sus resultados."""
+    barrera = threading.Barrier(hilos)
+    resultados = []
+    errores = []
+    bloqueo = threading.Lock()
+
+    def trabajo():
+        try:
+            barrera.wait()
+            for _ in range(repeticiones):
+                resultado = funcion()
+                with bloqueo:
+                    resultados.append(resultado)
+        except Exception as e:
+            errores.append(e)
+        finally:
+            connection.close()
+
+    trabajadores = [threading.Thread(target=trabajo) for _ in range(hilos)]
+    for trabajador in trabajadores:
+        trabajador.start()
+    for trabajador in trabajadores:
+        trabajador.join()
+    if errores:
+        raise errores[0]
+    return resultados
+
+
+class InventarioConcurrenteTest(TransactionTestCase):
+    """Pruebas de estrés con varios hilos escribiendo sobre el inventario"""
+
+    HILOS = 8
+    REPETICIONES = 25
+
+    def setUp(self):
+        for categoria in CATEGORIAS:
+            InventarioHuevos.objects.create(categoria=categoria, cantidad_actual=0, stock_automatico=False)
+
+    def cantidades(self):
+        return dict(InventarioHuevos.objects.values_list('categoria', 'cantidad_actual'))
+
+    def test_entradas_concurrentes_no_pierden_actualizaciones(self):
+        """Bitácoras simultáneas suman todas sus categorías sin perder ninguna"""
+        produccion = {'AAA': 5, 'AA': 4, 'A': 3, 'B': 2, 'C': 1}
+
+        ejecutar_en_hilos(lambda: sumar_stock(produccion), self.HILOS, self.REPETICIONES)
+
+        total_escrituras = self.HILOS * self.REPETICIONES
+        self.assertEqual(
+            self.cantidades(),
+            {categoria: n * total_escrituras for categoria, n in produccion.items()}
+        )
+        self.assertEqual(verificar_inventario(), {})
+
+    def test_salidas_concurrentes_no_dejan_stock_negativo(self):
+        """Ventas simultáneas solo se aplican mientras hay existencias"""
+        InventarioHuevos.objects.filter(categoria='AAA').update(cantidad_actual=100)
+
+        resultados = ejecutar_en_hilos(lambda: descontar_stock('AAA', 1), self.HILOS, self.REPETICIONES)
+
+        self.assertEqual(resultados.count(True), 100)
+        self.assertEqual(self.cantidades()['AAA'], 0)
+
+    def test_entradas_y_salidas_mezcladas(self):
+        """El saldo final coincide con las entradas menos las salidas aplicadas"""
+        InventarioHuevos.objects.filter(categoria='AA').update(cantidad_actual=50)
+        turno = iter(range(10 ** 6))
+        bloqueo = threading.Lock()
+
+        def mover():
+            with bloqueo:
+                par = next(turno) % 2 == 0
+            if par:
+                return ('entrada', sumar_stock({'AA': 3}))
+            return ('salida', descontar_stock('AA', 5))
+
+        resultados = ejecutar_en_hilos(mover, self.HILOS, self.REPETICIONES)
+
+        entradas = sum(1 for tipo, _ in resultados if tipo == 'entrada')
+        salidas = sum(1 for tipo, aplicado in resultados if tipo == 'salida' and aplicado)
+        saldo = self.cantidades()['AA']
+        self.assertEqual(saldo, 50 + entradas * 3 - salidas * 5)
+        self.assertGreaterEqual(saldo, 0)
+        # El kardex registra exactamente los cambios aplicados (más el ajuste inicial)
+        self.assertEqual(verificar_inventario(), {'AA': (saldo, saldo - 50)})
+
+
+@override_settings(AVES_EFECTOS_BACKEND='sincrono')
+class InventarioSalidasTest(TestCase):
+    """Pruebas de las salidas condicionales desde movimientos y pedidos"""
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(username='admin', password='testpass123')
+        self.inventario = InventarioHuevos.objects.create(
+            categoria='AAA', cantidad_actual=24, stock_automatico=False
+        )
+
+    def test_movimiento_sin_stock_no_descuenta(self):
+        """Una venta mayor al stock lanza ValidationError y revierte el movimiento"""
+        with self.assertRaises(ValidationError):
+            with transaction.atomic():
+                movimiento = MovimientoHuevos.objects.create(
+                    fecha=date(2024, 6, 1), tipo_movimiento='venta', usuario_registro=self.user
+                )
+                DetalleMovimientoHuevos.objects.create(
+                    movimiento=movimiento, categoria_huevo='AAA', cantidad_docenas=3
+                )
+
+        self.inventario.refresh_from_db()
+        self.assertEqual(self.inventario.cantidad_actual, 24)
+        self.assertFalse(MovimientoHuevos.objects.exists())
+
+    def test_eliminar_movimiento_devuelve_stock(self):
+        """Eliminar un detalle devuelve sus unidades al inventario"""
+        movimiento = MovimientoHuevos.objects.create(
+            fecha=date(2024, 6, 1), tipo_movimiento='venta', usuario_registro=self.user
+        )
+        detalle = DetalleMovimientoHuevos.objects.create(
+            movimiento=movimiento, categoria_huevo='AAA', cantidad_docenas=1
+        )
+        self.inventario.refresh_from_db()
+        self.assertEqual(self.inventario.cantidad_actual, 12)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            detalle.delete()
+
+        self.inventario.refresh_from_db()
+        self.assertEqual(self.inventario.cantidad_actual, 24)
+
+    def test_pedido_entregado_descuenta_todo_o_nada(self):
+        """Si una categoría del pedido no alcanza no se descuenta ninguna"""
+        inventario_b = InventarioHuevos.objects.create(categoria='B', cantidad_actual=5, stock_automatico=False)
+        pedido = Pedido.objects.create(
+            usuario_punto_blanco=self.user, cliente_nombre='Cliente', cliente_telefono='3000000000'
+        )
+        DetallePedido.objects.create(
+            pedido=pedido, inventario_huevos=self.inventario, cantidad=10, precio_unitario=500
+        )
+        DetallePedido.objects.create(
+            pedido=pedido, inventario_huevos=inventario_b, cantidad=10, precio_unitario=300
+        )
+
+        with self.assertRaises(ValidationError):
+            with transaction.atomic():
+                pedido.actualizar_inventario()
+
+        self.inventario.refresh_from_db()
+        inventario_b.refresh_from_db()
+        self.assertEqual((self.inventario.cantidad_actual, inventario_b.cantidad_actual), (24, 5))
+
+
+class StockMinimoAutomaticoTest(TestCase):
+    """Pruebas del total de gallinas cacheado y el recálculo de mínimos"""
+
+    def setUp(self):
+        cache.clear()
+        User.objects.create_superuser(username='admin', password='testpass123')
+        self.lote = LoteAves.objects.create(
+            codigo='L001',
+            galpon='Galpón 1',
+            linea_genetica='lohmann_brown',
+            procedencia='Incubadora',
+            numero_aves_inicial=1000,
+            numero_aves_actual=1000,
+            fecha_llegada=date(2024, 1, 1),
+            peso_total_llegada=Decimal('40.00'),
+            peso_promedio_llegada=Decimal('40.00'),
+            estado='postura',
+        )
+        for categoria in CATEGORIAS:
+            InventarioHuevos.objects.create(categoria=categoria, cantidad_minima=100, stock_automatico=False)
+
+    def test_total_cacheado(self):
+        """Con el total en caché, guardar inventario no agrega sobre los lotes"""
+        self.assertEqual(total_gallinas_postura(), 1000)
+        inventario = InventarioHuevos.objects.get(categoria='AAA')
+        inventario.stock_automatico = True
+
+        with CaptureQueriesContext(connection) as consultas:
+            inventario.save()
+
+        self.assertFalse(any('aves_loteaves' in consulta['sql'] for consulta in consultas.captured_queries))
+
+        self.assertEqual(inventario.cantidad_minima, int(1000 * 0.75 * 0.40 * 3))
+
+    def test_invalida_solo_campos_de_postura(self):
+        """Cambiar observaciones no invalida; cambiar aves o estado sí"""
+        total_gallinas_postura()
+        lote = LoteAves.objects.get(pk=self.lote.pk)
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            lote.observaciones = 'Revisión'
+            lote.save()
+        self.assertEqual(total_gallinas_postura(), 1000)
+        cantidad_sin_cambio = len(callbacks)
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            lote.numero_aves_actual = 900
+            lote.save()
+        self.assertEqual(len(callbacks), cantidad_sin_cambio + 1)
+        self.assertEqual(total_gallinas_postura(), 900)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            lote.estado = 'finalizado'
+            lote.save()
+        self.assertEqual(total_gallinas_postura(), 0)
+
+    def test_recalcular_minimos_en_una_pasada(self):
+        """Las cinco categorías se recalculan con una lectura y un bulk_update"""
+        InventarioHuevos.objects.update(stock_automatico=True)
+        total_gallinas_postura()
+
+        with self.assertNumQueries(2):
+            actualizados = InventarioHuevos.recalcular_minimos()
+
+        self.assertEqual(actualizados, 5)
+        self.assertEqual(
+            InventarioHuevos.objects.get(categoria='AA').cantidad_minima, int(1000 * 0.75 * 0.35 * 3)
+        )
+        self.assertEqual(InventarioHuevos.objects.get(categoria='C').cantidad_minima, 50)
@@ -0,0 +1,163 @@
+"""
+Pruebas del kardex de huevos y sus saldos de cierre diarios.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from .kardex import generar_saldos_diarios, saldo_a_fecha, saldos_a_fecha, verificar_inventario
+from .models import (
+    LoteAves, BitacoraDiaria, InventarioHuevos, MovimientoHuevos, DetalleMovimientoHuevos,
+    KardexHuevos, SaldoDiarioHuevos
+)
+from .utils import ajustar_stock
+
+User = get_user_model()
+
+
+@override_settings(AVES_EFECTOS_BACKEND='sincrono')
+class KardexHuevosTest(TestCase):
+    """Pruebas del registro de movimientos de stock en el kardex"""
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(username='admin', password='testpass123')
+        for categoria in ['AAA', 'AA', 'A', 'B', 'C']:
+            InventarioHuevos.objects.create(categoria=categoria, cantidad_actual=0, stock_automatico=False)
+        self.lote = LoteAves.objects.create(
+            codigo='L001',
+            galpon='Galpón 1',
+            linea_genetica='lohmann_brown',
+            procedencia='Incubadora',
+            numero_aves_inicial=1000,
+            numero_aves_actual=1000,
+            fecha_llegada=date(2024, 1, 1),
+            peso_total_llegada=Decimal('40.00'),
+            peso_promedio_llegada=Decimal('40.00'),
+            estado='postura',
+        )
+
+    def test_bitacora_registra_entradas(self):
+        """La bitácora deja una fila por categoría con su origen"""
+        with self.captureOnCommitCallbacks(execute=True):
+            bitacora = BitacoraDiaria.objects.create(
+                lote=self.lote, fecha=date(2024, 6, 1), recoleccion_1=700,
+                produccion_aaa=500, produccion_b=200, usuario_registro=self.user
+            )
+
+        filas = KardexHuevos.objects.filter(origen='bitacora', referencia_id=bitacora.pk)
+        self.assertEqual(
+            dict(filas.values_list('categoria', 'cantidad')), {'AAA': 500, 'B': 200}
+        )
+        self.assertEqual(filas.first().fecha_origen, date(2024, 6, 1))
+        self.assertEqual(verificar_inventario(), {})
+
+    def test_venta_y_reversion(self):
+        """Una venta registra la salida y eliminarla registra la devolución"""
+        ajustar_stock('AAA', 120)
+        movimiento = MovimientoHuevos.objects.create(
+            fecha=date(2024, 6, 2), tipo_movimiento='venta', usuario_registro=self.user
+        )
+        detalle = DetalleMovimientoHuevos.objects.create(
+            movimiento=movimiento, categoria_huevo='AAA', cantidad_docenas=5
+        )
+        detalle_id = detalle.pk
+
+        with self.captureOnCommitCallbacks(execute=True):
+            detalle.delete()
+
+        self.assertEqual(
+            list(
+                KardexHuevos.objects.filter(origen='movimiento', referencia_id=detalle_id)
+                .order_by('id').values_list('cantidad', flat=True)
+            ),
+            [-60, 60]
+        )
+        self.assertEqual(saldo_a_fecha('AAA'), 120)
+        self.assertEqual(verificar_inventario(), {})
+
+    def test_ajuste_manual(self):
+        """El ajuste registra solo la diferencia con el stock actual"""
+        ajustar_stock('AA', 100, usuario_id=self.user.id)
+        ajustar_stock('AA', 70, usuario_id=self.user.id)
+
+        self.assertEqual(
+            list(KardexHuevos.objects.filter(origen='ajuste').order_by('id').values_list('cantidad', flat=True)),
+            [100, -30]
+        )
+        self.assertEqual(InventarioHuevos.objects.get(categoria='AA').cantidad_actual, 70)
+
+    def test_kardex_solo_insercion(self):
+        """Las filas del kardex no se modifican ni se eliminan"""
+        ajustar_stock('A', 10)
+        fila = KardexHuevos.objects.get()
+
+        fila.cantidad = 20
+        with self.assertRaises(ValueError):
+            fila.save()
+        with self.assertRaises(ValueError):
+            fila.delete()
+
+    def test_sincronizar_desde_kardex(self):
+        """El comando devuelve el inventario al saldo del kardex"""
+        ajustar_stock('AAA', 300)
+        InventarioHuevos.objects.filter(categoria='AAA').update(cantidad_actual=999)
+        self.assertEqual(verificar_inventario(), {'AAA': (999, 300)})
+
+        call_command('sincronizar_inventario', stdout=StringIO())
+
+        self.assertEqual(InventarioHuevos.objects.get(categoria='AAA').cantidad_actual, 300)
+        self.assertEqual(verificar_inventario(), {})
+
+
+class SaldoDiarioHuevosTest(TestCase):
+    """Pruebas de los saldos de cierre y el saldo a una fecha"""
+
+    def setUp(self):
+        self.inicio = date(2024, 6, 1)
+        # Entradas de 100 AAA diarias y una salida de 30 el tercer día
+        filas = [
+            KardexHuevos(categoria='AAA', cantidad=100, origen='bitacora', fecha=self.inicio + timedelta(days=d))
+            for d in range(10)
+        ]
+        filas.append(KardexHuevos(categoria='AAA', cantidad=-30, origen='movimiento', fecha=date(2024, 6, 3)))
+        KardexHuevos.objects.bulk_create(filas)
+
+    def test_saldo_sin_cierres(self):
+        """Sin saldos de cierre el saldo se suma desde el inicio del kardex"""
+        self.assertEqual(saldo_a_fecha('AAA', date(2024, 6, 3)), 270)
+
+    def test_generar_saldos_diarios(self):
+        """Los cierres guardan entradas, salidas y saldo de cada día"""
+        creadas = generar_saldos_diarios(date(2024, 6, 5))
+
+        self.assertEqual(creadas, 5 * 5)
+        cierre = SaldoDiarioHuevos.objects.get(categoria='AAA', fecha=date(2024, 6, 3))
+        self.assertEqual((cierre.entradas, cierre.salidas, cierre.saldo), (100, 30, 270))
+        self.assertEqual(
+            SaldoDiarioHuevos.objects.get(categoria='AAA', fecha=date(2024, 6, 5)).saldo, 470
+        )
+
+    def test_cierres_incrementales(self):
+        """Un segundo cierre continúa desde el último saldo guardado"""
+        generar_saldos_diarios(date(2024, 6, 5))
+        generar_saldos_diarios(date(2024, 6, 8))
+
+        self.assertEqual(
+            SaldoDiarioHuevos.objects.get(categoria='AAA', fecha=date(2024, 6, 8)).saldo, 770
+        )
+        self.assertEqual(generar_saldos_diarios(date(2024, 6, 8)), 0)
+
+    def test_saldo_con_cierre_y_rango_acotado(self):
+        """El saldo a una fecha usa el último cierre más el rango posterior"""
+        generar_saldos_diarios(date(2024, 6, 5))
+
+        with self.assertNumQueries(3):
+            saldos = saldos_a_fecha(date(2024, 6, 7))
+
+        self.assertEqual(saldos['AAA'], 670)
+        self.assertEqual(saldos['B'], 0)
+        self.assertEqual(saldo_a_fecha('AAA', date(2024, 6, 2)), 200)
@@ -0,0 +1,289 @@
+"""
+Pruebas del resumen diario de producción por lote.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from .models import LoteAves, BitacoraDiaria, ResumenProduccionDiaria
+from .reports import ReporteAvicola
+from .resumenes import anotar_aves_inicio_dia
+
+User = get_user_model()
+
+
+class ResumenProduccionDiariaTest(TestCase):
+    """Pruebas para el mantenimiento incremental del resumen diario"""
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(username='admin', password='testpass123')
+        self.lote = LoteAves.objects.create(
+            codigo='L001',
+            galpon='Galpón 1',
+            linea_genetica='lohmann_brown',
+            procedencia='Incubadora',
+            numero_aves_inicial=1000,
+            numero_aves_actual=1000,
+            fecha_llegada=date(2024, 1, 1),
+            peso_total_llegada=Decimal('40.00'),
+            peso_promedio_llegada=Decimal('40.00'),
+            estado='postura',
+        )
+        self.fecha = date(2024, 6, 1)
+
+    def crear_bitacora(self, dias, mortalidad, produccion=500):
+        return BitacoraDiaria.objects.create(
+            lote=self.lote,
+            fecha=self.fecha + timedelta(days=dias),
+            recoleccion_1=produccion,
+            produccion_aaa=produccion,
+            mortalidad=mortalidad,
+            consumo_concentrado=Decimal('110.00'),
+            usuario_registro=self.user,
+        )
+
+    def aves_inicio(self):
+        return list(
+            ResumenProduccionDiaria.objects.filter(lote=self.lote)
+            .order_by('fecha').values_list('aves_inicio_dia', flat=True)
+        )
+
+    def test_crear_bitacora_genera_resumen(self):
+        """Cada bitácora genera su fila de resumen con las aves al inicio del día"""
+        self.crear_bitacora(0, mortalidad=5)
+        self.crear_bitacora(1, mortalidad=3)
+
+        resumen = ResumenProduccionDiaria.objects.get(lote=self.lote, fecha=self.fecha)
+        self.assertEqual(resumen.produccion_total, 500)
+        self.assertEqual(resumen.galpon, 'Galpón 1')
+        self.assertEqual(self.aves_inicio(), [1000, 995])
+
+    def test_bitacora_fuera_de_orden(self):
+        """Un día intermedio registrado tarde corrige los días siguientes"""
+        self.crear_bitacora(0, mortalidad=5)
+        self.crear_bitacora(2, mortalidad=1)
+        self.crear_bitacora(1, mortalidad=10)
+
+        self.assertEqual(self.aves_inicio(), [1000, 995, 985])
+
+    def test_editar_bitacora_actualiza_resumen(self):
+        """Editar la mortalidad desplaza las aves iniciales de los días siguientes"""
+        bitacora = self.crear_bitacora(0, mortalidad=5)
+        self.crear_bitacora(1, mortalidad=0)
+
+        bitacora.mortalidad = 8
+        bitacora.produccion_aaa = 400
+        bitacora.save()
+
+        self.assertEqual(self.aves_inicio(), [1000, 992])
+        self.assertEqual(
+            ResumenProduccionDiaria.objects.get(bitacora=bitacora).produccion_total, 400
+        )
+
+    def test_eliminar_bitacora_revierte_resumen(self):
+        """Eliminar una bitácora borra su resumen y corrige los días siguientes"""
+        bitacora = self.crear_bitacora(0, mortalidad=5)
+        self.crear_bitacora(1, mortalidad=0)
+
+        bitacora.delete()
+
+        self.assertEqual(self.aves_inicio(), [1000])
+
+    def test_cambio_de_galpon(self):
+        """El galpón del resumen sigue al lote"""
+        self.crear_bitacora(0, mortalidad=0)
+        self.lote.refresh_from_db()
+        self.lote.galpon = 'Galpón 2'
+        self.lote.save()
+
+        self.assertEqual(
+            ResumenProduccionDiaria.objects.get(lote=self.lote).galpon, 'Galpón 2'
+        )
+
+    def test_reconstruir_resumen(self):
+        """El comando reconstruye el resumen desde las bitácoras"""
+        BitacoraDiaria.objects.bulk_create([
+            BitacoraDiaria(
+                lote=self.lote, fecha=self.fecha + timedelta(days=d),
+                produccion_aaa=600, mortalidad=2, usuario_registro=self.user
+            )
+            for d in range(5)
+        ])
+        self.assertFalse(ResumenProduccionDiaria.objects.exists())
+
+        call_command('reconstruir_resumen_produccion', workers=1, stdout=StringIO())
+
+        self.assertEqual(self.aves_inicio(), [1000, 998, 996, 994, 992])
+        self.assertEqual(ResumenProduccionDiaria.objects.filter(produccion_total=600).count(), 5)
+
+    def test_postura_con_aves_de_cada_dia(self):
+        """El porcentaje de postura histórico no cambia cuando mueren aves después"""
+        self.crear_bitacora(0, mortalidad=100, produccion=900)
+        self.crear_bitacora(1, mortalidad=0, produccion=900)
+        reporte = ReporteAvicola({'lote_id': self.lote.id, 'fecha_fin': self.fecha})
+
+        self.assertEqual(reporte.obtener_resumen_produccion()['porcentaje_postura'], 90.0)
+        self.crear_bitacora(2, mortalidad=400)
+        LoteAves.objects.filter(pk=self.lote.pk).update(numero_aves_actual=500)
+        self.assertEqual(reporte.obtener_resumen_produccion()['porcentaje_postura'], 90.0)
+        # El segundo día empezó con 900 aves
+        self.assertEqual(
+            ReporteAvicola({'lote_id': self.lote.id}).obtener_resumen_produccion()['porcentaje_postura'],
+            round(2300 / (1000 + 900 + 900) * 100, 2),
+        )
+
+    def test_anotacion_aves_inicio_dia(self):
+        """La ventana sobre las bitácoras coincide con el resumen, también desde una fecha intermedia"""
+        for dias, mortalidad in enumerate([5, 3, 0, 7, 2]):
+            self.crear_bitacora(dias, mortalidad=mortalidad)
+        LoteAves.objects.filter(pk=self.lote.pk).update(numero_aves_actual=983)
+
+        bitacoras = anotar_aves_inicio_dia(BitacoraDiaria.objects.filter(lote=self.lote)).order_by('fecha')
+        self.assertEqual([b.aves_inicio_dia for b in bitacoras], [1000, 995, 992, 992, 985])
+        self.assertEqual([b.aves_inicio_dia for b in bitacoras], self.aves_inicio())
+
+        desde = anotar_aves_inicio_dia(
+            BitacoraDiaria.objects.filter(lote=self.lote, fecha__lte=self.fecha + timedelta(days=3)),
+            desde=self.fecha + timedelta(days=2),
+        ).order_by('fecha')
+        self.assertEqual([b.aves_inicio_dia for b in desde], [992, 992])
+
+    def test_porcentaje_postura_bitacora(self):
+        """El porcentaje usa las aves de su día si está anotado y nunca consulta por fila"""
+        self.crear_bitacora(0, mortalidad=500, produccion=800)
+        bitacora = self.crear_bitacora(1, mortalidad=0, produccion=400)
+        LoteAves.objects.filter(pk=self.lote.pk).update(numero_aves_actual=250)
+
+        anotada = anotar_aves_inicio_dia(BitacoraDiaria.objects.filter(lote=self.lote)).order_by('fecha')[1]
+        with self.assertNumQueries(0):
+            self.assertEqual(anotada.porcentaje_postura, 80.0)
+
+        # Sin anotación: aves actuales del lote, como antes
+        sin_anotar = BitacoraDiaria.objects.select_related('lote').get(pk=bitacora.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(sin_anotar.porcentaje_postura, 160.0)
+
+    def test_reporte_diario_sin_consultas_por_fila(self):
+        """El reporte diario anota las aves: una consulta para todas las bitácoras"""
+        for dias in range(5):
+            self.crear_bitacora(dias, mortalidad=dias)
+
+        reporte = ReporteAvicola({'lote_id': self.lote.id})
+        with self.assertNumQueries(1):
+            porcentajes = [
+                bitacora.porcentaje_postura
+                for bitacora in reporte.obtener_datos_produccion_diaria(con_aves_inicio_dia=True)
+            ]
+        self.assertEqual(porcentajes[-1], 50.0)
+        self.assertEqual(porcentajes[0], round(500 / 994 * 100, 2))
+
+    def test_reportes_leen_del_resumen(self):
+        """Los reportes agregan sobre el resumen diario"""
+        from apps.reportes.views import reporte_produccion_semanal
+        from .reports import ReporteAvicola, ReporteComparativo
+
+        self.crear_bitacora(0, mortalidad=5)
+        self.crear_bitacora(1, mortalidad=3, produccion=300)
+        fin = self.fecha + timedelta(days=1)
+
+        resumen = ReporteAvicola({'lote_id': self.lote.id}).obtener_resumen_produccion()
+        self.assertEqual(resumen['total_huevos'], 800)
+        self.assertEqual(resumen['mejor_dia'], 500)
+        self.assertEqual(resumen['total_mortalidad'], 8)
+        self.assertEqual(resumen['dias_registrados'], 2)
+        # Ave-día: 800 huevos sobre 1000 + 995 aves vivas al inicio de cada día
+        self.assertEqual(resumen['porcentaje_postura'], 40.1)
+
+        comparacion = ReporteComparativo().comparar_lotes([self.lote.id], self.fecha, fin)
+        self.assertEqual(comparacion[0]['total_huevos'], 800)
+
+        semanal = reporte_produccion_semanal(self.lote.id, self.fecha, fin)
+        self.assertEqual(semanal['resumen']['total_huevos'], 800)
+        self.assertEqual(semanal['resumen']['total_mortalidad'], 8)
+
+
+class ReporteComparativoTest(TestCase):
+    """Comparaciones de lotes y períodos en una sola consulta"""
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(username='admin', password='testpass123')
+        self.fecha = date(2024, 6, 1)
+
+    def crear_lote(self, codigo, galpon, linea='lohmann_brown', aves=1000):
+        return LoteAves.objects.create(
+            codigo=codigo, galpon=galpon, linea_genetica=linea, procedencia='Incubadora',
+            numero_aves_inicial=aves, numero_aves_actual=aves, fecha_llegada=date(2024, 1, 1),
+            peso_total_llegada=Decimal('40.00'), peso_promedio_llegada=Decimal('40.00'), estado='postura',
+        )
+
+    def crear_bitacora(self, lote, dias, produccion, mortalidad=0):
+        return BitacoraDiaria.objects.create(
+            lote=lote, fecha=self.fecha + timedelta(days=dias), recoleccion_1=produccion,
+            produccion_aaa=produccion, mortalidad=mortalidad, usuario_registro=self.user,
+        )
+
+    def test_comparar_lotes_una_consulta(self):
+        """Lotes de un galpón con una consulta, sin importar cuántos sean; los lotes sin datos salen en cero"""
+        from .reports import ReporteComparativo
+
+        lotes = [self.crear_lote(f'L{numero:03d}', 'Galpón 1') for numero in range(6)]
+        for dias in range(3):
+            for indice, lote in enumerate(lotes[:5]):
+                self.crear_bitacora(lote, dias, produccion=100 * (indice + 1), mortalidad=indice)
+        otro = self.crear_lote('L900', 'Galpón 2', linea='isa_brown')
+        self.crear_bitacora(otro, 0, produccion=700)
+        fin = self.fecha + timedelta(days=1)
+
+        with self.assertNumQueries(1):
+            comparacion = ReporteComparativo().comparar_lotes([], self.fecha, fin, galpon='Galpón 1')
+
+        self.assertEqual([dato['lote_codigo'] for dato in comparacion], [lote.codigo for lote in lotes])
+        self.assertEqual(comparacion[1]['total_huevos'], 400)
+        self.assertEqual(comparacion[1]['total_mortalidad'], 2)
+        self.assertEqual(comparacion[1]['dias_registrados'], 2)
+        self.assertEqual(comparacion[1]['huevos_por_ave_dia'], round(400 / (1000 + 999), 3))
+        self.assertEqual(comparacion[5]['total_huevos'], 0)
+        self.assertEqual(comparacion[5]['dias_registrados'], 0)
+
+        por_linea = ReporteComparativo().comparar_lotes(None, None, None, linea_genetica='isa_brown')
+        self.assertEqual([(dato['lote_codigo'], dato['total_huevos']) for dato in por_linea], [('L900', 700)])
+
+        # Lotes elegidos: en el orden pedido
+        elegidos = ReporteComparativo().comparar_lotes([str(lotes[2].pk), lotes[0].pk], self.fecha, fin)
+        self.assertEqual([dato['lote_codigo'] for dato in elegidos], ['L002', 'L000'])
+        self.assertEqual(ReporteComparativo().comparar_lotes([], self.fecha, fin), [])
+
+        # Lotes elegidos más los del galpón: la unión, sin repetir el que está en ambos
+        mixto = ReporteComparativo().comparar_lotes([otro.pk, lotes[0].pk], self.fecha, fin, galpon='Galpón 1')
+        self.assertEqual(
+            [dato['lote_codigo'] for dato in mixto], [lote.codigo for lote in lotes] + ['L900']
+        )
+        self.assertEqual(mixto[-1]['total_huevos'], 700)
+
+    def test_comparar_periodos_una_consulta(self):
+        """Cada período es una agregación condicional de la misma consulta"""
+        from .reports import ReporteComparativo
+
+        lote = self.crear_lote('L001', 'Galpón 1')
+        for dias in range(10):
+            self.crear_bitacora(lote, dias, produccion=100 + dias, mortalidad=1)
+        periodos = [
+            {'nombre': 'Primera', 'fecha_inicio': self.fecha, 'fecha_fin': self.fecha + timedelta(days=4)},
+            {'nombre': 'Segunda', 'fecha_inicio': self.fecha + timedelta(days=5), 'fecha_fin': self.fecha + timedelta(days=9)},
+            {'nombre': 'Vacío', 'fecha_inicio': date(2024, 7, 1), 'fecha_fin': date(2024, 7, 31)},
+        ]
+
+        with self.assertNumQueries(1):
+            comparacion = ReporteComparativo().comparar_periodos(lote.pk, periodos)
+
+        self.assertEqual([dato['periodo'] for dato in comparacion], ['Primera', 'Segunda', 'Vacío'])
+        self.assertEqual(comparacion[0]['total_huevos'], 510)
+        self.assertEqual(comparacion[1]['total_huevos'], 535)
+        self.assertEqual(comparacion[1]['promedio_huevos_dia'], 107.0)
+        self.assertEqual(comparacion[0]['total_mortalidad'], 5)
+        self.assertEqual(comparacion[2]['dias_registrados'], 0)
+        self.assertEqual(comparacion[2]['total_huevos'], 0)
@@ -0,0 +1,171 @@
+"""
+Pruebas de la sincronización idempotente de bitácoras sin conexión.
+"""
+import json
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.usuarios.models import PerfilUsuario
+from .kardex import verificar_inventario
+from .models import LoteAves, BitacoraDiaria, InventarioHuevos, SincronizacionBitacora
+from .sincronizacion import sincronizar_bitacoras
+
+User = get_user_model()
+
+
+class SincronizacionBitacorasTest(TestCase):
+    """Pruebas para sincronizar_bitacoras"""
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(username='admin', password='testpass123')
+        self.lote = LoteAves.objects.create(
+            codigo='L001',
+            galpon='Galpón 1',
+            linea_genetica='lohmann_brown',
+            procedencia='Incubadora',
+            numero_aves_inicial=1000,
+            numero_aves_actual=1000,
+            fecha_llegada=date(2024, 1, 1),
+            peso_total_llegada=Decimal('40.00'),
+            peso_promedio_llegada=Decimal('40.00'),
+            estado='postura',
+        )
+        self.fecha = date(2024, 6, 1)
+
+    def registro(self, clave, dias=0, mortalidad=2, produccion_aaa=600, **extra):
+        datos = {
+            'clave': clave,
+            'lote': 'L001',
+            'fecha': f'{self.fecha + timedelta(days=dias):%Y-%m-%d}',
+            'recoleccion_1': 800,
+            'produccion_aaa': produccion_aaa,
+            'mortalidad': mortalidad,
+            'consumo_concentrado': '110.5',
+        }
+        datos.update(extra)
+        return datos
+
+    def test_reintento_no_duplica_efectos(self):
+        """Reenviar la misma clave devuelve el resultado guardado sin volver a aplicarlo"""
+        registros = [self.registro('tab1-001'), self.registro('tab1-002', dias=1)]
+
+        primero = sincronizar_bitacoras(registros, self.user)
+        segundo = sincronizar_bitacoras(registros, self.user)
+
+        self.assertEqual([r['estado'] for r in primero], ['creada', 'creada'])
+        self.assertEqual([r['estado'] for r in segundo], ['duplicada', 'duplicada'])
+        self.assertEqual([r['bitacora_id'] for r in primero], [r['bitacora_id'] for r in segundo])
+        self.assertEqual(BitacoraDiaria.objects.count(), 2)
+        self.assertEqual(LoteAves.objects.get(pk=self.lote.pk).numero_aves_actual, 996)
+        self.assertEqual(InventarioHuevos.objects.get(categoria='AAA').cantidad_actual, 1200)
+        self.assertEqual(verificar_inventario(), {})
+
+    def test_upsert_aplica_solo_la_diferencia(self):
+        """Una nueva versión del mismo día corrige aves e inventario por diferencia"""
+        sincronizar_bitacoras([self.registro('v1', mortalidad=5, produccion_aaa=600)], self.user)
+
+        resultados = sincronizar_bitacoras(
+            [self.registro('v2', mortalidad=3, produccion_aaa=500)], self.user
+        )
+
+        self.assertEqual(resultados[0]['estado'], 'actualizada')
+        bitacora = BitacoraDiaria.objects.get()
+        self.assertEqual((bitacora.mortalidad, bitacora.produccion_aaa), (3, 500))
+        self.assertEqual(LoteAves.objects.get(pk=self.lote.pk).numero_aves_actual, 997)
+        self.assertEqual(InventarioHuevos.objects.get(categoria='AAA').cantidad_actual, 500)
+        self.assertEqual(verificar_inventario(), {})
+
+        sin_cambios = sincronizar_bitacoras(
+            [self.registro('v3', mortalidad=3, produccion_aaa=500)], self.user
+        )
+        self.assertEqual(sin_cambios[0]['estado'], 'sin_cambios')
+        self.assertEqual(sin_cambios[0]['bitacora_id'], bitacora.pk)
+
+    def test_errores_por_registro(self):
+        """Los registros inválidos se rechazan sin afectar a los válidos"""
+        sincronizar_bitacoras([self.registro('usada')], self.user)
+        registros = [
+            self.registro('ok', dias=1),
+            self.registro('sin-lote', dias=2, lote='X99'),
+            self.registro('usada', dias=3),
+            self.registro('', dias=4),
+            self.registro('mismo-dia', dias=1),
+        ]
+
+        resultados = sincronizar_bitacoras(registros, self.user)
+
+        self.assertEqual(
+            [r['estado'] for r in resultados], ['creada', 'error', 'error', 'error', 'error']
+        )
+        self.assertIn('X99', resultados[1]['errores'][0])
+        self.assertIn('contenido distinto', resultados[2]['errores'][0])
+        self.assertEqual(BitacoraDiaria.objects.count(), 2)
+        self.assertFalse(SincronizacionBitacora.objects.filter(clave='mismo-dia').exists())
+
+    def test_correccion_sin_stock_se_rechaza(self):
+        """Una corrección a la baja no deja el inventario en negativo"""
+        sincronizar_bitacoras([self.registro('v1', produccion_aaa=600)], self.user)
+        InventarioHuevos.objects.filter(categoria='AAA').update(cantidad_actual=100)
+
+        resultados = sincronizar_bitacoras([self.registro('v2', produccion_aaa=0)], self.user)
+
+        self.assertEqual(resultados[0]['estado'], 'error')
+        self.assertIn('AAA', resultados[0]['errores'][0])
+        self.assertEqual(BitacoraDiaria.objects.get().produccion_aaa, 600)
+
+    def test_consultas_acotadas(self):
+        """200 registros se sincronizan con un número fijo de consultas"""
+        registros = [self.registro(f'tab-{n:03d}', dias=n, mortalidad=0) for n in range(200)]
+
+        with CaptureQueriesContext(connection) as contexto:
+            resultados = sincronizar_bitacoras(registros, self.user)
+
+        self.assertTrue(all(r['estado'] == 'creada' for r in resultados))
+        sentencias = [
+            q['sql'] for q in contexto.captured_queries if not q['sql'].startswith(('SAVEPOINT', 'RELEASE'))
+        ]
+        inserciones = [sql for sql in sentencias if sql.startswith('INSERT')]
+        self.assertLess(len(sentencias) - len(inserciones), 25)
+        self.assertLess(len(inserciones), 40)
+
+
+class ApiSincronizacionTest(TestCase):
+    """Pruebas para la vista api_sincronizar_bitacoras"""
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(username='admin', password='testpass123')
+        PerfilUsuario.objects.filter(user=self.user).update(rol='admin_aves')
+        LoteAves.objects.create(
+            codigo='L001', galpon='Galpón 1', linea_genetica='lohmann_brown', procedencia='Incubadora',
+            numero_aves_inicial=1000, numero_aves_actual=1000, fecha_llegada=date(2024, 1, 1),
+            peso_total_llegada=Decimal('40.00'), peso_promedio_llegada=Decimal('40.00'), estado='postura',
+        )
+        self.client.login(username='admin', password='testpass123')
+        self.url = reverse('aves:api_sincronizar_bitacoras')
+
+    def test_sincronizar_por_api(self):
+        """La API responde un resultado por registro y un resumen"""
+        cuerpo = {'registros': [
+            {'clave': 'a1', 'lote': 'L001', 'fecha': '2024-06-01', 'recoleccion_1': 10, 'produccion_aaa': 10},
+            {'clave': 'a2', 'lote': 'L999', 'fecha': '2024-06-01'},
+        ]}
+
+        response = self.client.post(self.url, json.dumps(cuerpo), content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertTrue(data['success'])
+        self.assertEqual(data['resumen'], {'creada': 1, 'error': 1})
+        self.assertEqual(data['resultados'][0]['clave'], 'a1')
+
+    def test_cuerpo_invalido(self):
+        response = self.client.post(self.url, 'no es json', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(self.url, json.dumps({'registros': []}), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,98 @@
+"""
+Pruebas del calendario de vacunación y sus alertas.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.usuarios.models import PerfilUsuario
+from .alertas import barrido_alertas
+from .models import LoteAves, TipoVacuna, PlanVacunacion, AlertaSistema
+from .vacunacion import calendario_mes, generar_calendario
+
+User = get_user_model()
+
+
+def crear_vacuna(nombre, intervalo_dias=None):
+    return TipoVacuna.objects.create(
+        nombre=nombre, laboratorio='Lab', enfermedad_previene='Newcastle', via_aplicacion='Ocular',
+        dosis_por_ave=Decimal('0.03'), intervalo_dias=intervalo_dias,
+    )
+
+
+class CalendarioVacunacionTest(TestCase):
+    """Pruebas de la generación del calendario, el barrido y la vista mensual"""
+
+    def setUp(self):
+        self.veterinario = User.objects.create_user(username='veterinario', password='testpass123')
+        PerfilUsuario.objects.filter(user=self.veterinario).update(rol='veterinario')
+        self.hoy = timezone.localdate()
+        self.lote = LoteAves.objects.create(
+            codigo='L001', galpon='Galpón 1', linea_genetica='lohmann_brown', procedencia='Incubadora',
+            numero_aves_inicial=1000, numero_aves_actual=1000, fecha_llegada=self.hoy - timedelta(days=5),
+            peso_total_llegada=Decimal('40.00'), peso_promedio_llegada=Decimal('40.00'),
+        )
+        self.refuerzo = crear_vacuna('Newcastle', intervalo_dias=30)
+        self.unica = crear_vacuna('Marek')
+
+    def test_calendario_en_un_insert(self):
+        tipos = [self.refuerzo, self.unica]
+        hasta = self.lote.fecha_llegada + timedelta(days=90)
+
+        with self.assertNumQueries(2):
+            planes = generar_calendario(self.lote, self.veterinario, tipos, hasta=hasta)
+
+        self.assertEqual(len(planes), 5)
+        self.assertEqual(
+            list(PlanVacunacion.objects.filter(tipo_vacuna=self.refuerzo).values_list('fecha_programada', flat=True)),
+            [self.lote.fecha_llegada + timedelta(days=d) for d in (0, 30, 60, 90)]
+        )
+        self.assertEqual(generar_calendario(self.lote, self.veterinario, tipos, hasta=hasta), [])
+
+    def test_barrido_emite_vencidas_y_proximas(self):
+        for dias, aplicada in ((-5, False), (2, False), (-1, True), (10, False)):
+            PlanVacunacion.objects.create(
+                lote=self.lote, tipo_vacuna=self.refuerzo, veterinario=self.veterinario,
+                fecha_programada=self.hoy + timedelta(days=dias), aplicada=aplicada,
+            )
+
+        barrido_alertas(dias=0)
+        barrido_alertas(dias=0)
+
+        alerta = AlertaSistema.objects.get(tipo_alerta='vacuna_pendiente')
+        self.assertEqual((alerta.lote, alerta.nivel, alerta.fecha_alerta), (self.lote, 'critica', self.hoy))
+        self.assertIn('vencida hace 5 días', alerta.mensaje)
+        self.assertIn('en 2 días', alerta.mensaje)
+        self.assertEqual(alerta.mensaje.count('Newcastle'), 2)
+
+    def test_calendario_mes_una_consulta(self):
+        generar_calendario(self.lote, self.veterinario, [self.refuerzo, self.unica])
+
+        with self.assertNumQueries(1):
+            semanas = calendario_mes(self.lote.fecha_llegada.year, self.lote.fecha_llegada.month)
+            dias = {dia['fecha']: [plan.tipo_vacuna.nombre for plan in dia['planes']] for semana in semanas for dia in semana}
+
+        self.assertEqual(sorted(dias[self.lote.fecha_llegada]), ['Marek', 'Newcastle'])
+        self.assertTrue(all(len(semana) == 7 for semana in semanas))
+
+    def test_vistas(self):
+        self.client.force_login(self.veterinario)
+        respuesta = self.client.post(reverse('aves:plan_vacunacion_generar'), {'lote': self.lote.pk})
+        self.assertRedirects(respuesta, reverse('aves:calendario_vacunacion'))
+        self.assertTrue(PlanVacunacion.objects.filter(lote=self.lote).exists())
+
+        respuesta = self.client.get(
+            reverse('aves:calendario_vacunacion'),
+            {'anio': self.lote.fecha_llegada.year, 'mes': self.lote.fecha_llegada.month}
+        )
+        self.assertContains(respuesta, 'L001: Marek')
+
+        # Años fuera del rango de date: se muestra el mes actual
+        for anio in ('0', '1', '9999', '10000', 'x'):
+            respuesta = self.client.get(reverse('aves:calendario_vacunacion'), {'anio': anio, 'mes': 12})
+            self.assertEqual(respuesta.status_code, 200)
+            self.assertEqual(respuesta.context['anio'], timezone.localdate().year)
@@ -15,6 +15,8 @@ urlpatterns = [
     # Bitácora diaria
     path('bitacora/', views.bitacora_list, name='bitacora_list'),
     path('bitacora/nueva/', views.bitacora_diaria_create, name='bitacora_create'),
+    path('bitacora/importar/', views.bitacora_importar, name='bitacora_importar'),
+    path('api/bitacoras/sincronizar/', views.api_sincronizar_bitacoras, name='api_sincronizar_bitacoras'),
     path('bitacora/<int:pk>/', views.bitacora_detail, name='bitacora_detail'),
     path('bitacora/<int:pk>/editar/', views.bitacora_edit, name='bitacora_edit'),
     
@@ -36,6 +38,8 @@ urlpatterns = [
     # Plan de vacunación
     path('vacunacion/', views.plan_vacunacion_list, name='plan_vacunacion_list'),
     path('vacunacion/nuevo/', views.plan_vacunacion_create, name='plan_vacunacion_create'),
+    path('vacunacion/calendario/', views.calendario_vacunacion, name='calendario_vacunacion'),
+    path('vacunacion/generar/', views.plan_vacunacion_generar, name='plan_vacunacion_generar'),
     path('vacunacion/<int:pk>/', views.plan_vacunacion_detail, name='plan_vacunacion_detail'),
     path('vacunacion/<int:pk>/aplicar/', views.plan_vacunacion_aplicar, name='plan_vacunacion_aplicar'),
     
@@ -55,6 +59,7 @@ urlpatterns = [
     path('reportes/vacunacion/', views_reports.reporte_salud_vacunacion, name='reporte_vacunacion'),
     path('reportes/comparativo-lotes/', views_reports.reporte_comparativo_lotes, name='reporte_comparativo_lotes'),
     path('reportes/sena/', views_reports.generar_reporte_sena, name='generar_reporte_sena'),
+    path('reportes/sena/lote/', views_reports.generar_reportes_sena_lote, name='generar_reportes_sena_lote'),
     path('reportes/exportar-completo/', views_reports.exportar_datos_completos, name='exportar_datos_completos'),
     path('api/datos-dashboard/', views_reports.api_datos_dashboard, name='api_datos_dashboard'),
 ]
\ No newline at end of file
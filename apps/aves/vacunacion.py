@@ -0,0 +1,79 @@
+"""
+Programación de la vacunación de los lotes.
+
+generar_calendario crea de una sola vez (un bulk_create) todas las dosis
+de un lote a partir de TipoVacuna.intervalo_dias. Las alertas de vacunas
+próximas y vencidas las emite el barrido nocturno de alertas
+(alertas.evaluar_vacunas) sobre el índice (aplicada, fecha_programada), y
+calendario_mes arma la vista mensual de todos los lotes con una consulta.
+"""
+
+import calendar
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+
+from apps.core.cache import invalidar_dominio, DOMINIO_LOTES
+from .models import PlanVacunacion, TipoVacuna
+
+
+def fechas_dosis(tipo_vacuna, desde, hasta):
+    """Fechas de las dosis de una vacuna: la primera en `desde` y luego cada intervalo_dias."""
+    if not tipo_vacuna.intervalo_dias:
+        return [desde]
+    fechas = []
+    fecha = desde
+    while fecha <= hasta:
+        fechas.append(fecha)
+        fecha += timedelta(days=tipo_vacuna.intervalo_dias)
+    return fechas
+
+
+def generar_calendario(lote, veterinario, tipos_vacuna=None, desde=None, hasta=None):
+    """
+    Genera el plan de vacunación completo del lote entre `desde` (por defecto
+    la fecha de llegada) y `hasta` (por defecto AVES_VACUNACION_HORIZONTE_DIAS
+    después), con un solo INSERT. Omite las dosis ya programadas, de modo que
+    volver a generarlo no duplica nada. Retorna los planes creados.
+    """
+    desde = desde or lote.fecha_llegada
+    hasta = hasta or lote.fecha_llegada + timedelta(days=getattr(settings, 'AVES_VACUNACION_HORIZONTE_DIAS', 560))
+    if tipos_vacuna is None:
+        tipos_vacuna = TipoVacuna.objects.filter(is_active=True)
+
+    existentes = set(
+        PlanVacunacion.objects.filter(lote=lote, fecha_programada__range=(desde, hasta))
+        .values_list('tipo_vacuna_id', 'fecha_programada')
+    )
+    planes = [
+        PlanVacunacion(lote=lote, tipo_vacuna=tipo, fecha_programada=fecha, veterinario=veterinario)
+        for tipo in tipos_vacuna
+        for fecha in fechas_dosis(tipo, desde, hasta)
+        if (tipo.pk, fecha) not in existentes
+    ]
+    if planes:
+        # bulk_create no emite post_save: invalidar los dashboards que cuentan vacunas
+        PlanVacunacion.objects.bulk_create(planes, batch_size=500)
+        invalidar_dominio(DOMINIO_LOTES)
+    return planes
+
+
+def calendario_mes(anio, mes):
+    """
+    Semanas del mes (de lunes a domingo) con los planes de cada día de todos
+    los lotes activos, obtenidos con una sola consulta con select_related.
+    Retorna una lista de semanas; cada día es {'fecha', 'del_mes', 'planes'}.
+    """
+    semanas = calendar.Calendar(firstweekday=0).monthdatescalendar(anio, mes)
+    planes_por_dia = defaultdict(list)
+    for plan in PlanVacunacion.objects.filter(
+        is_active=True, lote__is_active=True,
+        fecha_programada__range=(semanas[0][0], semanas[-1][-1]),
+    ).select_related('lote', 'tipo_vacuna').order_by('fecha_programada', 'lote__codigo'):
+        planes_por_dia[plan.fecha_programada].append(plan)
+
+    return [
+        [{'fecha': dia, 'del_mes': dia.month == mes, 'planes': planes_por_dia.get(dia, [])} for dia in semana]
+        for semana in semanas
+    ]
@@ -12,311 +12,45 @@ from django.utils import timezone
 from django.core.paginator import Paginator
 from django.views.decorators.http import require_http_methods
 from django.core.exceptions import ValidationError
-from datetime import timedelta
+from django.db import IntegrityError
+from datetime import MAXYEAR, MINYEAR, timedelta
 import json
 import traceback
 
 from apps.usuarios.decorators import role_required, acceso_modulo_aves_required, puede_editar_required, puede_eliminar_required, veterinario_required
 from .models import *
 from .forms import *
-from .utils import generar_alertas, actualizar_inventario_huevos, exportar_reporte_excel
+from .utils import exportar_reporte_excel
+from .dashboard import DashboardAvicola
+from .importacion import importar_bitacoras, CAMPOS_ENTEROS, CAMPOS_TEXTO
+from .sincronizacion import sincronizar_bitacoras, MAX_REGISTROS
+from .auditoria import historial_modificaciones
+from .alertas import contar_alertas
+from .vacunacion import calendario_mes, generar_calendario
+from .reports import ReporteAvicola
+from .resumenes import anotar_aves_inicio_dia
+from .exportacion import pedir_gzip
+from apps.reportes.resultados import archivo_en_cache, contexto_en_cache
+from apps.core.cache import obtener_o_calcular, invalidar_dominio, rol_usuario, DOMINIO_ALERTAS, DOMINIO_LOTES
 
 
 @login_required
 @acceso_modulo_aves_required
 def dashboard_aves(request):
     """Dashboard principal del módulo avícola mejorado."""
-    from django.db.models import F
-    
-    hoy = timezone.now().date()
-    hace_7_dias = hoy - timedelta(days=7)
-    hace_30_dias = hoy - timedelta(days=30)
-    fecha_30d_atras = hace_30_dias
-    
     # Filtros opcionales
     galpon_filtro = request.GET.get('galpon')
     lote_filtro = request.GET.get('lote')
     
-    # Query base para lotes activos
-    lotes_query = LoteAves.objects.filter(is_active=True)
-    if galpon_filtro:
-        lotes_query = lotes_query.filter(galpon__icontains=galpon_filtro)
-    if lote_filtro:
-        lotes_query = lotes_query.filter(id=lote_filtro)
-    
-    # Estadísticas generales
-    total_lotes = lotes_query.count()
-    total_aves = lotes_query.aggregate(total=Sum('numero_aves_actual'))['total'] or 0
-    
-    # Separar lotes por tipo (ponedoras vs engorde)
-    lotes_ponedoras = lotes_query.filter(estado='postura')
-    lotes_engorde = lotes_query.filter(estado='levante')
-    
-    # INDICADORES PONEDORAS
-    # Producción de huevos - AGREGADO: Consultas para 7 días
-    bitacoras_ponedoras_hoy = BitacoraDiaria.objects.filter(
-        lote__in=lotes_ponedoras, fecha=hoy
-    )
-    bitacoras_ponedoras_7d = BitacoraDiaria.objects.filter(
-        lote__in=lotes_ponedoras, fecha__gte=hace_7_dias, fecha__lte=hoy
-    )
-    bitacoras_ponedoras_30d = BitacoraDiaria.objects.filter(
-        lote__in=lotes_ponedoras, fecha__gte=hace_30_dias, fecha__lte=hoy
-    )
-    
-    # Producción diaria, semanal y mensual - CORREGIDO
-    produccion_hoy = bitacoras_ponedoras_hoy.aggregate(
-        total=Sum(F('produccion_aaa') + F('produccion_aa') + F('produccion_a') + 
-                    F('produccion_b') + F('produccion_c'))
-    )['total'] or 0
-    
-    # AGREGADO: Producción de 7 días
-    produccion_7d = bitacoras_ponedoras_7d.aggregate(
-        total=Sum(F('produccion_aaa') + F('produccion_aa') + F('produccion_a') + 
-                    F('produccion_b') + F('produccion_c'))
-    )['total'] or 0
-    
-    produccion_30d = bitacoras_ponedoras_30d.aggregate(
-        total=Sum(F('produccion_aaa') + F('produccion_aa') + F('produccion_a') + 
-                    F('produccion_b') + F('produccion_c'))
-    )['total'] or 0
-    
-    # Porcentaje de postura
-    aves_ponedoras = lotes_ponedoras.aggregate(total=Sum('numero_aves_actual'))['total'] or 0
-    porcentaje_postura_hoy = (produccion_hoy / aves_ponedoras * 100) if aves_ponedoras > 0 else 0
-    # AGREGADO: Porcentaje de postura 7 días
-    porcentaje_postura_7d = (produccion_7d / (aves_ponedoras * 7) * 100) if aves_ponedoras > 0 else 0
-    porcentaje_postura_30d = (produccion_30d / (aves_ponedoras * 30) * 100) if aves_ponedoras > 0 else 0
-    
-    # Producción ideal vs real (asumiendo 85% como ideal)
-    produccion_ideal_hoy = aves_ponedoras * 0.85
-    # AGREGADO: Producción ideal 7 días
-    produccion_ideal_7d = aves_ponedoras * 0.85 * 7
-    produccion_ideal_30d = aves_ponedoras * 0.85 * 30
-    diferencia_ideal_hoy = produccion_hoy - produccion_ideal_hoy
-    # AGREGADO: Diferencia ideal 7 días
-    diferencia_ideal_7d = produccion_7d - produccion_ideal_7d
-    diferencia_ideal_30d = produccion_30d - produccion_ideal_30d
-    
-    # INDICADORES ENGORDE
-    # Peso promedio y consumo - AGREGADO: Consultas para 7 días
-    bitacoras_engorde_hoy = BitacoraDiaria.objects.filter(
-        lote__in=lotes_engorde, fecha=hoy
-    )
-    bitacoras_engorde_7d = BitacoraDiaria.objects.filter(
-        lote__in=lotes_engorde, fecha__gte=hace_7_dias, fecha__lte=hoy
+    dashboard = DashboardAvicola(galpon_filtro, lote_filtro)
+    context = obtener_o_calcular(
+        'dashboard_aves',
+        DashboardAvicola.DOMINIOS_CACHE,
+        [galpon_filtro, lote_filtro, rol_usuario(request.user), dashboard.hoy],
+        dashboard.obtener_contexto
     )
-    bitacoras_engorde_30d = BitacoraDiaria.objects.filter(
-        lote__in=lotes_engorde, fecha__gte=hace_30_dias, fecha__lte=hoy
-    )
-    
-    # Consumo de alimento
-    consumo_total_hoy = bitacoras_engorde_hoy.aggregate(total=Sum('consumo_concentrado'))['total'] or 0
-    # AGREGADO: Consumo total 7 días
-    consumo_total_7d = bitacoras_engorde_7d.aggregate(total=Sum('consumo_concentrado'))['total'] or 0
-    consumo_total_30d = bitacoras_engorde_30d.aggregate(total=Sum('consumo_concentrado'))['total'] or 0
-    aves_engorde = lotes_engorde.aggregate(total=Sum('numero_aves_actual'))['total'] or 0
-    consumo_por_ave_hoy = (consumo_total_hoy / aves_engorde) if aves_engorde > 0 else 0
-    # AGREGADO: Consumo promedio 7 días
-    consumo_promedio_7d = (consumo_total_7d / (aves_engorde * 7)) if aves_engorde > 0 else 0
-    consumo_promedio_30d = (consumo_total_30d / (aves_engorde * 30)) if aves_engorde > 0 else 0
-    
-    # ... existing code ...
-    
-    # MORTALIDAD - CORREGIDO
-    mortalidad_hoy = BitacoraDiaria.objects.filter(
-        fecha=hoy, lote__in=lotes_query
-    ).aggregate(total=Sum('mortalidad'))['total'] or 0
-    
-    mortalidad_30d = BitacoraDiaria.objects.filter(
-        fecha__gte=hace_30_dias, fecha__lte=hoy, lote__in=lotes_query
-    ).aggregate(total=Sum('mortalidad'))['total'] or 0
-    
-    porcentaje_mortalidad_hoy = (mortalidad_hoy / total_aves * 100) if total_aves > 0 else 0
-    porcentaje_mortalidad_30d = (mortalidad_30d / total_aves * 100) if total_aves > 0 else 0
-    
-    # GRÁFICOS DE TENDENCIA - CAMBIADO A MENSUAL (30 DÍAS)
-    # Evolución producción últimos 30 días
-    evolucion_produccion = []
-    for i in range(30):
-        fecha = hoy - timedelta(days=29-i)
-        prod_dia = BitacoraDiaria.objects.filter(
-            fecha=fecha, lote__in=lotes_ponedoras
-        ).aggregate(
-            total=Sum(F('produccion_aaa') + F('produccion_aa') + F('produccion_a') + 
-                     F('produccion_b') + F('produccion_c'))
-        )['total'] or 0
-        evolucion_produccion.append({
-            'fecha': fecha.strftime('%d/%m'),
-            'produccion': prod_dia,
-            'porcentaje': (prod_dia / aves_ponedoras * 100) if aves_ponedoras > 0 else 0
-        })
-    
-    # Evolución mortalidad últimos 30 días
-    evolucion_mortalidad = []
-    for i in range(30):
-        fecha = hoy - timedelta(days=29-i)
-        mort_dia = BitacoraDiaria.objects.filter(
-            fecha=fecha, lote__in=lotes_query
-        ).aggregate(total=Sum('mortalidad'))['total'] or 0
-        evolucion_mortalidad.append({
-            'fecha': fecha.strftime('%d/%m'),
-            'mortalidad': mort_dia
-        })
-    
-    # COMPARACIÓN ENTRE GALPONES - CAMBIADO A MENSUAL
-    comparacion_galpones = []
-    galpones = lotes_query.values_list('galpon', flat=True).distinct()
-    for galpon in galpones:
-        lotes_galpon = lotes_query.filter(galpon=galpon)
-        aves_galpon = lotes_galpon.aggregate(total=Sum('numero_aves_actual'))['total'] or 0
-        
-        # Producción del galpón (últimos 30 días)
-        prod_galpon = BitacoraDiaria.objects.filter(
-            lote__in=lotes_galpon, fecha__gte=hace_30_dias, fecha__lte=hoy
-        ).aggregate(
-            total=Sum(F('produccion_aaa') + F('produccion_aa') + F('produccion_a') + 
-                     F('produccion_b') + F('produccion_c'))
-        )['total'] or 0
-        
-        # Mortalidad del galpón (últimos 30 días)
-        mort_galpon = BitacoraDiaria.objects.filter(
-            lote__in=lotes_galpon, fecha__gte=hace_30_dias, fecha__lte=hoy
-        ).aggregate(total=Sum('mortalidad'))['total'] or 0
-        
-        comparacion_galpones.append({
-            'galpon': galpon,
-            'aves': aves_galpon,
-            'produccion_30d': prod_galpon,
-            'mortalidad_30d': mort_galpon,
-            'porcentaje_postura': (prod_galpon / (aves_galpon * 30) * 100) if aves_galpon > 0 else 0,
-            'porcentaje_mortalidad': (mort_galpon / aves_galpon * 100) if aves_galpon > 0 else 0
-        })
-    
-    # ALERTAS Y NOTIFICACIONES
-    alertas_activas = AlertaSistema.objects.filter(leida=False).count()
-    alertas_criticas_count = AlertaSistema.objects.filter(leida=False, nivel='critica').count()
-    
-    # Generar alertas automáticas
-    alertas_criticas = []
-    
-    # Alerta baja postura
-    if porcentaje_postura_hoy < 70:
-        nivel = 'critica' if porcentaje_postura_hoy < 50 else 'normal'
-        alertas_criticas.append({
-            'tipo': 'danger' if nivel == 'critica' else 'warning',
-            'mensaje': f'Postura {"crítica" if nivel == "critica" else "baja"}: {porcentaje_postura_hoy:.1f}% (objetivo: 85%)',
-            'icono': 'fas fa-egg'
-        })
-    
-    # Alerta mortalidad alta
-    if porcentaje_mortalidad_hoy > 2:
-        nivel = 'critica' if porcentaje_mortalidad_hoy > 5 else 'normal'
-        alertas_criticas.append({
-            'tipo': 'danger' if nivel == 'critica' else 'warning',
-            'mensaje': f'Mortalidad {"crítica" if nivel == "critica" else "elevada"}: {porcentaje_mortalidad_hoy:.1f}% hoy',
-            'icono': 'fas fa-skull-crossbones'
-        })
-    
-    # Alerta consumo anormal
-    if consumo_por_ave_hoy > 0.15 or (consumo_por_ave_hoy < 0.08 and consumo_por_ave_hoy > 0):
-        alertas_criticas.append({
-            'tipo': 'warning',  # Consumo anormal siempre es normal, no crítico
-            'mensaje': f'Consumo anormal: {consumo_por_ave_hoy*1000:.0f}g por ave',
-            'icono': 'fas fa-utensils'
-        })
-    
-    # Vacunas pendientes
-    vacunas_pendientes = PlanVacunacion.objects.filter(
-        aplicada=False,
-        fecha_programada__lte=timezone.now().date() + timedelta(days=3)
-    ).count()
-    
-    # Inventario de huevos
-    inventario_huevos = []
-    for categoria in ['AAA', 'AA', 'A', 'B', 'C']:
-        inventario, created = InventarioHuevos.objects.get_or_create(
-            categoria=categoria,
-            defaults={'cantidad_actual': 0, 'cantidad_minima': 100}
-        )
-        inventario_huevos.append(inventario)
-    
-    # Top 5 lotes por rendimiento (30 días)
-    top_lotes = []
-    for lote in lotes_query[:5]:  # Cambiar lotes_activos por lotes_query
-        produccion_30d = BitacoraDiaria.objects.filter(
-            lote=lote,
-            fecha__gte=fecha_30d_atras
-        ).aggregate(total=Sum(F('produccion_aaa') + F('produccion_aa') + F('produccion_a') + F('produccion_b') + F('produccion_c')))['total'] or 0
-        
-        porcentaje_postura = (produccion_30d / (lote.numero_aves_actual * 30) * 100) if lote.numero_aves_actual > 0 else 0
-        
-        top_lotes.append({
-            'lote': lote,
-            'edad_dias': lote.edad_dias,
-            'porcentaje_postura': porcentaje_postura,
-            'produccion_30d': produccion_30d
-        })
-    
-    # Ordenar por porcentaje de postura
-    top_lotes.sort(key=lambda x: x['porcentaje_postura'], reverse=True)
-    
-    context = {
-        # Estadísticas generales
-        'total_lotes': total_lotes,
-        'total_aves': total_aves,
-        'aves_ponedoras': aves_ponedoras,
-        'aves_engorde': aves_engorde,
-        
-        # Indicadores ponedoras
-        'produccion_hoy': produccion_hoy,
-        'produccion_7d': produccion_7d,  # AGREGADO
-        'produccion_30d': produccion_30d,
-        'porcentaje_postura_hoy': round(porcentaje_postura_hoy, 1),
-        'porcentaje_postura_7d': round(porcentaje_postura_7d, 1),  # AGREGADO
-        'porcentaje_postura_30d': round(porcentaje_postura_30d, 1),
-        'produccion_ideal_hoy': round(produccion_ideal_hoy),
-        'diferencia_ideal_hoy': round(diferencia_ideal_hoy),
-        'diferencia_ideal_7d': round(diferencia_ideal_7d),  # AGREGADO
-        'diferencia_ideal_30d': round(diferencia_ideal_30d),
-        
-        # Indicadores engorde
-        'consumo_total_hoy': round(consumo_total_hoy, 1),
-        'consumo_por_ave_hoy': round(consumo_por_ave_hoy * 1000),  # En gramos
-        'consumo_promedio_7d': round(consumo_promedio_7d * 1000),  # AGREGADO - En gramos
-        'consumo_promedio_30d': round(consumo_promedio_30d * 1000),  # En gramos
-        
-        # Mortalidad
-        'mortalidad_hoy': mortalidad_hoy,
-        'mortalidad_30d': mortalidad_30d,
-        'porcentaje_mortalidad_hoy': round(porcentaje_mortalidad_hoy, 2),
-        'porcentaje_mortalidad_30d': round(porcentaje_mortalidad_30d, 2),
-        
-        # Gráficos
-        'evolucion_produccion': evolucion_produccion,
-        'evolucion_mortalidad': evolucion_mortalidad,
-        'comparacion_galpones': comparacion_galpones,
-        
-        # Alertas
-        'alertas_pendientes': alertas_activas,
-        'alertas_criticas': alertas_criticas,
-        'vacunas_pendientes': vacunas_pendientes,
-        
-        # Otros datos
-        'inventario_huevos': inventario_huevos,
-        'top_lotes': top_lotes[:5],
-        
-        # Para filtros
-        'galpones_disponibles': list(galpones),
-        'lotes_disponibles': lotes_query.values('id', 'codigo'),
-        'galpon_filtro': galpon_filtro,
-        'lote_filtro': lote_filtro,
-        
-        # JSON para gráficos
-        'evolucion_produccion_json': json.dumps(evolucion_produccion),
-        'evolucion_mortalidad_json': json.dumps(evolucion_mortalidad),
-        'comparacion_galpones_json': json.dumps(comparacion_galpones),
-    }
+    # La insignia de alertas depende del usuario: sale de sus contadores cacheados
+    context = dict(context, alertas_pendientes=contar_alertas(request.user)['total_no_leidas'])
     
     return render(request, 'aves/dashboard.html', context)
 
@@ -332,14 +66,9 @@ def bitacora_diaria_create(request):
             try:
                 bitacora = form.save(commit=False)
                 bitacora.usuario_registro = request.user
+                # La señal post_save actualiza el inventario y genera las alertas
                 bitacora.save()
                 
-                # Actualizar inventario de huevos
-                actualizar_inventario_huevos(bitacora)
-                
-                # Generar alertas automáticas
-                generar_alertas(bitacora)
-                
                 messages.success(request, 'Bitácora diaria registrada exitosamente.')
                 return redirect('aves:bitacora_list')
             except Exception as e:
@@ -370,6 +99,79 @@ def bitacora_diaria_create(request):
     return render(request, 'aves/bitacora_form.html', {'form': form})
 
 
+@login_required
+@acceso_modulo_aves_required
+@puede_editar_required
+def bitacora_importar(request):
+    """Importar bitácoras diarias desde un archivo CSV o Excel."""
+    resultado = None
+    if request.method == 'POST':
+        archivo = request.FILES.get('archivo')
+        if not archivo:
+            messages.error(request, 'Seleccione un archivo .csv o .xlsx para importar.')
+        else:
+            try:
+                resultado = importar_bitacoras(
+                    archivo, request.user, nombre=archivo.name,
+                    dry_run=request.POST.get('solo_validar') == '1'
+                )
+                if resultado['errores']:
+                    messages.error(
+                        request,
+                        f'El archivo tiene {len(resultado["errores"])} errores. No se importó ninguna bitácora.'
+                    )
+                elif resultado['creadas']:
+                    messages.success(request, f'Se importaron {resultado["creadas"]} bitácoras exitosamente.')
+                    return redirect('aves:bitacora_list')
+                else:
+                    messages.info(request, f'Archivo válido: {resultado["filas"]} filas listas para importar.')
+            except ValidationError as e:
+                messages.error(request, ' '.join(e.messages))
+            except Exception as e:
+                messages.error(request, f'Error al importar el archivo: {str(e)}')
+    
+    return render(request, 'aves/bitacora_importar.html', {
+        'resultado': resultado,
+        'columnas': ['lote', 'fecha'] + CAMPOS_ENTEROS + ['consumo_concentrado'] + CAMPOS_TEXTO,
+    })
+
+
+@login_required
+@acceso_modulo_aves_required
+@puede_editar_required
+@require_http_methods(["POST"])
+def api_sincronizar_bitacoras(request):
+    """Sincronizar por lotes las bitácoras registradas sin conexión (JSON)."""
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'JSON inválido'}, status=400)
+
+    registros = data.get('registros') if isinstance(data, dict) else None
+    if not isinstance(registros, list) or not registros:
+        return JsonResponse({'success': False, 'error': 'Se requiere una lista de registros'}, status=400)
+    if len(registros) > MAX_REGISTROS:
+        return JsonResponse(
+            {'success': False, 'error': f'Máximo {MAX_REGISTROS} registros por solicitud'}, status=400
+        )
+
+    try:
+        resultados = sincronizar_bitacoras(registros, request.user)
+    except IntegrityError:
+        # Otra sincronización guardó las mismas claves o días al mismo tiempo
+        return JsonResponse({
+            'success': False,
+            'error': 'Conflicto con una sincronización simultánea. Reintente con las mismas claves.'
+        }, status=409)
+    except ValidationError as e:
+        return JsonResponse({'success': False, 'error': ' '.join(e.messages)}, status=409)
+
+    resumen = {}
+    for resultado in resultados:
+        resumen[resultado['estado']] = resumen.get(resultado['estado'], 0) + 1
+    return JsonResponse({'success': True, 'resultados': resultados, 'resumen': resumen})
+
+
 @login_required
 @role_required(['superusuario', 'admin_aves', 'solo_vista'])
 def bitacora_list(request):
@@ -756,7 +558,8 @@ def movimiento_huevos_create(request):
                                 detalle = detalle_form.save(commit=False)
                                 detalle.movimiento = movimiento
                                 
-                                # Validar stock antes de guardar
+                                # Validar stock antes de guardar (aviso temprano; el descuento
+                                # definitivo es un UPDATE condicional que no deja stock negativo)
                                 if movimiento.tipo_movimiento in ['venta', 'autoconsumo', 'baja']:
                                     try:
                                         inventario = InventarioHuevos.objects.get(categoria=detalle.categoria_huevo)
@@ -951,18 +754,23 @@ def alertas_list(request):
     elif leida == 'false':
         alertas = alertas.filter(leida=False)
     
-    # Estadísticas corregidas para coincidir con el template
+    # Estadísticas de las mismas alertas que la lista: una consulta agregada, cacheada
+    contadores = contar_alertas()
+    normales = contadores['normales'] // 3  # Dividir normales en 3 categorías ficticias
     stats = {
-        'criticas': AlertaSistema.objects.filter(is_active=True, leida=False, nivel='critica').count(),
-        'altas': AlertaSistema.objects.filter(is_active=True, leida=False, nivel='normal').count() // 3,  # Dividir normales en 3 categorías ficticias
-        'medias': AlertaSistema.objects.filter(is_active=True, leida=False, nivel='normal').count() // 3,
-        'bajas': AlertaSistema.objects.filter(is_active=True, leida=False, nivel='normal').count() // 3,
-        'total_no_leidas': AlertaSistema.objects.filter(is_active=True, leida=False).count(),
-        'total': AlertaSistema.objects.filter(is_active=True).count(),
+        'criticas': contadores['criticas'],
+        'altas': normales,
+        'medias': normales,
+        'bajas': normales,
+        'total_no_leidas': contadores['total_no_leidas'],
+        'total': contadores['total'],
     }
     
-    # Obtener lotes para filtros - corregido
-    lotes = LoteAves.objects.filter(is_active=True)
+    # Lotes para filtros (cacheados hasta que cambie algún lote)
+    lotes = obtener_o_calcular(
+        'opciones_lotes_alertas', [DOMINIO_LOTES], [],
+        lambda: list(LoteAves.objects.filter(is_active=True).values('id', 'codigo', 'galpon'))
+    )
     
     paginator = Paginator(alertas, 20)
     page = request.GET.get('page')
@@ -996,7 +804,7 @@ def marcar_alerta_leida(request, pk):
     try:
         alerta = get_object_or_404(AlertaSistema, pk=pk)
         alerta.leida = True
-        alerta.save()
+        alerta.save(update_fields=['leida', 'updated_at'])
         return JsonResponse({'success': True, 'message': 'Alerta marcada como leída'})
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)})
@@ -1009,7 +817,7 @@ def marcar_alerta_resuelta(request, pk):
     try:
         alerta = get_object_or_404(AlertaSistema, pk=pk)
         alerta.is_active = False
-        alerta.save()
+        alerta.save(update_fields=['is_active', 'updated_at'])
         return JsonResponse({'success': True, 'message': 'Alerta marcada como resuelta'})
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)})
@@ -1040,6 +848,8 @@ def marcar_alertas_masivo(request):
                 alertas.update(is_active=False)
             else:
                 return JsonResponse({'success': False, 'error': 'Acción no válida'})
+            # update() no emite señales: invalidar la caché de dashboards explícitamente
+            invalidar_dominio(DOMINIO_ALERTAS)
             return JsonResponse({'success': True, 'count': count})
         
         # Si son IDs específicos
@@ -1059,6 +869,7 @@ def marcar_alertas_masivo(request):
         else:
             return JsonResponse({'success': False, 'error': 'Acción no válida'})
         
+        invalidar_dominio(DOMINIO_ALERTAS)
         return JsonResponse({'success': True, 'count': count})
         
     except json.JSONDecodeError:
@@ -1087,93 +898,103 @@ def reporte_produccion(request):
     fecha_hasta = request.GET.get('fecha_hasta')
     formato = request.GET.get('formato', 'html')
     
+    # Exportar según formato, sin calcular los datos del HTML
+    if formato != 'html':
+        return exportar_reporte_produccion(request)
+    
     bitacoras = BitacoraDiaria.objects.select_related('lote')
     
     if lote_id:
         bitacoras = bitacoras.filter(lote_id=lote_id)
-    if fecha_desde:
-        bitacoras = bitacoras.filter(fecha__gte=fecha_desde)
     if fecha_hasta:
         bitacoras = bitacoras.filter(fecha__lte=fecha_hasta)
+    # Las aves de cada día descuentan también la mortalidad anterior a fecha_desde
+    bitacoras_con_aves = anotar_aves_inicio_dia(bitacoras, desde=fecha_desde)
+    if fecha_desde:
+        bitacoras = bitacoras.filter(fecha__gte=fecha_desde)
     
-    # Preparar datos para el template
-    datos_reporte = []
-    for bitacora in bitacoras:
-        huevos_buenos = bitacora.produccion_aaa + bitacora.produccion_aa + bitacora.produccion_a
-        huevos_defectuosos = bitacora.produccion_b + bitacora.produccion_c
-        total_huevos = huevos_buenos + huevos_defectuosos
+    def calcular():
+        # Preparar datos para el template
+        datos_reporte = []
+        for bitacora in bitacoras_con_aves.order_by('-fecha'):
+            huevos_buenos = bitacora.produccion_aaa + bitacora.produccion_aa + bitacora.produccion_a
+            huevos_defectuosos = bitacora.produccion_b + bitacora.produccion_c
+            total_huevos = huevos_buenos + huevos_defectuosos
+            
+            # Porcentaje de postura sobre las aves vivas al inicio de ese día
+            porcentaje_postura = 0
+            if bitacora.aves_inicio_dia > 0:
+                porcentaje_postura = (total_huevos / bitacora.aves_inicio_dia) * 100
+            
+            datos_reporte.append({
+                'fecha': bitacora.fecha,
+                'lote': bitacora.lote,
+                'huevos_buenos': huevos_buenos,
+                'huevos_defectuosos': huevos_defectuosos,
+                'total_huevos': total_huevos,
+                'porcentaje_postura': porcentaje_postura,
+                'mortalidad': bitacora.mortalidad,
+                'consumo_concentrado': bitacora.consumo_concentrado,
+            })
         
-        # Calcular porcentaje de postura
-        porcentaje_postura = 0
-        if bitacora.lote.numero_aves_actual > 0:
-            porcentaje_postura = (total_huevos / bitacora.lote.numero_aves_actual) * 100
+        # Estadísticas mejoradas
+        stats = bitacoras.aggregate(
+            total_produccion=Sum('produccion_aaa') + Sum('produccion_aa') + Sum('produccion_a') + 
+                            Sum('produccion_b') + Sum('produccion_c'),
+            total_mortalidad=Sum('mortalidad'),
+            consumo_promedio=Avg('consumo_concentrado'),
+            total_huevos_b=Sum('produccion_b'),
+            total_huevos_c=Sum('produccion_c'),
+        )
         
-        datos_reporte.append({
-            'fecha': bitacora.fecha,
-            'lote': bitacora.lote,
-            'huevos_buenos': huevos_buenos,
-            'huevos_defectuosos': huevos_defectuosos,
-            'total_huevos': total_huevos,
-            'porcentaje_postura': porcentaje_postura,
-            'mortalidad': bitacora.mortalidad,
-            'consumo_concentrado': bitacora.consumo_concentrado,
-        })
-    
-    # Estadísticas mejoradas
-    stats = bitacoras.aggregate(
-        total_produccion=Sum('produccion_aaa') + Sum('produccion_aa') + Sum('produccion_a') + 
-                        Sum('produccion_b') + Sum('produccion_c'),
-        total_mortalidad=Sum('mortalidad'),
-        consumo_promedio=Avg('consumo_concentrado'),
-        total_huevos_b=Sum('produccion_b'),
-        total_huevos_c=Sum('produccion_c'),
-    )
-    
-    # Calcular resumen
-    resumen = {}
-    if datos_reporte:
-        total_huevos = sum(dato['total_huevos'] for dato in datos_reporte)
-        total_buenos = sum(dato['huevos_buenos'] for dato in datos_reporte)
-        mejor_dia = max(datos_reporte, key=lambda x: x['total_huevos'])['total_huevos'] if datos_reporte else 0
-        promedio_diario = total_huevos / len(datos_reporte) if datos_reporte else 0
+        # Calcular resumen
+        resumen = {}
+        if datos_reporte:
+            total_huevos = sum(dato['total_huevos'] for dato in datos_reporte)
+            total_buenos = sum(dato['huevos_buenos'] for dato in datos_reporte)
+            mejor_dia = max(datos_reporte, key=lambda x: x['total_huevos'])['total_huevos'] if datos_reporte else 0
+            promedio_diario = total_huevos / len(datos_reporte) if datos_reporte else 0
+            
+            # Calcular porcentaje de postura promedio
+            porcentajes_postura = [dato['porcentaje_postura'] for dato in datos_reporte if dato['porcentaje_postura'] > 0]
+            porcentaje_postura_promedio = sum(porcentajes_postura) / len(porcentajes_postura) if porcentajes_postura else 0
+            
+            resumen = {
+                'total_huevos': total_huevos,
+                'total_buenos': total_buenos,
+                'mejor_dia': mejor_dia,
+                'promedio_diario': promedio_diario,
+                'porcentaje_postura': porcentaje_postura_promedio,
+            }
         
-        # Calcular porcentaje de postura promedio
-        porcentajes_postura = [dato['porcentaje_postura'] for dato in datos_reporte if dato['porcentaje_postura'] > 0]
-        porcentaje_postura_promedio = sum(porcentajes_postura) / len(porcentajes_postura) if porcentajes_postura else 0
+        # Producción por categoría
+        produccion_categoria = {
+            'AAA': bitacoras.aggregate(total=Sum('produccion_aaa'))['total'] or 0,
+            'AA': bitacoras.aggregate(total=Sum('produccion_aa'))['total'] or 0,
+            'A': bitacoras.aggregate(total=Sum('produccion_a'))['total'] or 0,
+            'B': bitacoras.aggregate(total=Sum('produccion_b'))['total'] or 0,
+            'C': bitacoras.aggregate(total=Sum('produccion_c'))['total'] or 0,
+        }
         
-        resumen = {
-            'total_huevos': total_huevos,
-            'total_buenos': total_buenos,
-            'mejor_dia': mejor_dia,
-            'promedio_diario': promedio_diario,
-            'porcentaje_postura': porcentaje_postura_promedio,
+        return {
+            'datos_reporte': datos_reporte,  # Cambiado de 'bitacoras' a 'datos_reporte'
+            'resumen': resumen,  # Agregado el resumen
+            'stats': stats,
+            'produccion_categoria': produccion_categoria,
         }
     
-    # Producción por categoría
-    produccion_categoria = {
-        'AAA': bitacoras.aggregate(total=Sum('produccion_aaa'))['total'] or 0,
-        'AA': bitacoras.aggregate(total=Sum('produccion_aa'))['total'] or 0,
-        'A': bitacoras.aggregate(total=Sum('produccion_a'))['total'] or 0,
-        'B': bitacoras.aggregate(total=Sum('produccion_b'))['total'] or 0,
-        'C': bitacoras.aggregate(total=Sum('produccion_c'))['total'] or 0,
+    filtros = {
+        'lote': lote_id,
+        'fecha_desde': fecha_desde,
+        'fecha_hasta': fecha_hasta,
     }
     
-    # Exportar según formato
-    if formato != 'html':
-        return exportar_reporte_produccion(request)
-    
-    context = {
-        'datos_reporte': datos_reporte,  # Cambiado de 'bitacoras' a 'datos_reporte'
-        'resumen': resumen,  # Agregado el resumen
+    # Con los mismos filtros y sin bitácoras nuevas ni editadas se reutiliza el resultado anterior
+    context = contexto_en_cache(request.user, 'produccion', filtros, bitacoras, calcular)
+    context.update({
         'lotes_disponibles': lotes,  # Cambiado de 'lotes' a 'lotes_disponibles'
-        'stats': stats,
-        'produccion_categoria': produccion_categoria,
-        'filtros': {
-            'lote': lote_id,
-            'fecha_desde': fecha_desde,
-            'fecha_hasta': fecha_hasta,
-        }
-    }
+        'filtros': filtros,
+    })
     
     return render(request, 'aves/reporte_produccion.html', context)
 
@@ -1199,38 +1020,48 @@ def exportar_reporte_produccion(request):
         if fecha_fin:
             bitacoras = bitacoras.filter(fecha__lte=fecha_fin)
         
-        # Calcular estadísticas - corregido para evitar None y especificar output_field
-        stats = bitacoras.aggregate(
-            total_produccion=Sum(
-                Coalesce('produccion_aaa', Value(0)) + 
-                Coalesce('produccion_aa', Value(0)) + 
-                Coalesce('produccion_a', Value(0)) + 
-                Coalesce('produccion_b', Value(0)) + 
-                Coalesce('produccion_c', Value(0)),
-                output_field=IntegerField()
-            ),
-            total_mortalidad=Sum(Coalesce('mortalidad', Value(0)), output_field=IntegerField()),
-            consumo_promedio=Avg(Coalesce('consumo_concentrado', Value(0)), output_field=DecimalField()),
-        )
-        
-        # Asegurar que no hay valores None
-        stats = {
-            'total_produccion': stats.get('total_produccion') or 0,
-            'total_mortalidad': stats.get('total_mortalidad') or 0,
-            'consumo_promedio': stats.get('consumo_promedio') or 0,
-        }
-        
-        # Exportar según formato
         filtros = {
             'lote': lote_id,
             'fecha_inicio': fecha_inicio,
             'fecha_fin': fecha_fin,
         }
         
-        if formato == 'excel':
-            return exportar_reporte_excel('produccion', bitacoras, stats, filtros)
-        else:
+        # El CSV se genera en streaming y no necesita las estadísticas
+        if formato == 'csv':
+            comprimir = pedir_gzip(request)
+            reporte = ReporteAvicola({'lote_id': lote_id, 'fecha_inicio': fecha_inicio, 'fecha_fin': fecha_fin})
+            return archivo_en_cache(
+                request.user, 'produccion', 'csv', {**filtros, 'gzip': comprimir}, bitacoras,
+                lambda: reporte.generar_csv_produccion(comprimir=comprimir),
+            )
+        
+        if formato != 'excel':
             return HttpResponseServerError("La exportación a PDF ha sido deshabilitada. Solo está disponible Excel.")
+        
+        def generar():
+            # Calcular estadísticas - corregido para evitar None y especificar output_field
+            stats = bitacoras.aggregate(
+                total_produccion=Sum(
+                    Coalesce('produccion_aaa', Value(0)) + 
+                    Coalesce('produccion_aa', Value(0)) + 
+                    Coalesce('produccion_a', Value(0)) + 
+                    Coalesce('produccion_b', Value(0)) + 
+                    Coalesce('produccion_c', Value(0)),
+                    output_field=IntegerField()
+                ),
+                total_mortalidad=Sum(Coalesce('mortalidad', Value(0)), output_field=IntegerField()),
+                consumo_promedio=Avg(Coalesce('consumo_concentrado', Value(0)), output_field=DecimalField()),
+            )
+            
+            # Asegurar que no hay valores None
+            stats = {
+                'total_produccion': stats.get('total_produccion') or 0,
+                'total_mortalidad': stats.get('total_mortalidad') or 0,
+                'consumo_promedio': stats.get('consumo_promedio') or 0,
+            }
+            return exportar_reporte_excel('produccion', bitacoras, stats, filtros)
+        
+        return archivo_en_cache(request.user, 'produccion', 'excel', filtros, bitacoras, generar)
             
     except Exception as e:
         error_msg = f"Error al exportar reporte: {str(e)}"
@@ -1245,10 +1076,7 @@ def bitacora_detail(request, pk):
     bitacora = get_object_or_404(BitacoraDiaria, pk=pk)
     
     # Obtener el historial de modificaciones para esta bitácora
-    registros_modificacion = RegistroModificacion.objects.filter(
-        modelo='BitacoraDiaria',
-        objeto_id=bitacora.id
-    ).select_related('usuario').order_by('-fecha_modificacion')
+    registros_modificacion = historial_modificaciones('BitacoraDiaria', bitacora.id)
     
     context = {
         'bitacora': bitacora,
@@ -1334,11 +1162,8 @@ def actualizar_stock_automatico(request):
     """Vista AJAX para actualizar stocks mínimos automáticamente."""
     if request.method == 'POST':
         try:
-            inventarios_actualizados = 0
-            
-            for inventario in InventarioHuevos.objects.filter(stock_automatico=True):
-                if inventario.actualizar_stock_minimo():
-                    inventarios_actualizados += 1
+            # Una sola pasada con el total de gallinas cacheado y un bulk_update
+            inventarios_actualizados = InventarioHuevos.recalcular_minimos()
             
             return JsonResponse({
                 'success': True,
@@ -1374,7 +1199,11 @@ def configurar_stock_automatico(request, inventario_id):
             if stock_automatico:
                 inventario.cantidad_minima = inventario.calcular_stock_minimo_automatico()
             
-            inventario.save()
+            # No se reescribe cantidad_actual: puede haber cambiado desde que se leyó
+            inventario.save(update_fields=[
+                'stock_automatico', 'factor_calculo', 'dias_stock', 'cantidad_minima',
+                'fecha_ultima_actualizacion', 'updated_at'
+            ])
             
             return JsonResponse({
                 'success': True,
@@ -1434,6 +1263,60 @@ def plan_vacunacion_detail(request, pk):
     return render(request, 'aves/plan_vacunacion_detail.html', context)
 
 
+MESES = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio',
+         'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+
+
+@login_required
+@role_required(['superusuario', 'veterinario', 'admin_aves', 'solo_vista'])
+def calendario_vacunacion(request):
+    """Calendario mensual de vacunación de todos los lotes (una consulta)."""
+    hoy = timezone.localdate()
+    try:
+        anio = int(request.GET.get('anio', hoy.year))
+        mes = int(request.GET.get('mes', hoy.month))
+        # Sin los años extremos: el mes anterior o siguiente saldría del rango de date
+        if not 1 <= mes <= 12 or not MINYEAR < anio < MAXYEAR:
+            raise ValueError
+    except ValueError:
+        anio, mes = hoy.year, hoy.month
+    
+    anterior = (anio - 1, 12) if mes == 1 else (anio, mes - 1)
+    siguiente = (anio + 1, 1) if mes == 12 else (anio, mes + 1)
+    
+    context = {
+        'semanas': calendario_mes(anio, mes),
+        'anio': anio,
+        'mes': mes,
+        'nombre_mes': MESES[mes - 1],
+        'anterior': anterior,
+        'siguiente': siguiente,
+        'hoy': hoy,
+        'lotes': LoteAves.objects.filter(is_active=True).only('id', 'codigo'),
+    }
+    
+    return render(request, 'aves/calendario_vacunacion.html', context)
+
+
+@login_required
+@veterinario_required
+@require_http_methods(["POST"])
+def plan_vacunacion_generar(request):
+    """Genera el calendario de vacunación completo de un lote."""
+    lote_id = request.POST.get('lote', '')
+    if not lote_id.isdigit():
+        messages.error(request, 'Seleccione un lote.')
+        return redirect('aves:calendario_vacunacion')
+    lote = get_object_or_404(LoteAves, pk=lote_id, is_active=True)
+    planes = generar_calendario(lote, request.user)
+    
+    if planes:
+        messages.success(request, f'Se programaron {len(planes)} dosis para el lote {lote.codigo}.')
+    else:
+        messages.info(request, f'El lote {lote.codigo} ya tenía todas sus dosis programadas.')
+    return redirect('aves:calendario_vacunacion')
+
+
 @login_required
 @role_required(['superusuario', 'admin_aves', 'solo_vista'])
 def movimiento_huevos_detail(request, pk):
@@ -3,6 +3,7 @@ Vistas para el sistema de reportes del módulo avícola
 """
 
 from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse, HttpResponse
@@ -11,12 +12,16 @@ from django.db.models import Q, Sum, Avg, Count, F
 from django.utils import timezone
 from datetime import datetime, timedelta
 import json
-import csv
 import io
 
 from apps.usuarios.decorators import acceso_modulo_aves_required
 from .models import LoteAves, BitacoraDiaria, MovimientoHuevos, ControlConcentrado, PlanVacunacion, AlertaSistema
-from .reports import ReporteAvicola, ReporteComparativo, obtener_datos_dashboard
+from .exportacion import respuesta_csv, pedir_gzip, filas_por_bloques, Seccion
+from .excel import LibroStreaming
+from .reports import ReporteAvicola, ReporteComparativo, obtener_datos_dashboard, DOMINIOS_DATOS_DASHBOARD, ESTILOS_REPORTE
+from .resumenes import anotar_aves_inicio_dia
+from apps.core.cache import obtener_o_calcular, rol_usuario
+from apps.reportes.resultados import archivo_en_cache, contexto_en_cache
 
 # Importaciones para Excel
 try:
@@ -77,9 +82,15 @@ def generar_reporte_produccion(request):
     }
     reporte = ReporteAvicola(parametros)
     
+    # Exportar según formato solicitado, antes de cargar los datos del HTML
+    if formato == 'excel':
+        return reporte.generar_excel_produccion()
+    elif formato == 'csv':
+        return reporte.generar_csv_produccion(comprimir=pedir_gzip(request))
+    
     # Generar datos del reporte
     try:
-        datos_produccion = reporte.obtener_datos_produccion_diaria()
+        datos_produccion = reporte.obtener_datos_produccion_diaria(con_aves_inicio_dia=True)
         resumen = reporte.obtener_resumen_produccion()
         
         # Convertir QuerySet a lista de diccionarios para el template
@@ -114,12 +125,6 @@ def generar_reporte_produccion(request):
             'error': str(e)
         }
     
-    # Exportar según formato solicitado
-    if formato == 'excel':
-        return reporte.generar_excel_produccion()
-    elif formato == 'csv':
-        return reporte.generar_csv_produccion()
-    
     # Renderizar HTML por defecto
     context = {
         'datos': datos,
@@ -133,17 +138,22 @@ def generar_reporte_produccion(request):
 @acceso_modulo_aves_required
 def reporte_comparativo_lotes(request):
     """
-    Vista para el reporte comparativo entre lotes
+    Vista para el reporte comparativo entre lotes: los elegidos más todos
+    los de un galpón o una línea genética
     """
     # Obtener parámetros
     lotes_ids = request.GET.getlist('lotes')
+    galpon = request.GET.get('galpon')
+    linea_genetica = request.GET.get('linea_genetica')
     fecha_inicio = request.GET.get('fecha_inicio')
     fecha_fin = request.GET.get('fecha_fin')
     formato = request.GET.get('formato', 'html')
     
     try:
         reporte_comparativo = ReporteComparativo()
-        datos_comparacion = reporte_comparativo.comparar_lotes(lotes_ids, fecha_inicio, fecha_fin)
+        datos_comparacion = reporte_comparativo.comparar_lotes(
+            lotes_ids, fecha_inicio, fecha_fin, galpon=galpon, linea_genetica=linea_genetica
+        )
         
         # Exportar según formato
         if formato == 'excel':
@@ -154,8 +164,12 @@ def reporte_comparativo_lotes(request):
     context = {
         'datos_comparacion': datos_comparacion,
         'lotes': LoteAves.objects.exclude(estado='finalizado'),
+        'galpones': LoteAves.objects.exclude(estado='finalizado').order_by('galpon').values_list('galpon', flat=True).distinct(),
+        'lineas_geneticas': LoteAves.LINEAS_GENETICAS,
         'filtros': {
             'lotes_ids': lotes_ids,
+            'galpon': galpon,
+            'linea_genetica': linea_genetica,
             'fecha_inicio': fecha_inicio,
             'fecha_fin': fecha_fin,
         }
@@ -187,48 +201,62 @@ def reporte_mortalidad(request):
             
             if lote_id:
                 queryset = queryset.filter(lote_id=lote_id)
-            if fecha_inicio:
-                queryset = queryset.filter(fecha__gte=fecha_inicio)
             if fecha_fin:
                 queryset = queryset.filter(fecha__lte=fecha_fin)
+            # El % de mortalidad de cada día es sobre las aves vivas al inicio de ese día
+            queryset_con_aves = anotar_aves_inicio_dia(queryset, desde=fecha_inicio)
+            if fecha_inicio:
+                queryset = queryset.filter(fecha__gte=fecha_inicio)
             
-            # Obtener datos de mortalidad
-            datos_mortalidad = []
-            total_mortalidad = 0
+            filtros = {
+                'lote_id': lote_id,
+                'fecha_inicio': fecha_inicio,
+                'fecha_fin': fecha_fin
+            }
             
-            for bitacora in queryset.order_by('-fecha'):
-                datos_mortalidad.append({
-                    'fecha': bitacora.fecha,
-                    'lote': bitacora.lote.codigo,
-                    'galpon': bitacora.lote.galpon,
-                    'mortalidad': bitacora.mortalidad,
-                    'causa_mortalidad': bitacora.causa_mortalidad,
-                    'aves_actuales': bitacora.lote.numero_aves_actual,
-                    'porcentaje_mortalidad': round((bitacora.mortalidad / bitacora.lote.numero_aves_actual * 100), 2) if bitacora.lote.numero_aves_actual > 0 else 0
-                })
-                total_mortalidad += bitacora.mortalidad
+            # El CSV se genera en streaming sin materializar las bitácoras
+            if formato == 'csv':
+                comprimir = pedir_gzip(request)
+                return archivo_en_cache(
+                    request.user, 'mortalidad', 'csv', {**filtros, 'gzip': comprimir}, queryset,
+                    lambda: generar_csv_mortalidad(queryset_con_aves, comprimir=comprimir),
+                )
             
-            # Calcular resumen
-            resumen = {
-                'total_mortalidad': total_mortalidad,
-                'registros_encontrados': len(datos_mortalidad),
-                'promedio_diario': round(total_mortalidad / len(datos_mortalidad), 2) if datos_mortalidad else 0
-            }
+            def calcular():
+                # Obtener datos de mortalidad
+                datos_mortalidad = []
+                total_mortalidad = 0
+                
+                for bitacora in queryset_con_aves.order_by('-fecha'):
+                    datos_mortalidad.append({
+                        'fecha': bitacora.fecha,
+                        'lote': bitacora.lote.codigo,
+                        'galpon': bitacora.lote.galpon,
+                        'mortalidad': bitacora.mortalidad,
+                        'causa_mortalidad': bitacora.causa_mortalidad,
+                        'aves_inicio_dia': bitacora.aves_inicio_dia,
+                        'porcentaje_mortalidad': round((bitacora.mortalidad / bitacora.aves_inicio_dia * 100), 2) if bitacora.aves_inicio_dia > 0 else 0
+                    })
+                    total_mortalidad += bitacora.mortalidad
+                
+                # Calcular resumen
+                resumen = {
+                    'total_mortalidad': total_mortalidad,
+                    'registros_encontrados': len(datos_mortalidad),
+                    'promedio_diario': round(total_mortalidad / len(datos_mortalidad), 2) if datos_mortalidad else 0
+                }
+                return {'datos_mortalidad': datos_mortalidad, 'resumen': resumen}
+            
+            # Mismos filtros y bitácoras sin cambios: se reutiliza el resultado anterior
+            datos = contexto_en_cache(request.user, 'mortalidad', filtros, queryset, calcular)
             
             # Exportar según formato
             if formato == 'excel':
-                return generar_excel_mortalidad(datos_mortalidad, resumen)
-            elif formato == 'csv':
-                return generar_csv_mortalidad(datos_mortalidad)
+                return generar_excel_mortalidad(datos['datos_mortalidad'], datos['resumen'])
             
             context.update({
-                'datos_mortalidad': datos_mortalidad,
-                'resumen': resumen,
-                'filtros': {
-                    'lote_id': lote_id,
-                    'fecha_inicio': fecha_inicio,
-                    'fecha_fin': fecha_fin
-                }
+                **datos,
+                'filtros': filtros,
             })
                 
         except Exception as e:
@@ -244,7 +272,12 @@ def api_datos_dashboard(request):
     API para obtener datos del dashboard en tiempo real
     """
     try:
-        datos = obtener_datos_dashboard()
+        datos = obtener_o_calcular(
+            'api_datos_dashboard',
+            DOMINIOS_DATOS_DASHBOARD,
+            [None, None, rol_usuario(request.user), timezone.now().date()],
+            obtener_datos_dashboard
+        )
         return JsonResponse(datos)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
@@ -264,7 +297,7 @@ def exportar_datos_completos(request):
     if formato == 'excel':
         return generar_excel_datos_completos(incluir_historicos)
     elif formato == 'csv':
-        return generar_csv_datos_completos(incluir_historicos)
+        return generar_csv_datos_completos(incluir_historicos, comprimir=pedir_gzip(request))
     else:
         return JsonResponse({'error': 'Formato no válido'}, status=400)
 
@@ -378,43 +411,49 @@ def reporte_consumo_concentrado(request):
             if fecha_fin:
                 queryset = queryset.filter(fecha__lte=fecha_fin)
             
-            # Obtener datos de consumo
-            datos_consumo = []
-            total_consumo = 0
+            filtros = {
+                'lote_id': lote_id,
+                'fecha_inicio': fecha_inicio,
+                'fecha_fin': fecha_fin
+            }
             
-            for bitacora in queryset.order_by('-fecha'):
-                consumo_por_ave = round(bitacora.consumo_concentrado / bitacora.lote.numero_aves_actual, 3) if bitacora.lote.numero_aves_actual > 0 else 0
-                datos_consumo.append({
-                    'fecha': bitacora.fecha,
-                    'lote': bitacora.lote.codigo,
-                    'galpon': bitacora.lote.galpon,
-                    'consumo_total': bitacora.consumo_concentrado,
-                    'aves_actuales': bitacora.lote.numero_aves_actual,
-                    'consumo_por_ave': consumo_por_ave
-                })
-                total_consumo += bitacora.consumo_concentrado
+            def calcular():
+                # Obtener datos de consumo
+                datos_consumo = []
+                total_consumo = 0
+                
+                for bitacora in queryset.order_by('-fecha'):
+                    consumo_por_ave = round(bitacora.consumo_concentrado / bitacora.lote.numero_aves_actual, 3) if bitacora.lote.numero_aves_actual > 0 else 0
+                    datos_consumo.append({
+                        'fecha': bitacora.fecha,
+                        'lote': bitacora.lote.codigo,
+                        'galpon': bitacora.lote.galpon,
+                        'consumo_total': bitacora.consumo_concentrado,
+                        'aves_actuales': bitacora.lote.numero_aves_actual,
+                        'consumo_por_ave': consumo_por_ave
+                    })
+                    total_consumo += bitacora.consumo_concentrado
+                
+                # Calcular resumen
+                resumen = {
+                    'total_consumo': total_consumo,
+                    'registros_encontrados': len(datos_consumo),
+                    'promedio_diario': round(total_consumo / len(datos_consumo), 2) if datos_consumo else 0
+                }
+                return {'datos_consumo': datos_consumo, 'resumen': resumen}
             
-            # Calcular resumen
-            resumen = {
-                'total_consumo': total_consumo,
-                'registros_encontrados': len(datos_consumo),
-                'promedio_diario': round(total_consumo / len(datos_consumo), 2) if datos_consumo else 0
-            }
+            # Mismos filtros y bitácoras sin cambios: se reutiliza el resultado anterior
+            datos = contexto_en_cache(request.user, 'consumo', filtros, queryset, calcular)
             
             # Exportar según formato
             if formato == 'excel':
-                return generar_excel_consumo(datos_consumo, resumen)
+                return generar_excel_consumo(datos['datos_consumo'], datos['resumen'])
             elif formato == 'csv':
-                return generar_csv_consumo(datos_consumo)
+                return generar_csv_consumo(datos['datos_consumo'])
             
             context.update({
-                'datos_consumo': datos_consumo,
-                'resumen': resumen,
-                'filtros': {
-                    'lote_id': lote_id,
-                    'fecha_inicio': fecha_inicio,
-                    'fecha_fin': fecha_fin
-                }
+                **datos,
+                'filtros': filtros,
             })
                 
         except Exception as e:
@@ -426,6 +465,28 @@ def reporte_consumo_concentrado(request):
 
 
 
+def generar_excel_comparativo(datos_comparacion):
+    """Genera Excel con la comparación de lotes de ReporteComparativo.comparar_lotes"""
+    if not OPENPYXL_AVAILABLE:
+        return HttpResponse("OpenPyXL no está disponible", status=500)
+    
+    lineas = dict(LoteAves.LINEAS_GENETICAS)
+    libro = LibroStreaming(ESTILOS_REPORTE)
+    libro.hoja("Comparativo").tabla(
+        ['Lote', 'Galpón', 'Línea Genética', 'Aves Actuales', 'Total Huevos', 'Producción AAA', 'Producción AA',
+         'Producción A', 'Producción B', 'Producción C', 'Mortalidad', 'Promedio Postura', 'Días Registrados',
+         'Huevos por Ave/Día'],
+        (
+            [dato['lote_codigo'], dato['galpon'], lineas.get(dato['linea_genetica'], dato['linea_genetica']),
+             dato['numero_aves_actual'], dato['total_huevos'], dato['produccion_aaa'], dato['produccion_aa'],
+             dato['produccion_a'], dato['produccion_b'], dato['produccion_c'], dato['total_mortalidad'],
+             dato['promedio_postura'], dato['dias_registrados'], dato['huevos_por_ave_dia']]
+            for dato in datos_comparacion
+        ),
+        estilo_encabezado='reporte_encabezado',
+    )
+    return libro.respuesta('comparativo_lotes.xlsx')
+
 def generar_excel_datos_completos(incluir_historicos=False):
     """Genera Excel con todos los datos del sistema"""
     if not OPENPYXL_AVAILABLE:
@@ -458,29 +519,64 @@ def generar_excel_datos_completos(incluir_historicos=False):
     wb.save(response)
     return response
 
-def generar_csv_datos_completos(incluir_historicos=False):
-    """Genera CSV con todos los datos del sistema"""
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="datos_completos.csv"'
-    
-    writer = csv.writer(response)
-    
-    # Escribir datos de lotes
-    writer.writerow(['=== LOTES ==='])
-    writer.writerow(['Código', 'Galpón', 'Línea Genética', 'Aves Actuales', 'Estado', 'Fecha Llegada'])
-    
-    lotes = LoteAves.objects.all()
-    for lote in lotes:
-        writer.writerow([
-            lote.codigo,
-            lote.galpon,
-            lote.get_linea_genetica_display(),
-            lote.numero_aves_actual,
-            lote.get_estado_display(),
-            lote.fecha_llegada.strftime('%d/%m/%Y')
-        ])
-    
-    return response
+def generar_csv_datos_completos(incluir_historicos=False, comprimir=False):
+    """
+    Genera CSV con todos los datos del sistema: los lotes y sus bitácoras,
+    en streaming. Sin incluir_historicos se omiten las bitácoras de los
+    lotes finalizados.
+    """
+    lineas = dict(LoteAves.LINEAS_GENETICAS)
+    estados = dict(LoteAves.ESTADOS)
+    lotes = filas_por_bloques(
+        LoteAves.objects.order_by('codigo'),
+        'codigo', 'galpon', 'linea_genetica', 'numero_aves_actual', 'estado', 'fecha_llegada'
+    )
+    filas_lotes = (
+        [codigo, galpon, lineas.get(linea, linea), aves, estados.get(estado, estado), llegada.strftime('%d/%m/%Y')]
+        for codigo, galpon, linea, aves, estado, llegada in lotes
+    )
+
+    bitacoras = BitacoraDiaria.objects.all()
+    if not incluir_historicos:
+        bitacoras = bitacoras.exclude(lote__estado='finalizado')
+    bitacoras = filas_por_bloques(
+        bitacoras.order_by('lote__codigo', 'fecha'),
+        'fecha', 'lote__codigo', 'produccion_aaa', 'produccion_aa', 'produccion_a', 'produccion_b',
+        'produccion_c', 'mortalidad', 'consumo_concentrado'
+    )
+    filas_bitacoras = (
+        [fecha.strftime('%d/%m/%Y'), codigo, aaa, aa, a, b, c, aaa + aa + a + b + c, mortalidad, float(consumo)]
+        for fecha, codigo, aaa, aa, a, b, c, mortalidad, consumo in bitacoras
+    )
+
+    return respuesta_csv('datos_completos.csv', [
+        Seccion(['Código', 'Galpón', 'Línea Genética', 'Aves Actuales', 'Estado', 'Fecha Llegada'],
+                filas_lotes, titulo='=== LOTES ==='),
+        Seccion(['Fecha', 'Lote', 'Producción AAA', 'Producción AA', 'Producción A', 'Producción B',
+                 'Producción C', 'Total Huevos', 'Mortalidad', 'Consumo Concentrado'],
+                filas_bitacoras, titulo='=== BITÁCORAS ==='),
+    ], comprimir=comprimir)
+
+
+def generar_csv_mortalidad(queryset, comprimir=False):
+    """
+    Genera CSV de mortalidad en streaming a partir del queryset filtrado de
+    bitácoras, anotado con resumenes.anotar_aves_inicio_dia
+    """
+    # En orden descendente cada página solo deja fuera días posteriores, así
+    # que la suma en ventana de los días anteriores de cada lote no cambia
+    filas = filas_por_bloques(
+        queryset.order_by('-fecha'),
+        'fecha', 'lote__codigo', 'lote__galpon', 'mortalidad', 'causa_mortalidad', 'aves_inicio_dia'
+    )
+    return respuesta_csv('reporte_mortalidad.csv', [Seccion(
+        ['Fecha', 'Lote', 'Galpón', 'Mortalidad', 'Causa', 'Aves Inicio Día', '% Mortalidad'],
+        (
+            [fecha.strftime('%d/%m/%Y'), codigo, galpon, mortalidad, causa, aves,
+             round(mortalidad / aves * 100, 2) if aves > 0 else 0]
+            for fecha, codigo, galpon, mortalidad, causa, aves in filas
+        ),
+    )], comprimir=comprimir)
 
 
 @login_required
@@ -509,6 +605,9 @@ def generar_reporte_sena(request):
             ],
             'años': list(range(año_actual - 2, año_actual + 1))
         }
+        # Lote de fin de mes encolado por generar_reportes_sena_lote
+        if request.GET.get('reporte', '').isdigit():
+            context['url_estado_lote'] = reverse('reportes:estado_reporte', args=[request.GET['reporte']])
         
         return render(request, 'aves/reporte_sena_form.html', context)
     
@@ -528,4 +627,36 @@ def generar_reporte_sena(request):
             return generar_reporte_sena_excel(lote_id, mes, año, nombre_granja, registro_ica)
         except Exception as e:
             messages.error(request, f'Error al generar el reporte: {str(e)}')
-            return redirect('aves:generar_reporte_sena')
\ No newline at end of file
+            return redirect('aves:generar_reporte_sena')
+
+@login_required
+@acceso_modulo_aves_required
+@require_http_methods(["POST"])
+def generar_reportes_sena_lote(request):
+    """
+    Encola los registros SENA de fin de mes de todos los lotes activos (o de
+    un galpón o de los lotes indicados), en un ZIP o en un Excel de varias
+    hojas, como trabajo en segundo plano (reportes.trabajos). Vuelve al
+    formulario, que consulta el estado y ofrece la descarga al terminar.
+    """
+    from apps.reportes.trabajos import encolar_reporte
+    from .sena import leer_periodo
+
+    try:
+        periodos = [leer_periodo(periodo) for periodo in request.POST.getlist('periodo')]
+        if not periodos:
+            periodos = [(int(request.POST.get('mes')), int(request.POST.get('año')))]
+    except (TypeError, ValueError):
+        messages.error(request, 'Indique el mes y el año de los reportes.')
+        return redirect('aves:generar_reporte_sena')
+
+    reporte = encolar_reporte(request.user, 'sena_lote', {
+        'periodos': [f'{año}-{mes:02d}' for mes, año in periodos],
+        'lotes_ids': request.POST.getlist('lotes'),
+        'galpon': request.POST.get('galpon', ''),
+        'nombre_granja': request.POST.get('nombre_granja') or 'Granja Avícola La Salada',
+        'registro_ica': request.POST.get('registro_ica') or '051290274',
+        'formato_lote': request.POST.get('formato_lote', 'zip'),
+    })
+    messages.info(request, 'Los registros SENA se están generando; la descarga aparecerá aquí al terminar.')
+    return redirect(f"{reverse('aves:generar_reporte_sena')}?reporte={reporte.pk}")
@@ -0,0 +1,115 @@
+"""
+Caché versionada para dashboards.
+
+Cada dominio de datos (producción, inventario, alertas, pedidos, lotes,
+total de aves en postura)
+tiene un contador de versión en la caché. Las señales de escritura
+incrementan el contador del dominio al confirmar la transacción, y cada
+entrada guarda las versiones con las que se calculó: si alguna cambió,
+la entrada se descarta y se recalcula. Una consulta con acierto cuesta
+una sola lectura a la caché (get_many de la entrada y sus versiones).
+"""
+
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+DOMINIO_PRODUCCION = 'produccion'
+DOMINIO_INVENTARIO = 'inventario'
+DOMINIO_ALERTAS = 'alertas'
+DOMINIO_PEDIDOS = 'pedidos'
+DOMINIO_LOTES = 'lotes'
+DOMINIO_AVES_POSTURA = 'aves_postura'
+
+PREFIJO_VERSION = 'agrosmart:version'
+PREFIJO_ENTRADA = 'agrosmart:cache'
+
+
+def clave_version(dominio):
+    """Clave de caché del contador de versión de un dominio."""
+    return f'{PREFIJO_VERSION}:{dominio}'
+
+
+def clave_entrada(vista, partes):
+    """Clave de caché de una entrada según la vista y sus parámetros."""
+    resumen = hashlib.sha1(
+        json.dumps(partes, sort_keys=True, default=str).encode('utf-8')
+    ).hexdigest()
+    return f'{PREFIJO_ENTRADA}:{vista}:{resumen}'
+
+
+def _version_inicial():
+    """
+    Valor inicial de un contador. Se basa en el reloj para que un contador
+    desalojado no vuelva a coincidir con versiones guardadas antes.
+    """
+    return time.time_ns()
+
+
+def incrementar_version(dominio):
+    """Invalida todas las entradas que dependen del dominio."""
+    clave = clave_version(dominio)
+    try:
+        cache.incr(clave)
+    except ValueError:
+        # El contador no existe (primer uso o desalojado)
+        if not cache.add(clave, _version_inicial(), timeout=None):
+            cache.incr(clave)
+
+
+def invalidar_dominio(dominio):
+    """Incrementa la versión del dominio cuando la transacción actual se confirme."""
+    transaction.on_commit(lambda: incrementar_version(dominio))
+
+
+def obtener_o_calcular(vista, dominios, partes, calcular, timeout=None):
+    """
+    Devuelve el valor cacheado de la vista si ninguno de sus dominios
+    cambió desde que se calculó; en caso contrario lo calcula con
+    `calcular()` y lo guarda junto con las versiones leídas.
+    """
+    if timeout is None:
+        timeout = getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300)
+
+    clave = clave_entrada(vista, partes)
+    claves_version = {dominio: clave_version(dominio) for dominio in dominios}
+    valores = cache.get_many([clave, *claves_version.values()])
+
+    versiones = {}
+    faltantes = {}
+    for dominio, clave_dominio in claves_version.items():
+        if clave_dominio in valores:
+            versiones[dominio] = valores[clave_dominio]
+        else:
+            faltantes[clave_dominio] = _version_inicial()
+            versiones[dominio] = faltantes[clave_dominio]
+
+    entrada = valores.get(clave)
+    if entrada is not None and not faltantes and entrada['versiones'] == versiones:
+        return entrada['datos']
+
+    if faltantes:
+        for clave_dominio, version in faltantes.items():
+            if not cache.add(clave_dominio, version, timeout=None):
+                # Otro proceso lo inicializó primero: no guardar con una versión ajena
+                versiones = None
+
+    # Las versiones se leen antes de calcular: una escritura concurrente
+    # deja la entrada guardada desactualizada respecto a su contador.
+    datos = calcular()
+    if versiones is not None:
+        cache.set(clave, {'versiones': versiones, 'datos': datos}, timeout)
+    return datos
+
+
+def rol_usuario(user):
+    """Rol del usuario para separar las entradas de caché por perfil."""
+    try:
+        return user.perfilusuario.rol
+    except Exception:
+        return None
@@ -0,0 +1,42 @@
+"""
+Middleware comunes del proyecto AgroSmart.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+_usuario_actual = ContextVar('usuario_actual', default=None)
+
+
+def obtener_usuario_actual():
+    """Usuario autenticado que ejecuta la petición o tarea actual, o None."""
+    usuario = _usuario_actual.get()
+    if usuario is None or not usuario.is_authenticated:
+        return None
+    return usuario
+
+
+@contextmanager
+def usuario_actual(usuario):
+    """Fija el usuario actual fuera de una petición (comandos, tareas)."""
+    token = _usuario_actual.set(usuario)
+    try:
+        yield
+    finally:
+        _usuario_actual.reset(token)
+
+
+class UsuarioActualMiddleware:
+    """
+    Expone request.user como usuario actual durante la petición, para que la
+    auditoría registre quién hizo el cambio. El usuario es perezoso: solo se
+    consulta si algo lo necesita.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with usuario_actual(getattr(request, 'user', None)):
+            return self.get_response(request)
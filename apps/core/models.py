@@ -2,6 +2,8 @@
 Modelos base y utilidades comunes para el proyecto AgroSmart.
 """
 
+import copy
+
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
@@ -35,7 +37,55 @@ class ActiveModel(models.Model):
         abstract = True
 
 
-class BaseModel(TimeStampedModel, ActiveModel):
+class SnapshotModel(models.Model):
+    """
+    Modelo abstracto que conserva los valores leídos de la base de datos
+    (instantánea) para detectar cambios sin volver a consultar la fila.
+    """
+    
+    class Meta:
+        abstract = True
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._instantanea = dict(zip(field_names, map(_copiar_valor, values)))
+        return instance
+    
+    def campos_modificados(self, campos=None):
+        """
+        Campos cambiados desde la carga: {campo: (valor_anterior, valor_nuevo)}.
+        Retorna None si la instancia no viene de la base de datos. `campos`
+        limita la comparación (por ejemplo a los update_fields de un save).
+        """
+        instantanea = getattr(self, '_instantanea', None)
+        if instantanea is None:
+            return None
+        cambios = {}
+        for field in self._meta.concrete_fields:
+            if field.attname not in instantanea or (campos is not None and field.name not in campos):
+                continue
+            anterior = instantanea[field.attname]
+            nuevo = getattr(self, field.attname)
+            if anterior != nuevo:
+                cambios[field.name] = (anterior, nuevo)
+        return cambios
+    
+    def tomar_instantanea(self):
+        """Toma los valores actuales como referencia para el próximo guardado."""
+        diferidos = self.get_deferred_fields()
+        self._instantanea = {
+            field.attname: _copiar_valor(getattr(self, field.attname))
+            for field in self._meta.concrete_fields if field.attname not in diferidos
+        }
+
+
+def _copiar_valor(valor):
+    # Los JSONField se pueden modificar en sitio: la instantánea guarda una copia
+    return copy.deepcopy(valor) if isinstance(valor, (dict, list)) else valor
+
+
+class BaseModel(TimeStampedModel, ActiveModel, SnapshotModel):
     """
     Modelo base que combina timestamp y funcionalidad de activación.
     """
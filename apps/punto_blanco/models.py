@@ -77,6 +77,26 @@ class Pedido(BaseModel):
         self.save(update_fields=['total'])
         return total
     
+    def actualizar_inventario(self):
+        """
+        Descuenta del inventario las cantidades del pedido entregado.
+        Cada categoría se descuenta con un UPDATE condicional; si alguna no
+        tiene stock suficiente se lanza ValidationError y, dentro de la
+        transacción de la vista, se revierten los descuentos ya aplicados.
+        """
+        from django.core.exceptions import ValidationError
+        from apps.aves.utils import descontar_stock
+        
+        for detalle in self.detalles.select_related('inventario_huevos'):
+            categoria = detalle.inventario_huevos.categoria
+            if not descontar_stock(
+                categoria, detalle.cantidad, origen='pedido', referencia_id=self.pk,
+                usuario_id=self.usuario_punto_blanco_id
+            ):
+                raise ValidationError(
+                    f'No hay suficiente stock de {categoria} para entregar el pedido {self.numero_pedido}.'
+                )
+    
     def puede_ser_cancelado(self):
         """Verifica si el pedido puede ser cancelado"""
         return self.estado in ['pendiente', 'confirmado']
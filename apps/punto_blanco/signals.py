@@ -1,6 +1,7 @@
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from .models import DetallePedido
+from apps.core.cache import invalidar_dominio, DOMINIO_PEDIDOS
+from .models import Pedido, DetallePedido, ConfiguracionPuntoBlanco
 
 
 @receiver(post_save, sender=DetallePedido)
@@ -12,4 +13,13 @@ def actualizar_total_pedido_save(sender, instance, **kwargs):
 @receiver(post_delete, sender=DetallePedido)
 def actualizar_total_pedido_delete(sender, instance, **kwargs):
     """Actualizar total del pedido cuando se elimina un detalle"""
-    instance.pedido.calcular_total()
\ No newline at end of file
+    instance.pedido.calcular_total()
+
+
+@receiver(post_save, sender=Pedido)
+@receiver(post_delete, sender=Pedido)
+@receiver(post_save, sender=ConfiguracionPuntoBlanco)
+@receiver(post_delete, sender=ConfiguracionPuntoBlanco)
+def invalidar_cache_pedidos(sender, **kwargs):
+    """Invalida la caché de dashboards que dependen de los pedidos"""
+    invalidar_dominio(DOMINIO_PEDIDOS)
@@ -10,62 +10,60 @@ from django.db.models import Q, Sum, Count, F
 from datetime import datetime, timedelta
 
 from apps.usuarios.decorators import punto_blanco_required, role_required
+from apps.core.cache import obtener_o_calcular, rol_usuario, DOMINIO_PEDIDOS, DOMINIO_INVENTARIO
 from .models import Pedido, DetallePedido, ConfiguracionPuntoBlanco
 from .forms import PedidoForm, DetallePedidoFormSet, ConfiguracionPuntoBlancoForm
 from apps.aves.models import InventarioHuevos, MovimientoHuevos, DetalleMovimientoHuevos
 
 
-@login_required
-@punto_blanco_required
-def dashboard_punto_blanco(request):
-    """Dashboard principal del punto blanco"""
-    # Estadísticas del día
-    hoy = timezone.now().date()
+# Dominios de datos de los que depende el dashboard (caché versionada)
+DOMINIOS_DASHBOARD = [DOMINIO_PEDIDOS, DOMINIO_INVENTARIO]
+
+
+def calcular_contexto_dashboard(hoy):
+    """Calcula el contexto del dashboard con las consultas ya evaluadas."""
     pedidos_hoy = Pedido.objects.filter(fecha_pedido__date=hoy)
     
+    # Conteos y ventas del día en una sola consulta
+    resumen_hoy = pedidos_hoy.aggregate(
+        pedidos_hoy=Count('id'),
+        pedidos_pendientes=Count('id', filter=Q(estado='pendiente')),
+        pedidos_listos=Count('id', filter=Q(estado='listo')),
+        ventas_hoy=Sum('total', filter=Q(estado='entregado')),
+    )
+    
     estadisticas = {
-        'pedidos_hoy': pedidos_hoy.count(),
-        'pedidos_pendientes': pedidos_hoy.filter(estado='pendiente').count(),
-        'pedidos_listos': pedidos_hoy.filter(estado='listo').count(),
-        'ventas_hoy': pedidos_hoy.filter(estado='entregado').aggregate(
-            total=Sum('total')
-        )['total'] or 0,
+        'pedidos_hoy': resumen_hoy['pedidos_hoy'],
+        'pedidos_pendientes': resumen_hoy['pedidos_pendientes'],
+        'pedidos_listos': resumen_hoy['pedidos_listos'],
+        'ventas_hoy': resumen_hoy['ventas_hoy'] or 0,
     }
     
     # Pedidos recientes
-    pedidos_recientes = Pedido.objects.order_by('-fecha_pedido')[:5]
+    pedidos_recientes = list(Pedido.objects.order_by('-fecha_pedido')[:5])
     
     # Inventario de huevos completo
-    inventarios_huevos = InventarioHuevos.objects.all().order_by('categoria')
+    inventarios_huevos = list(InventarioHuevos.objects.all().order_by('categoria'))
     
     # Total de huevos disponibles
-    total_huevos_disponibles = inventarios_huevos.aggregate(
-        total=Sum('cantidad_actual')
-    )['total'] or 0
+    total_huevos_disponibles = sum(inventario.cantidad_actual for inventario in inventarios_huevos)
     
     # Inventario con stock bajo
-    inventarios_bajo_stock = inventarios_huevos.filter(
-        cantidad_actual__lte=F('cantidad_minima')
-    )
+    inventarios_bajo_stock = [
+        inventario for inventario in inventarios_huevos
+        if inventario.cantidad_actual <= inventario.cantidad_minima
+    ]
     
     # Movimientos recientes de huevos (últimos 10)
     # Corregido: removido 'cliente' del select_related ya que no es una relación ForeignKey
-    movimientos_recientes = DetalleMovimientoHuevos.objects.select_related(
+    movimientos_recientes = list(DetalleMovimientoHuevos.objects.select_related(
         'movimiento', 'movimiento__usuario_registro'
-    ).order_by('-movimiento__fecha', '-movimiento__created_at')[:10]
+    ).order_by('-movimiento__fecha', '-movimiento__created_at')[:10])
     
     # Configuración del punto
-    try:
-        configuracion = ConfiguracionPuntoBlanco.objects.first()
-    except ConfiguracionPuntoBlanco.DoesNotExist:
-        configuracion = None
-    
-    # Calcular ingresos del día
-    ingresos_hoy = pedidos_hoy.filter(estado='entregado').aggregate(
-        total=Sum('total')
-    )['total'] or 0
+    configuracion = ConfiguracionPuntoBlanco.objects.first()
     
-    context = {
+    return {
         'estadisticas': estadisticas,
         'pedidos_recientes': pedidos_recientes,
         'inventarios_huevos': inventarios_huevos,
@@ -74,8 +72,21 @@ def dashboard_punto_blanco(request):
         'movimientos_recientes': movimientos_recientes,
         'configuracion': configuracion,
         'pedidos_hoy': estadisticas['pedidos_hoy'],
-        'ingresos_hoy': ingresos_hoy,
+        'ingresos_hoy': estadisticas['ventas_hoy'],
     }
+
+
+@login_required
+@punto_blanco_required
+def dashboard_punto_blanco(request):
+    """Dashboard principal del punto blanco"""
+    hoy = timezone.now().date()
+    context = obtener_o_calcular(
+        'dashboard_punto_blanco',
+        DOMINIOS_DASHBOARD,
+        [None, None, rol_usuario(request.user), hoy],
+        lambda: calcular_contexto_dashboard(hoy)
+    )
     
     return render(request, 'punto_blanco_dashboard.html', context)
 
@@ -194,14 +205,15 @@ def cambiar_estado_pedido(request, pk):
     if request.method == 'POST':
         nuevo_estado = request.POST.get('estado')
         
-        if nuevo_estado in dict(Pedido.ESTADOS_CHOICES):
+        if nuevo_estado in dict(Pedido.ESTADO_CHOICES):
             try:
                 with transaction.atomic():
+                    estado_anterior = pedido.estado
                     pedido.estado = nuevo_estado
                     pedido.save()
                     
-                    # Si se marca como entregado, actualizar inventario
-                    if nuevo_estado == 'entregado':
+                    # Si se marca como entregado, actualizar inventario (una sola vez)
+                    if nuevo_estado == 'entregado' and estado_anterior != 'entregado':
                         pedido.actualizar_inventario()
                     
                     messages.success(request, f'Estado del pedido actualizado a {pedido.get_estado_display()}.')
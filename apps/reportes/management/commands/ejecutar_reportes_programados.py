@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from apps.reportes.programador import ejecutar_programados
+from apps.reportes.trabajos import esperar_reportes
+
+
+class Command(BaseCommand):
+    help = 'Genera los reportes programados vencidos y calcula su próxima ejecución (ejecutar cada minuto desde cron)'
+
+    def handle(self, *args, **options):
+        self.stdout.write('🗓️ Buscando reportes programados vencidos...\n')
+        reportes = ejecutar_programados()
+        if not reportes:
+            self.stdout.write(self.style.SUCCESS('✅ No hay reportes programados pendientes'))
+            return
+
+        self.stdout.write(f'📊 Reportes encolados: {len(reportes)}')
+        # El proceso del comando termina aquí: hay que esperar al pool antes de salir
+        esperar_reportes()
+
+        errores = 0
+        for reporte in reportes:
+            reporte.refresh_from_db(fields=['estado', 'nombre_archivo', 'mensaje_error'])
+            if reporte.estado == 'completado':
+                self.stdout.write(f'  ✅ {reporte.tipo_reporte.nombre}: {reporte.nombre_archivo}')
+            elif reporte.estado == 'generando':
+                # Con REPORTES_BACKEND = 'celery' los genera el worker
+                self.stdout.write(f'  ⏳ {reporte.tipo_reporte.nombre}: en cola')
+            else:
+                errores += 1
+                self.stdout.write(self.style.WARNING(
+                    f'  ⚠️ {reporte.tipo_reporte.nombre}: {reporte.mensaje_error or reporte.estado}'
+                ))
+        if errores:
+            self.stdout.write(self.style.WARNING(f'⚠️ Reportes con error: {errores}'))
+        else:
+            self.stdout.write(self.style.SUCCESS('✅ Reportes programados generados'))
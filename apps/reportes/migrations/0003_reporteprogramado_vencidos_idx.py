@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reportes', '0002_alter_reportegenerado_formato_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reporteprogramado',
+            index=models.Index(fields=['is_active', 'proxima_ejecucion'], name='reportes_prog_vencidos_idx'),
+        ),
+    ]
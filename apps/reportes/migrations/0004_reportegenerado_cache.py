@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reportes', '0003_reporteprogramado_vencidos_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportegenerado',
+            name='clave_cache',
+            field=models.CharField(blank=True, db_index=True, help_text='Hash del tipo y los parámetros normalizados, para reutilizar el resultado', max_length=40),
+        ),
+        migrations.AddField(
+            model_name='reportegenerado',
+            name='marca_datos',
+            field=models.CharField(blank=True, help_text='Última modificación de los datos con los que se generó', max_length=100),
+        ),
+    ]
@@ -52,6 +52,14 @@ class ReporteGenerado(BaseModel):
         ('error', 'Error')
     ], default='generando')
     mensaje_error = models.TextField(blank=True)
+    clave_cache = models.CharField(
+        max_length=40, blank=True, db_index=True,
+        help_text="Hash del tipo y los parámetros normalizados, para reutilizar el resultado"
+    )
+    marca_datos = models.CharField(
+        max_length=100, blank=True,
+        help_text="Última modificación de los datos con los que se generó"
+    )
     
     class Meta:
         verbose_name = 'Reporte Generado'
@@ -92,6 +100,10 @@ class ReporteProgramado(BaseModel):
         verbose_name = 'Reporte Programado'
         verbose_name_plural = 'Reportes Programados'
         ordering = ['nombre']
+        indexes = [
+            # Programas vencidos en cada pasada del programador
+            models.Index(fields=['is_active', 'proxima_ejecucion'], name='reportes_prog_vencidos_idx'),
+        ]
     
     def __str__(self):
         return f"{self.nombre} ({self.get_frecuencia_display()})"
\ No newline at end of file
@@ -0,0 +1,143 @@
+"""
+Ejecución de los reportes programados.
+
+ejecutar_programados se llama cada minuto (comando
+ejecutar_reportes_programados desde cron, o la tarea
+reportes.ejecutar_programados con Celery beat). En una sola consulta por
+el índice (is_active, proxima_ejecucion) toma los programas vencidos, les
+calcula la siguiente ejecución y los guarda con un bulk_update dentro de
+la misma transacción, así que otra pasada que arranque mientras tanto no
+los vuelve a tomar. Cada programa se encola como un ReporteGenerado en el
+pool de trabajos.py: los reportes corren en paralelo hasta
+REPORTES_TRABAJADORES a la vez, uno lento no retrasa a los demás y el
+correo se envía aparte cuando cada archivo termina. La misma pasada
+reencola los reportes que un reinicio dejó en 'generando'
+(trabajos.recuperar_interrumpidos).
+"""
+
+import calendar
+import logging
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ReporteGenerado, ReporteProgramado
+from .trabajos import TRABAJOS, encolar_reporte, recuperar_interrumpidos
+
+logger = logging.getLogger(__name__)
+
+# Meses en los que corre cada frecuencia mensual
+MESES = {
+    'mensual': range(1, 13),
+    'trimestral': (1, 4, 7, 10),
+}
+
+
+def _en_fecha(dia, hora):
+    return timezone.make_aware(datetime.combine(dia, hora))
+
+
+def calcular_proxima_ejecucion(programado, desde):
+    """
+    Primera ejecución de `programado` estrictamente posterior a `desde`,
+    con hora_ejecucion en la zona horaria local. Sin dia_semana se toma el
+    lunes y sin dia_mes el día 1; un día que no existe en el mes (31 en
+    abril) se corre el último día del mes.
+    """
+    local = timezone.localtime(desde)
+    hora = programado.hora_ejecucion
+
+    if programado.frecuencia == 'diario':
+        proxima = _en_fecha(local.date(), hora)
+        return proxima if proxima > desde else _en_fecha(local.date() + timedelta(days=1), hora)
+
+    if programado.frecuencia == 'semanal':
+        dias = ((programado.dia_semana or 1) - 1 - local.weekday()) % 7
+        proxima = _en_fecha(local.date() + timedelta(days=dias), hora)
+        return proxima if proxima > desde else proxima + timedelta(days=7)
+
+    meses = MESES[programado.frecuencia]
+    año, mes = local.year, local.month
+    while True:
+        if mes in meses:
+            dia = min(programado.dia_mes or 1, calendar.monthrange(año, mes)[1])
+            proxima = _en_fecha(local.date().replace(year=año, month=mes, day=dia), hora)
+            if proxima > desde:
+                return proxima
+        año, mes = (año + 1, 1) if mes == 12 else (año, mes + 1)
+
+
+def clave_trabajo(programado):
+    """Trabajo de TRABAJOS que genera el programa: parametros['trabajo'] o el nombre de su TipoReporte."""
+    clave = programado.parametros.get('trabajo')
+    if clave in TRABAJOS:
+        return clave
+    for clave, trabajo in TRABAJOS.items():
+        if trabajo.nombre == programado.tipo_reporte.nombre:
+            return clave
+    return None
+
+
+def parametros_de_ejecucion(programado, clave, ahora):
+    """
+    Parámetros del reporte de esta ejecución: los del programa, con el
+    periodo desde la última ejecución hasta hoy y, para el registro SENA,
+    el mes anterior si no se fijó uno.
+    """
+    hoy = timezone.localdate(ahora)
+    desde = timezone.localdate(programado.ultima_ejecucion) if programado.ultima_ejecucion else hoy - timedelta(days=1)
+    parametros = {
+        'fecha_inicio': desde.isoformat(),
+        'fecha_fin': hoy.isoformat(),
+        **programado.parametros,
+        'formato': programado.formato_salida,
+        'programado': programado.pk,
+    }
+    if clave == 'sena_mensual' and 'mes' not in parametros:
+        anterior = hoy.replace(day=1) - timedelta(days=1)
+        parametros['mes'], parametros['año'] = anterior.month, anterior.year
+    if programado.enviar_email and programado.emails_destino:
+        parametros['emails'] = programado.emails_destino
+    return parametros
+
+
+def ejecutar_programados(ahora=None):
+    """
+    Encola los reportes programados vencidos y programa su siguiente
+    ejecución. Los programas sin proxima_ejecucion solo reciben la primera.
+    Retorna la lista de ReporteGenerado encolados, incluidos los
+    interrumpidos que se reencolaron.
+    """
+    ahora = ahora or timezone.now()
+    reportes = recuperar_interrumpidos(ahora)
+    with transaction.atomic():
+        nuevos = list(ReporteProgramado.objects.filter(is_active=True, proxima_ejecucion__isnull=True))
+        for programado in nuevos:
+            programado.proxima_ejecucion = calcular_proxima_ejecucion(programado, ahora)
+            programado.updated_at = ahora
+        ReporteProgramado.objects.bulk_update(nuevos, ['proxima_ejecucion', 'updated_at'])
+
+        vencidos = list(
+            ReporteProgramado.objects.select_for_update(skip_locked=True, of=('self',))
+            .select_related('tipo_reporte', 'usuario')
+            .filter(is_active=True, proxima_ejecucion__lte=ahora)
+        )
+        for programado in vencidos:
+            clave = clave_trabajo(programado)
+            parametros = parametros_de_ejecucion(programado, clave, ahora)
+            programado.ultima_ejecucion = ahora
+            programado.proxima_ejecucion = calcular_proxima_ejecucion(programado, ahora)
+            programado.updated_at = ahora
+
+            if clave is None:
+                logger.warning('El reporte programado %s no corresponde a ningún trabajo', programado.pk)
+                reportes.append(ReporteGenerado.objects.create(
+                    tipo_reporte=programado.tipo_reporte, usuario=programado.usuario, nombre_archivo='',
+                    formato=programado.formato_salida, parametros=parametros, estado='error',
+                    mensaje_error=f'El tipo de reporte "{programado.tipo_reporte.nombre}" no se puede programar',
+                ))
+                continue
+            reportes.append(encolar_reporte(programado.usuario, clave, parametros, tipo=programado.tipo_reporte))
+        ReporteProgramado.objects.bulk_update(vencidos, ['ultima_ejecucion', 'proxima_ejecucion', 'updated_at'])
+    return reportes
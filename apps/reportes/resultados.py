@@ -0,0 +1,211 @@
+"""
+Caché de resultados de los reportes parametrizados.
+
+Los reportes de producción, mortalidad y consumo se piden muchas veces al
+día con los mismos filtros. Cada resultado se guarda como un
+ReporteGenerado con clave_cache = hash del tipo de reporte y los
+parámetros normalizados, y marca_datos = última modificación y número de
+las bitácoras del rango (y última modificación de sus lotes), leídas en
+una sola consulta agregada. Si la marca no se movió, se sirve el archivo
+guardado o, para la vista HTML, el contexto guardado; si se movió, el
+resultado se genera de nuevo y reemplaza a las entradas anteriores de la
+misma clave.
+
+La marca incluye el número de bitácoras para que borrar una del rango
+también invalide el resultado.
+
+El contexto se guarda como JSON: fechas y decimales marcados con su tipo y
+las instancias de modelos como referencia (modelo y pk), que al leer se
+vuelven a cargar con una consulta por modelo. Así el archivo no puede
+ejecutar código al leerse y sigue siendo válido aunque cambien los modelos.
+"""
+
+import hashlib
+import json
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.apps import apps
+from django.core.files.base import ContentFile
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.db.models import Count, Max
+from django.http import FileResponse
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import ReporteGenerado, TipoReporte
+from .trabajos import guardar_respuesta
+
+logger = logging.getLogger(__name__)
+
+# tipo -> (nombre del TipoReporte, categoría)
+REPORTES = {
+    'produccion': ('Reporte de producción', 'produccion'),
+    'mortalidad': ('Reporte de mortalidad', 'salud'),
+    'consumo': ('Reporte de consumo de concentrado', 'produccion'),
+}
+
+
+def normalizar_parametros(parametros):
+    """Parámetros como texto, sin espacios sobrantes ni valores vacíos, para que ?lote=1& y ?lote=1 coincidan."""
+    normalizados = {}
+    for clave, valor in parametros.items():
+        valor = '' if valor is None else str(valor).strip()
+        if valor:
+            normalizados[clave] = valor
+    return normalizados
+
+
+def clave_resultado(tipo, formato, parametros):
+    contenido = json.dumps([tipo, formato, normalizar_parametros(parametros)], sort_keys=True)
+    return hashlib.sha1(contenido.encode('utf-8')).hexdigest()
+
+
+def marca_de_datos(bitacoras):
+    """Marca de agua del rango de bitácoras del reporte, en una sola consulta."""
+    datos = bitacoras.order_by().aggregate(
+        ultima=Max('updated_at'), lotes=Max('lote__updated_at'), registros=Count('id'),
+    )
+    return '|'.join(
+        valor.isoformat() if valor else '-' for valor in (datos['ultima'], datos['lotes'])
+    ) + f"|{datos['registros']}"
+
+
+def _vigente(clave, formato, marca):
+    return ReporteGenerado.objects.filter(
+        clave_cache=clave, formato=formato, marca_datos=marca, estado='completado',
+    ).exclude(archivo='').order_by('-fecha_generacion').first()
+
+
+def _nuevo(usuario, tipo, formato, parametros, clave, marca):
+    nombre, categoria = REPORTES[tipo]
+    tipo_reporte, _ = TipoReporte.objects.get_or_create(
+        nombre=nombre, defaults={'descripcion': nombre, 'categoria': categoria},
+    )
+    return ReporteGenerado(
+        tipo_reporte=tipo_reporte, usuario=usuario, nombre_archivo='', formato=formato,
+        parametros=normalizar_parametros(parametros), clave_cache=clave, marca_datos=marca,
+    )
+
+
+def _reemplazar(reporte):
+    """Guarda el resultado nuevo y elimina los anteriores de la misma clave con sus archivos."""
+    reporte.save()
+    anteriores = ReporteGenerado.objects.filter(
+        clave_cache=reporte.clave_cache, formato=reporte.formato,
+    ).exclude(pk=reporte.pk)
+    for anterior in anteriores:
+        if anterior.archivo:
+            anterior.archivo.delete(save=False)
+    anteriores.delete()
+
+
+def archivo_en_cache(usuario, tipo, formato, parametros, bitacoras, generar):
+    """
+    Respuesta de descarga del reporte: el archivo guardado si los datos no
+    cambiaron, o el que produce `generar()` (guardado para la próxima vez).
+    Las respuestas con error se devuelven sin guardarse.
+    """
+    clave = clave_resultado(tipo, formato, parametros)
+    marca = marca_de_datos(bitacoras)
+    reporte = _vigente(clave, formato, marca)
+
+    if reporte is None:
+        respuesta = generar()
+        if respuesta.status_code != 200:
+            return respuesta
+        reporte = _nuevo(usuario, tipo, formato, parametros, clave, marca)
+        reporte.parametros['content_type'] = respuesta['Content-Type']
+        guardar_respuesta(reporte, respuesta, f'{tipo}.{formato}')
+        _reemplazar(reporte)
+
+    return FileResponse(
+        reporte.archivo.open('rb'), as_attachment=True, filename=reporte.nombre_archivo,
+        content_type=reporte.parametros.get('content_type'),
+    )
+
+
+class _CodificadorContexto(DjangoJSONEncoder):
+    """Conserva el tipo de fechas y decimales y guarda los modelos como referencia."""
+
+    def default(self, o):
+        if isinstance(o, models.Model):
+            return {'__modelo__': o._meta.label, 'pk': o.pk}
+        if isinstance(o, datetime):
+            return {'__fechahora__': super().default(o)}
+        if isinstance(o, date):
+            return {'__fecha__': o.isoformat()}
+        if isinstance(o, Decimal):
+            return {'__decimal__': str(o)}
+        return super().default(o)
+
+
+class _Referencia:
+    def __init__(self, modelo, pk):
+        self.modelo = modelo
+        self.pk = pk
+
+
+def _decodificar(texto):
+    """Contexto guardado con _CodificadorContexto; las instancias se cargan con un in_bulk por modelo."""
+    referencias = {}
+
+    def convertir(objeto):
+        if '__fecha__' in objeto:
+            return parse_date(objeto['__fecha__'])
+        if '__fechahora__' in objeto:
+            return parse_datetime(objeto['__fechahora__'])
+        if '__decimal__' in objeto:
+            return Decimal(objeto['__decimal__'])
+        if '__modelo__' in objeto:
+            referencia = _Referencia(objeto['__modelo__'], objeto['pk'])
+            referencias.setdefault(referencia.modelo, set()).add(referencia.pk)
+            return referencia
+        return objeto
+
+    datos = json.loads(texto, object_hook=convertir)
+    instancias = {
+        etiqueta: apps.get_model(etiqueta).objects.in_bulk(list(pks))
+        for etiqueta, pks in referencias.items()
+    }
+
+    def resolver(valor):
+        if isinstance(valor, _Referencia):
+            # Una instancia borrada después de guardar el resultado queda como None
+            return instancias[valor.modelo].get(valor.pk)
+        if isinstance(valor, dict):
+            return {clave: resolver(elemento) for clave, elemento in valor.items()}
+        if isinstance(valor, list):
+            return [resolver(elemento) for elemento in valor]
+        return valor
+
+    return resolver(datos) if referencias else datos
+
+
+def contexto_en_cache(usuario, tipo, parametros, bitacoras, calcular):
+    """
+    Datos de la vista HTML del reporte: los guardados si los datos no
+    cambiaron, o los que calcula `calcular()`. Se guardan como JSON en el
+    archivo del ReporteGenerado (ver _CodificadorContexto).
+    """
+    clave = clave_resultado(tipo, 'html', parametros)
+    marca = marca_de_datos(bitacoras)
+    reporte = _vigente(clave, 'html', marca)
+
+    if reporte is not None:
+        try:
+            with reporte.archivo.open('rb') as archivo:
+                return _decodificar(archivo.read().decode('utf-8'))
+        except Exception:
+            # Archivo borrado o en un formato anterior: se recalcula
+            logger.warning('No se pudo leer el resultado guardado %s', reporte.pk, exc_info=True)
+
+    datos = calcular()
+    reporte = _nuevo(usuario, tipo, 'html', parametros, clave, marca)
+    contenido = json.dumps(datos, cls=_CodificadorContexto, ensure_ascii=False)
+    reporte.archivo.save(f'{tipo}.json', ContentFile(contenido.encode('utf-8')), save=False)
+    reporte.nombre_archivo = f'{tipo}.json'
+    reporte.estado = 'completado'
+    _reemplazar(reporte)
+    return datos
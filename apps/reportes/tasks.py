@@ -0,0 +1,29 @@
+"""
+Tareas de Celery de reportes.
+
+Solo se importa cuando REPORTES_BACKEND = 'celery' o cuando los reportes
+programados se ejecutan con Celery beat.
+"""
+
+from celery import shared_task
+
+from .programador import ejecutar_programados
+from .trabajos import ejecutar_reporte, enviar_correo_reporte
+
+
+@shared_task(name='reportes.ejecutar_reporte')
+def ejecutar_reporte_task(reporte_id):
+    """Genera en el worker el archivo de un reporte encolado."""
+    ejecutar_reporte(reporte_id)
+
+
+@shared_task(name='reportes.enviar_correo_reporte')
+def enviar_correo_reporte_task(reporte_id):
+    """Envía por correo el archivo de un reporte terminado."""
+    enviar_correo_reporte(reporte_id)
+
+
+@shared_task(name='reportes.ejecutar_programados')
+def ejecutar_programados_task():
+    """Ejecuta los reportes programados vencidos (Celery beat, cada minuto)."""
+    return len(ejecutar_programados())
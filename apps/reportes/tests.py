@@ -0,0 +1,300 @@
+"""
+Pruebas de los reportes generados en segundo plano y de los programados.
+"""
+import io
+import json
+import shutil
+import tempfile
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.aves.models import LoteAves, BitacoraDiaria
+from apps.usuarios.models import PerfilUsuario
+from .models import ReporteGenerado, ReporteProgramado, TipoReporte
+from .programador import calcular_proxima_ejecucion, ejecutar_programados
+from .trabajos import recuperar_interrumpidos
+
+User = get_user_model()
+
+
+@override_settings(REPORTES_BACKEND='sincrono')
+class TrabajosReportesTest(TestCase):
+    """Pruebas de encolar, consultar y descargar reportes"""
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        ajuste = override_settings(MEDIA_ROOT=self.media)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+
+        self.admin = User.objects.create_superuser(username='admin', password='testpass123')
+        self.user = User.objects.create_user(username='operario', password='testpass123')
+        PerfilUsuario.objects.filter(user=self.user).update(rol='admin_aves')
+        self.client.force_login(self.user)
+        self.lote = LoteAves.objects.create(
+            codigo='L001', galpon='Galpón 1', linea_genetica='lohmann_brown', procedencia='Incubadora',
+            numero_aves_inicial=1000, numero_aves_actual=1000, fecha_llegada=date(2024, 1, 1),
+            peso_total_llegada=Decimal('40.00'), peso_promedio_llegada=Decimal('40.00'), estado='postura',
+        )
+        BitacoraDiaria.objects.create(
+            lote=self.lote, fecha=date(2024, 6, 10), recoleccion_1=800, produccion_aaa=800,
+            consumo_concentrado=Decimal('110.00'), usuario_registro=self.admin,
+        )
+
+    def encolar(self, clave, datos):
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.client.post(reverse('reportes:encolar_reporte', args=[clave]), datos)
+        return respuesta
+
+    def test_encolar_consultar_y_descargar(self):
+        respuesta = self.encolar('datos_completos', {'formato': 'csv'})
+
+        self.assertEqual(respuesta.status_code, 202)
+        estado = self.client.get(respuesta.json()['url_estado']).json()
+        self.assertEqual(estado['estado'], 'completado')
+        self.assertEqual(estado['nombre_archivo'], 'datos_completos.csv')
+
+        reporte = ReporteGenerado.objects.get()
+        self.assertTrue(reporte.archivo.name.startswith('reportes/'))
+        self.assertEqual((reporte.formato, reporte.parametros['trabajo']), ('csv', 'datos_completos'))
+
+        descarga = self.client.get(estado['url_descarga'])
+        contenido = b''.join(descarga.streaming_content).decode('utf-8')
+        self.assertIn('L001', contenido)
+        self.assertIn('10/06/2024', contenido)
+
+    def test_comparativo_de_lotes(self):
+        self.encolar('comparativo_lotes', {
+            'lotes_ids': [self.lote.pk], 'fecha_inicio': '2024-06-01', 'fecha_fin': '2024-06-30',
+        })
+
+        reporte = ReporteGenerado.objects.get()
+        self.assertEqual(reporte.estado, 'completado', reporte.mensaje_error)
+        self.assertEqual(reporte.nombre_archivo, 'comparativo_lotes.xlsx')
+
+    def test_error_queda_registrado(self):
+        respuesta = self.encolar('sena_mensual', {'lote_id': 999, 'mes': 6, 'año': 2024})
+
+        estado = self.client.get(respuesta.json()['url_estado']).json()
+        self.assertEqual(estado['estado'], 'error')
+        self.assertIn('999', estado['error'])
+        url = reverse('reportes:descargar_reporte', args=[respuesta.json()['reporte_id']])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_validaciones_y_permisos(self):
+        self.assertEqual(self.encolar('sena_mensual', {'mes': 6}).status_code, 400)
+        self.assertEqual(self.encolar('inexistente', {}).status_code, 404)
+
+        reporte_id = self.encolar('datos_completos', {}).json()['reporte_id']
+        otro = User.objects.create_user(username='otro', password='testpass123')
+        self.client.force_login(otro)
+        self.assertEqual(self.client.get(reverse('reportes:estado_reporte', args=[reporte_id])).status_code, 404)
+
+    def test_interrumpidos_se_reencolan_una_vez(self):
+        tipo = TipoReporte.objects.create(nombre='Datos completos', descripcion='Datos', categoria='general')
+        colgado, reintentado, reciente = [
+            ReporteGenerado.objects.create(
+                tipo_reporte=tipo, usuario=self.user, nombre_archivo='', formato='csv',
+                parametros={'trabajo': 'datos_completos', 'formato': 'csv', **extra},
+            )
+            for extra in ({}, {'reintentos': 1}, {})
+        ]
+        hace_dos_horas = timezone.now() - timedelta(hours=2)
+        ReporteGenerado.objects.filter(pk__in=[colgado.pk, reintentado.pk]).update(updated_at=hace_dos_horas)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reencolados = recuperar_interrumpidos()
+
+        self.assertEqual(reencolados, [colgado])
+        colgado.refresh_from_db()
+        self.assertEqual((colgado.estado, colgado.parametros['reintentos']), ('completado', 1))
+        reintentado.refresh_from_db()
+        self.assertEqual(reintentado.estado, 'error')
+        self.assertIn('interrumpió', reintentado.mensaje_error)
+        reciente.refresh_from_db()
+        self.assertEqual(reciente.estado, 'generando')
+
+
+def local(*args):
+    return timezone.make_aware(datetime(*args))
+
+
+@override_settings(REPORTES_BACKEND='sincrono')
+class ProgramadorReportesTest(TestCase):
+    """Pruebas del cálculo de la próxima ejecución y de la pasada del programador"""
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        ajuste = override_settings(MEDIA_ROOT=self.media)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+
+        self.admin = User.objects.create_superuser(username='admin', password='testpass123')
+        self.tipo = TipoReporte.objects.create(nombre='Datos completos', descripcion='', categoria='general')
+        self.ahora = local(2024, 6, 12, 8, 0)  # miércoles
+
+    def programar(self, frecuencia='diario', hora=time(6, 0), **campos):
+        return ReporteProgramado.objects.create(
+            tipo_reporte=self.tipo, usuario=self.admin, nombre=f'Programa {frecuencia}',
+            frecuencia=frecuencia, hora_ejecucion=hora, formato_salida='csv', **campos,
+        )
+
+    def test_proxima_ejecucion(self):
+        casos = [
+            (('diario', time(6, 0)), {}, local(2024, 6, 13, 6, 0)),
+            (('diario', time(9, 0)), {}, local(2024, 6, 12, 9, 0)),
+            (('semanal', time(6, 0)), {'dia_semana': 3}, local(2024, 6, 19, 6, 0)),
+            (('semanal', time(6, 0)), {'dia_semana': 1}, local(2024, 6, 17, 6, 0)),
+            (('mensual', time(6, 0)), {'dia_mes': 31}, local(2024, 6, 30, 6, 0)),
+            (('mensual', time(6, 0)), {'dia_mes': 12}, local(2024, 7, 12, 6, 0)),
+            (('trimestral', time(6, 0)), {}, local(2024, 7, 1, 6, 0)),
+        ]
+        for (frecuencia, hora), campos, esperada in casos:
+            programado = ReporteProgramado(frecuencia=frecuencia, hora_ejecucion=hora, **campos)
+            self.assertEqual(calcular_proxima_ejecucion(programado, self.ahora), esperada, (frecuencia, campos))
+
+    def test_vencidos_se_encolan_y_reprograman(self):
+        vencido = self.programar(proxima_ejecucion=local(2024, 6, 12, 6, 0))
+        futuro = self.programar('semanal', proxima_ejecucion=local(2024, 6, 17, 6, 0))
+        nuevo = self.programar('mensual')
+        inactivo = self.programar(proxima_ejecucion=local(2024, 6, 1, 6, 0), is_active=False)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reportes = ejecutar_programados(self.ahora)
+
+        self.assertEqual(len(reportes), 1)
+        reporte = ReporteGenerado.objects.get()
+        self.assertEqual(reporte.estado, 'completado', reporte.mensaje_error)
+        self.assertEqual((reporte.tipo_reporte, reporte.formato), (self.tipo, 'csv'))
+        self.assertEqual(reporte.parametros['programado'], vencido.pk)
+
+        vencido.refresh_from_db()
+        self.assertEqual(vencido.ultima_ejecucion, self.ahora)
+        self.assertEqual(vencido.proxima_ejecucion, local(2024, 6, 13, 6, 0))
+        futuro.refresh_from_db()
+        self.assertIsNone(futuro.ultima_ejecucion)
+        nuevo.refresh_from_db()
+        self.assertEqual(nuevo.proxima_ejecucion, local(2024, 7, 1, 6, 0))
+        inactivo.refresh_from_db()
+        self.assertIsNone(inactivo.ultima_ejecucion)
+
+        # Una segunda pasada en el mismo minuto no repite el reporte
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(ejecutar_programados(self.ahora), [])
+
+    def test_correo_con_adjunto(self):
+        self.programar(
+            proxima_ejecucion=local(2024, 6, 12, 6, 0), enviar_email=True,
+            emails_destino=['granja@example.com', 'sena@example.com'],
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ejecutar_programados(self.ahora)
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['granja@example.com', 'sena@example.com'])
+        self.assertEqual(mail.outbox[0].attachments[0][0], 'datos_completos.csv')
+
+    def test_tipo_no_programable(self):
+        self.tipo = TipoReporte.objects.create(nombre='Financiero', descripcion='', categoria='financiero')
+        self.programar(proxima_ejecucion=local(2024, 6, 12, 6, 0))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reporte, = ejecutar_programados(self.ahora)
+
+        self.assertEqual(reporte.estado, 'error')
+        self.assertIn('Financiero', reporte.mensaje_error)
+
+    def test_comando(self):
+        self.programar(proxima_ejecucion=timezone.now())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('ejecutar_reportes_programados', stdout=io.StringIO())
+
+        self.assertEqual(ReporteGenerado.objects.get().estado, 'completado')
+
+
+class ResultadosCacheTest(TestCase):
+    """Pruebas de la caché de resultados con marca de datos"""
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        ajuste = override_settings(MEDIA_ROOT=self.media)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+
+        self.admin = User.objects.create_superuser(username='admin', password='testpass123')
+        self.user = User.objects.create_user(username='operario', password='testpass123')
+        PerfilUsuario.objects.filter(user=self.user).update(rol='admin_aves')
+        self.client.force_login(self.user)
+        self.lote = LoteAves.objects.create(
+            codigo='L001', galpon='Galpón 1', linea_genetica='lohmann_brown', procedencia='Incubadora',
+            numero_aves_inicial=1000, numero_aves_actual=1000, fecha_llegada=date(2024, 1, 1),
+            peso_total_llegada=Decimal('40.00'), peso_promedio_llegada=Decimal('40.00'), estado='postura',
+        )
+        self.bitacora = BitacoraDiaria.objects.create(
+            lote=self.lote, fecha=date(2024, 6, 10), recoleccion_1=800, produccion_aaa=800, mortalidad=2,
+            consumo_concentrado=Decimal('110.00'), usuario_registro=self.admin,
+        )
+
+    def mortalidad(self, **parametros):
+        return self.client.get(reverse('aves:reporte_mortalidad'), {'lote_id': self.lote.pk, **parametros})
+
+    def test_contexto_reutilizado_hasta_que_cambian_los_datos(self):
+        self.assertEqual(self.mortalidad().context['resumen']['total_mortalidad'], 2)
+        guardado = ReporteGenerado.objects.get(formato='html')
+        # Un parámetro vacío no cambia la clave: se sirve el resultado guardado
+        respuesta = self.mortalidad(fecha_fin='')
+        self.assertEqual(respuesta.context['resumen']['total_mortalidad'], 2)
+        self.assertEqual(ReporteGenerado.objects.get(formato='html').pk, guardado.pk)
+
+        self.bitacora.mortalidad = 5
+        self.bitacora.save()
+        self.assertEqual(self.mortalidad().context['resumen']['total_mortalidad'], 5)
+        # La entrada anterior se reemplaza
+        self.assertEqual(ReporteGenerado.objects.filter(formato='html').count(), 1)
+
+        self.bitacora.delete()
+        self.assertEqual(self.mortalidad().context['resumen']['registros_encontrados'], 0)
+
+    def test_archivo_reutilizado(self):
+        primero = b''.join(self.mortalidad(formato='csv').streaming_content)
+        reporte = ReporteGenerado.objects.get(formato='csv')
+        self.assertEqual(reporte.tipo_reporte.nombre, 'Reporte de mortalidad')
+
+        segunda = self.mortalidad(formato='csv')
+        self.assertEqual(b''.join(segunda.streaming_content), primero)
+        self.assertIn('reporte_mortalidad.csv', segunda['Content-Disposition'])
+        self.assertEqual(ReporteGenerado.objects.get(formato='csv').pk, reporte.pk)
+
+        # gzip es otro resultado
+        comprimida = self.mortalidad(formato='csv', gzip='1')
+        self.assertEqual(comprimida['Content-Type'], 'application/gzip')
+        self.assertEqual(ReporteGenerado.objects.filter(formato='csv').count(), 2)
+
+    def test_html_de_produccion(self):
+        url = reverse('aves:reporte_produccion')
+        self.assertEqual(self.client.get(url, {'lote': self.lote.pk}).context['resumen']['total_huevos'], 800)
+
+        respuesta = self.client.get(url, {'lote': self.lote.pk})
+        dato = respuesta.context['datos_reporte'][0]
+        self.assertEqual(dato['lote'].codigo, 'L001')
+        self.assertEqual(dato['fecha'], date(2024, 6, 10))
+        self.assertEqual(dato['consumo_concentrado'], Decimal('110.00'))
+
+        # Se guarda como JSON con el lote por referencia, no como objeto serializado
+        reporte = ReporteGenerado.objects.get(formato='html')
+        self.assertTrue(reporte.nombre_archivo.endswith('.json'))
+        with reporte.archivo.open('rb') as archivo:
+            guardado = json.loads(archivo.read())
+        self.assertEqual(guardado['datos_reporte'][0]['lote'], {'__modelo__': 'aves.LoteAves', 'pk': self.lote.pk})
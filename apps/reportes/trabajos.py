@@ -0,0 +1,320 @@
+"""
+Generación de reportes pesados en segundo plano.
+
+Los reportes que pueden pasar del timeout de gunicorn (registro mensual
+SENA de un lote o de todos, exportación completa de datos, comparativo de
+varios lotes) no se
+generan dentro de la petición: encolar_reporte crea un ReporteGenerado en
+estado 'generando' y, al confirmarse la transacción, lo envía a un pool de
+trabajadores. El trabajador genera la misma respuesta que la descarga
+directa, guarda el archivo en media/reportes/ y marca el reporte como
+'completado' o 'error'. El cliente consulta el estado y descarga el
+archivo con las vistas estado_reporte y descargar_reporte.
+
+REPORTES_BACKEND elige dónde se ejecuta: 'hilos' (por defecto, un
+ThreadPoolExecutor del proceso web), 'procesos' (ProcessPoolExecutor,
+para no competir por el GIL con las peticiones), 'celery' (un worker de config/celery.py) o
+'sincrono' (en el mismo hilo al confirmar; pruebas y comandos).
+
+Un reinicio o despliegue pierde los trabajos que estaban en el pool del
+proceso: recuperar_interrumpidos (llamado por el programador cada minuto)
+vuelve a encolar una vez los reportes que llevan más de
+REPORTES_INTERRUMPIDO_MINUTOS en 'generando' y marca con error los que ya
+se reintentaron.
+
+Si los parámetros traen 'emails', el archivo terminado se envía por
+correo desde un pool aparte de un solo hilo (o una tarea de Celery): un
+servidor SMTP lento no ocupa a los trabajadores que generan reportes.
+"""
+
+import logging
+import multiprocessing
+import re
+import tempfile
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import timedelta
+from functools import partial
+
+import django
+from django.conf import settings
+from django.core.files import File
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import ReporteGenerado, TipoReporte
+
+logger = logging.getLogger(__name__)
+
+try:
+    import celery  # noqa: F401
+    CELERY_AVAILABLE = True
+except ImportError:
+    CELERY_AVAILABLE = False
+
+
+def _sena_mensual(parametros):
+    from apps.aves.reports import generar_reporte_sena_excel
+    return generar_reporte_sena_excel(
+        parametros['lote_id'], int(parametros['mes']), int(parametros['año']),
+        parametros.get('nombre_granja') or 'Granja Avícola La Salada',
+        parametros.get('registro_ica') or '051290274',
+    )
+
+
+def _sena_lote(parametros):
+    from apps.aves.models import LoteAves
+    from apps.aves.reports import generar_reportes_sena
+    from apps.aves.sena import leer_periodo
+    periodos = parametros['periodos']
+    lotes = LoteAves.objects.filter(is_active=True).order_by('galpon', 'codigo')
+    if parametros.get('lotes_ids'):
+        lotes = lotes.filter(pk__in=parametros['lotes_ids'])
+    if parametros.get('galpon'):
+        lotes = lotes.filter(galpon=parametros['galpon'])
+    return generar_reportes_sena(
+        lotes, [leer_periodo(periodo) for periodo in ([periodos] if isinstance(periodos, str) else periodos)],
+        parametros.get('nombre_granja') or 'Granja Avícola La Salada',
+        parametros.get('registro_ica') or '051290274',
+        formato=parametros.get('formato_lote') or 'zip',
+    )
+
+
+def _datos_completos(parametros):
+    from apps.aves.views_reports import generar_csv_datos_completos, generar_excel_datos_completos
+    incluir_historicos = parametros.get('incluir_historicos') in (True, 'true', '1')
+    if parametros.get('formato') == 'csv':
+        return generar_csv_datos_completos(incluir_historicos, comprimir=parametros.get('gzip') in (True, 'true', '1'))
+    return generar_excel_datos_completos(incluir_historicos)
+
+
+def _comparativo_lotes(parametros):
+    from apps.aves.reports import ReporteComparativo
+    from apps.aves.views_reports import generar_excel_comparativo
+    if not (parametros.get('lotes_ids') or parametros.get('galpon') or parametros.get('linea_genetica')):
+        raise ValueError('Indique los lotes, el galpón o la línea genética a comparar')
+    datos = ReporteComparativo().comparar_lotes(
+        parametros.get('lotes_ids'), parametros.get('fecha_inicio'), parametros.get('fecha_fin'),
+        galpon=parametros.get('galpon'), linea_genetica=parametros.get('linea_genetica'),
+    )
+    return generar_excel_comparativo(datos)
+
+
+# clave -> (nombre del TipoReporte, categoría, formato, parámetros obligatorios, función que genera la respuesta)
+Trabajo = namedtuple('Trabajo', 'nombre categoria formato requeridos generar')
+
+TRABAJOS = {
+    'sena_mensual': Trabajo('Registro mensual SENA', 'produccion', 'excel', ('lote_id', 'mes', 'año'), _sena_mensual),
+    # periodos: lista de 'AAAA-MM'; ZIP con un Excel por lote-mes o un libro (formato_lote='libro')
+    'sena_lote': Trabajo('Registros SENA de todos los lotes', 'produccion', 'excel', ('periodos',), _sena_lote),
+    'datos_completos': Trabajo('Datos completos', 'general', 'excel', (), _datos_completos),
+    # lotes_ids, galpon o linea_genetica: se valida al generar
+    'comparativo_lotes': Trabajo('Comparativo de lotes', 'produccion', 'excel', (), _comparativo_lotes),
+}
+
+_candado = threading.Lock()
+_pool = None
+_pool_correo = None
+
+
+def _backend():
+    backend = getattr(settings, 'REPORTES_BACKEND', 'hilos')
+    if backend == 'celery' and not CELERY_AVAILABLE:
+        logger.warning('Celery no está instalado; los reportes se generan en hilos')
+        return 'hilos'
+    return backend
+
+
+def _obtener_pool():
+    global _pool
+    with _candado:
+        if _pool is None:
+            trabajadores = getattr(settings, 'REPORTES_TRABAJADORES', 2)
+            if _backend() == 'procesos':
+                # spawn: cada proceso arranca limpio (sin conexiones heredadas) y configura Django
+                _pool = ProcessPoolExecutor(
+                    max_workers=trabajadores, mp_context=multiprocessing.get_context('spawn'),
+                    initializer=django.setup,
+                )
+            else:
+                _pool = ThreadPoolExecutor(max_workers=trabajadores, thread_name_prefix='reportes')
+        return _pool
+
+
+def encolar_reporte(usuario, clave, parametros, tipo=None):
+    """
+    Registra un reporte en estado 'generando' y lo envía al pool al
+    confirmarse la transacción. `parametros` debe poder serializarse como
+    JSON. Sin `tipo` se usa el TipoReporte del trabajo. Retorna el
+    ReporteGenerado.
+    """
+    trabajo = TRABAJOS[clave]
+    if tipo is None:
+        tipo, _ = TipoReporte.objects.get_or_create(
+            nombre=trabajo.nombre,
+            defaults={'descripcion': f'{trabajo.nombre} generado en segundo plano', 'categoria': trabajo.categoria},
+        )
+    formato = 'csv' if parametros.get('formato') == 'csv' else trabajo.formato
+    reporte = ReporteGenerado.objects.create(
+        tipo_reporte=tipo, usuario=usuario, nombre_archivo='', formato=formato,
+        parametros={**parametros, 'trabajo': clave},
+    )
+    transaction.on_commit(lambda: despachar(reporte.pk))
+    return reporte
+
+
+def despachar(reporte_id):
+    backend = _backend()
+    if backend == 'sincrono':
+        ejecutar_reporte(reporte_id)
+        return
+
+    if backend == 'celery':
+        from .tasks import ejecutar_reporte_task
+        try:
+            ejecutar_reporte_task.delay(reporte_id)
+            return
+        except Exception:
+            logger.exception('No se pudo enviar el reporte %s a Celery; se genera localmente', reporte_id)
+    _obtener_pool().submit(_ejecutar_en_trabajador, reporte_id)
+
+
+def recuperar_interrumpidos(ahora=None):
+    """
+    Reencola los reportes del pool que siguen en 'generando' tras
+    REPORTES_INTERRUMPIDO_MINUTOS sin cambios (el proceso que los generaba
+    se reinició). Cada reporte se reintenta una sola vez; la siguiente se
+    marca como error. Retorna la lista de ReporteGenerado reencolados.
+    """
+    ahora = ahora or timezone.now()
+    limite = ahora - timedelta(minutes=getattr(settings, 'REPORTES_INTERRUMPIDO_MINUTOS', 60))
+    reencolados = []
+    with transaction.atomic():
+        for reporte in ReporteGenerado.objects.select_for_update(skip_locked=True).filter(
+            estado='generando', updated_at__lt=limite, parametros__has_key='trabajo',
+        ):
+            if reporte.parametros.get('reintentos', 0) >= 1 or reporte.parametros['trabajo'] not in TRABAJOS:
+                logger.warning('El reporte %s quedó interrumpido y se marca con error', reporte.pk)
+                reporte.estado = 'error'
+                reporte.mensaje_error = 'La generación se interrumpió (reinicio del servidor); vuelva a solicitarlo'
+                reporte.save(update_fields=['estado', 'mensaje_error', 'updated_at'])
+                continue
+            logger.info('Reencolando el reporte interrumpido %s', reporte.pk)
+            reporte.parametros['reintentos'] = reporte.parametros.get('reintentos', 0) + 1
+            reporte.save(update_fields=['parametros', 'updated_at'])
+            transaction.on_commit(partial(despachar, reporte.pk))
+            reencolados.append(reporte)
+    return reencolados
+
+
+def _nombre_archivo(respuesta):
+    encontrado = re.search(r'filename="?([^";]+)"?', respuesta.get('Content-Disposition', ''))
+    return encontrado.group(1) if encontrado else None
+
+
+def guardar_respuesta(reporte, respuesta, nombre_por_defecto):
+    """
+    Copia el contenido de una respuesta de descarga al archivo del reporte
+    y lo marca como completado, sin guardar el modelo. Una respuesta con
+    error se convierte en ValueError con su contenido.
+    """
+    if respuesta.status_code != 200:
+        contenido = b'' if respuesta.streaming else respuesta.content
+        raise ValueError(contenido.decode('utf-8', 'replace')[:500] or f'HTTP {respuesta.status_code}')
+
+    nombre = _nombre_archivo(respuesta) or nombre_por_defecto
+    with tempfile.TemporaryFile() as temporal:
+        for bloque in (respuesta.streaming_content if respuesta.streaming else [respuesta.content]):
+            temporal.write(bloque)
+        # Sin respuesta.close(): emitiría request_finished y cerraría la conexión
+        # a la base de datos a mitad del trabajo; los archivos se liberan con la respuesta
+        temporal.seek(0)
+        reporte.archivo.save(nombre, File(temporal), save=False)
+    reporte.nombre_archivo = nombre
+    reporte.estado = 'completado'
+    reporte.mensaje_error = ''
+
+
+def _ejecutar_en_trabajador(reporte_id):
+    close_old_connections()
+    try:
+        ejecutar_reporte(reporte_id)
+    finally:
+        close_old_connections()
+
+
+def ejecutar_reporte(reporte_id):
+    """
+    Genera el archivo de un reporte encolado y actualiza su estado. Los
+    errores quedan en mensaje_error y en el log; nunca se propagan.
+    """
+    try:
+        reporte = ReporteGenerado.objects.get(pk=reporte_id)
+        try:
+            clave = reporte.parametros['trabajo']
+            guardar_respuesta(reporte, TRABAJOS[clave].generar(reporte.parametros), f'{clave}_{reporte.pk}')
+        except Exception as e:
+            logger.exception('Error generando el reporte %s', reporte_id)
+            reporte.estado = 'error'
+            reporte.mensaje_error = str(e)
+        reporte.save(update_fields=['archivo', 'nombre_archivo', 'estado', 'mensaje_error', 'updated_at'])
+        if reporte.estado == 'completado' and reporte.parametros.get('emails'):
+            despachar_correo(reporte.pk)
+    except ReporteGenerado.DoesNotExist:
+        logger.warning('El reporte %s ya no existe', reporte_id)
+
+
+def despachar_correo(reporte_id):
+    """Envía por correo un reporte terminado sin bloquear al trabajador que lo generó."""
+    global _pool_correo
+    backend = _backend()
+    if backend == 'sincrono':
+        enviar_correo_reporte(reporte_id)
+        return
+
+    if backend == 'celery':
+        from .tasks import enviar_correo_reporte_task
+        try:
+            enviar_correo_reporte_task.delay(reporte_id)
+            return
+        except Exception:
+            logger.exception('No se pudo enviar el correo del reporte %s a Celery; se envía localmente', reporte_id)
+    with _candado:
+        if _pool_correo is None:
+            _pool_correo = ThreadPoolExecutor(max_workers=1, thread_name_prefix='reportes-correo')
+        pool = _pool_correo
+    pool.submit(_enviar_en_trabajador, reporte_id)
+
+
+def _enviar_en_trabajador(reporte_id):
+    close_old_connections()
+    try:
+        enviar_correo_reporte(reporte_id)
+    finally:
+        close_old_connections()
+
+
+def enviar_correo_reporte(reporte_id):
+    """Adjunta el archivo del reporte y lo envía a parametros['emails']."""
+    from .utils import enviar_reporte_por_email
+    try:
+        reporte = ReporteGenerado.objects.select_related('tipo_reporte').get(pk=reporte_id)
+    except ReporteGenerado.DoesNotExist:
+        logger.warning('El reporte %s ya no existe', reporte_id)
+        return False
+    return enviar_reporte_por_email(reporte, reporte.parametros['emails'])
+
+
+def esperar_reportes():
+    """Espera a que los pools terminen los reportes y correos encolados (pruebas y comandos)."""
+    global _pool, _pool_correo
+    with _candado:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True)
+    # Los reportes terminados pudieron encolar correos mientras se esperaba
+    with _candado:
+        pool_correo, _pool_correo = _pool_correo, None
+    if pool_correo is not None:
+        pool_correo.shutdown(wait=True)
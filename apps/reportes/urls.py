@@ -17,4 +17,9 @@ urlpatterns = [
     # APIs para datos de reportes
     path('api/datos-produccion/', views.api_datos_produccion, name='api_datos_produccion'),
     path('api/datos-financieros/', views.api_datos_financieros, name='api_datos_financieros'),
+    
+    # Reportes pesados generados en segundo plano
+    path('trabajos/<str:clave>/', views.encolar_reporte_view, name='encolar_reporte'),
+    path('trabajos/<int:pk>/estado/', views.estado_reporte, name='estado_reporte'),
+    path('trabajos/<int:pk>/descargar/', views.descargar_reporte, name='descargar_reporte'),
 ]
\ No newline at end of file
@@ -1,6 +1,6 @@
-import os
 import io
 import csv
+import logging
 from datetime import datetime, timedelta
 from django.conf import settings
 from django.template.loader import render_to_string
@@ -28,6 +28,9 @@ except ImportError:
     OPENPYXL_AVAILABLE = False
 
 from apps.aves.models import LoteAves, BitacoraDiaria
+from .models import ReporteGenerado
+
+logger = logging.getLogger(__name__)
 
 class GeneradorReportes:
     """
@@ -306,7 +309,9 @@ class ReportePersonalizado:
 
 def generar_reporte_automatico(reporte_programado):
     """
-    Genera un reporte automático basado en la configuración programada.
+    Genera ahora, en el hilo actual, el reporte de un programa (ejecución
+    manual). El programador usa apps.reportes.programador.ejecutar_programados,
+    que encola los vencidos en el pool de trabajos.
     
     Args:
         reporte_programado: Instancia del modelo ReporteProgramado
@@ -314,86 +319,64 @@ def generar_reporte_automatico(reporte_programado):
     Returns:
         dict: Resultado de la generación del reporte
     """
-    try:
-        # Obtener parámetros del reporte
-        parametros = {
-            'fecha_inicio': reporte_programado.fecha_inicio,
-            'fecha_fin': reporte_programado.fecha_fin,
-        }
-        
-        # Crear generador de reportes
-        generador = GeneradorReportes(
-            tipo_reporte=reporte_programado.tipo_reporte,
-            parametros=parametros
-        )
-        
-        # Obtener datos según el tipo
-        if reporte_programado.tipo_reporte == 'produccion':
-            datos = generador.obtener_datos_produccion()
-        elif reporte_programado.tipo_reporte == 'inventario':
-            datos = generador.obtener_datos_inventario()
-        else:
-            raise ValueError(f"Tipo de reporte no soportado: {reporte_programado.tipo_reporte}")
-        
-        # Generar archivo según formato
-        nombre_archivo = f"{reporte_programado.tipo_reporte}_{timezone.now().strftime('%Y%m%d_%H%M%S')}"
-        
-        if reporte_programado.formato == 'excel':
-            archivo = generador.generar_excel(datos, nombre_archivo)
-        elif reporte_programado.formato == 'csv':
-            archivo = generador.generar_csv(datos, nombre_archivo)
-        else:
-            raise ValueError(f"Formato no soportado: {reporte_programado.formato}")
-        
-        # Guardar archivo si es necesario
-        if reporte_programado.guardar_archivo:
-            ruta_archivo = os.path.join(
-                settings.MEDIA_ROOT, 
-                'reportes', 
-                f"{nombre_archivo}.{reporte_programado.formato}"
-            )
-            
-            # Crear directorio si no existe
-            os.makedirs(os.path.dirname(ruta_archivo), exist_ok=True)
-            
-            # Guardar archivo
-            with open(ruta_archivo, 'wb') as f:
-                f.write(archivo.content)
-        
-        # Enviar por email si está configurado
-        if reporte_programado.enviar_email and reporte_programado.emails_destino:
-            emails = [email.strip() for email in reporte_programado.emails_destino.split(',')]
-            enviar_reporte_por_email(archivo, emails)
-        
-        return {
-            'exito': True,
-            'mensaje': 'Reporte generado exitosamente',
-            'archivo': archivo,
-            'datos': datos
-        }
-        
-    except Exception as e:
+    from .programador import clave_trabajo, parametros_de_ejecucion
+    from .trabajos import TRABAJOS, ejecutar_reporte
+
+    clave = clave_trabajo(reporte_programado)
+    if clave is None:
+        mensaje = f'Tipo de reporte no soportado: {reporte_programado.tipo_reporte.nombre}'
+        return {'exito': False, 'mensaje': mensaje, 'error': mensaje}
+
+    parametros = parametros_de_ejecucion(reporte_programado, clave, timezone.now())
+    faltantes = [campo for campo in TRABAJOS[clave].requeridos if campo not in parametros]
+    if faltantes:
+        mensaje = f'Faltan parámetros: {", ".join(faltantes)}'
+        return {'exito': False, 'mensaje': mensaje, 'error': mensaje}
+
+    reporte = ReporteGenerado.objects.create(
+        tipo_reporte=reporte_programado.tipo_reporte, usuario=reporte_programado.usuario,
+        nombre_archivo='', formato=reporte_programado.formato_salida,
+        parametros={**parametros, 'trabajo': clave},
+    )
+    ejecutar_reporte(reporte.pk)
+    reporte.refresh_from_db()
+
+    if reporte.estado != 'completado':
         return {
             'exito': False,
-            'mensaje': f'Error generando reporte: {str(e)}',
-            'error': str(e)
+            'mensaje': f'Error generando reporte: {reporte.mensaje_error}',
+            'error': reporte.mensaje_error,
+            'reporte': reporte,
         }
+    return {
+        'exito': True,
+        'mensaje': 'Reporte generado exitosamente',
+        'reporte': reporte,
+    }
 
 
 def enviar_reporte_por_email(reporte_generado, emails_destino):
     """
-    Envía un reporte por email.
+    Envía por email el archivo de un reporte generado.
     
     Args:
-        reporte_generado: Archivo del reporte generado
-        emails_destino: Lista de emails destino
+        reporte_generado: ReporteGenerado completado
+        emails_destino: Lista de emails destino (o texto separado por comas)
+    
+    Returns:
+        bool: True si el email se envió
     """
+    from django.core.mail import EmailMessage
+
+    if isinstance(emails_destino, str):
+        emails_destino = emails_destino.split(',')
+    emails_destino = [email.strip() for email in emails_destino if email.strip()]
+    if not emails_destino or not reporte_generado.archivo:
+        return False
+
     try:
-        from django.core.mail import EmailMessage
-        from django.conf import settings
-        
         # Crear mensaje de email
-        asunto = f"Reporte AgroSmart - {timezone.now().strftime('%d/%m/%Y')}"
+        asunto = f"Reporte AgroSmart - {reporte_generado.tipo_reporte.nombre} - {timezone.localdate().strftime('%d/%m/%Y')}"
         mensaje = """
         Estimado usuario,
         
@@ -403,7 +386,7 @@ def enviar_reporte_por_email(reporte_generado, emails_destino):
         
         Saludos,
         Sistema AgroSmart
-        """.format(timezone.now().strftime('%d/%m/%Y %H:%M'))
+        """.format(timezone.localtime(reporte_generado.fecha_generacion).strftime('%d/%m/%Y %H:%M'))
         
         # Crear email
         email = EmailMessage(
@@ -412,13 +395,14 @@ def enviar_reporte_por_email(reporte_generado, emails_destino):
             from_email=settings.DEFAULT_FROM_EMAIL,
             to=emails_destino
         )
-
+        with reporte_generado.archivo.open('rb') as archivo:
+            email.attach(reporte_generado.nombre_archivo, archivo.read())
         
         # Enviar
         email.send()
         
         return True
         
-    except Exception as e:
-        print(f"Error enviando email: {e}")
-        return False
\ No newline at end of file
+    except Exception:
+        logger.exception('Error enviando por email el reporte %s', reporte_generado.pk)
+        return False
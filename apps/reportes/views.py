@@ -2,15 +2,21 @@
 Vistas para el módulo de reportes.
 """
 
-from django.shortcuts import render
+from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, FileResponse, Http404
+from django.urls import reverse
+from django.views.decorators.http import require_POST
 from django.db.models import Sum, Count, Avg, F
+from django.db.models.functions import ExtractIsoYear, ExtractWeek
 from django.utils import timezone
 from datetime import datetime, timedelta
 from django.utils import timezone
 
-from apps.aves.models import LoteAves, BitacoraDiaria, MovimientoHuevos, ControlConcentrado
+from apps.aves.models import LoteAves, BitacoraDiaria, ResumenProduccionDiaria, MovimientoHuevos, ControlConcentrado
+from apps.usuarios.decorators import acceso_modulo_aves_required
+from .models import ReporteGenerado
+from .trabajos import TRABAJOS, encolar_reporte
 
 
 @login_required
@@ -109,30 +115,27 @@ def reporte_produccion_semanal(lote_id, fecha_inicio, fecha_fin):
     if lote_id:
         filtros['lote_id'] = lote_id
     
-    # Obtener datos de producción
-    produccion = BitacoraDiaria.objects.filter(**filtros).select_related('lote')
+    # Agrupar por semana ISO directamente en el resumen diario
+    produccion = ResumenProduccionDiaria.objects.filter(**filtros).annotate(
+        anio=ExtractIsoYear('fecha'),
+        semana=ExtractWeek('fecha')
+    ).values('anio', 'semana').annotate(
+        total_huevos=Sum('produccion_total'),
+        total_mortalidad=Sum('mortalidad'),
+        total_consumo=Sum('consumo_concentrado'),
+        dias_registrados=Count('id')
+    ).order_by('anio', 'semana')
     
-    # Agrupar por semana
     datos_semanales = {}
-    for bitacora in produccion:
-        # Calcular número de semana
-        semana = bitacora.fecha.isocalendar()[1]
-        año = bitacora.fecha.year
-        clave_semana = f"{año}-S{semana:02d}"
-        
-        if clave_semana not in datos_semanales:
-            datos_semanales[clave_semana] = {
-                'semana': clave_semana,
-                'total_huevos': 0,
-                'total_mortalidad': 0,
-                'total_consumo': 0,
-                'dias_registrados': 0
-            }
-        
-        datos_semanales[clave_semana]['total_huevos'] += bitacora.produccion_total
-        datos_semanales[clave_semana]['total_mortalidad'] += bitacora.mortalidad
-        datos_semanales[clave_semana]['total_consumo'] += bitacora.consumo_concentrado or 0
-        datos_semanales[clave_semana]['dias_registrados'] += 1
+    for fila in produccion:
+        clave_semana = f"{fila['anio']}-S{fila['semana']:02d}"
+        datos_semanales[clave_semana] = {
+            'semana': clave_semana,
+            'total_huevos': fila['total_huevos'] or 0,
+            'total_mortalidad': fila['total_mortalidad'] or 0,
+            'total_consumo': fila['total_consumo'] or 0,
+            'dias_registrados': fila['dias_registrados']
+        }
     
     # Convertir a lista y calcular promedios
     resultado = []
@@ -282,4 +285,67 @@ def api_datos_financieros(request):
         {'mes': 'Marzo', 'ingresos': 48000, 'gastos': 21000},
     ]
     
-    return JsonResponse({'ventas': data})
\ No newline at end of file
+    return JsonResponse({'ventas': data})
+
+
+def _reporte_del_usuario(request, pk):
+    reportes = ReporteGenerado.objects.select_related('tipo_reporte')
+    if not request.user.is_superuser:
+        reportes = reportes.filter(usuario=request.user)
+    return get_object_or_404(reportes, pk=pk)
+
+
+@login_required
+@acceso_modulo_aves_required
+@require_POST
+def encolar_reporte_view(request, clave):
+    """Encola un reporte pesado; responde de inmediato con la URL para consultar su estado."""
+    trabajo = TRABAJOS.get(clave)
+    if trabajo is None:
+        return JsonResponse({'success': False, 'error': 'Tipo de reporte no válido'}, status=404)
+
+    parametros = {}
+    for campo in request.POST:
+        if campo == 'csrfmiddlewaretoken':
+            continue
+        valores = request.POST.getlist(campo)
+        parametros[campo] = valores if campo.endswith('_ids') or len(valores) > 1 else valores[0]
+    faltantes = [campo for campo in trabajo.requeridos if not parametros.get(campo)]
+    if faltantes:
+        return JsonResponse({'success': False, 'error': f'Faltan parámetros: {", ".join(faltantes)}'}, status=400)
+
+    reporte = encolar_reporte(request.user, clave, parametros)
+    return JsonResponse({
+        'success': True,
+        'reporte_id': reporte.pk,
+        'estado': reporte.estado,
+        'url_estado': reverse('reportes:estado_reporte', args=[reporte.pk]),
+    }, status=202)
+
+
+@login_required
+def estado_reporte(request, pk):
+    """Estado de un reporte encolado, para consultarlo periódicamente."""
+    reporte = _reporte_del_usuario(request, pk)
+    datos = {
+        'success': True,
+        'reporte_id': reporte.pk,
+        'tipo': reporte.tipo_reporte.nombre,
+        'estado': reporte.estado,
+        'fecha_generacion': reporte.fecha_generacion.isoformat(),
+    }
+    if reporte.estado == 'completado':
+        datos['nombre_archivo'] = reporte.nombre_archivo
+        datos['url_descarga'] = reverse('reportes:descargar_reporte', args=[reporte.pk])
+    elif reporte.estado == 'error':
+        datos['error'] = reporte.mensaje_error
+    return JsonResponse(datos)
+
+
+@login_required
+def descargar_reporte(request, pk):
+    """Descarga el archivo de un reporte ya generado."""
+    reporte = _reporte_del_usuario(request, pk)
+    if reporte.estado != 'completado' or not reporte.archivo:
+        raise Http404('El reporte todavía no tiene archivo')
+    return FileResponse(reporte.archivo.open('rb'), as_attachment=True, filename=reporte.nombre_archivo)
@@ -0,0 +1,150 @@
+"""
+Escritura diferida de RegistroAcceso y retención con resumen diario.
+
+Los accesos se acumulan en memoria y se escriben con bulk_create cuando
+el búfer llega a ACCESOS_BUFFER_TAMANO registros, cada
+ACCESOS_BUFFER_SEGUNDOS segundos (hilo en segundo plano) y al terminar el
+proceso. Así, en el cambio de turno, cuando todos los operarios entran a
+la vez, los inicios de sesión no compiten con el trabajo real por
+inserciones individuales. Con ACCESOS_BUFFER_SEGUNDOS = 0 cada acceso se
+escribe en el momento.
+
+depurar_accesos() elimina los registros más antiguos que la retención,
+conservando en ResumenAccesoDiario el conteo diario por usuario y acción.
+"""
+
+import atexit
+import logging
+import threading
+from time import sleep
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import RegistroAcceso, ResumenAccesoDiario
+
+logger = logging.getLogger(__name__)
+
+_pendientes = []
+_candado = threading.Lock()
+_hilo = None
+
+
+def ip_cliente(request):
+    """IP del cliente, respetando X-Forwarded-For detrás del proxy."""
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        return x_forwarded_for.split(',')[0]
+    return request.META.get('REMOTE_ADDR')
+
+
+def registrar_acceso(usuario, request, accion, modulo):
+    """Encola un registro de acceso; se escribe con el siguiente vaciado del búfer."""
+    registro = RegistroAcceso(
+        usuario=usuario,
+        ip_address=ip_cliente(request),
+        user_agent=request.META.get('HTTP_USER_AGENT', ''),
+        accion=accion,
+        modulo=modulo,
+    )
+
+    intervalo = getattr(settings, 'ACCESOS_BUFFER_SEGUNDOS', 5)
+    if intervalo <= 0:
+        RegistroAcceso.objects.bulk_create([registro])
+        return
+
+    with _candado:
+        _pendientes.append(registro)
+        lleno = len(_pendientes) >= getattr(settings, 'ACCESOS_BUFFER_TAMANO', 50)
+    _iniciar_hilo(intervalo)
+    if lleno:
+        vaciar()
+
+
+def vaciar():
+    """Escribe los accesos pendientes con un solo bulk_create. Retorna cuántos escribió."""
+    with _candado:
+        if not _pendientes:
+            return 0
+        registros = _pendientes[:]
+        del _pendientes[:]
+
+    try:
+        RegistroAcceso.objects.bulk_create(registros, batch_size=500)
+    except Exception:
+        logger.exception('No se pudieron escribir %d registros de acceso', len(registros))
+        return 0
+    return len(registros)
+
+
+def _iniciar_hilo(intervalo):
+    global _hilo
+    with _candado:
+        if _hilo is not None:
+            return
+        _hilo = threading.Thread(target=_vaciar_periodicamente, args=(intervalo,), name='accesos', daemon=True)
+    _hilo.start()
+
+
+def _vaciar_periodicamente(intervalo):
+    while True:
+        sleep(intervalo)
+        close_old_connections()
+        vaciar()
+
+
+@atexit.register
+def _vaciar_al_terminar():
+    try:
+        vaciar()
+    except Exception:
+        logger.exception('No se pudieron escribir los registros de acceso al terminar')
+
+
+def _inicio_del_dia(dia):
+    return timezone.make_aware(datetime.combine(dia, time.min))
+
+
+def depurar_accesos(dias_retencion=90):
+    """
+    Resume y elimina los accesos con más de `dias_retencion` días, un día
+    por transacción. Los conteos se suman a ResumenAccesoDiario, de modo
+    que volver a ejecutar la depuración no duplica nada. Retorna
+    (dias_procesados, registros_eliminados).
+    """
+    limite = _inicio_del_dia(timezone.localdate() - timedelta(days=dias_retencion))
+    dias = list(
+        RegistroAcceso.objects.filter(created_at__lt=limite).annotate(dia=TruncDate('created_at'))
+        .order_by('dia').values_list('dia', flat=True).distinct()
+    )
+
+    eliminados = 0
+    for dia in dias:
+        inicio = _inicio_del_dia(dia)
+        registros_dia = RegistroAcceso.objects.filter(created_at__gte=inicio, created_at__lt=inicio + timedelta(days=1))
+        with transaction.atomic():
+            conteos = {
+                (usuario_id, accion): total
+                for usuario_id, accion, total in registros_dia.order_by().values('usuario_id', 'accion')
+                .annotate(total=Count('id')).values_list('usuario_id', 'accion', 'total')
+            }
+            existentes = {
+                (resumen.usuario_id, resumen.accion): resumen
+                for resumen in ResumenAccesoDiario.objects.select_for_update().filter(fecha=dia)
+            }
+            nuevos, actualizados = [], []
+            for (usuario_id, accion), total in conteos.items():
+                resumen = existentes.get((usuario_id, accion))
+                if resumen is None:
+                    nuevos.append(ResumenAccesoDiario(usuario_id=usuario_id, fecha=dia, accion=accion, total=total))
+                else:
+                    resumen.total += total
+                    actualizados.append(resumen)
+            ResumenAccesoDiario.objects.bulk_create(nuevos)
+            ResumenAccesoDiario.objects.bulk_update(actualizados, ['total'])
+            eliminados += registros_dia.delete()[0]
+    return len(dias), eliminados
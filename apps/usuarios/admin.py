@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
-from .models import PerfilUsuario, RegistroAcceso
+from .models import PerfilUsuario, RegistroAcceso, ResumenAccesoDiario
 
 
 class PerfilUsuarioInline(admin.StackedInline):
@@ -32,6 +32,14 @@ class RegistroAccesoAdmin(admin.ModelAdmin):
     date_hierarchy = 'created_at'
 
 
+@admin.register(ResumenAccesoDiario)
+class ResumenAccesoDiarioAdmin(admin.ModelAdmin):
+    list_display = ['usuario', 'fecha', 'accion', 'total']
+    list_filter = ['accion', 'fecha']
+    search_fields = ['usuario__username', 'accion']
+    date_hierarchy = 'fecha'
+
+
 # Re-register UserAdmin
 admin.site.unregister(User)
 admin.site.register(User, UserAdmin)
\ No newline at end of file
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from apps.usuarios.accesos import depurar_accesos
+
+
+class Command(BaseCommand):
+    help = 'Resume por usuario y día los registros de acceso antiguos y los elimina'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=getattr(settings, 'ACCESOS_RETENCION_DIAS', 90),
+            help='Conservar el detalle de los últimos N días (por defecto ACCESOS_RETENCION_DIAS)',
+        )
+
+    def handle(self, *args, **options):
+        if options['dias'] < 1:
+            raise CommandError('--dias debe ser mayor que cero.')
+
+        self.stdout.write(f'🧹 Depurando accesos con más de {options["dias"]} días...\n')
+        dias, eliminados = depurar_accesos(options['dias'])
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ Días resumidos: {dias} | Registros eliminados: {eliminados}')
+        )
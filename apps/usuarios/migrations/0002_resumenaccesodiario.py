@@ -0,0 +1,43 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:19
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('usuarios', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenAccesoDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('accion', models.CharField(max_length=100, verbose_name='Acción')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Total')),
+            ],
+            options={
+                'verbose_name': 'Resumen Diario de Accesos',
+                'verbose_name_plural': 'Resúmenes Diarios de Accesos',
+                'ordering': ['-fecha', 'usuario'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='registroacceso',
+            index=models.Index(fields=['created_at'], name='usuarios_acceso_fecha_idx'),
+        ),
+        migrations.AddField(
+            model_name='resumenaccesodiario',
+            name='usuario',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Usuario'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='resumenaccesodiario',
+            unique_together={('usuario', 'fecha', 'accion')},
+        ),
+    ]
@@ -120,6 +120,29 @@ class RegistroAcceso(BaseModel):
         verbose_name = 'Registro de Acceso'
         verbose_name_plural = 'Registros de Acceso'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='usuarios_acceso_fecha_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.usuario.username} - {self.accion} - {self.created_at}"
\ No newline at end of file
+        return f"{self.usuario.username} - {self.accion} - {self.created_at}"
+
+
+class ResumenAccesoDiario(models.Model):
+    """
+    Conteo diario de accesos por usuario y acción que se conserva cuando
+    los registros de acceso se eliminan por retención.
+    """
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='Usuario')
+    fecha = models.DateField('Fecha')
+    accion = models.CharField('Acción', max_length=100)
+    total = models.PositiveIntegerField('Total', default=0)
+    
+    class Meta:
+        verbose_name = 'Resumen Diario de Accesos'
+        verbose_name_plural = 'Resúmenes Diarios de Accesos'
+        ordering = ['-fecha', 'usuario']
+        unique_together = ['usuario', 'fecha', 'accion']
+    
+    def __str__(self):
+        return f"{self.usuario.username} - {self.accion} - {self.fecha}: {self.total}"
\ No newline at end of file
@@ -4,9 +4,11 @@ Señales para la app de usuarios.
 
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from django.contrib.auth.signals import user_logged_out
 from django.contrib.auth.models import User, Group, Permission
 from django.contrib.contenttypes.models import ContentType
 from .models import PerfilUsuario
+from .accesos import registrar_acceso
 
 
 @receiver(post_save, sender=User)
@@ -93,4 +95,11 @@ def asignar_grupos_permisos(sender, instance, **kwargs):
         except Exception as e:
             print(f"Error asignando permisos a solo_vista: {e}")
             
-        user.groups.add(group)
\ No newline at end of file
+        user.groups.add(group)
+
+
+@receiver(user_logged_out)
+def registrar_logout(sender, request, user, **kwargs):
+    """Registra el cierre de sesión en el búfer de accesos."""
+    if user is not None and request is not None:
+        registrar_acceso(user, request, accion='Logout', modulo='Usuarios')
@@ -0,0 +1,98 @@
+"""
+Pruebas del registro de accesos por lotes y su depuración.
+"""
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import accesos
+from .models import RegistroAcceso, ResumenAccesoDiario
+
+User = get_user_model()
+
+
+@override_settings(ACCESOS_BUFFER_TAMANO=50, ACCESOS_BUFFER_SEGUNDOS=3600)
+class BufferAccesosTest(TestCase):
+    """Pruebas de la escritura diferida de RegistroAcceso"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='operario', password='testpass123')
+        self.request = RequestFactory().get('/', HTTP_X_FORWARDED_FOR='10.0.0.5, 10.0.0.1')
+        accesos.vaciar()
+
+    def tearDown(self):
+        del accesos._pendientes[:]
+
+    def test_accesos_se_escriben_juntos(self):
+        """Los accesos quedan en memoria y se escriben con un solo INSERT"""
+        for _ in range(3):
+            accesos.registrar_acceso(self.user, self.request, accion='Login', modulo='Usuarios')
+        self.assertFalse(RegistroAcceso.objects.exists())
+
+        with CaptureQueriesContext(connection) as contexto:
+            self.assertEqual(accesos.vaciar(), 3)
+
+        self.assertEqual(len(contexto.captured_queries), 1)
+        self.assertEqual(
+            list(RegistroAcceso.objects.values_list('ip_address', flat=True)), ['10.0.0.5'] * 3
+        )
+
+    @override_settings(ACCESOS_BUFFER_TAMANO=2)
+    def test_buffer_lleno_se_vacia(self):
+        accesos.registrar_acceso(self.user, self.request, accion='Login', modulo='Usuarios')
+        self.assertFalse(RegistroAcceso.objects.exists())
+        accesos.registrar_acceso(self.user, self.request, accion='Logout', modulo='Usuarios')
+        self.assertEqual(RegistroAcceso.objects.count(), 2)
+
+    @override_settings(ACCESOS_BUFFER_SEGUNDOS=0)
+    def test_sin_intervalo_escribe_al_momento(self):
+        accesos.registrar_acceso(self.user, self.request, accion='Login', modulo='Usuarios')
+        self.assertEqual(RegistroAcceso.objects.count(), 1)
+
+    def test_logout_registra_acceso(self):
+        self.client.force_login(self.user)
+        self.client.post('/usuarios/logout/')
+        self.assertEqual(accesos.vaciar(), 1)
+        self.assertEqual(RegistroAcceso.objects.get().accion, 'Logout')
+
+
+class DepurarAccesosTest(TestCase):
+    """Pruebas de la retención con resumen diario"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='operario', password='testpass123')
+        self.otro = User.objects.create_user(username='veterinario', password='testpass123')
+
+    def _acceso(self, usuario, accion, dias):
+        registro = RegistroAcceso.objects.create(usuario=usuario, ip_address='10.0.0.5', accion=accion, modulo='Usuarios')
+        RegistroAcceso.objects.filter(pk=registro.pk).update(created_at=timezone.now() - timedelta(days=dias))
+
+    def test_resume_y_elimina_antiguos(self):
+        for _ in range(3):
+            self._acceso(self.user, 'Login', 120)
+        self._acceso(self.otro, 'Login', 120)
+        self._acceso(self.user, 'Login', 5)
+
+        self.assertEqual(accesos.depurar_accesos(90), (1, 4))
+
+        self.assertEqual(RegistroAcceso.objects.count(), 1)
+        resumenes = dict(ResumenAccesoDiario.objects.values_list('usuario__username', 'total'))
+        self.assertEqual(resumenes, {'operario': 3, 'veterinario': 1})
+
+    def test_repetir_suma_sin_duplicar(self):
+        self._acceso(self.user, 'Login', 120)
+        accesos.depurar_accesos(90)
+        self._acceso(self.user, 'Login', 120)
+
+        salida = StringIO()
+        call_command('depurar_accesos', '--dias', '90', stdout=salida)
+
+        self.assertIn('Registros eliminados: 1', salida.getvalue())
+        resumen = ResumenAccesoDiario.objects.get()
+        self.assertEqual(resumen.total, 2)
@@ -13,7 +13,8 @@ from django.http import Http404
 from django.urls import reverse_lazy
 from django.utils.decorators import method_decorator
 from django.db.models import Q
-from .models import PerfilUsuario, RegistroAcceso
+from .models import PerfilUsuario
+from .accesos import ip_cliente, registrar_acceso
 from .forms import RegistroUsuarioForm, PerfilUsuarioForm, LoginForm, RegistroCompletoForm, EditarUsuarioForm
 from .decorators import role_required, admin_usuarios_required, punto_blanco_required
 
@@ -57,13 +58,7 @@ class LoginView(CreateView):
                 
                 login(request, user)
                 # Registrar acceso
-                RegistroAcceso.objects.create(
-                    usuario=user,
-                    ip_address=self.get_client_ip(request),
-                    user_agent=request.META.get('HTTP_USER_AGENT', ''),
-                    accion='Login',
-                    modulo='Usuarios'
-                )
+                registrar_acceso(user, request, accion='Login', modulo='Usuarios')
                 messages.success(request, f'Bienvenido {user.get_full_name()}')
                 
                 # Redirección basada en el rol del usuario
@@ -90,12 +85,7 @@ class LoginView(CreateView):
         return render(request, self.template_name, {'form': form})
     
     def get_client_ip(self, request):
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
+        return ip_cliente(request)
 
 
 class RegistroView(CreateView):
@@ -118,13 +108,7 @@ class RegistroView(CreateView):
         user = form.instance
         
         # Registrar la creación del usuario
-        RegistroAcceso.objects.create(
-            usuario=user,
-            ip_address=self.get_client_ip(self.request),
-            user_agent=self.request.META.get('HTTP_USER_AGENT', ''),
-            accion='Registro',
-            modulo='Usuarios'
-        )
+        registrar_acceso(user, self.request, accion='Registro', modulo='Usuarios')
         
         messages.success(
             self.request, 
@@ -139,12 +123,7 @@ class RegistroView(CreateView):
         return response
     
     def get_client_ip(self, request):
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
+        return ip_cliente(request)
 
 
 @method_decorator(admin_usuarios_required, name='dispatch')
@@ -185,13 +164,7 @@ class CrearUsuarioView(LoginRequiredMixin, CreateView):
         user = form.instance
         
         # Registrar la creación del usuario
-        RegistroAcceso.objects.create(
-            usuario=user,
-            ip_address=self.get_client_ip(self.request),
-            user_agent=self.request.META.get('HTTP_USER_AGENT', ''),
-            accion='Creación de Usuario',
-            modulo='Usuarios'
-        )
+        registrar_acceso(user, self.request, accion='Creación de Usuario', modulo='Usuarios')
         
         messages.success(
             self.request, 
@@ -201,12 +174,7 @@ class CrearUsuarioView(LoginRequiredMixin, CreateView):
         return response
     
     def get_client_ip(self, request):
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
+        return ip_cliente(request)
 
 
 class PerfilView(LoginRequiredMixin, DetailView):
@@ -2,4 +2,9 @@ try:
     import MySQLdb  # type: ignore
 except Exception:
     import pymysql
-    pymysql.install_as_MySQLdb()
\ No newline at end of file
+    pymysql.install_as_MySQLdb()
+try:
+    # Aplicación de Celery para los backends 'celery' (ver config/celery.py)
+    from .celery import app as celery_app  # noqa: F401
+except ImportError:
+    celery_app = None
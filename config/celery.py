@@ -0,0 +1,21 @@
+"""
+Aplicación de Celery de AgroSmart.
+
+Solo se usa con REPORTES_BACKEND o AVES_EFECTOS_BACKEND = 'celery'. Los
+ajustes se leen de Django con el prefijo CELERY_ (broker, zona horaria y
+tareas periódicas de Celery beat en CELERY_BEAT_SCHEDULE).
+
+    celery -A config worker -l info
+    celery -A config beat -l info
+"""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.prod')
+
+app = Celery('agrosmart')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+# apps.aves.tasks y apps.reportes.tasks
+app.autodiscover_tasks()
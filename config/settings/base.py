@@ -47,6 +47,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'apps.core.middleware.UsuarioActualMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -126,6 +127,68 @@ LOGIN_URL = '/usuarios/login/'
 LOGIN_REDIRECT_URL = '/dashboard/'
 LOGOUT_REDIRECT_URL = '/usuarios/login/'
 
+# Caché: Redis si REDIS_URL está definido, memoria local en caso contrario
+REDIS_URL = os.environ.get('REDIS_URL', '')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'agrosmart',
+        }
+    }
+
+# Tiempo máximo (segundos) de una entrada de dashboard en la caché versionada
+DASHBOARD_CACHE_TIMEOUT = int(os.environ.get('DASHBOARD_CACHE_TIMEOUT', 300))
+
+# Efectos diferidos del módulo avícola (inventario, mortalidad y alertas tras
+# guardar bitácoras y movimientos): 'hilos' (pool en el proceso), 'celery'
+# (requiere un worker de Celery) o 'sincrono' (en el mismo hilo al confirmar)
+AVES_EFECTOS_BACKEND = os.environ.get('AVES_EFECTOS_BACKEND', 'hilos')
+AVES_EFECTOS_HILOS = int(os.environ.get('AVES_EFECTOS_HILOS', 2))
+
+# Alertas leídas o resueltas: se compactan a los N días y se eliminan tras la retención
+AVES_ALERTAS_COMPACTAR_DIAS = int(os.environ.get('AVES_ALERTAS_COMPACTAR_DIAS', 7))
+AVES_ALERTAS_RETENCION_DIAS = int(os.environ.get('AVES_ALERTAS_RETENCION_DIAS', 90))
+
+# Días cubiertos por el calendario de vacunación generado desde la llegada del lote
+AVES_VACUNACION_HORIZONTE_DIAS = int(os.environ.get('AVES_VACUNACION_HORIZONTE_DIAS', 560))
+
+# Procesos que escriben en paralelo los registros SENA de fin de mes (1 = sin pool)
+AVES_SENA_PROCESOS = int(os.environ.get('AVES_SENA_PROCESOS', 4))
+
+# Reportes pesados en segundo plano (apps/reportes/trabajos.py): 'hilos',
+# 'procesos', 'celery' (requiere un worker de Celery) o 'sincrono'
+REPORTES_BACKEND = os.environ.get('REPORTES_BACKEND', 'hilos')
+REPORTES_TRABAJADORES = int(os.environ.get('REPORTES_TRABAJADORES', 2))
+# Minutos en 'generando' tras los que un reporte se da por interrumpido y se reencola
+REPORTES_INTERRUMPIDO_MINUTOS = int(os.environ.get('REPORTES_INTERRUMPIDO_MINUTOS', 60))
+
+# Celery (config/celery.py): solo lo usan los backends 'celery'. El broker
+# es CELERY_BROKER_URL o, si no está definido, el Redis de la caché
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', REDIS_URL or 'redis://localhost:6379/0')
+CELERY_TIMEZONE = TIME_ZONE
+CELERY_TASK_IGNORE_RESULT = True
+CELERY_TASK_ACKS_LATE = True
+# Tareas periódicas de Celery beat (segundos); sin beat, los comandos equivalentes desde cron
+CELERY_BEAT_SCHEDULE = {
+    'reportes-programados': {'task': 'reportes.ejecutar_programados', 'schedule': 60.0},
+    'barrido-alertas': {'task': 'aves.barrido_alertas', 'schedule': 24 * 60 * 60.0},
+    'mantenimiento-alertas': {'task': 'aves.mantenimiento_alertas', 'schedule': 24 * 60 * 60.0},
+}
+
+# Registros de acceso: se escriben por lotes de ACCESOS_BUFFER_TAMANO o cada
+# ACCESOS_BUFFER_SEGUNDOS segundos (0 = escribir cada acceso en el momento)
+ACCESOS_BUFFER_TAMANO = int(os.environ.get('ACCESOS_BUFFER_TAMANO', 50))
+ACCESOS_BUFFER_SEGUNDOS = int(os.environ.get('ACCESOS_BUFFER_SEGUNDOS', 5))
+ACCESOS_RETENCION_DIAS = int(os.environ.get('ACCESOS_RETENCION_DIAS', 90))
+
 # Email configuration (base)
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 